@@ -0,0 +1,92 @@
+"""Latency of the reads during a storm of writes, with and without admission control.
+
+For each setting a server is started on a seeded database. Many writer threads send games
+without pause while a reader times GET /game/mano_fuerte. Without admission control every write
+takes a thread of the server and waits for the SQLite write lock. With it, only
+`WRITE_CONCURRENCY` writes run at a time and the excess is rejected with a 503, after which
+the writer waits for the Retry-After.
+
+Usage:
+    python -m benchmarks.bench_admission --writers 128 --workers 2 --seconds 10
+"""
+import argparse
+from collections import Counter
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+
+import requests
+
+from benchmarks.bench_write_latency import percentile
+from benchmarks.dataset import random_game, seed_database
+from benchmarks.server import running_server
+
+SETTINGS = {
+    "no admission control": {"WRITE_CONCURRENCY": "0", "READ_CONCURRENCY": "0"},
+    "admission control": {},
+}
+
+
+def write_storm(base_url: str, stop: threading.Event, statuses: Counter, seed: int):
+    """Sends games until `stop` is set and counts the status codes of the responses.
+
+    Like `api_client`, a writer refused with a Retry-After waits before sending again.
+    """
+    rng = random.Random(seed)
+    with requests.Session() as session:
+        while not stop.is_set():
+            response = session.post(f"{base_url}/game/", json=random_game(rng))
+            statuses[response.status_code] += 1
+            if "Retry-After" in response.headers:
+                stop.wait(float(response.headers["Retry-After"]))
+
+
+def time_reads(base_url: str, seconds: float) -> list:
+    """Reads the strong hand for a number of seconds and returns the latency of each request in ms."""
+    latencies = []
+    deadline = time.monotonic() + seconds
+    with requests.Session() as session:
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            session.get(f"{base_url}/game/mano_fuerte").raise_for_status()
+            latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=128)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--games", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_path = os.path.join(directory, "bench.db")
+        seed_database(f"sqlite:///{database_path}", args.games)
+
+        for name, env in SETTINGS.items():
+            with running_server(database_path, args.workers, args.port, **env) as base_url:
+                idle = time_reads(base_url, 1)
+                stop = threading.Event()
+                statuses = Counter()
+                writers = [threading.Thread(target=write_storm, args=(base_url, stop, statuses, seed))
+                           for seed in range(args.writers)]
+                for writer in writers:
+                    writer.start()
+                latencies = time_reads(base_url, args.seconds)
+                stop.set()
+                for writer in writers:
+                    writer.join()
+
+            print(f"{name}: reads p50={statistics.median(latencies):.1f} ms "
+                  f"p99={percentile(latencies, 0.99):.1f} ms (idle p99={percentile(idle, 0.99):.1f} ms), "
+                  f"writes {dict(sorted(statuses.items()))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Latency of the statistics counted by SQLite or by DuckDB (`ANALYTICS_ENGINE=duckdb`).
+
+On a database with random games, times the all-time statistics, the hands counted from
+the games and a windowed statistic with both engines. Requires `pip install duckdb`.
+
+Usage:
+    python -m benchmarks.bench_analytics --games 100000
+"""
+import argparse
+from datetime import timedelta
+import os
+import tempfile
+import time
+
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.dataset import seed_database
+from rock_paper_scissors.api import analytics, crud
+from rock_paper_scissors.api.database import create_db_engine
+
+QUERIES = {
+    "get_global_info": lambda db: crud.get_global_info(db),
+    "get_statistics": lambda db: crud.get_statistics(db),
+    "get_ranking": lambda db: crud.get_ranking(db),
+    "get_strong_hand (no cache)": lambda db: crud.get_strong_hand(db),
+    "get_statistics 90m Human": lambda db: crud.get_statistics(db, window=timedelta(minutes=90), player="Human"),
+}
+
+
+def timed(function, repeat: int) -> float:
+    """Returns the milliseconds of one call of a function, averaged over `repeat` calls after a first one."""
+    function()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    if analytics.duckdb is None:
+        parser.error("duckdb is not installed")
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_path = os.path.join(directory, "bench.db")
+        seed_database(f"sqlite:///{database_path}", args.games)
+        engine = create_db_engine(f"sqlite:///{database_path}")
+        SessionLocal = sessionmaker(autoflush=False, bind=engine)
+        duckdb_analytics = analytics.DuckDBAnalytics(database_path)
+
+        print(f"{'statistic':<28} {'SQLite':>10} {'DuckDB':>10}")
+        with SessionLocal() as db:
+            for name, query in QUERIES.items():
+                analytics.ANALYTICS_ENGINE = "sqlite"
+                sqlite_time = timed(lambda: query(db), args.repeat)
+                analytics.ANALYTICS_ENGINE = "duckdb"
+                analytics._analytics = duckdb_analytics
+                duckdb_time = timed(lambda: query(db), args.repeat)
+                print(f"{name:<28} {sqlite_time:>7.1f} ms {duckdb_time:>7.1f} ms")
+
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Size and speed of the archive of old games.
+
+On a database with random games, all created a year ago except the newest `--hot-games`, measures:
+- the size of the database before and after archiving the old games, and the size of the segments;
+- `crud.get_statistics` over all the games, with the old games in the database or in the archive;
+- the games per second of the export of the archive.
+
+Usage:
+    python -m benchmarks.bench_archive --games 20000 --hot-games 2000
+"""
+import argparse
+from datetime import timedelta
+import os
+import sqlite3
+import tempfile
+import time
+
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.dataset import seed_database
+from rock_paper_scissors.api import archive, crud, models
+from rock_paper_scissors.api.database import create_db_engine
+
+
+def timed(function, repeat: int = 1) -> float:
+    """Returns the milliseconds of one call of a function, averaged over `repeat` calls."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def database_size(path: str) -> int:
+    """Returns the bytes used by a SQLite database, after removing its free pages."""
+    connection = sqlite3.connect(path, isolation_level=None)
+    try:
+        connection.execute("VACUUM")
+        connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return os.path.getsize(path)
+    finally:
+        connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=20000)
+    parser.add_argument("--hot-games", type=int, default=2000, help="Newest games, kept in the database")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_path = os.path.join(directory, "bench.db")
+        archive_dir = os.path.join(directory, "archive")
+        seed_database(f"sqlite:///{database_path}", args.games)
+        engine = create_db_engine(f"sqlite:///{database_path}")
+        SessionLocal = sessionmaker(autoflush=False, bind=engine)
+
+        with SessionLocal() as db:
+            old_games = db.query(models.Game).filter(models.Game.id <= args.games - args.hot_games)
+            old_games.update({models.Game.created_at: models.utcnow() - timedelta(days=365)}, synchronize_session=False)
+            db.commit()
+
+        archive.ARCHIVE_DIR = archive_dir
+        size_before = database_size(database_path)
+        with SessionLocal() as db:
+            stats_before = timed(lambda: crud.get_statistics(db), repeat=20)
+
+        archiving = timed(lambda: archive.archive_games(timedelta(days=90), session_factory=SessionLocal))
+
+        size_after = database_size(database_path)
+        archive_size = sum(os.path.getsize(os.path.join(archive_dir, name)) for name in os.listdir(archive_dir))
+        with SessionLocal() as db:
+            stats_after = timed(lambda: crud.get_statistics(db), repeat=20)
+
+        start = time.perf_counter()
+        exported = sum(1 for _ in archive.iter_archived_games())
+        export_rate = exported / (time.perf_counter() - start)
+
+        engine.dispose()
+
+    archived = args.games - args.hot_games
+    print(f"database with {args.games} games:          {size_before / 1024:.0f} KiB")
+    print(f"database with {args.hot_games} games:           {size_after / 1024:.0f} KiB")
+    print(f"archive of {archived} games:            {archive_size / 1024:.0f} KiB")
+    print(f"archiving:                             {archiving:.0f} ms")
+    print(f"get_statistics, all games in database: {stats_before:.1f} ms")
+    print(f"get_statistics, old games in archive:  {stats_after:.1f} ms")
+    print(f"export:                                {export_rate:.0f} games/s")
+
+
+if __name__ == "__main__":
+    main()
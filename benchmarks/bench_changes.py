@@ -0,0 +1,95 @@
+"""Cost of tailing the games with the change feed, polling against long polling.
+
+N consumers follow `/game/changes` from the last game, either asking again every
+`--poll-interval` seconds (wait=0) or waiting for the next game in the request (long polling).
+For each mode, measures:
+- the CPU used by the server while no game is played (Linux only, from /proc);
+- the time until every consumer has received a new game.
+
+Usage:
+    python -m benchmarks.bench_changes --consumers 200 --idle 10 --games 20
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.bench_scoreboard import server_cpu_seconds
+from benchmarks.dataset import random_game, seed_database
+from benchmarks.server import running_server
+
+
+async def last_cursor(client: httpx.AsyncClient) -> str:
+    cursor = "0"
+    while True:
+        page = (await client.get("/game/changes", params={"since": cursor, "limit": 1000, "wait": 0})).json()
+        if not page["games"]:
+            return cursor
+        cursor = page["cursor"]
+
+
+async def consumer(client: httpx.AsyncClient, cursor: str, wait: float, poll_interval: float, arrivals: asyncio.Queue):
+    """Tails the feed and puts the arrival time of every batch of games in a queue."""
+    while True:
+        response = await client.get("/game/changes", params={"since": cursor, "wait": wait})
+        response.raise_for_status()
+        page = response.json()
+        cursor = page["cursor"]
+        if page["games"]:
+            arrivals.put_nowait(time.perf_counter())
+        elif not wait:
+            await asyncio.sleep(poll_interval)
+
+
+async def scenario(base_url: str, port: int, mode: str, consumers: int, idle: float, games: int, poll_interval: float):
+    limits = httpx.Limits(max_connections=consumers + 1)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        cursor = await last_cursor(client)
+        wait = 30 if mode == "long polling" else 0
+        arrivals = asyncio.Queue()
+        tasks = [asyncio.create_task(consumer(client, cursor, wait, poll_interval, arrivals)) for _ in range(consumers)]
+        await asyncio.sleep(2)
+
+        cpu_before = server_cpu_seconds(port)
+        await asyncio.sleep(idle)
+        cpu_idle = server_cpu_seconds(port) - cpu_before
+
+        rng = random.Random(3)
+        latencies = []
+        for _ in range(games):
+            start = time.perf_counter()
+            await client.post("/game/", json=random_game(rng))
+            received = [await asyncio.wait_for(arrivals.get(), 60) for _ in range(consumers)]
+            latencies.append((max(received) - start) * 1000)
+        latencies.sort()
+
+        for task in tasks:
+            task.cancel()
+    print(f"{mode:13}: {consumers} idle consumers, server CPU {cpu_idle / idle * 1000:7.1f} ms/s; "
+          f"game received by all: median {latencies[len(latencies) // 2]:7.1f} ms, max {latencies[-1]:7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--consumers", type=int, default=200)
+    parser.add_argument("--idle", type=float, default=10)
+    parser.add_argument("--games", type=int, default=20)
+    parser.add_argument("--poll-interval", type=float, default=1)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_path = os.path.join(directory, "bench.db")
+        seed_database(f"sqlite:///{database_path}", 1000)
+        with running_server(database_path, port=args.port) as base_url:
+            for mode in ("polling", "long polling"):
+                asyncio.run(scenario(base_url, args.port, mode, args.consumers, args.idle, args.games,
+                                     args.poll_interval))
+
+
+if __name__ == "__main__":
+    main()
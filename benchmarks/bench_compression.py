@@ -0,0 +1,66 @@
+"""Bytes on the wire and CPU time of the response compression, by encoding and level.
+
+On a database with random games, compresses with every encoding and level:
+- a page of `/game/historial` (1000 games), sent in one part;
+- the same games as JSON lines, one game per part, as `/game/archivo` streams them.
+
+Encodings whose library is not installed (brotli, zstandard) are skipped.
+
+Usage:
+    python -m benchmarks.bench_compression --games 5000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.dataset import seed_database
+from rock_paper_scissors.api import compression, crud
+from rock_paper_scissors.api.database import create_db_engine
+
+LEVELS = {"gzip": [1, 6, 9], "br": [1, 4, 6, 11], "zstd": [1, 3, 7, 19]}
+
+
+def compress(encoding: str, level: int, parts: list) -> tuple:
+    """Returns the compressed size of some parts and the milliseconds taken to compress them."""
+    start = time.perf_counter()
+    compressor = compression.make_compressor(encoding, level)
+    size = sum(len(compressor.compress(part)) for part in parts) + len(compressor.finish())
+    return size, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_path = os.path.join(directory, "bench.db")
+        seed_database(f"sqlite:///{database_path}", args.games)
+        engine = create_db_engine(f"sqlite:///{database_path}")
+        with sessionmaker(bind=engine)() as db:
+            games = crud.get_history(db, limit=1000)
+        engine.dispose()
+
+    payloads = {
+        "history page": [json.dumps(games).encode()],
+        "export lines": [(json.dumps(game) + "\n").encode() for game in games],
+    }
+    for name, parts in payloads.items():
+        raw_size = sum(len(part) for part in parts)
+        print(f"{name}: {raw_size} bytes in {len(parts)} parts")
+        for encoding in compression.available_encodings(",".join(LEVELS)):
+            for level in LEVELS[encoding]:
+                results = [compress(encoding, level, parts) for _ in range(args.repeat)]
+                size = results[0][0]
+                milliseconds = min(elapsed for _, elapsed in results)
+                print(f"  {encoding:4} level {level:2}: {size:7} bytes ({raw_size / size:5.1f}x) {milliseconds:7.2f} ms "
+                      f"({raw_size / milliseconds / 1000:6.1f} MB/s)")
+
+
+if __name__ == "__main__":
+    main()
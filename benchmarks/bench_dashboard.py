@@ -0,0 +1,78 @@
+"""Cost of showing all the statistics with the separate routes or with /game/dashboard.
+
+On a database with random games, measures the SQL statements run by the separate `crud`
+functions and by `crud.get_dashboard`, then, against a server, the time to fetch the five
+separate routes one after the other and the single dashboard request.
+
+Usage:
+    python -m benchmarks.bench_dashboard --games 20000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import requests
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.dataset import seed_database
+from benchmarks.server import running_server
+from rock_paper_scissors.api import crud, query_log
+from rock_paper_scissors.api.database import create_db_engine
+
+ROUTES = ["/game/get_global_info", "/game/estadisticas", "/game/ranking", "/game/mano_fuerte", "/game/mano_debil"]
+
+
+def separate(db):
+    crud.get_global_info(db)
+    crud.get_statistics(db)
+    crud.get_ranking(db)
+    crud.get_strong_hand(db)
+    crud.get_weak_hand(db)
+
+
+def timed(function, repeat: int) -> float:
+    """Returns the milliseconds of one call of a function, averaged over `repeat` calls after a first one."""
+    function()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_path = os.path.join(directory, "bench.db")
+        seed_database(f"sqlite:///{database_path}", args.games)
+        engine = create_db_engine(f"sqlite:///{database_path}")
+        SessionLocal = sessionmaker(autoflush=False, bind=engine)
+
+        with SessionLocal() as db:
+            with query_log.count_queries() as separate_stats:
+                separate(db)
+            with query_log.count_queries() as dashboard_stats:
+                crud.get_dashboard(db)
+        engine.dispose()
+        print(f"separate functions: {separate_stats.count} statements")
+        print(f"get_dashboard:      {dashboard_stats.count} statements")
+
+        with running_server(database_path, port=args.port) as base_url, requests.Session() as http:
+            def fetch_routes():
+                for route in ROUTES:
+                    http.get(base_url + route).raise_for_status()
+
+            routes_time = timed(fetch_routes, args.repeat)
+            dashboard_time = timed(lambda: http.get(base_url + "/game/dashboard").raise_for_status(), args.repeat)
+
+    print(f"{len(ROUTES)} separate requests: {routes_time:.1f} ms")
+    print(f"/game/dashboard:     {dashboard_time:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Cost of the strong and weak hand statistics, counted from the games or kept in memory.
+
+On a database with random games, measures:
+- `crud.get_strong_hand` counting the moves of every game won, as before;
+- the same call answered by the statistics in memory, already up to date;
+- the start of a process: reading all the games, or loading the snapshot and reading
+  only the games recorded after it.
+
+Usage:
+    python -m benchmarks.bench_hand_stats --games 20000 --new-games 1000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.dataset import random_game, seed_database
+from rock_paper_scissors.api import crud, schemas
+from rock_paper_scissors.api.database import create_db_engine
+from rock_paper_scissors.api.hand_stats import HandStats
+
+
+def timed(function, repeat: int = 1) -> float:
+    """Returns the milliseconds of one call of a function, averaged over `repeat` calls."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=20000)
+    parser.add_argument("--new-games", type=int, default=1000, help="Games recorded after the snapshot")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_path = os.path.join(directory, "bench.db")
+        seed_database(f"sqlite:///{database_path}", args.games)
+        engine = create_db_engine(f"sqlite:///{database_path}")
+        SessionLocal = sessionmaker(autoflush=False, bind=engine)
+
+        with SessionLocal() as db:
+            counted = timed(lambda: crud.get_strong_hand(db), repeat=3)
+
+            stats = HandStats()
+            cold_start = timed(lambda: stats.catch_up(db))
+            in_memory = timed(lambda: crud.get_strong_hand(db, hand_stats=stats), repeat=1000)
+
+            snapshot_path = os.path.join(directory, "hands.json")
+            stats.save(snapshot_path)
+            rng = random.Random(1)
+            crud.create_games(db, [schemas.GameCreate(**random_game(rng)) for _ in range(args.new_games)])
+
+            def warm_start():
+                restarted = HandStats()
+                restarted.load(snapshot_path, db)
+                restarted.catch_up(db)
+
+            warm = timed(warm_start)
+
+        engine.dispose()
+
+    print(f"get_strong_hand counting {args.games} games: {counted:.1f} ms")
+    print(f"get_strong_hand in memory:                {in_memory * 1000:.1f} us (including the check for new games)")
+    print(f"start reading all the games:              {cold_start:.1f} ms")
+    print(f"start from snapshot + {args.new_games} new games:     {warm:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
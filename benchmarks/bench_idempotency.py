@@ -0,0 +1,78 @@
+"""Cost of idempotency keys on the game uploads.
+
+Records the same random games one by one through `crud.create_game`:
+- without idempotency keys;
+- with new keys, which the filter of recent keys lets skip the database lookup;
+- with new keys and a lookup for every game, as without the filter;
+- replaying keys already recorded.
+
+Usage:
+    python -m benchmarks.bench_idempotency --games 5000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+import uuid
+from unittest.mock import patch
+
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.dataset import random_game
+from rock_paper_scissors.api import crud, schemas
+from rock_paper_scissors.api.database import create_db_engine, init_db
+
+
+class AlwaysMaybe:
+    """Filter of recent keys that never rules a key out, so every upload looks up its key."""
+
+    def might_contain(self, key: str) -> bool:
+        return True
+
+    def update(self, keys):
+        pass
+
+
+def record(db, games: list) -> float:
+    """Records the games one by one and returns the microseconds per game."""
+    start = time.perf_counter()
+    for game in games:
+        crud.create_game(db, game)
+    return (time.perf_counter() - start) / len(games) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=5000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    payload = [random_game(rng) for _ in range(args.games)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_db_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        init_db(engine)
+        SessionLocal = sessionmaker(autoflush=False, expire_on_commit=False, bind=engine)
+
+        with SessionLocal() as db:
+            without_keys = record(db, [schemas.GameCreate(**game) for game in payload])
+
+            keyed = [schemas.GameCreate(**game, idempotency_key=uuid.uuid4().hex) for game in payload]
+            with_filter = record(db, keyed)
+
+            with patch("rock_paper_scissors.api.crud.recent_keys", AlwaysMaybe()):
+                with_lookup = record(db, [schemas.GameCreate(**game, idempotency_key=uuid.uuid4().hex) for game in payload])
+
+            replays = record(db, keyed)
+
+        engine.dispose()
+
+    print(f"without keys:            {without_keys:.0f} us per game")
+    print(f"new keys, with filter:   {with_filter:.0f} us per game")
+    print(f"new keys, always lookup: {with_lookup:.0f} us per game")
+    print(f"replayed keys:           {replays:.0f} us per game")
+
+
+if __name__ == "__main__":
+    main()
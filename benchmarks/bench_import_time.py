@@ -0,0 +1,100 @@
+"""Import-time benchmark for the console client and the API server.
+
+Runs `python -X importtime -c "import <module>"` in fresh interpreters, parses the
+lines written to stderr and reports the total import time plus the slowest modules.
+
+Usage:
+    python -m benchmarks.bench_import_time                 # main.py and the API app
+    python -m benchmarks.bench_import_time main --runs 10 --top 15
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+
+DEFAULT_MODULES = ["main", "rock_paper_scissors.api.init_app"]
+
+
+def parse_importtime(stderr: str) -> dict:
+    """Parses the output of `-X importtime` into a dictionary of timings.
+
+    Args:
+        stderr (str): Text written by the interpreter to stderr.
+
+    Returns:
+        dict: Module name mapped to a tuple (self_us, cumulative_us).
+
+    Examples:
+        >>> output = '''import time: self [us] | cumulative | imported package
+        ... import time:       376 |      13678 | dotenv
+        ... import time:       850 |     475370 | main'''
+        >>> parse_importtime(output)
+        {'dotenv': (376, 13678), 'main': (850, 475370)}
+    """
+    timings = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        name = fields[2].strip()
+        timings[name] = (int(fields[0]), int(fields[1]))
+    return timings
+
+
+def measure(module: str) -> dict:
+    """Imports a module in a fresh interpreter and returns its parsed timings.
+
+    Args:
+        module (str): Dotted name of the module to import.
+
+    Returns:
+        dict: Timings as returned by `parse_importtime`.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return parse_importtime(result.stderr)
+
+
+def report(module: str, runs: int, top: int):
+    """Prints the median import time of a module and its slowest dependencies.
+
+    Args:
+        module (str): Dotted name of the module to import.
+        runs (int): Number of fresh interpreters to start.
+        top (int): Number of modules to list, sorted by cumulative time.
+    """
+    samples = [measure(module) for _ in range(runs)]
+    totals = [sample[module][1] for sample in samples]
+
+    print(f"== {module}: median {statistics.median(totals) / 1000:.1f} ms "
+          f"(min {min(totals) / 1000:.1f} ms, {runs} runs, {len(samples[-1])} modules)")
+
+    slowest = sorted(samples[-1].items(), key=lambda item: item[1][1], reverse=True)[:top]
+    for name, (self_us, cumulative_us) in slowest:
+        print(f"   {cumulative_us / 1000:8.1f} ms  (self {self_us / 1000:6.1f} ms)  {name}")
+
+    for heavy in ("sqlalchemy", "pydantic", "fastapi", "requests"):
+        if heavy in samples[-1]:
+            print(f"   loaded: {heavy}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    for module in args.modules:
+        report(module, args.runs, args.top)
+
+
+if __name__ == "__main__":
+    main()
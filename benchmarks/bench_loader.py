@@ -0,0 +1,103 @@
+"""Games per second loaded from a JSON lines file: one game per transaction, bulk and the loader.
+
+Writes random games to a file and loads them into a database that already has `--existing`
+games, in four ways:
+- one transaction per game with `crud.create_game`, as POST /game does (on the first
+  `--single-games` games only);
+- with `crud.create_games` in batches, as POST /game/bulk does;
+- with `loader.load_file`;
+- with `loader.load_file` and the indexes deferred.
+
+Usage:
+    python -m benchmarks.bench_loader --games 200000 --existing 200000
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from itertools import islice
+
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.dataset import random_game
+from rock_paper_scissors.api import crud, loader, schemas
+from rock_paper_scissors.api.database import create_db_engine, init_db
+
+
+def write_games(path: str, games: int, seed: int):
+    """Writes random games to a JSON lines file."""
+    rng = random.Random(seed)
+    with open(path, "w") as games_file:
+        for _ in range(games):
+            games_file.write(json.dumps(random_game(rng)) + "\n")
+
+
+def read_games(path: str, limit: int = None):
+    """Yields the games of a JSON lines file as `schemas.GameCreate`."""
+    with open(path) as games_file:
+        for line in islice(games_file, limit):
+            yield schemas.GameCreate(**json.loads(line))
+
+
+def load_one_by_one(session_factory, path: str, limit: int) -> int:
+    with session_factory() as db:
+        count = 0
+        for game in read_games(path, limit):
+            crud.create_game(db, game)
+            count += 1
+    return count
+
+
+def load_bulk(session_factory, path: str, batch_size: int) -> int:
+    count = 0
+    with session_factory() as db:
+        games = read_games(path)
+        while True:
+            batch = list(islice(games, batch_size))
+            if not batch:
+                return count
+            crud.create_games(db, batch)
+            count += len(batch)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=200000)
+    parser.add_argument("--existing", type=int, default=200000)
+    parser.add_argument("--single-games", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        existing_path = os.path.join(directory, "existing.jsonl")
+        games_path = os.path.join(directory, "games.jsonl")
+        write_games(existing_path, args.existing, seed=1)
+        write_games(games_path, args.games, seed=2)
+
+        methods = {
+            "one game per transaction": lambda factory: load_one_by_one(factory, games_path, args.single_games),
+            "bulk (crud.create_games)": lambda factory: load_bulk(factory, games_path, args.batch_size),
+            "loader": lambda factory: loader.load_file(
+                games_path, batch_size=args.batch_size, session_factory=factory).games,
+            "loader, indexes deferred": lambda factory: loader.load_file(
+                games_path, batch_size=args.batch_size, defer_indexes=True, session_factory=factory).games,
+        }
+        for index, (name, method) in enumerate(methods.items()):
+            database_path = os.path.join(directory, f"bench_{index}.db")
+            engine = create_db_engine(f"sqlite:///{database_path}")
+            init_db(engine)
+            factory = sessionmaker(autoflush=False, expire_on_commit=False,
+                                   bind=engine.execution_options(sqlite_begin="IMMEDIATE"))
+            loader.load_file(existing_path, batch_size=args.batch_size, session_factory=factory)
+
+            start = time.perf_counter()
+            games = method(factory)
+            seconds = time.perf_counter() - start
+            engine.dispose()
+            print(f"{name:26}: {games:7} games in {seconds:7.2f} s, {games / seconds:8.0f} games/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Time the game spends logging each game saved in a mvm run, by logging setup.
+
+Each setup logs the record that `api_client.create_game` writes for every game, with the
+response of a game, `--games` times:
+- the previous setup: a FileHandler on the root logger and an f-string message, which is
+  formatted even when the level is WARNING;
+- `utils.setup_logging` with text and JSON records, with one of every 10 game records
+  sampled, and with the level at WARNING.
+
+"game thread" is the time spent in the logging calls. Between two games the game waits
+`--request-ms` milliseconds, as it does for the response of the API, while the listener
+writes the records; with 0 the calls run back to back and compete with the listener.
+"until written" also waits for the listener to write every record to the file.
+
+Usage:
+    python -m benchmarks.bench_logging --games 5000 --request-ms 1
+    python -m benchmarks.bench_logging --games 100000 --request-ms 0
+"""
+import argparse
+import atexit
+import json
+import logging
+import os
+import tempfile
+import time
+
+from rock_paper_scissors import utils
+
+RESPONSE = json.dumps({
+    "id": 123456,
+    "rounds_played": [{"player_1_move": "rock", "player_2_move": "scissors", "winner": "Machine_1"}] * 3,
+    "game_winner": "Machine_1",
+    "player": "Machine_1",
+    "idempotency_key": "9f86d081884c7d659a2feaa0c55ad015"
+})
+
+SETUPS = {
+    "file handler, f-string": {"before": True, "LOG_LEVEL": "INFO"},
+    "file handler, f-string, WARNING": {"before": True, "LOG_LEVEL": "WARNING"},
+    "queue, text": {"LOG_FORMAT": "text"},
+    "queue, json": {"LOG_FORMAT": "json"},
+    "queue, text, 1 of 10 sampled": {"LOG_FORMAT": "text", "LOG_SAMPLE_EVERY": 10},
+    "queue, level WARNING": {"LOG_LEVEL": "WARNING"},
+}
+
+
+def remove_handlers():
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    games_logger = logging.getLogger(utils.GAMES_LOGGER)
+    for log_filter in list(games_logger.filters):
+        games_logger.removeFilter(log_filter)
+
+
+def run(directory: str, settings: dict, games: int, request_seconds: float) -> tuple:
+    """Logs the record of `games` games and returns the microseconds per game in the game thread
+    and until every record is written."""
+    remove_handlers()
+    games_logger = logging.getLogger(utils.GAMES_LOGGER)
+    listener = None
+    before = settings.get("before", False)
+    if before:
+        logging.basicConfig(level=settings["LOG_LEVEL"], format=utils.TEXT_FORMAT, datefmt=utils.DATE_FORMAT,
+                            handlers=[logging.FileHandler(os.path.join(directory, "before.log"))])
+    else:
+        defaults = {"LOG_DIR": directory, "LOG_LEVEL": "INFO", "LOG_SAMPLE_EVERY": 1}
+        for name, value in {**defaults, **settings}.items():
+            setattr(utils, name, value)
+        listener = utils.setup_logging("bench")
+        atexit.unregister(listener.stop)
+
+    game_thread = 0.0
+    for _ in range(games):
+        if request_seconds:
+            time.sleep(request_seconds)
+        start = time.perf_counter()
+        if before:
+            logging.info(f"New game created:\n{RESPONSE}")
+        else:
+            games_logger.info("New game created:\n%s", RESPONSE)
+        game_thread += time.perf_counter() - start
+    start = time.perf_counter()
+    if listener is not None:
+        listener.stop()
+    written = game_thread + time.perf_counter() - start
+    remove_handlers()
+    return game_thread / games * 1e6, written / games * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=5000)
+    parser.add_argument("--request-ms", type=float, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name, settings in SETUPS.items():
+            game_thread, written = run(directory, settings, args.games, args.request_ms / 1000)
+            print(f"{name:32}: game thread {game_thread:6.2f} us/game, until written {written:6.2f} us/game")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Space reclaimed by the maintenance of the database, and what it costs the requests.
+
+On a database with random games, the oldest `--deleted` of which are deleted (as the archive
+does), measures:
+- the size of the database file and of its WAL, before and after `maintenance.maintain`;
+- the milliseconds of each step of the run;
+- the latency of a read (the count of the games of a player) made in a loop by another thread,
+  while nothing else runs and while the maintenance runs. The maintenance runs as if the worker
+  were idle: in the API its steps that write wait for that.
+
+Usage:
+    python -m benchmarks.bench_maintenance --games 50000 --deleted 40000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from sqlalchemy import text
+
+from benchmarks.dataset import seed_database
+from rock_paper_scissors.api import maintenance
+from rock_paper_scissors.api.database import create_db_engine
+
+
+def read_latencies(engine, stop: threading.Event, latencies: list):
+    """Counts the games of a player until `stop` is set, appending the milliseconds of each count."""
+    with engine.connect() as connection:
+        while not stop.is_set():
+            start = time.perf_counter()
+            connection.execute(text("SELECT count(*) FROM games WHERE player = 'Human'")).scalar()
+            connection.rollback()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+
+def measure_reads(engine, seconds: float = None, during=None) -> list:
+    """Returns the latencies of the reads made for `seconds`, or while `during()` runs."""
+    stop = threading.Event()
+    latencies = []
+    reader = threading.Thread(target=read_latencies, args=(engine, stop, latencies))
+    reader.start()
+    result = during() if during else time.sleep(seconds)
+    stop.set()
+    reader.join()
+    return latencies, result
+
+
+def describe(latencies: list) -> str:
+    latencies = sorted(latencies)
+    p99 = latencies[int(len(latencies) * 0.99)]
+    return f"p50 {statistics.median(latencies):6.2f} ms, p99 {p99:6.2f} ms, max {latencies[-1]:6.2f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=50000)
+    parser.add_argument("--deleted", type=int, default=40000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_path = os.path.join(directory, "bench.db")
+        seed_database(f"sqlite:///{database_path}", args.games)
+        engine = create_db_engine(f"sqlite:///{database_path}")
+        with engine.begin() as connection:
+            connection.execute(text("DELETE FROM moves WHERE game_id <= :id"), {"id": args.deleted})
+            connection.execute(text("DELETE FROM games WHERE id <= :id"), {"id": args.deleted})
+        sizes_before = os.path.getsize(database_path), maintenance.wal_size(engine)
+
+        idle, _ = measure_reads(engine, seconds=2)
+        maintenance.MAINTENANCE_WAL_TRUNCATE_BYTES = 0
+        busy, report = measure_reads(engine, during=lambda: asyncio.run(
+            maintenance.maintain(engine, is_idle=lambda: True, write_lock=asyncio.Lock())))
+        sizes_after = os.path.getsize(database_path), maintenance.wal_size(engine)
+        engine.dispose()
+
+    print(f"database, WAL before: {sizes_before[0] / 1024:8.0f} KiB, {sizes_before[1] / 1024:8.0f} KiB")
+    print(f"database, WAL after:  {sizes_after[0] / 1024:8.0f} KiB, {sizes_after[1] / 1024:8.0f} KiB")
+    print(f"maintenance:          {report}")
+    print(f"reads, alone:         {describe(idle)}")
+    print(f"reads, maintenance:   {describe(busy)}")
+
+
+if __name__ == "__main__":
+    main()
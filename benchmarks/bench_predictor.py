@@ -0,0 +1,60 @@
+"""Cost of a prediction of the next move: model built per request, cached model and model alone.
+
+On a database with random games, times predicting the next move of Human:
+- building its model from the database on every request, as without the cache;
+- through `crud.get_prediction` with the model cached, which only looks up the highest game id;
+- with `PlayerModel.predict` alone, as the sessions do with the "predictor" strategy.
+
+Usage:
+    python -m benchmarks.bench_predictor --games 50000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.dataset import seed_database
+from rock_paper_scissors.api import crud
+from rock_paper_scissors.api.database import create_db_engine
+from rock_paper_scissors.api.predictor import Predictor
+
+
+def timed(function, repeat: int) -> float:
+    """Returns the milliseconds of one call of a function, averaged over `repeat` calls after a first one."""
+    function()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_path = os.path.join(directory, "bench.db")
+        seed_database(f"sqlite:///{database_path}", args.games)
+        engine = create_db_engine(f"sqlite:///{database_path}")
+        SessionLocal = sessionmaker(autoflush=False, bind=engine)
+
+        with SessionLocal() as db:
+            predictor = Predictor()
+            model = predictor.model(db, "Human")
+            cold_time = timed(lambda: crud.get_prediction(db, Predictor(), recent_moves=["rock"]), args.repeat)
+            cached_time = timed(lambda: crud.get_prediction(db, predictor, recent_moves=["rock"]), args.repeat * 1000)
+            predict_time = timed(lambda: model.predict(("paper", "rock")), args.repeat * 100000)
+        engine.dispose()
+
+    print(f"{sum(model.counts[()])} moves of Human in {args.games} games")
+    print(f"model built per request: {cold_time:9.3f} ms")
+    print(f"cached model:            {cached_time:9.3f} ms")
+    print(f"predict only:            {predict_time * 1000:9.3f} us")
+
+
+if __name__ == "__main__":
+    main()
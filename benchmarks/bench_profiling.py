@@ -0,0 +1,74 @@
+"""Cost of the profiling endpoints for the requests served meanwhile.
+
+Against a server on a database with random games, measures the latency of
+`GET /game/mano_fuerte` with no profile running, while a CPU profile runs and while
+a memory profile runs.
+
+Usage:
+    python -m benchmarks.bench_profiling --games 20000 --seconds 5
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+import requests
+
+from benchmarks.dataset import seed_database
+from benchmarks.server import running_server
+
+TOKEN = "bench-token"
+
+
+def latencies(url: str, seconds: float) -> list:
+    """Sends GET requests to an URL for a number of seconds and returns their latencies in ms."""
+    result = []
+    deadline = time.monotonic() + seconds
+    with requests.Session() as session:
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            session.get(url).raise_for_status()
+            result.append((time.perf_counter() - start) * 1000)
+    return result
+
+
+def report(label: str, values: list):
+    values = sorted(values)
+    p99 = values[int(len(values) * 0.99) - 1]
+    print(f"{label:<24} {len(values):>6} requests  median {statistics.median(values):6.2f} ms  p99 {p99:6.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=20000)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_path = os.path.join(directory, "bench.db")
+        seed_database(f"sqlite:///{database_path}", args.games)
+
+        with running_server(database_path, ADMIN_TOKEN=TOKEN) as base_url:
+            url = f"{base_url}/game/mano_fuerte"
+            report("no profile", latencies(url, args.seconds))
+
+            for kind in ("cpu", "memory"):
+                profile = {}
+
+                def run_profile():
+                    profile["response"] = requests.get(f"{base_url}/admin/profile/{kind}",
+                                                       params={"seconds": args.seconds},
+                                                       headers={"X-Admin-Token": TOKEN})
+
+                thread = threading.Thread(target=run_profile)
+                thread.start()
+                report(f"during {kind} profile", latencies(url, args.seconds))
+                thread.join()
+                lines = profile["response"].text.count("\n") + 1
+                print(f"{'':<24} {kind} profile: {lines} collapsed stacks")
+
+
+if __name__ == "__main__":
+    main()
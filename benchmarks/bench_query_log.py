@@ -0,0 +1,83 @@
+"""Cost of the query log for every SQL statement, and the statements saved by loading the moves at once.
+
+On a database with random games, measures:
+- the time of a small statement with and without the query log hooks on the engines;
+- `crud.get_strong_hand` counted from the games, loading the moves of each game lazily
+  (one statement per game) or all at once, as it does now.
+
+Usage:
+    python -m benchmarks.bench_query_log --games 5000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import lazyload, sessionmaker
+
+from benchmarks.dataset import seed_database
+from rock_paper_scissors.api import crud, models, query_log
+from rock_paper_scissors.api.database import create_db_engine
+
+HOOKS = [
+    ("before_cursor_execute", query_log.before_cursor_execute),
+    ("after_cursor_execute", query_log.after_cursor_execute),
+    ("handle_error", query_log.handle_error),
+]
+
+
+def per_statement(db, repeat: int) -> float:
+    """Returns the microseconds of a primary key lookup, averaged over `repeat` lookups."""
+    statement = text("SELECT winner FROM games WHERE id = :id")
+    start = time.perf_counter()
+    for game_id in range(repeat):
+        db.execute(statement, {"id": game_id % 100 + 1}).scalar()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=5000)
+    parser.add_argument("--statements", type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_path = os.path.join(directory, "bench.db")
+        seed_database(f"sqlite:///{database_path}", args.games)
+        engine = create_db_engine(f"sqlite:///{database_path}")
+        SessionLocal = sessionmaker(autoflush=False, bind=engine)
+
+        query_log.QUERY_REPEAT_WARNING = 0
+        with SessionLocal() as db:
+            per_statement(db, 1000)
+            with query_log.track_queries():
+                hooked = per_statement(db, args.statements)
+            for name, hook in HOOKS:
+                event.remove(Engine, name, hook)
+            bare = per_statement(db, args.statements)
+            for name, hook in HOOKS:
+                event.listen(Engine, name, hook)
+
+        with SessionLocal() as db, query_log.count_queries() as lazy_stats:
+            start = time.perf_counter()
+            games = db.query(models.Game).options(lazyload(models.Game.moves)).filter(models.Game.winner == "Human").all()
+            crud.get_moves_by_winner(games, "Human")
+            lazy = (time.perf_counter() - start) * 1000
+
+        with SessionLocal() as db, query_log.count_queries() as eager_stats:
+            start = time.perf_counter()
+            crud.get_strong_hand(db)
+            eager = (time.perf_counter() - start) * 1000
+
+        engine.dispose()
+
+    print(f"statement without query log: {bare:.1f} us")
+    print(f"statement with query log:    {hooked:.1f} us")
+    print(f"strong hand, lazy moves:     {lazy:.0f} ms in {lazy_stats.count} statements")
+    print(f"strong hand, moves at once:  {eager:.0f} ms in {eager_stats.count} statements")
+
+
+if __name__ == "__main__":
+    main()
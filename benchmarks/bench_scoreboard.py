@@ -0,0 +1,97 @@
+"""Cost of the live scoreboard with many connected dashboards.
+
+Opens N Server-Sent Events streams on /game/scoreboard/stream, then measures:
+- the CPU used by the server while no game is played (Linux only, from /proc);
+- the time until every dashboard has received the event of a new game.
+
+Usage:
+    python -m benchmarks.bench_scoreboard --dashboards 1000 --idle 10 --games 20
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+import requests
+
+from benchmarks.dataset import random_game, seed_database
+from benchmarks.server import running_server
+
+
+def server_cpu_seconds(port: int) -> float:
+    """Returns the CPU time used so far by the process listening on a port (Linux only)."""
+    pid = next(
+        int(pid) for pid in os.listdir("/proc") if pid.isdigit() and _is_server(int(pid), port)
+    )
+    with open(f"/proc/{pid}/stat") as stat:
+        fields = stat.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def _is_server(pid: int, port: int) -> bool:
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as cmdline:
+            arguments = cmdline.read().split(b"\0")
+    except OSError:
+        return False
+    return b"rock_paper_scissors.api" in arguments and str(port).encode() in arguments
+
+
+async def dashboard(port: int, events: asyncio.Queue):
+    """Connects to the SSE stream and puts the arrival time of every game event in a queue."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"GET /game/scoreboard/stream HTTP/1.1\r\nHost: localhost\r\n\r\n")
+    await writer.drain()
+    while True:
+        line = await reader.readline()
+        if not line:
+            return
+        if line.startswith(b"data: {\"type\":\"game\""):
+            events.put_nowait(time.perf_counter())
+
+
+async def scenario(base_url: str, port: int, dashboards: int, idle: float, games: int):
+    events = asyncio.Queue()
+    tasks = [asyncio.create_task(dashboard(port, events)) for _ in range(dashboards)]
+    await asyncio.sleep(2)
+
+    cpu_before = server_cpu_seconds(port)
+    await asyncio.sleep(idle)
+    cpu_idle = server_cpu_seconds(port) - cpu_before
+    print(f"{dashboards} dashboards idle for {idle:.0f} s: server CPU {cpu_idle * 1000:.1f} ms "
+          f"({cpu_idle / idle / dashboards * 1e6:.2f} us per dashboard per second)")
+
+    rng = random.Random(3)
+    latencies = []
+    for _ in range(games):
+        start = time.perf_counter()
+        await asyncio.to_thread(requests.post, f"{base_url}/game/", json=random_game(rng))
+        arrivals = [await events.get() for _ in range(dashboards)]
+        latencies.append((max(arrivals) - start) * 1000)
+    latencies.sort()
+    print(f"game event delivered to all {dashboards} dashboards: "
+          f"median {latencies[len(latencies) // 2]:.1f} ms, max {latencies[-1]:.1f} ms")
+
+    for task in tasks:
+        task.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dashboards", type=int, default=1000)
+    parser.add_argument("--idle", type=float, default=10)
+    parser.add_argument("--games", type=int, default=20)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_path = os.path.join(directory, "bench.db")
+        seed_database(f"sqlite:///{database_path}", 1000)
+        with running_server(database_path, port=args.port, SCOREBOARD_BUFFER="1024") as base_url:
+            asyncio.run(scenario(base_url, args.port, args.dashboards, args.idle, args.games))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Cost of the statistics of the rounds: moves loaded in Python, window functions and cache.
+
+On a database with random games, times counting the rounds of every game by position and
+previous move:
+- loading every game with its moves and counting them in Python;
+- with one query that orders the moves of each game with window functions (`count_sequences`);
+- through the cache of `get_sequences`, while no game is recorded.
+
+Usage:
+    python -m benchmarks.bench_sequences --games 50000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from sqlalchemy.orm import selectinload, sessionmaker
+
+from benchmarks.dataset import seed_database
+from rock_paper_scissors.api import models, sequences
+from rock_paper_scissors.api.database import create_db_engine
+
+
+def in_python(db) -> sequences.SequenceCounts:
+    games = db.query(models.Game).options(selectinload(models.Game.moves)).all()
+    return sequences.count_games(
+        {"player": game.player,
+         "rounds_played": [{"player_1_move": move.player_1_move, "player_2_move": move.player_2_move,
+                            "winner": move.winner} for move in sorted(game.moves, key=lambda move: move.id)]}
+        for game in games
+    )
+
+
+def timed(function, repeat: int) -> float:
+    """Returns the milliseconds of one call of a function, averaged over `repeat` calls after a first one."""
+    function()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_path = os.path.join(directory, "bench.db")
+        seed_database(f"sqlite:///{database_path}", args.games)
+        engine = create_db_engine(f"sqlite:///{database_path}")
+        SessionLocal = sessionmaker(autoflush=False, bind=engine)
+
+        with SessionLocal() as db:
+            assert in_python(db).rounds == sequences.count_sequences(db).rounds
+            python_time = timed(lambda: in_python(db), args.repeat)
+            window_time = timed(lambda: sequences.count_sequences(db), args.repeat)
+            cached_time = timed(lambda: sequences.get_sequences(db), args.repeat * 100)
+        engine.dispose()
+
+    print(f"moves loaded in Python: {python_time:.1f} ms")
+    print(f"window functions:       {window_time:.1f} ms")
+    print(f"cached:                 {cached_time:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
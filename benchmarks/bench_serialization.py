@@ -0,0 +1,64 @@
+"""Serialization cost of large game payloads: standard path vs FAST_JSON.
+
+Measures, for a page of the history and a bulk upload:
+- the serialization alone: response_model validation + stdlib `json`, against `orjson`;
+- the whole request through the application, with `FAST_JSON` disabled and enabled.
+
+Usage:
+    python -m benchmarks.bench_serialization --games 1000 --repeat 20
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from typing import List
+
+
+def timed(function, repeat: int) -> float:
+    """Returns the mean time in ms of calling a function."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=1000, help="Games per history page and bulk upload.")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+
+        import orjson
+        from fastapi.testclient import TestClient
+        from pydantic import TypeAdapter
+
+        from benchmarks.dataset import random_game, seed_database
+        from rock_paper_scissors.api import responses, schemas
+        from rock_paper_scissors.api.init_app import app
+
+        seed_database(os.environ["DATABASE_URL"], args.games)
+        rng = random.Random(2)
+        bulk = [random_game(rng) for _ in range(args.games)]
+
+        with TestClient(app) as client:
+            page = client.get("/game/historial", params={"limit": args.games}).json()
+
+            adapter = TypeAdapter(List[schemas.Game])
+            standard = timed(lambda: json.dumps(adapter.dump_python(adapter.validate_python(page), mode="json")).encode(), args.repeat)
+            fast = timed(lambda: orjson.dumps(page), args.repeat)
+            print(f"serialize {len(page)} games: validation + json {standard:7.2f} ms | orjson {fast:7.2f} ms")
+
+            for fast_json in (False, True):
+                responses.FAST_JSON = fast_json
+                history = timed(lambda: client.get("/game/historial", params={"limit": args.games}), args.repeat)
+                upload = timed(lambda: client.post("/game/bulk", json=bulk), max(1, args.repeat // 4))
+                print(f"FAST_JSON={int(fast_json)}: GET /game/historial {history:7.2f} ms | POST /game/bulk {upload:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
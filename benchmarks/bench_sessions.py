@@ -0,0 +1,82 @@
+"""Cost of the server-side game sessions with many games in progress.
+
+First, in the current process: the memory used by N open sessions (with tracemalloc) and the
+time to look up a session and play a round while the store holds them. Then, against a
+server: the latency of POST /game/sesion/{id}/jugada with N sessions open.
+
+Usage:
+    python -m benchmarks.bench_sessions --sessions 50000 --rounds 2000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+import requests
+
+from benchmarks.server import running_server
+from rock_paper_scissors.api.sessions import SessionStore, play_move
+
+MOVES = ("rock", "paper", "scissors")
+
+
+def in_process(sessions: int, rounds: int):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    store = SessionStore(max_sessions=sessions)
+    ids = [store.create().session_id for _ in range(sessions)]
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    print(f"{sessions} open sessions: {used / 2 ** 20:.1f} MiB ({used / sessions:.0f} bytes per session)")
+
+    rng = random.Random(5)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        session = store.get(rng.choice(ids))
+        play_move(session, rng.choice(MOVES))
+        # Keeps every session below three rounds, so none is closed.
+        del session.rounds[:]
+    elapsed = time.perf_counter() - start
+    print(f"lookup and round in process: {elapsed / rounds * 1e6:.2f} us per round")
+
+
+def over_http(base_url: str, sessions: int, rounds: int):
+    http = requests.Session()
+    ids = [http.post(f"{base_url}/game/sesion/").json()["session_id"] for _ in range(sessions)]
+
+    rng = random.Random(5)
+    latencies = []
+    while len(latencies) < rounds and ids:
+        session_id = ids.pop(rng.randrange(len(ids)))
+        for _ in range(3):
+            start = time.perf_counter()
+            response = http.post(f"{base_url}/game/sesion/{session_id}/jugada", json={"move": rng.choice(MOVES)})
+            latencies.append((time.perf_counter() - start) * 1000)
+            response.raise_for_status()
+    latencies.sort()
+    print(f"POST /game/sesion/{{id}}/jugada with {sessions} sessions open: "
+          f"median {latencies[len(latencies) // 2]:.2f} ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99)]:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=50000)
+    parser.add_argument("--rounds", type=int, default=2000)
+    parser.add_argument("--http-sessions", type=int, default=10000,
+                        help="Sessions opened on the server before measuring")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    in_process(args.sessions, args.rounds)
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_path = os.path.join(directory, "bench.db")
+        with running_server(database_path, port=args.port) as base_url:
+            over_http(base_url, args.http_sessions, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
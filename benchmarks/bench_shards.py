@@ -0,0 +1,91 @@
+"""Ingest throughput and read latency with the games spread over 1, 2 and 4 shards.
+
+Every worker process records `--batches` bulk uploads of `--batch` games without idempotency
+keys, as the route `/game/bulk` does: each upload goes to the next shard, round-robin, so the
+workers write in different shards at the same time. Then measures the milliseconds of `shards.get_dashboard`,
+which asks every shard at once and merges their counts.
+
+Usage:
+    python -m benchmarks.bench_shards --workers 4 --batches 200 --batch 50
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.dataset import random_game
+from rock_paper_scissors.api import schemas, shards
+from rock_paper_scissors.api.database import create_db_engine, init_db
+from rock_paper_scissors.api.shards import Shard
+
+
+def timed(function, repeat: int) -> float:
+    """Returns the milliseconds of one call of a function, averaged over `repeat` calls after a first one."""
+    function()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def open_shards(directory: str, count: int) -> list:
+    engines = [create_db_engine(f"sqlite:///{os.path.join(directory, f'shard.{index}.db')}") for index in range(count)]
+    return [Shard(index, count, engine, engine, first_engine=engines[0]) for index, engine in enumerate(engines)]
+
+
+def ingest(directory: str, count: int, seed: int, batches: int, batch: int, start, done):
+    shards.shards = open_shards(directory, count)
+    rng = random.Random(seed)
+    uploads = [[schemas.GameCreate(**random_game(rng)) for _ in range(batch)] for _ in range(batches)]
+    start.wait()
+    with shards.shards[0].SessionLocal() as db:
+        for games in uploads:
+            shards.create_games(db, games)
+            db.commit()
+    done.put(time.perf_counter())
+
+
+def run(count: int, workers: int, batches: int, batch: int, repeat: int) -> tuple:
+    with tempfile.TemporaryDirectory() as directory:
+        for shard in open_shards(directory, count):
+            init_db(shard.engine)
+            shard.engine.dispose()
+
+        start = multiprocessing.Barrier(workers + 1)
+        done = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=ingest, args=(directory, count, seed, batches, batch, start, done))
+                     for seed in range(workers)]
+        for process in processes:
+            process.start()
+        start.wait()
+        began = time.perf_counter()
+        finished = max(done.get() for _ in processes)
+        for process in processes:
+            process.join()
+        games_per_second = workers * batches * batch / (finished - began)
+
+        shards.shards = open_shards(directory, count)
+        with shards.shards[0].ReadSessionLocal() as db:
+            dashboard = timed(lambda: shards.get_dashboard(db), repeat)
+        for shard in shards.shards:
+            shard.engine.dispose()
+    return games_per_second, dashboard
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--batches", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    for count in (1, 2, 4):
+        games_per_second, dashboard = run(count, args.workers, args.batches, args.batch, args.repeat)
+        print(f"{count} shard(s): ingest {games_per_second:8.0f} games/s, dashboard {dashboard:6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Python overhead per call of the hot `crud` functions.
+
+On a small database, so the time is spent building, compiling and executing the statements
+rather than in SQLite, measures the microseconds of one call of:
+- `crud.get_global_info` and `crud.get_statistics` over all time, which count the games;
+- `crud.get_history`, a page of `--page` games;
+- `crud.create_game`, in its own transaction;
+and, for the reads, the same SQL run with the sqlite3 module alone, which is the floor.
+
+Usage:
+    python -m benchmarks.bench_statements --games 1000 --repeat 2000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.dataset import random_game, seed_database
+from rock_paper_scissors.api import crud, schemas
+from rock_paper_scissors.api.database import create_db_engine
+
+COUNTS_SQL = [
+    "SELECT count(*), count(*) FILTER (WHERE winner = 'Human'), count(*) FILTER (WHERE winner = 'Machine'), "
+    "count(*) FILTER (WHERE winner = 'Machine' AND total_rounds < 3) FROM games",
+]
+HISTORY_SQL = [
+    "SELECT id, winner, player, idempotency_key FROM games WHERE id > 0 ORDER BY id LIMIT {page}",
+    "SELECT game_id, player_1_move, player_2_move, winner FROM moves WHERE game_id <= {page} ORDER BY game_id, id",
+]
+
+
+def timed(function, repeat: int) -> float:
+    """Returns the microseconds of one call of a function, averaged over `repeat` calls after a first one."""
+    function()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def run_sql(connection: sqlite3.Connection, statements: list):
+    for statement in statements:
+        connection.execute(statement).fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--page", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_path = os.path.join(directory, "bench.db")
+        seed_database(f"sqlite:///{database_path}", args.games)
+        engine = create_db_engine(f"sqlite:///{database_path}")
+        SessionLocal = sessionmaker(autoflush=False, expire_on_commit=False, bind=engine)
+        connection = sqlite3.connect(database_path)
+        history_sql = [statement.format(page=args.page) for statement in HISTORY_SQL]
+        rng = random.Random(1)
+        new_games = [schemas.GameCreate(**random_game(rng)) for _ in range(args.repeat + 1)]
+        new_games_iter = iter(new_games)
+
+        with SessionLocal() as db:
+            results = {
+                "get_global_info": (timed(lambda: crud.get_global_info(db), args.repeat),
+                                    timed(lambda: run_sql(connection, COUNTS_SQL), args.repeat)),
+                "get_statistics": (timed(lambda: crud.get_statistics(db), args.repeat),
+                                   timed(lambda: run_sql(connection, COUNTS_SQL), args.repeat)),
+                f"get_history, {args.page} games": (timed(lambda: crud.get_history(db, limit=args.page), args.repeat),
+                                                    timed(lambda: run_sql(connection, history_sql), args.repeat)),
+                "create_game": (timed(lambda: crud.create_game(db, next(new_games_iter)), args.repeat), None),
+            }
+        connection.close()
+        engine.dispose()
+
+    for name, (call, sql) in results.items():
+        floor = f", sqlite3 alone {sql:7.1f} us, overhead {call - sql:7.1f} us" if sql is not None else ""
+        print(f"{name:22}: {call:7.1f} us/call{floor}")
+
+
+if __name__ == "__main__":
+    main()
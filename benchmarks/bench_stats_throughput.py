@@ -0,0 +1,46 @@
+"""Throughput of the read-heavy statistics endpoints with 1, 2, 4... server workers.
+
+Starts `python -m rock_paper_scissors.api` on a seeded database for each worker count and
+hits the endpoint from several client processes for a fixed time.
+
+Usage:
+    python -m benchmarks.bench_stats_throughput --workers 1 2 4 --clients 8 --seconds 5
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+
+from benchmarks.dataset import seed_database
+from benchmarks.server import hammer, running_server
+
+
+def run(database_path: str, workers: int, endpoint: str, clients: int, seconds: float, port: int) -> float:
+    """Starts a server with the given workers and returns the requests per second served."""
+    with running_server(database_path, workers, port) as base_url:
+        with multiprocessing.Pool(clients) as pool:
+            counts = pool.starmap(hammer, [(f"{base_url}{endpoint}", seconds)] * clients)
+    return sum(counts) / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--endpoint", default="/game/estadisticas")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--games", type=int, default=5000)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_path = os.path.join(directory, "bench.db")
+        seed_database(f"sqlite:///{database_path}", args.games)
+
+        for workers in args.workers:
+            throughput = run(database_path, workers, args.endpoint, args.clients, args.seconds, args.port)
+            print(f"{args.endpoint} workers={workers}: {throughput:8.1f} req/s")
+
+
+if __name__ == "__main__":
+    main()
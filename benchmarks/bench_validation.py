@@ -0,0 +1,76 @@
+"""Cost of validating the games on ingest and of the offline integrity scan.
+
+Measures, for bulk payloads of random games (a share of them with wrong winners):
+- the time of `validation.validate_games` per game, compared with `crud.create_games`;
+- the games per second checked by `integrity.scan_games` over a seeded database.
+
+Usage:
+    python -m benchmarks.bench_validation --games 10000 --corrupt 0.1
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.dataset import random_game, seed_database
+from rock_paper_scissors.api import crud, schemas
+from rock_paper_scissors.api.database import create_db_engine, init_db
+from rock_paper_scissors.api.integrity import scan_games
+from rock_paper_scissors.api.validation import validate_games
+
+
+def corrupt_games(games: int, corrupt: float, seed: int = 0) -> list:
+    """Builds random games and swaps the winner of a share of them."""
+    rng = random.Random(seed)
+    payload = []
+    for _ in range(games):
+        game = random_game(rng)
+        if rng.random() < corrupt:
+            game["game_winner"] = "Human" if game["game_winner"] == "Machine" else "Machine"
+        payload.append(game)
+    return payload
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=10000)
+    parser.add_argument("--corrupt", type=float, default=0.1, help="Share of games with a wrong winner")
+    args = parser.parse_args()
+
+    payload = corrupt_games(args.games, args.corrupt)
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_db_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        init_db(engine)
+        SessionLocal = sessionmaker(autoflush=False, expire_on_commit=False, bind=engine)
+
+        games = [schemas.GameCreate(**game) for game in payload]
+        start = time.perf_counter()
+        validate_games(games, mode="recompute")
+        validation_time = time.perf_counter() - start
+
+        with SessionLocal() as db:
+            start = time.perf_counter()
+            crud.create_games(db, games)
+            create_time = time.perf_counter() - start
+
+        print(f"validate_games: {validation_time / args.games * 1e6:.2f} us per game "
+              f"({validation_time / create_time * 100:.1f}% of crud.create_games, "
+              f"{create_time / args.games * 1e6:.2f} us per game)")
+        engine.dispose()
+
+        database_path = os.path.join(directory, "scan.db")
+        seed_database(f"sqlite:///{database_path}", args.games)
+        engine = create_db_engine(f"sqlite:///{database_path}")
+        start = time.perf_counter()
+        report = scan_games(session_factory=sessionmaker(bind=engine))
+        elapsed = time.perf_counter() - start
+        print(f"integrity scan: {report.scanned / elapsed:.0f} games per second, {len(report.invalid)} invalid")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Latency of POST /game/ while dashboards keep reading the statistics.
+
+For each read mode (see READ_ENGINE in `rock_paper_scissors/api/database.py`) a server is
+started on a seeded database, several reader processes loop over the statistics endpoints
+and the games created meanwhile are timed.
+
+Usage:
+    python -m benchmarks.bench_write_latency --modes primary readonly snapshot --readers 4
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import requests
+
+from benchmarks.dataset import random_game, seed_database
+from benchmarks.server import hammer, running_server
+
+READ_ENDPOINTS = ["/game/mano_fuerte", "/game/mano_debil", "/game/ranking", "/game/get_global_info"]
+
+
+def time_writes(base_url: str, games: int) -> list:
+    """Creates games one after another and returns the latency of each request in ms."""
+    rng = random.Random(1)
+    latencies = []
+    with requests.Session() as session:
+        for _ in range(games):
+            start = time.perf_counter()
+            session.post(f"{base_url}/game/", json=random_game(rng)).raise_for_status()
+            latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def percentile(values: list, fraction: float) -> float:
+    """Returns the value below which a fraction of the sorted values fall."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", default=["primary", "readonly", "snapshot"])
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--writes", type=int, default=200)
+    parser.add_argument("--games", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_path = os.path.join(directory, "bench.db")
+        seed_database(f"sqlite:///{database_path}", args.games)
+
+        for mode in args.modes:
+            with running_server(database_path, args.workers, args.port, READ_ENGINE=mode) as base_url:
+                with multiprocessing.Pool(args.readers) as pool:
+                    urls = [f"{base_url}{READ_ENDPOINTS[i % len(READ_ENDPOINTS)]}" for i in range(args.readers)]
+                    pool.starmap_async(hammer, [(url, 3600) for url in urls])
+                    latencies = time_writes(base_url, args.writes)
+                    pool.terminate()
+
+            print(f"READ_ENGINE={mode:9} writes={len(latencies)} "
+                  f"p50={statistics.median(latencies):7.2f} ms "
+                  f"p95={percentile(latencies, 0.95):7.2f} ms "
+                  f"p99={percentile(latencies, 0.99):7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
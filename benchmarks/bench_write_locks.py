@@ -0,0 +1,62 @@
+"""Games per second recorded by a single worker with the games spread over 1, 2 and 4 shards.
+
+`--clients` clients post games without idempotency keys to POST /game/ at the same time, so
+the games go to the shards round-robin. Each shard has its own write lock in the worker: with
+one shard the requests wait for each other, with more shards the writes of different shards
+run at the same time in the threadpool. The admission control is opened to all the clients,
+so only the write locks limit the writes.
+
+Usage:
+    python -m benchmarks.bench_write_locks --clients 16 --games 2000
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.dataset import random_game
+from benchmarks.server import running_server
+
+
+async def client(base_url: str, games: list, latencies: list):
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as session:
+        for game in games:
+            start = time.perf_counter()
+            (await session.post("/game/", json=game)).raise_for_status()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+
+async def scenario(base_url: str, clients: int, games: int) -> tuple:
+    rng = random.Random(5)
+    uploads = [[random_game(rng) for _ in range(games // clients)] for _ in range(clients)]
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(client(base_url, upload, latencies) for upload in uploads))
+    seconds = time.perf_counter() - start
+    latencies.sort()
+    return len(latencies) / seconds, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--games", type=int, default=2000)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    for count in (1, 2, 4):
+        with tempfile.TemporaryDirectory() as directory:
+            database_path = os.path.join(directory, "shard.0.db")
+            others = ",".join(f"sqlite:///{os.path.join(directory, f'shard.{index}.db')}" for index in range(1, count))
+            with running_server(database_path, port=args.port, DATABASE_SHARDS=others,
+                                WRITE_CONCURRENCY=str(args.clients), WRITE_QUEUE=str(args.clients)) as base_url:
+                games_per_second, p50, p99 = asyncio.run(scenario(base_url, args.clients, args.games))
+        print(f"{count} shard(s): {games_per_second:7.0f} games/s, p50 {p50:7.2f} ms, p99 {p99:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
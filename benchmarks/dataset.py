@@ -0,0 +1,81 @@
+"""Benchmark dataset: a database filled with random games.
+
+Usage:
+    python -m benchmarks.dataset /tmp/bench.db --games 20000
+"""
+import argparse
+import random
+
+from rock_paper_scissors.game_logic import MOVES, determine_round_winner
+
+PLAYERS = [("Human", "Machine"), ("Machine_1", "Machine_2")]
+
+
+def random_game(rng: random.Random) -> dict:
+    """Builds a random game with the shape of `schemas.GameCreate`.
+
+    Human games are abandoned before the third round 20% of the time, which makes the
+    machine the winner, as in `game_logic.get_game_information`.
+
+    Args:
+        rng (random.Random): Source of randomness.
+
+    Returns:
+        dict: The rounds played and the game winner.
+    """
+    player_1, player_2 = rng.choice(PLAYERS)
+    total_rounds = 3
+    if player_1 == "Human" and rng.random() < 0.2:
+        total_rounds = rng.randint(1, 2)
+
+    rounds_played = []
+    for _ in range(total_rounds):
+        player_1_move, player_2_move = rng.choice(MOVES), rng.choice(MOVES)
+        rounds_played.append({
+            "player_1_move": player_1_move,
+            "player_2_move": player_2_move,
+            "winner": determine_round_winner(player_1_move, player_2_move, player_1, player_2)
+        })
+
+    player_1_wins = sum(1 for round_info in rounds_played if round_info["winner"] == player_1)
+    game_winner = player_1 if total_rounds == 3 and player_1_wins >= 2 else player_2
+
+    return {"rounds_played": rounds_played, "game_winner": game_winner}
+
+
+def seed_database(database_url: str, games: int, seed: int = 0):
+    """Creates the schema of a database and inserts random games through `crud.create_game`.
+
+    Args:
+        database_url (str): SQLAlchemy URL of the database to fill.
+        games (int): Number of games to insert.
+        seed (int): Seed of the random generator, so every run builds the same dataset.
+    """
+    from sqlalchemy.orm import sessionmaker
+
+    from rock_paper_scissors.api import crud, schemas
+    from rock_paper_scissors.api.database import create_db_engine, init_db
+
+    engine = create_db_engine(database_url)
+    init_db(engine)
+    rng = random.Random(seed)
+
+    with sessionmaker(bind=engine, expire_on_commit=False)() as db:
+        for _ in range(games):
+            crud.create_game(db, schemas.GameCreate(**random_game(rng)))
+
+    engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="Path of the SQLite file to create.")
+    parser.add_argument("--games", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    seed_database(f"sqlite:///{args.path}", args.games, args.seed)
+
+
+if __name__ == "__main__":
+    main()
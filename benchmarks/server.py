@@ -0,0 +1,60 @@
+"""Helpers to run the API in a subprocess during a benchmark."""
+from contextlib import contextmanager
+import os
+import subprocess
+import sys
+import time
+
+import requests
+
+
+def wait_until_ready(base_url: str, timeout: float = 30):
+    """Waits until the server answers or the timeout expires."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            requests.get(f"{base_url}/docs", timeout=1)
+            return
+        except requests.exceptions.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"The server at {base_url} did not start.")
+
+
+@contextmanager
+def running_server(database_path: str, workers: int = 1, port: int = 8765, **env):
+    """Starts `python -m rock_paper_scissors.api` on a database and stops it on exit.
+
+    Args:
+        database_path (str): Path of the SQLite file used by the server.
+        workers (int): Number of worker processes. Defaults to 1.
+        port (int): Port to listen on. Defaults to 8765.
+        **env: Extra environment variables for the server, e.g. READ_ENGINE="snapshot".
+
+    Yields:
+        str: Base URL of the server.
+    """
+    server_env = dict(os.environ, DATABASE_URL=f"sqlite:///{database_path}", **env)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "rock_paper_scissors.api", "--workers", str(workers), "--port", str(port)],
+        env=server_env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        wait_until_ready(base_url)
+        yield base_url
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def hammer(url: str, seconds: float) -> int:
+    """Sends GET requests to an URL for a number of seconds and returns how many were answered."""
+    done = 0
+    deadline = time.monotonic() + seconds
+    with requests.Session() as session:
+        while time.monotonic() < deadline:
+            session.get(url).raise_for_status()
+            done += 1
+    return done
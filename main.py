@@ -22,7 +22,7 @@ def main():
                 print(f"You have to introduce 'mvm' as first parameter of the script to play machine vs machine.")
         except ValueError:
             print("Second argument must be a number for the number of games to play.")
-            logging.error(f"The second argument is not a int: {sys.argv[2]}. There is no posible to play machine against machine.")
+            logging.error("The second argument is not a int: %s. There is no posible to play machine against machine.", sys.argv[2])
 
     while True:
         print_menu()
@@ -0,0 +1,43 @@
+import argparse
+import os
+
+import uvicorn
+
+from rock_paper_scissors.api.database import init_db
+from rock_paper_scissors.api.shards import init_shards
+
+# Serves the API with several worker processes. Usage:
+#   python -m rock_paper_scissors.api --workers 4 --host 0.0.0.0 --port 8000
+
+
+def main():
+    """Creates the database schema once, in every shard, and starts uvicorn with the configured number of workers.
+
+    The number of workers is taken from `--workers`, or from the `WORKERS` environment variable.
+    Workers skip the schema creation at startup because it has already been done here, and
+    write their logs with `utils.setup_logging` unless `API_LOGGING=0`; with several workers,
+    each one in its own files (`utils.LOG_PER_PROCESS`).
+    """
+    parser = argparse.ArgumentParser(description="Rock, Paper, Scissors API server.")
+    parser.add_argument("--host", default=os.getenv("HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WORKERS", "1")))
+    args = parser.parse_args()
+
+    init_db()
+    init_shards()
+    os.environ["DB_INIT_ON_STARTUP"] = "0"
+    os.environ.setdefault("API_LOGGING", "1")
+    if args.workers > 1:
+        os.environ.setdefault("LOG_PER_PROCESS", "1")
+
+    uvicorn.run(
+        "rock_paper_scissors.api.init_app:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+    )
+
+
+if __name__ == "__main__":
+    main()
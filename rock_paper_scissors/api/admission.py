@@ -0,0 +1,276 @@
+import asyncio
+from collections import OrderedDict, deque
+import json
+import math
+import os
+import time
+from typing import Optional
+
+# Admission control of the HTTP requests: each class of routes (writes and reads) runs at most a
+# number of requests at a time, with a bounded queue of waiting requests, and each client may be
+# rate limited with a token bucket. Rejected requests get a 503 (busy) or 429 (rate limited)
+# response with a Retry-After header at once, before they take a thread or a database lock.
+#
+# Every write waits for the single SQLite write lock, so without a limit a burst of uploads fills
+# the threadpool with threads waiting for it and the reads queue behind them. With a few writes
+# admitted at a time, the other threads stay free for the reads.
+
+# Requests of each class that run at the same time, per worker. 0 disables the limit.
+WRITE_CONCURRENCY = int(os.getenv("WRITE_CONCURRENCY", "4"))
+READ_CONCURRENCY = int(os.getenv("READ_CONCURRENCY", "32"))
+# Requests of each class that may wait for one of those places. More are rejected with a 503.
+WRITE_QUEUE = int(os.getenv("WRITE_QUEUE", "64"))
+READ_QUEUE = int(os.getenv("READ_QUEUE", "128"))
+# Seconds a request waits in the queue before it is rejected with a 503.
+ADMISSION_TIMEOUT = float(os.getenv("ADMISSION_TIMEOUT", "2"))
+# Requests per second of each class allowed to a client (by IP address), and the number of
+# requests it may send at once after being idle. A rate of 0 (the default) disables it.
+WRITE_RATE_LIMIT = float(os.getenv("WRITE_RATE_LIMIT", "0"))
+WRITE_RATE_BURST = int(os.getenv("WRITE_RATE_BURST", "20"))
+READ_RATE_LIMIT = float(os.getenv("READ_RATE_LIMIT", "0"))
+READ_RATE_BURST = int(os.getenv("READ_RATE_BURST", "50"))
+
+# Long-lived responses that would hold a place for their whole life, and the admin routes.
+EXEMPT_PATHS = ("/game/scoreboard/", "/game/archivo", "/game/changes", "/admin/")
+# Clients whose buckets are kept; the least recently seen are forgotten first.
+MAX_CLIENTS = 10000
+
+
+class RejectedError(Exception):
+    """Raised when a request is not admitted.
+
+    Attributes:
+        status_code (int): 503 when the server is busy, 429 when the client is rate limited.
+        retry_after (int): Seconds the client should wait before trying again.
+    """
+
+    def __init__(self, status_code: int, retry_after: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.detail = detail
+
+
+class ConcurrencyLimiter:
+    """Lets at most `limit` requests run at a time, with up to `queue_size` waiting in order.
+
+    It is used from the event loop only, so it needs no lock.
+
+    Args:
+        limit (int): Requests that may run at the same time.
+        queue_size (int): Requests that may wait for a place.
+        timeout (float): Seconds a request waits before it is rejected.
+    """
+
+    def __init__(self, limit: int, queue_size: int, timeout: float):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.active = 0
+        self.waiters = deque()
+
+    async def acquire(self):
+        """Takes a place, waiting for one if needed.
+
+        Raises:
+            RejectedError: With status 503 if the queue is full or the wait times out.
+        """
+        if self.active < self.limit and not self.waiters:
+            self.active += 1
+            return
+        if len(self.waiters) >= self.queue_size:
+            raise RejectedError(503, 1, "Server busy, too many requests waiting")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        try:
+            # The place is handed over by `release`, which counts it as taken.
+            await asyncio.wait_for(waiter, self.timeout)
+        except BaseException as error:
+            if waiter.done() and not waiter.cancelled():
+                # The place was handed over just as the wait ended (or the client went away).
+                self.release()
+            elif waiter in self.waiters:
+                self.waiters.remove(waiter)
+            if isinstance(error, asyncio.TimeoutError):
+                raise RejectedError(503, max(1, math.ceil(self.timeout)), "Server busy, timed out waiting") from None
+            raise
+
+    def release(self):
+        """Frees a place, or hands it over to the oldest waiting request."""
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+class TokenBucket:
+    """Token bucket of a client: `rate` tokens per second, up to `burst`, one per request.
+
+    Examples:
+        >>> bucket = TokenBucket(rate=2, burst=2, now=0.0)
+        >>> bucket.take(0.0), bucket.take(0.0), bucket.take(0.0)
+        (0.0, 0.0, 0.5)
+        >>> bucket.take(0.5)
+        0.0
+    """
+
+    def __init__(self, rate: float, burst: int, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """Takes a token if there is one.
+
+        Returns:
+            float: 0 if a token was taken, otherwise the seconds until the next one.
+        """
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Token buckets of the clients, forgetting the least recently seen beyond `MAX_CLIENTS`.
+
+    Args:
+        rate (float): Requests per second allowed to each client.
+        burst (int): Requests a client may send at once after being idle.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.buckets = OrderedDict()
+
+    def check(self, client: str, now: Optional[float] = None):
+        """Takes a token of a client.
+
+        Raises:
+            RejectedError: With status 429 if the client has no token left.
+        """
+        now = time.monotonic() if now is None else now
+        bucket = self.buckets.get(client)
+        if bucket is None:
+            bucket = self.buckets[client] = TokenBucket(self.rate, self.burst, now)
+            if len(self.buckets) > MAX_CLIENTS:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(client)
+        wait = bucket.take(now)
+        if wait:
+            raise RejectedError(429, math.ceil(wait), "Too many requests")
+
+
+class RouteClass:
+    """Limits of a class of routes: a concurrency limiter and an optional rate limiter per client."""
+
+    def __init__(self, concurrency: int, queue_size: int, rate: float, burst: int, timeout: float):
+        self.limiter = ConcurrencyLimiter(concurrency, queue_size, timeout) if concurrency > 0 else None
+        self.rate_limiter = RateLimiter(rate, burst) if rate > 0 else None
+
+
+class Load:
+    """Requests of each class being served by the worker, and when the last one finished.
+
+    Background work that must not slow the requests down waits until the worker is idle.
+    """
+
+    def __init__(self):
+        self.active = {"write": 0, "read": 0}
+        self.last_finished = time.monotonic()
+
+    def start(self, name: str):
+        self.active[name] += 1
+
+    def finish(self, name: str):
+        self.active[name] -= 1
+        self.last_finished = time.monotonic()
+
+    def idle_for(self, now: Optional[float] = None) -> float:
+        """Returns the seconds since the worker finished its last request, 0 while it serves one.
+
+        Examples:
+            >>> load = Load()
+            >>> load.start("read")
+            >>> load.idle_for()
+            0.0
+            >>> load.finish("read")
+            >>> load.idle_for(now=load.last_finished + 2)
+            2.0
+        """
+        if any(self.active.values()):
+            return 0.0
+        return (time.monotonic() if now is None else now) - self.last_finished
+
+
+def route_class(method: str, path: str) -> Optional[str]:
+    """Returns the class of a request: "write", "read", or None if it is not limited.
+
+    Examples:
+        >>> route_class("POST", "/game/"), route_class("GET", "/game/ranking")
+        ('write', 'read')
+        >>> route_class("GET", "/game/scoreboard/stream") is None
+        True
+    """
+    if path.startswith(EXEMPT_PATHS):
+        return None
+    return "read" if method in ("GET", "HEAD", "OPTIONS") else "write"
+
+
+def rejection(error: RejectedError) -> dict:
+    """Returns the status, headers and body of the response of a rejected request."""
+    return {
+        "status": error.status_code,
+        "headers": [(b"content-type", b"application/json"), (b"retry-after", str(error.retry_after).encode())],
+        "body": json.dumps({"detail": error.detail}).encode(),
+    }
+
+
+class AdmissionMiddleware:
+    """ASGI middleware that admits the HTTP requests of each route class, see the module comments."""
+
+    def __init__(self, app):
+        self.app = app
+        self.classes = {
+            "write": RouteClass(WRITE_CONCURRENCY, WRITE_QUEUE, WRITE_RATE_LIMIT, WRITE_RATE_BURST, ADMISSION_TIMEOUT),
+            "read": RouteClass(READ_CONCURRENCY, READ_QUEUE, READ_RATE_LIMIT, READ_RATE_BURST, ADMISSION_TIMEOUT),
+        }
+
+    async def __call__(self, scope, receive, send):
+        name = route_class(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+
+        limits = self.classes[name]
+        try:
+            if limits.rate_limiter is not None:
+                client = scope.get("client")
+                limits.rate_limiter.check(client[0] if client else "")
+            if limits.limiter is not None:
+                await limits.limiter.acquire()
+        except RejectedError as error:
+            response = rejection(error)
+            await send({"type": "http.response.start", "status": response["status"], "headers": response["headers"]})
+            await send({"type": "http.response.body", "body": response["body"]})
+            return
+
+        load.start(name)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            load.finish(name)
+            if limits.limiter is not None:
+                limits.limiter.release()
+
+
+# Requests being served by the worker.
+load = Load()
@@ -0,0 +1,108 @@
+from collections import Counter
+import logging
+import os
+import threading
+from typing import Optional
+
+try:
+    import duckdb
+except ImportError:  # duckdb is optional: without it the statistics are counted by SQLite.
+    duckdb = None
+
+from rock_paper_scissors.api.database import SQLALCHEMY_DATABASE_URL, sqlite_file_path
+
+# Engine of the statistics that scan the games: "sqlite" (default) or "duckdb", which attaches
+# the SQLite file read-only to an embedded DuckDB and runs the scans with its columnar engine.
+# Writes always go to SQLite.
+ANALYTICS_ENGINE = os.getenv("ANALYTICS_ENGINE", "sqlite")
+
+logger = logging.getLogger(__name__)
+
+
+class DuckDBAnalytics:
+    """Aggregations of the games run by DuckDB over the SQLite database, attached read-only.
+
+    DuckDB reads the tables of the SQLite file on every query, so the results include the
+    games committed up to the query, like the read-only engine of the routes. Each thread
+    gets its own cursor of a single in-memory DuckDB connection.
+
+    Args:
+        database_path (str): Path of the SQLite database.
+    """
+
+    def __init__(self, database_path: str):
+        self.connection = duckdb.connect(":memory:")
+        self.connection.execute("INSTALL sqlite")
+        self.connection.execute("LOAD sqlite")
+        quoted_path = database_path.replace("'", "''")
+        self.connection.execute(f"ATTACH '{quoted_path}' AS game_db (TYPE SQLITE, READ_ONLY)")
+        self.local = threading.local()
+
+    def cursor(self):
+        """Returns the DuckDB cursor of the current thread."""
+        cursor = getattr(self.local, "cursor", None)
+        if cursor is None:
+            cursor = self.local.cursor = self.connection.cursor()
+        return cursor
+
+    def outcome_counts(self, player: Optional[str] = None) -> list:
+        """Counts all the games by player and winner, as `rollups.query_games` does with SQLite.
+
+        The games of a period are always counted by SQLite, through the index on `created_at`.
+
+        Args:
+            player (str, optional): Only count the games of this player.
+
+        Returns:
+            list: Rows (player, winner, total games, total abandonments).
+        """
+        conditions = []
+        parameters = []
+        if player is not None:
+            conditions.append("player = ?")
+            parameters.append(player)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        rows = self.cursor().execute(f"""
+            SELECT player, winner, count(*), sum(CASE WHEN total_rounds < 3 THEN 1 ELSE 0 END)
+            FROM game_db.games {where}
+            GROUP BY player, winner
+        """, parameters).fetchall()
+        return [(row_player, winner, total, int(abandonments or 0)) for row_player, winner, total, abandonments in rows]
+
+    def moves_by_winner(self, winner: str) -> Counter:
+        """Counts the moves of player 1 in the rounds won by `winner` in the games it won,
+        as `crud.get_moves_by_winner` does with the games loaded in Python."""
+        rows = self.cursor().execute("""
+            SELECT moves.player_1_move, count(*)
+            FROM game_db.moves AS moves JOIN game_db.games AS games ON moves.game_id = games.id
+            WHERE games.winner = ? AND moves.winner = ?
+            GROUP BY moves.player_1_move
+        """, [winner, winner]).fetchall()
+        return Counter(dict(rows))
+
+
+_analytics = None
+_analytics_lock = threading.Lock()
+
+
+def get_analytics() -> Optional[DuckDBAnalytics]:
+    """Returns the DuckDB analytics of the process, opened on first use, or None to use SQLite.
+
+    It is None unless `ANALYTICS_ENGINE` is "duckdb", duckdb is installed and the database is an
+    SQLite file. If DuckDB cannot attach the database, a warning is logged once and the
+    statistics are counted by SQLite.
+    """
+    global _analytics
+    if ANALYTICS_ENGINE != "duckdb" or duckdb is None:
+        return None
+    if _analytics is None:
+        with _analytics_lock:
+            if _analytics is None:
+                database_path = sqlite_file_path(SQLALCHEMY_DATABASE_URL)
+                try:
+                    _analytics = DuckDBAnalytics(database_path) if database_path else False
+                except duckdb.Error as error:
+                    logger.warning("DuckDB cannot attach the database, using SQLite: %s", error)
+                    _analytics = False
+    return _analytics or None
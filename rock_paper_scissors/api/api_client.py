@@ -1,29 +1,105 @@
-from .database import SessionLocal
+from dotenv import load_dotenv
+import importlib
 import logging
 import os
-import requests
+import time
+from typing import Optional
+import uuid
+
+from rock_paper_scissors.utils import GAMES_LOGGER
+
+# The console client only talks HTTP: it must not import the database/ORM stack.
+# `requests` is imported the first time it is used, so the menu shows up without paying for it.
+
+
+class LazyModule:
+    """A module imported the first time one of its attributes is read.
+
+    Examples:
+        >>> json = LazyModule("json")
+        >>> json.dumps([1])
+        '[1]'
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+
+    def __getattr__(self, attribute: str):
+        return getattr(importlib.import_module(self._name), attribute)
+
+
+requests = LazyModule("requests")
+urllib3 = LazyModule("urllib3")
+
+# Loads environment variables from .env file.
+load_dotenv()
 
 api_url = os.getenv("API_URL")
 
-# Dependency
-def get_db():
-    """Dependency that provides a database session.
+# Attempts after the first one when a game upload times out, cannot connect or gets a 5xx error,
+# and seconds a request waits for the API.
+API_RETRIES = int(os.getenv("API_RETRIES", "3"))
+API_TIMEOUT = float(os.getenv("API_TIMEOUT", "10"))
+# Longest wait, in seconds, asked by the Retry-After header of a busy (503) or rate limited (429)
+# response that the client honors before trying again. A longer wait gives up at once.
+API_MAX_RETRY_AFTER = float(os.getenv("API_MAX_RETRY_AFTER", "30"))
+
+# One record per game saved, which `utils.LOG_SAMPLE_EVERY` can sample.
+games_logger = logging.getLogger(GAMES_LOGGER)
 
-    This function uses `SessionLocal()` to create a new database session. 
-    It ensures that the session is properly closed after use.
 
-    Yields:
-        SessionLocal: A new database session.
+def accept_encoding() -> dict:
+    """Returns the Accept-Encoding header with the encodings `requests` can decode: gzip and
+    deflate, plus br and zstd if brotli and zstandard are installed."""
+    return {"Accept-Encoding": urllib3.util.make_headers(accept_encoding=True)["accept-encoding"]}
+
+
+def retry_after(response) -> Optional[float]:
+    """Returns the seconds to wait before repeating a request the API refused because it is busy
+    or rate limited, or None if the request should not be repeated.
+
+    Examples:
+        >>> from types import SimpleNamespace
+        >>> retry_after(SimpleNamespace(status_code=503, headers={"Retry-After": "2"}))
+        2.0
+        >>> retry_after(SimpleNamespace(status_code=429, headers={})) is None
+        True
+        >>> retry_after(SimpleNamespace(status_code=200, headers={"Retry-After": "2"})) is None
+        True
     """
-    db = SessionLocal()
+    if response.status_code not in (429, 503):
+        return None
     try:
-        yield db
-    finally:
-        db.close()
+        delay = float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, delay) if delay <= API_MAX_RETRY_AFTER else None
+
+
+def get(url: str):
+    """Sends a GET request that accepts compressed responses, repeating it up to `API_RETRIES` times while the API answers that it is
+    busy or rate limited, after the wait asked by its Retry-After header.
+
+    Returns:
+        requests.Response: The last response.
+    """
+    for attempt in range(API_RETRIES + 1):
+        response = requests.get(url, headers=accept_encoding())
+        delay = retry_after(response)
+        if delay is None or attempt == API_RETRIES:
+            return response
+        logging.warning("The API is busy, retrying in %.0f s", delay)
+        time.sleep(delay)
+
 
 def create_game(rounds_information: dict, game_information:dict):
     """Sends a request to create a new game in the database.
 
+    The game is sent with a new idempotency key. If the request times out, cannot connect or
+    gets a server error, it is retried up to `API_RETRIES` times with the same key, so the API
+    records the game only once even if the first attempt arrived. A busy or rate limited
+    response is retried after the wait asked by its Retry-After header.
+
     Args:
         rounds_information (dict): Information about the rounds played in the game.
         game_information (dict): Information about the game, including the winner.
@@ -36,13 +112,30 @@ def create_game(rounds_information: dict, game_information:dict):
         "rounds_played": rounds_information["rounds_played"],
         "game_winner": game_information["game_winner"]
     }
-
-    try:
-        response = requests.post(API_URL, json=data_to_send)
-        response.raise_for_status()
-        logging.info(f"New game created:\n{response.text}")
-    except requests.exceptions.RequestException as e:
-        logging.error(f"Error saving the game: {e}")
+    headers = {"Idempotency-Key": uuid.uuid4().hex, **accept_encoding()}
+
+    for attempt in range(API_RETRIES + 1):
+        try:
+            response = requests.post(API_URL, json=data_to_send, headers=headers, timeout=API_TIMEOUT)
+            delay = retry_after(response)
+            if delay is not None and attempt < API_RETRIES:
+                logging.warning("The API is busy, retrying to save the game in %.0f s", delay)
+                time.sleep(delay)
+                continue
+            if response.status_code >= 500 and attempt < API_RETRIES:
+                raise requests.exceptions.RetryError(f"Server error {response.status_code}")
+            response.raise_for_status()
+            games_logger.info("New game created:\n%s", response.text)
+            return
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout, requests.exceptions.RetryError) as e:
+            if attempt == API_RETRIES:
+                logging.error("Error saving the game: %s", e)
+                return
+            logging.warning("Retrying to save the game: %s", e)
+            time.sleep(0.5 * 2 ** attempt)
+        except requests.exceptions.RequestException as e:
+            logging.error("Error saving the game: %s", e)
+            return
 
 
 def get_global_info():
@@ -53,10 +146,10 @@ def get_global_info():
     """
     API_URL = f"{api_url}/game/get_global_info"
     try:
-        response = requests.get(API_URL)
+        response = get(API_URL)
         print(response.text)
     except requests.exceptions.RequestException as e:
-        logging.error(f"Error displaying global information: {e}.")
+        logging.error("Error displaying global information: %s.", e)
 
 
 def get_strong_hand():
@@ -67,7 +160,7 @@ def get_strong_hand():
     """
     API_URL = f"{api_url}/game/mano_fuerte"
     try:
-        response = requests.get(API_URL)
+        response = get(API_URL)
         print(response.text)
     except requests.exceptions.RequestException as e:
         print(f"Error displaying data of strong hand: {e}")
@@ -81,7 +174,7 @@ def get_weak_hand():
     """
     API_URL = f"{api_url}/game/mano_debil"
     try:
-        response = requests.get(API_URL)
+        response = get(API_URL)
         print(response.text)
     except requests.exceptions.RequestException as e:
         print(f"Error displaying data of weak hand: {e}")
@@ -95,7 +188,7 @@ def get_ranking():
     """
     API_URL = f"{api_url}/game/ranking"
     try:
-        response = requests.get(API_URL)
+        response = get(API_URL)
         print(response.text)
     except requests.exceptions.RequestException as e:
         print(f"Error displaying the ranking: {e}")
@@ -109,11 +202,21 @@ def get_statistics():
     """
     API_URL = f"{api_url}/game/estadisticas"
     try:
-        response = requests.get(API_URL)
+        response = get(API_URL)
         print(response.text)
     except requests.exceptions.RequestException as e:
         print(f"Error displaying the statistics: {e}")
 
 
+def get_dashboard():
+    """Fetches and prints all the statistics of the dashboard from the API in a single request.
 
-
+    Raises:
+        requests.exceptions.RequestException: If there's an error during the request.
+    """
+    API_URL = f"{api_url}/game/dashboard"
+    try:
+        response = get(API_URL)
+        print(response.text)
+    except requests.exceptions.RequestException as e:
+        print(f"Error displaying the dashboard: {e}")
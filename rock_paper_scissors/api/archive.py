@@ -0,0 +1,524 @@
+import argparse
+from collections import Counter
+from datetime import datetime, timedelta
+import hashlib
+import json
+import os
+import sys
+import zlib
+from typing import Iterator, List, Optional, Sequence
+
+from sqlalchemy.orm import sessionmaker
+
+from rock_paper_scissors.api import models
+from rock_paper_scissors.api.database import SQLALCHEMY_DATABASE_URL, WriteSessionLocal, sqlite_file_path
+
+# Moves old games out of the database into compressed, immutable segment files. Usage:
+#   python -m rock_paper_scissors.api.archive archive --older-than 90d
+#   python -m rock_paper_scissors.api.archive export --output games.jsonl
+
+# Directory of the segment files. Defaults to a directory next to the SQLite database.
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR")
+if ARCHIVE_DIR is None:
+    database_path = sqlite_file_path(SQLALCHEMY_DATABASE_URL)
+    ARCHIVE_DIR = f"{database_path}.archive" if database_path else ""
+
+# Games younger than this are never archived: every worker has read them into its statistics
+# in memory long before (see `hand_stats.HandStats.sync_archive`).
+MIN_ARCHIVE_AGE = timedelta(hours=1)
+
+SEGMENT_MAGIC = b"RPSSEG1\n"
+DELETE_CHUNK = 500
+
+
+class SegmentInfo:
+    """Aggregates of a segment, read from the JSON file written next to it.
+
+    Attributes:
+        name (str): Name of the segment, also the prefix of its files.
+        first_id (int): Lowest game id of the segment.
+        last_id (int): Highest game id of the segment.
+        games (int): Number of games of the segment.
+        created_from (Optional[datetime]): Creation time of the oldest game, None if no game has one.
+        created_to (Optional[datetime]): Creation time of the newest game, None if no game has one.
+        outcomes (list): Rows (player, winner, total games, total abandonments).
+        hands (dict): Moves of player 1 in the rounds won by the winner of the game, by winner.
+    """
+
+    def __init__(self, aggregates: dict):
+        self.name = aggregates["segment"]
+        self.first_id = aggregates["first_id"]
+        self.last_id = aggregates["last_id"]
+        self.games = aggregates["games"]
+        self.created_from = parse_time(aggregates["created_from"])
+        self.created_to = parse_time(aggregates["created_to"])
+        self.outcomes = [tuple(row) for row in aggregates["outcomes"]]
+        self.hands = {winner: Counter(moves) for winner, moves in aggregates["hands"].items()}
+
+
+class ArchiveTotals:
+    """Sum of the aggregates of all the segments of an archive.
+
+    Attributes:
+        segments (List[SegmentInfo]): The segments, by first game id.
+        games (int): Number of archived games.
+        outcomes (Counter): Number of games by (player, winner).
+        abandonments (Counter): Number of games abandoned before the third round by (player, winner).
+        hands (dict): Moves of player 1 in the rounds won by the winner of the game, by winner.
+    """
+
+    def __init__(self, segments: List[SegmentInfo]):
+        self.segments = sorted(segments, key=lambda segment: segment.first_id)
+        self.games = sum(segment.games for segment in segments)
+        self.outcomes = Counter()
+        self.abandonments = Counter()
+        self.hands = {}
+        for segment in segments:
+            for player, winner, total_games, total_abandonments in segment.outcomes:
+                self.outcomes[(player, winner)] += total_games
+                self.abandonments[(player, winner)] += total_abandonments
+            for winner, moves in segment.hands.items():
+                self.hands.setdefault(winner, Counter()).update(moves)
+
+    def wins(self, winner: str) -> int:
+        """Number of archived games won by a player."""
+        return sum(total for (player, game_winner), total in self.outcomes.items() if game_winner == winner)
+
+    def abandonments_won_by(self, winner: str) -> int:
+        """Number of archived games abandoned before the third round and won by a player."""
+        return sum(total for (player, game_winner), total in self.abandonments.items() if game_winner == winner)
+
+
+def parse_time(value: Optional[str]) -> Optional[datetime]:
+    """Parses a time written by `format_time`."""
+    return datetime.fromisoformat(value) if value else None
+
+
+def format_time(value: Optional[datetime]) -> Optional[str]:
+    """Formats a time as ISO 8601, or None."""
+    return value.isoformat() if value else None
+
+
+def encode_strings(values: list) -> dict:
+    """Encodes a column of strings as its distinct values and the position of each value.
+
+    Examples:
+        >>> encode_strings(["Human", "Machine", "Human", None])
+        {'values': ['Human', 'Machine', None], 'codes': [0, 1, 0, 2]}
+    """
+    positions = {}
+    codes = [positions.setdefault(value, len(positions)) for value in values]
+    return {"values": list(positions), "codes": codes}
+
+
+def decode_strings(column: dict) -> list:
+    """Decodes a column written by `encode_strings`.
+
+    Examples:
+        >>> decode_strings({'values': ['Human', 'Machine'], 'codes': [0, 1, 0]})
+        ['Human', 'Machine', 'Human']
+    """
+    values = column["values"]
+    return [values[code] for code in column["codes"]]
+
+
+def encode_deltas(values: List[int]) -> List[int]:
+    """Encodes increasing integers as their differences, which compress better.
+
+    Examples:
+        >>> encode_deltas([10, 11, 12, 20])
+        [10, 1, 1, 8]
+    """
+    return [value - previous for previous, value in zip([0] + values, values)]
+
+
+def decode_deltas(deltas: List[int]) -> List[int]:
+    """Decodes integers written by `encode_deltas`.
+
+    Examples:
+        >>> decode_deltas([10, 1, 1, 8])
+        [10, 11, 12, 20]
+    """
+    values = []
+    total = 0
+    for delta in deltas:
+        total += delta
+        values.append(total)
+    return values
+
+
+def segment_columns(games: List[dict]) -> dict:
+    """Builds the columns of a segment: one list per field, the rounds of all the games in a row.
+
+    Args:
+        games (List[dict]): Games with id, total_rounds, winner, player, created_at,
+            idempotency_key and moves, a list of (player_1_move, player_2_move, winner).
+
+    Returns:
+        dict: The columns, ready to be written as JSON.
+    """
+    moves = [move for game in games for move in game["moves"]]
+    return {
+        "id": encode_deltas([game["id"] for game in games]),
+        "total_rounds": [game["total_rounds"] for game in games],
+        "winner": encode_strings([game["winner"] for game in games]),
+        "player": encode_strings([game["player"] for game in games]),
+        "created_at": [format_time(game["created_at"]) for game in games],
+        "idempotency_key": [game["idempotency_key"] for game in games],
+        "move_count": [len(game["moves"]) for game in games],
+        "player_1_move": encode_strings([move[0] for move in moves]),
+        "player_2_move": encode_strings([move[1] for move in moves]),
+        "move_winner": encode_strings([move[2] for move in moves])
+    }
+
+
+def segment_aggregates(name: str, games: List[dict]) -> dict:
+    """Precomputes the statistics of the games of a segment, as they are counted from the database.
+
+    Args:
+        name (str): Name of the segment.
+        games (List[dict]): Games, as for `segment_columns`.
+
+    Returns:
+        dict: The aggregates, see `SegmentInfo`.
+    """
+    outcomes = Counter()
+    abandonments = Counter()
+    hands = {}
+    for game in games:
+        key = (game["player"], game["winner"])
+        outcomes[key] += 1
+        abandonments[key] += game["total_rounds"] is not None and game["total_rounds"] < 3
+        for player_1_move, player_2_move, winner in game["moves"]:
+            if winner == game["winner"]:
+                hands.setdefault(winner, Counter())[player_1_move] += 1
+
+    created = [game["created_at"] for game in games if game["created_at"] is not None]
+    return {
+        "segment": name,
+        "first_id": min(game["id"] for game in games),
+        "last_id": max(game["id"] for game in games),
+        "games": len(games),
+        "created_from": format_time(min(created)) if created else None,
+        "created_to": format_time(max(created)) if created else None,
+        "outcomes": [[player, winner, total, abandonments[(player, winner)]] for (player, winner), total in outcomes.items()],
+        "hands": {winner: dict(moves) for winner, moves in hands.items()}
+    }
+
+
+def write_file(path: str, content: bytes):
+    """Writes a file and flushes it to disk."""
+    with open(path, "wb") as output:
+        output.write(content)
+        output.flush()
+        os.fsync(output.fileno())
+
+
+def write_segment(directory: str, games: List[dict]) -> str:
+    """Writes the files of a new segment with a `.pending` suffix.
+
+    The segment is not part of the archive until `publish_segment` renames its files, after the
+    games have been deleted from the database.
+
+    Args:
+        directory (str): Directory of the archive.
+        games (List[dict]): Games of the segment, as for `segment_columns`, ordered by id.
+
+    Returns:
+        str: The name of the segment.
+    """
+    name = f"segment-{games[0]['id']:012d}-{games[-1]['id']:012d}"
+    data = SEGMENT_MAGIC + zlib.compress(json.dumps(segment_columns(games), separators=(",", ":")).encode(), 9)
+    aggregates = segment_aggregates(name, games)
+    aggregates["sha256"] = hashlib.sha256(data).hexdigest()
+
+    write_file(os.path.join(directory, f"{name}.seg.pending"), data)
+    write_file(os.path.join(directory, f"{name}.json.pending"), json.dumps(aggregates).encode())
+    return name
+
+
+def publish_segment(directory: str, name: str):
+    """Adds a pending segment to the archive: its data first, its aggregates last."""
+    for suffix in (".seg", ".json"):
+        path = os.path.join(directory, name + suffix)
+        os.replace(path + ".pending", path)
+
+
+def read_segment(path: str) -> List[dict]:
+    """Reads the games of a segment file.
+
+    Args:
+        path (str): Path of the `.seg` file.
+
+    Returns:
+        List[dict]: The games, with the shape of `crud.get_history` plus `total_rounds` and `created_at`.
+    """
+    with open(path, "rb") as segment_file:
+        data = segment_file.read()
+    if not data.startswith(SEGMENT_MAGIC):
+        raise ValueError(f"Not a segment file: {path}")
+    columns = json.loads(zlib.decompress(data[len(SEGMENT_MAGIC):]))
+
+    player_1_moves = decode_strings(columns["player_1_move"])
+    player_2_moves = decode_strings(columns["player_2_move"])
+    move_winners = decode_strings(columns["move_winner"])
+
+    games = []
+    position = 0
+    for game_id, total_rounds, winner, player, created_at, move_count in zip(
+            decode_deltas(columns["id"]), columns["total_rounds"], decode_strings(columns["winner"]),
+            decode_strings(columns["player"]), columns["created_at"], columns["move_count"]):
+        games.append({
+            "id": game_id,
+            "rounds_played": [
+                {"player_1_move": player_1_moves[index], "player_2_move": player_2_moves[index], "winner": move_winners[index]}
+                for index in range(position, position + move_count)
+            ],
+            "game_winner": winner,
+            "player": player,
+            "total_rounds": total_rounds,
+            "created_at": created_at
+        })
+        position += move_count
+    return games
+
+
+_totals_cache = {}
+
+
+def archive_totals(directory: Optional[str] = None) -> ArchiveTotals:
+    """Returns the sum of the aggregates of the segments of an archive.
+
+    Segments are immutable, so the aggregates are read again only when the list of segments
+    changes, and a call usually costs a directory listing.
+
+    Args:
+        directory (str, optional): Directory of the archive. Defaults to `ARCHIVE_DIR`.
+
+    Returns:
+        ArchiveTotals: The totals, empty if there is no archive.
+    """
+    directory = ARCHIVE_DIR if directory is None else directory
+    try:
+        file_names = tuple(sorted(name for name in os.listdir(directory) if name.endswith(".json"))) if directory else ()
+    except FileNotFoundError:
+        file_names = ()
+    if not file_names:
+        return ArchiveTotals([])
+
+    cached = _totals_cache.get(directory)
+    if cached is not None and cached[0] == file_names:
+        return cached[1]
+
+    segments = []
+    for file_name in file_names:
+        with open(os.path.join(directory, file_name)) as aggregates_file:
+            segments.append(SegmentInfo(json.load(aggregates_file)))
+    totals = ArchiveTotals(segments)
+    _totals_cache[directory] = (file_names, totals)
+    return totals
+
+
+def iter_archived_games(directory: Optional[str] = None, segments: Optional[List[SegmentInfo]] = None) -> Iterator[dict]:
+    """Yields the archived games, one segment in memory at a time.
+
+    Args:
+        directory (str, optional): Directory of the archive. Defaults to `ARCHIVE_DIR`.
+        segments (List[SegmentInfo], optional): Only read these segments. Defaults to all, by game id.
+
+    Yields:
+        dict: The games, as returned by `read_segment`.
+    """
+    directory = ARCHIVE_DIR if directory is None else directory
+    if segments is None:
+        segments = archive_totals(directory).segments
+    for segment in segments:
+        yield from read_segment(os.path.join(directory, f"{segment.name}.seg"))
+
+
+def count_archived_games(player: Optional[str] = None, start: Optional[datetime] = None,
+                         end: Optional[datetime] = None, directory: Optional[str] = None) -> list:
+    """Counts the archived games by player and winner, as `rollups.query_games` counts the stored ones.
+
+    Without a period the counts come from the aggregates. With a period only the segments
+    whose games were created in it are read.
+
+    Args:
+        player (str, optional): Only count the games of this player. Defaults to all players.
+        start (datetime, optional): Only count the games created at or after this moment.
+        end (datetime, optional): Only count the games created before this moment.
+        directory (str, optional): Directory of the archive. Defaults to `ARCHIVE_DIR`.
+
+    Returns:
+        list: Rows (player, winner, total games, total abandonments).
+    """
+    directory = ARCHIVE_DIR if directory is None else directory
+    totals = archive_totals(directory)
+    if start is None:
+        return [
+            (row_player, winner, total, totals.abandonments[(row_player, winner)])
+            for (row_player, winner), total in totals.outcomes.items()
+            if player is None or row_player == player
+        ]
+
+    segments = [
+        segment for segment in totals.segments
+        if segment.created_from is not None and segment.created_from < end and segment.created_to >= start
+    ]
+    counts = Counter()
+    abandonments = Counter()
+    for game in iter_archived_games(directory, segments):
+        created_at = parse_time(game["created_at"])
+        if created_at is None or not start <= created_at < end or (player is not None and game["player"] != player):
+            continue
+        key = (game["player"], game["game_winner"])
+        counts[key] += 1
+        abandonments[key] += game["total_rounds"] is not None and game["total_rounds"] < 3
+    return [(row_player, winner, total, abandonments[(row_player, winner)]) for (row_player, winner), total in counts.items()]
+
+
+def recover_pending(db, directory: str, other_dbs: Sequence = ()):
+    """Finishes, or discards, the segments left pending by an interrupted archiver.
+
+    A pending segment whose games are still in the database was not committed and is removed;
+    otherwise the games were deleted and the segment is published.
+
+    Args:
+        db (Session): Database session.
+        directory (str): Directory of the archive.
+        other_dbs (Sequence[Session]): Sessions of the other shards archived in the same
+            directory, which may hold the games of a pending segment. Defaults to none.
+    """
+    for file_name in sorted(os.listdir(directory)):
+        if not file_name.endswith(".json.pending"):
+            continue
+        name = file_name[:-len(".json.pending")]
+        with open(os.path.join(directory, file_name)) as aggregates_file:
+            aggregates = json.load(aggregates_file)
+
+        still_stored = any(
+            shard_db.query(models.Game.id).filter(
+                models.Game.id.in_([aggregates["first_id"], aggregates["last_id"]])
+            ).first()
+            for shard_db in [db, *other_dbs]
+        )
+        if still_stored:
+            for suffix in (".seg.pending", ".json.pending"):
+                os.remove(os.path.join(directory, name + suffix))
+        else:
+            publish_segment(directory, name)
+
+
+def archive_games(older_than: timedelta, segment_size: int = 50000, directory: Optional[str] = None,
+                  session_factory: sessionmaker = WriteSessionLocal, now: Optional[datetime] = None,
+                  other_session_factories: Sequence[sessionmaker] = ()) -> int:
+    """Moves the games created before `older_than` ago into new segments of the archive.
+
+    Games without creation time, recorded before it was stored, are archived too. Each segment
+    is written and fsynced as pending, then its games are deleted in one transaction and the
+    segment is published. The rollups are not changed: they keep counting the archived games.
+
+    Args:
+        older_than (timedelta): Minimum age of the archived games, at least `MIN_ARCHIVE_AGE`.
+        segment_size (int): Maximum number of games per segment. Defaults to 50000.
+        directory (str, optional): Directory of the archive. Defaults to `ARCHIVE_DIR`.
+        session_factory (sessionmaker): Sessions of the database. Defaults to the write sessions.
+        now (datetime, optional): UTC current time. Defaults to the current time.
+        other_session_factories (Sequence[sessionmaker]): Sessions of the other shards archived
+            in the same directory, see `recover_pending`. Defaults to none.
+
+    Returns:
+        int: Number of archived games.
+
+    Raises:
+        ValueError: If `older_than` is less than `MIN_ARCHIVE_AGE` or there is no archive directory.
+    """
+    directory = ARCHIVE_DIR if directory is None else directory
+    if older_than < MIN_ARCHIVE_AGE:
+        raise ValueError(f"Games younger than {MIN_ARCHIVE_AGE} cannot be archived")
+    if not directory:
+        raise ValueError("No archive directory: set ARCHIVE_DIR")
+    os.makedirs(directory, exist_ok=True)
+    cutoff = (now or models.utcnow()) - older_than
+
+    other_dbs = [other_session_factory() for other_session_factory in other_session_factories]
+    try:
+        with session_factory() as db:
+            recover_pending(db, directory, other_dbs)
+    finally:
+        for other_db in other_dbs:
+            other_db.close()
+
+    archived = 0
+    while True:
+        with session_factory() as db:
+            rows = db.query(models.Game.id, models.Game.total_rounds, models.Game.winner, models.Game.player,
+                            models.Game.created_at, models.Game.idempotency_key) \
+                .filter((models.Game.created_at < cutoff) | models.Game.created_at.is_(None)) \
+                .order_by(models.Game.id) \
+                .limit(segment_size) \
+                .all()
+            if not rows:
+                return archived
+
+            games = {row.id: {**row._asdict(), "moves": []} for row in rows}
+            moves = db.query(models.Move.game_id, models.Move.player_1_move, models.Move.player_2_move, models.Move.winner) \
+                .filter(models.Move.game_id >= rows[0].id, models.Move.game_id <= rows[-1].id) \
+                .order_by(models.Move.game_id, models.Move.id) \
+                .all()
+            for game_id, player_1_move, player_2_move, winner in moves:
+                if game_id in games:
+                    games[game_id]["moves"].append((player_1_move, player_2_move, winner))
+
+            name = write_segment(directory, list(games.values()))
+
+            game_ids = list(games)
+            for position in range(0, len(game_ids), DELETE_CHUNK):
+                chunk = game_ids[position:position + DELETE_CHUNK]
+                db.query(models.Move).filter(models.Move.game_id.in_(chunk)).delete(synchronize_session=False)
+                db.query(models.Game).filter(models.Game.id.in_(chunk)).delete(synchronize_session=False)
+            db.commit()
+
+        publish_segment(directory, name)
+        archived += len(games)
+
+
+def main():
+    """Archives the old games, or exports the archived games as JSON lines."""
+    from rock_paper_scissors.api.database import init_db
+    from rock_paper_scissors.api.rollups import parse_window
+
+    parser = argparse.ArgumentParser(description="Archive of old games.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    archive_parser = commands.add_parser("archive", help="Move the old games to new segments")
+    archive_parser.add_argument("--older-than", default="90d", help="Minimum age of the archived games, e.g. 30d")
+    archive_parser.add_argument("--segment-size", type=int, default=50000, help="Games per segment")
+    export_parser = commands.add_parser("export", help="Write the archived games as JSON lines")
+    export_parser.add_argument("--output", help="Output file. Defaults to the standard output")
+    args = parser.parse_args()
+
+    if args.command == "archive":
+        from rock_paper_scissors.api import shards
+
+        init_db()
+        shards.init_shards()
+        # Every shard moves its games to the same archive, which the first shard counts.
+        archived = 0
+        for shard in shards.shards:
+            others = [other.SessionLocal for other in shards.shards if other is not shard]
+            archived += archive_games(parse_window(args.older_than), segment_size=args.segment_size,
+                                      session_factory=shard.SessionLocal, other_session_factories=others)
+        totals = archive_totals()
+        print(f"Archived {archived} games. The archive has {totals.games} games in {len(totals.segments)} segments.")
+    else:
+        output = open(args.output, "w") if args.output else sys.stdout
+        try:
+            for game in iter_archived_games():
+                output.write(json.dumps(game) + "\n")
+        finally:
+            if args.output:
+                output.close()
+
+
+if __name__ == "__main__":
+    main()
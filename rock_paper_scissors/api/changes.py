@@ -0,0 +1,180 @@
+import asyncio
+import os
+import threading
+from typing import List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+
+from rock_paper_scissors.api import crud, database, shards
+
+# The change feed: a consumer tails the games recorded, in the order they were committed, by
+# asking for the games after its cursor. The cursor holds the id of the last game received from
+# each shard, e.g. "1532" or, with three shards, "1532.1290.1417". When there are no new games
+# the request waits for the next game recorded by this worker, without querying the database,
+# and checks the database every CHANGES_RECHECK_INTERVAL seconds for the games of the other
+# workers. The feed reads the database itself, not the snapshot of `database.READ_ENGINE`, and
+# only returns the games still in it: the archived games leave the feed.
+
+# Seconds a request waits for new games when the client does not say.
+CHANGES_WAIT = float(os.getenv("CHANGES_WAIT", "30"))
+# Longest wait a client may ask for.
+CHANGES_MAX_WAIT = float(os.getenv("CHANGES_MAX_WAIT", "60"))
+# Seconds between two reads of the database while waiting, to see the games of the other workers.
+CHANGES_RECHECK_INTERVAL = float(os.getenv("CHANGES_RECHECK_INTERVAL", "5"))
+
+
+class ChangeNotifier:
+    """Wakes the requests of the change feed waiting in this process when games are recorded.
+
+    A waiter reads `version` before querying the games, and only waits if it has not changed
+    since, so a game recorded between the query and the wait is not missed.
+
+    Attributes:
+        version (int): Number of notifications sent.
+
+    Examples:
+        >>> notifier = ChangeNotifier()
+        >>> version = notifier.version
+        >>> notifier.notify()
+        >>> asyncio.run(notifier.wait(version, timeout=10))
+        True
+        >>> asyncio.run(notifier.wait(notifier.version, timeout=0.01))
+        False
+    """
+
+    def __init__(self):
+        self.version = 0
+        self._lock = threading.Lock()
+        self._loop = None
+        self._event = None
+
+    def notify(self):
+        """Wakes the waiters up. Called from any thread, after the new games are committed."""
+        with self._lock:
+            self.version += 1
+        # Scheduled even without waiters: one may be between its check of `version` and its wait.
+        loop = self._loop
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(self._wake)
+            except RuntimeError:
+                # The loop of the waiters was closed.
+                pass
+
+    def _wake(self):
+        event, self._event = self._event, None
+        if event is not None:
+            event.set()
+
+    async def wait(self, version: int, timeout: float) -> bool:
+        """Waits until a notification newer than `version`, or at most `timeout` seconds.
+
+        Returns:
+            bool: True if notified, False on timeout.
+        """
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # The event of another loop, e.g. of a finished test client, cannot be awaited.
+            self._loop, self._event = loop, None
+        if self.version != version:
+            return True
+        if self._event is None:
+            self._event = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+
+def parse_cursor(cursor: str, count: int) -> List[int]:
+    """Reads the id of the last game received from each of `count` shards.
+
+    "0", the start of the feed, is accepted with any number of shards.
+
+    Raises:
+        ValueError: If the cursor is not one of this number of shards.
+
+    Examples:
+        >>> parse_cursor("1532", 1), parse_cursor("0", 3), parse_cursor("12.7.9", 3)
+        ([1532], [0, 0, 0], [12, 7, 9])
+        >>> parse_cursor("12.7", 3)
+        Traceback (most recent call last):
+        ...
+        ValueError: Invalid cursor '12.7', expected 3 non-negative ids separated by dots
+    """
+    if cursor == "0":
+        return [0] * count
+    parts = cursor.split(".")
+    if len(parts) != count or not all(part.isdigit() for part in parts):
+        raise ValueError(f"Invalid cursor {cursor!r}, expected {count} non-negative ids separated by dots")
+    return [int(part) for part in parts]
+
+
+def format_cursor(positions: List[int]) -> str:
+    """Writes the cursor of the last game received from each shard.
+
+    Examples:
+        >>> format_cursor([1532]), format_cursor([12, 7, 9])
+        ('1532', '12.7.9')
+    """
+    return ".".join(str(position) for position in positions)
+
+
+def read_changes(db: Session, positions: List[int], limit: int) -> Tuple[List[dict], List[int]]:
+    """Reads the first `limit` games after the cursor, over every shard.
+
+    Args:
+        db (Session): Session of the first shard.
+        positions (List[int]): Id of the last game received from each shard.
+        limit (int): Maximum number of games.
+
+    Returns:
+        tuple: The games, in the order of their ids, and the positions after them.
+    """
+    pages = shards.fan_out(db, lambda shard_db, shard: crud.get_history(shard_db, positions[shard.index], limit))
+    games = sorted((game for page in pages for game in page), key=lambda game: game["id"])[:limit]
+    positions = list(positions)
+    count = len(positions)
+    for game in games:
+        # The shard `i` of `n` gives its games the ids that are `i` modulo `n`.
+        index = game["id"] % count if count > 1 else 0
+        positions[index] = max(positions[index], game["id"])
+    return games, positions
+
+
+async def wait_for_changes(positions: List[int], limit: int = 100, wait: float = CHANGES_WAIT,
+                           notifier: Optional[ChangeNotifier] = None) -> dict:
+    """Returns the games after the cursor, waiting up to `wait` seconds for one if there are none.
+
+    The database is read in the threadpool; no connection is held while waiting.
+
+    Args:
+        positions (List[int]): Id of the last game received from each shard, see `parse_cursor`.
+        limit (int): Maximum number of games.
+        wait (float): Seconds to wait when there are no new games. 0 answers at once.
+        notifier (ChangeNotifier, optional): Notifier of the new games. Defaults to the one of the process.
+
+    Returns:
+        dict: The games, under "games", and the cursor to send in the next request, under "cursor".
+    """
+    notifier = notifier or change_notifier
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + wait
+
+    def read():
+        with database.SessionLocal() as db:
+            return read_changes(db, positions, limit)
+
+    while True:
+        version = notifier.version
+        games, next_positions = await run_in_threadpool(read)
+        remaining = deadline - loop.time()
+        if games or remaining <= 0:
+            return {"games": games, "cursor": format_cursor(next_positions)}
+        await notifier.wait(version, min(remaining, CHANGES_RECHECK_INTERVAL))
+
+
+# Notifier of the process.
+change_notifier = ChangeNotifier()
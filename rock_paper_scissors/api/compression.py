@@ -0,0 +1,191 @@
+import os
+import zlib
+from typing import Optional
+
+from starlette.datastructures import MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # brotli is optional: without it "br" is not offered.
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional: without it "zstd" is not offered.
+    zstandard = None
+
+# Compresses the HTTP responses with the best encoding accepted by the client. The JSON of the
+# games repeats the same few strings ("rock", "Machine_2", ...) and compresses very well.
+
+# Encodings offered, in order of preference. Those whose library is missing are skipped; an
+# empty value disables the compression. At the default levels the three compress the games
+# about as well for the same CPU, so gzip, which every client accepts, is preferred.
+COMPRESSION_ENCODINGS = os.getenv("COMPRESSION_ENCODINGS", "gzip,br,zstd")
+# Responses smaller than this many bytes are sent as they are. Streamed responses are always compressed.
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+# Compression level of each encoding, see benchmarks/bench_compression.py.
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_LEVEL = int(os.getenv("BROTLI_LEVEL", "6"))
+ZSTD_LEVEL = int(os.getenv("ZSTD_LEVEL", "7"))
+
+# Responses that must reach the client as soon as each part is written.
+UNCOMPRESSED_TYPES = ("text/event-stream",)
+
+
+class GzipCompressor:
+    def __init__(self, level: int):
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self.compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self.compressor.flush()
+
+
+class BrotliCompressor:
+    def __init__(self, level: int):
+        self.compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self.compressor.process(data)
+
+    def finish(self) -> bytes:
+        return self.compressor.finish()
+
+
+class ZstdCompressor:
+    def __init__(self, level: int):
+        self.compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self.compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self.compressor.flush()
+
+
+def available_encodings(names: str = COMPRESSION_ENCODINGS) -> list:
+    """Returns the encodings of a comma separated list whose library is installed.
+
+    Examples:
+        >>> available_encodings("gzip, deflate")
+        ['gzip']
+    """
+    installed = {"gzip": True, "br": brotli is not None, "zstd": zstandard is not None}
+    return [name for name in (name.strip() for name in names.split(",")) if installed.get(name)]
+
+
+def make_compressor(encoding: str, level: Optional[int] = None):
+    """Returns a streaming compressor of an encoding, at its configured level by default."""
+    if encoding == "zstd":
+        return ZstdCompressor(ZSTD_LEVEL if level is None else level)
+    if encoding == "br":
+        return BrotliCompressor(BROTLI_LEVEL if level is None else level)
+    return GzipCompressor(GZIP_LEVEL if level is None else level)
+
+
+def choose_encoding(accept_encoding: str, offered: list) -> Optional[str]:
+    """Chooses the first offered encoding accepted by an Accept-Encoding header, if any.
+
+    Examples:
+        >>> choose_encoding("gzip, deflate, br", ["zstd", "br", "gzip"])
+        'br'
+        >>> choose_encoding("br;q=0, *", ["br", "gzip"])
+        'gzip'
+        >>> choose_encoding("identity", ["gzip"]) is None
+        True
+    """
+    accepted = {}
+    for item in accept_encoding.lower().split(","):
+        name, _, parameters = item.strip().partition(";")
+        quality = 1.0
+        for parameter in parameters.split(";"):
+            key, _, value = parameter.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name.strip()] = quality
+
+    for encoding in offered:
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+
+class CompressionMiddleware:
+    """ASGI middleware that compresses the HTTP responses, see the module comments.
+
+    A response sent in one part is compressed if it has at least `COMPRESSION_MIN_SIZE` bytes.
+    A streamed response, such as `/game/archivo`, is compressed as its parts are sent.
+    """
+
+    def __init__(self, app, encodings: Optional[list] = None, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.encodings = available_encodings() if encodings is None else encodings
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        encoding = None
+        if scope["type"] == "http" and self.encodings:
+            headers = dict(scope["headers"])
+            encoding = choose_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = CompressedResponder(encoding, self.minimum_size, send)
+        await self.app(scope, receive, responder.send_message)
+
+
+class CompressedResponder:
+    """Compresses the response messages of one request before they are sent."""
+
+    def __init__(self, encoding: str, minimum_size: int, send):
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.send = send
+        self.start_message = None
+        self.compressor = None
+        self.passthrough = False
+
+    async def send_message(self, message):
+        if self.passthrough:
+            await self.send(message)
+            return
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.compressor is None:
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            if "content-encoding" in headers or headers.get("content-type", "").startswith(UNCOMPRESSED_TYPES) \
+                    or (not more_body and len(body) < self.minimum_size):
+                self.passthrough = True
+                await self.send(self.start_message)
+                await self.send(message)
+                return
+
+            self.compressor = make_compressor(self.encoding)
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if not more_body:
+                body = self.compressor.compress(body) + self.compressor.finish()
+                headers["Content-Length"] = str(len(body))
+                await self.send(self.start_message)
+                await self.send({"type": "http.response.body", "body": body})
+                return
+            del headers["Content-Length"]
+            await self.send(self.start_message)
+
+        body = self.compressor.compress(body)
+        if not more_body:
+            body += self.compressor.finish()
+        if body or not more_body:
+            await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
@@ -1,16 +1,64 @@
 from collections import Counter
-from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+from sqlalchemy import and_, bindparam, func, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, selectinload
+from typing import Callable, Iterable, List, NamedTuple, Optional
 
-from rock_paper_scissors.api import models, schemas
+from rock_paper_scissors.api import analytics, archive, models, rollups, schemas, sequences
+from rock_paper_scissors.api.hand_stats import HandStats
+from rock_paper_scissors.api.idempotency import recent_keys
+from rock_paper_scissors.api.predictor import Predictor
 
 
 PLAYER_1 = ['Human', 'Machine_1']
 PLAYER_2 = ['Machine', 'Machine_2']
 
+# Statements of the hot paths, built once with bound parameters. SQLAlchemy caches the SQL
+# compiled for a statement by its structure, but building the statement and computing that
+# key again on every call costs more than running these small queries. They are Core
+# statements on the tables, and return plain rows.
+games_table = models.Game.__table__
+moves_table = models.Move.__table__
+
+# Games, games won by `winner`, by `loser`, and games abandoned and won by `loser`, in one scan.
+GAME_COUNTS = select(
+    func.count(),
+    func.count().filter(games_table.c.winner == bindparam("winner")),
+    func.count().filter(games_table.c.winner == bindparam("loser")),
+    func.count().filter(games_table.c.winner == bindparam("loser"), games_table.c.total_rounds < 3),
+)
+GAME_COLUMNS = (games_table.c.id, games_table.c.winner, games_table.c.player)
+HISTORY_PAGE = select(*GAME_COLUMNS) \
+    .where(games_table.c.id > bindparam("after_id")) \
+    .order_by(games_table.c.id) \
+    .limit(bindparam("limit"))
+GAMES_BY_KEY = select(games_table.c.idempotency_key, *GAME_COLUMNS).where(games_table.c.idempotency_key.in_(bindparam("keys", expanding=True)))
+MOVES_OF_GAMES = select(moves_table.c.game_id, moves_table.c.player_1_move, moves_table.c.player_2_move, moves_table.c.winner) \
+    .where(moves_table.c.game_id.in_(bindparam("game_ids", expanding=True))) \
+    .order_by(moves_table.c.game_id, moves_table.c.id)
+WINS_BY_WINNER = select(games_table.c.winner, func.count()).group_by(games_table.c.winner)
+# The ids are returned in the order of the rows, so the moves of each game can be inserted after it.
+INSERT_GAMES = insert(games_table).returning(games_table.c.id, sort_by_parameter_order=True)
+INSERT_MOVES = insert(moves_table)
+
+
+class GameRow(NamedTuple):
+    """Row of the games table of a new game. It is also a game for `rollups.record_games`."""
+    id: int
+    total_rounds: int
+    winner: str
+    player: str
+    created_at: datetime
+    idempotency_key: Optional[str]
+
 
 def create_game(db: Session, game: schemas.GameCreate) -> dict:
     """Creates a new game in the database.
 
+    If the game has an idempotency key that was already recorded, the game is not created
+    again, see `create_games`.
+
     Args:
         db (Session): Database session to interact with the database.
         game (schemas.GameCreate): Schema object containing information about the game being created.
@@ -18,63 +66,241 @@ def create_game(db: Session, game: schemas.GameCreate) -> dict:
     Returns:
         dict: Formatted response with game details.
     """
-    db_game = models.Game(
-        total_rounds=len(game.rounds_played),
-        winner=game.game_winner
-    )
-    
-    for round_info in game.rounds_played:
-        db_move = models.Move(
-            player_1_move=round_info.player_1_move,
-            player_2_move=round_info.player_2_move,
-            winner=round_info.winner,
-            game=db_game
-        )
-        db_game.moves.append(db_move)
-
-    db.add(db_game)
+    return create_games(db, [game])[0]
+
+
+def create_games(db: Session, games: List[schemas.GameCreate],
+                 assign_ids: Optional[Callable[[Session, int], Iterable[int]]] = None) -> List[dict]:
+    """Creates several games in the database in a single transaction.
+
+    A game whose idempotency key was already recorded, by an earlier upload or earlier in the
+    same list, is not created again: its response is the one of the recorded game, with the
+    extra key `"replayed": True`. The recorded keys are only looked up when the filter of recent
+    keys of the process may know one of them; if another process recorded a key, the unique
+    index refuses the transaction and it is retried with the lookup.
+
+    Args:
+        db (Session): Database session to interact with the database.
+        games (List[schemas.GameCreate]): Schema objects of the games being created.
+        assign_ids (Callable, optional): Returns the ids of a number of new games, given the session
+            in its write transaction, e.g. `shards.Shard.assign_ids`. Defaults to the ids chosen by the database.
+
+    Returns:
+        List[dict]: Formatted responses with the details of each game, in the same order.
+    """
+    keys = [game.idempotency_key for game in games if game.idempotency_key is not None]
+    if not keys:
+        return insert_games(db, games, {}, assign_ids)
+
+    recorded = {}
+    if any(recent_keys.might_contain(key) for key in keys):
+        recorded = get_games_by_key(db, keys)
+
+    try:
+        responses = insert_games(db, games, recorded, assign_ids)
+    except IntegrityError:
+        db.rollback()
+        responses = insert_games(db, games, get_games_by_key(db, keys), assign_ids)
+
+    recent_keys.update(keys)
+    return responses
+
+
+def insert_games(db: Session, games: List[schemas.GameCreate], recorded: dict,
+                 assign_ids: Optional[Callable[[Session, int], Iterable[int]]] = None) -> List[dict]:
+    """Adds the games that are not recorded yet, with their rollups, and commits.
+
+    The games and their moves are inserted with one executemany each, the games returning their ids.
+
+    Args:
+        db (Session): Database session to interact with the database.
+        games (List[schemas.GameCreate]): Schema objects of the games being created.
+        recorded (dict): Responses of the games already recorded, by idempotency key.
+        assign_ids (Callable, optional): Chooses the ids of the new games, see `create_games`.
+
+    Returns:
+        List[dict]: Formatted responses with the details of each game, in the same order.
+    """
+    # Each game is created, or replays a recorded game or a new game earlier in the list.
+    sources = []
+    new_games = {}
+    created = []
+    now = models.utcnow()
+    for game in games:
+        key = game.idempotency_key
+        if key in recorded:
+            sources.append((recorded[key], True))
+        elif key in new_games:
+            sources.append((new_games[key], True))
+        else:
+            response = build_game(game)
+            sources.append((response, False))
+            created.append((game, response))
+            if key is not None:
+                new_games[key] = response
+
+    if created:
+        rows = [
+            {"total_rounds": len(game.rounds_played), "winner": response["game_winner"],
+             "player": response["player"], "created_at": now, "idempotency_key": game.idempotency_key}
+            for game, response in created
+        ]
+        if assign_ids is not None:
+            for row, game_id in zip(rows, assign_ids(db, len(rows))):
+                row["id"] = game_id
+        game_ids = db.execute(INSERT_GAMES, rows).scalars().all()
+        move_rows = []
+        for game_id, (game, response) in zip(game_ids, created):
+            response["id"] = game_id
+            move_rows.extend({"game_id": game_id, **round_played} for round_played in response["rounds_played"])
+        if move_rows:
+            db.execute(INSERT_MOVES, move_rows)
+        rollups.record_games(db, [GameRow(**{**row, "id": game_id}) for game_id, row in zip(game_ids, rows)])
     db.commit()
-    db.refresh(db_game)
 
-    return format_game_response(db_game)
+    return [{**source, "replayed": True} if replayed else source for source, replayed in sources]
 
 
-def format_game_response(db_game: models.Game) -> dict:
-    """Formats the game data to match the expected schema for the response.
+def get_games_by_key(db: Session, keys: List[str]) -> dict:
+    """Retrieves the recorded games that have one of some idempotency keys.
 
     Args:
-        db_game (models.Game): The game instance retrieved from the database.
+        db (Session): Database session to interact with the database.
+        keys (List[str]): The idempotency keys.
 
     Returns:
-        dict: Formatted game response containing game id, rounds played, and game winner.
+        dict: Formatted games, with the same shape as the response of `create_game`, by idempotency key.
     """
-    rounds_played = [
-        {
-            "player_1_move": move.player_1_move,
-            "player_2_move": move.player_2_move,
-            "winner": move.winner
-        } for move in db_game.moves
-    ]
+    rows = db.execute(GAMES_BY_KEY, {"keys": keys}).all()
+    history = add_moves(db, [row[1:] for row in rows])
+    return {row.idempotency_key: game for row, game in zip(rows, history)}
 
+
+def build_game(game: schemas.GameCreate) -> dict:
+    """Builds the response of a new game, without its id, which is set once it is inserted.
+
+    The idempotency key is only written: it is not part of the responses.
+
+    Args:
+        game (schemas.GameCreate): Schema object containing information about the game.
+
+    Returns:
+        dict: The game, with the same shape as the response of `create_game`.
+
+    Examples:
+        >>> game = schemas.GameCreate(rounds_played=[
+        ...     {"player_1_move": "rock", "player_2_move": "paper", "winner": "Machine"}], game_winner="Machine")
+        >>> build_game(game)["player"], build_game(game)["rounds_played"][0]["player_2_move"]
+        ('Human', 'paper')
+    """
     return {
-        "id": db_game.id,
-        "rounds_played": rounds_played,
-        "game_winner": db_game.winner
+        "id": None,
+        "rounds_played": [
+            {
+                "player_1_move": round_info.player_1_move,
+                "player_2_move": round_info.player_2_move,
+                "winner": round_info.winner
+            } for round_info in game.rounds_played
+        ],
+        "game_winner": game.game_winner,
+        "player": game.player or get_player(game.game_winner)
     }
 
 
-def get_global_info(db: Session) -> schemas.GlobalInfo:
+def get_player(game_winner: str) -> str:
+    """Deduces player 1 of a game, who started it, from the winner of the game.
+
+    Args:
+        game_winner (str): The name of the winner of the game.
+
+    Returns:
+        str: The name of player 1. If the winner is not a known player, the winner itself.
+
+    Examples:
+        >>> get_player('Machine')
+        'Human'
+        >>> get_player('Machine_1')
+        'Machine_1'
+    """
+    if game_winner in PLAYER_2:
+        return PLAYER_1[PLAYER_2.index(game_winner)]
+    return game_winner
+
+
+def get_history(db: Session, after_id: int = 0, limit: int = 100) -> List[dict]:
+    """Retrieves a page of the games played, in the order they were created.
+
+    The page starts after the game `after_id`, so the next page is requested with the id of
+    the last game received. The games and their moves are read with two queries as plain rows,
+    without building ORM objects.
+
+    Args:
+        db (Session): Database session to interact with the database.
+        after_id (int): Id of the last game of the previous page. Defaults to 0, the first page.
+        limit (int): Maximum number of games of the page. Defaults to 100.
+
+    Returns:
+        List[dict]: Formatted games, with the same shape as the response of `create_game`.
+    """
+    games = db.execute(HISTORY_PAGE, {"after_id": after_id, "limit": limit}).all()
+    return add_moves(db, games)
+
+
+def add_moves(db: Session, games: list) -> List[dict]:
+    """Formats games read as plain rows, reading all their moves with a single query.
+
+    Args:
+        db (Session): Database session to interact with the database.
+        games (list): Rows with the id, winner and player of each game.
+
+    Returns:
+        List[dict]: Formatted games, with the same shape as the response of `create_game`, in the same order.
+    """
+    if not games:
+        return []
+
+    history = {
+        game_id: {"id": game_id, "rounds_played": [], "game_winner": winner, "player": player}
+        for game_id, winner, player in games
+    }
+
+    moves = db.execute(MOVES_OF_GAMES, {"game_ids": list(history)}).all()
+
+    for game_id, player_1_move, player_2_move, winner in moves:
+        history[game_id]["rounds_played"].append({
+            "player_1_move": player_1_move,
+            "player_2_move": player_2_move,
+            "winner": winner
+        })
+
+    return list(history.values())
+
+
+def get_global_info(db: Session, window: Optional[timedelta] = None, player: Optional[str] = None,
+                    outcomes: Optional[List[rollups.OutcomeCount]] = None) -> schemas.GlobalInfo:
     """Retrieves global information about the games played.
 
     Args:
         db (Session): Database session to interact with the database.
+        window (timedelta, optional): Only count the games of this last period. Defaults to all time.
+        player (str, optional): Only count the games of this player; wins and losses are then
+            the games won and lost by the player. Defaults to the games of all players.
+        outcomes (List[rollups.OutcomeCount], optional): The games already counted by player and
+            winner, e.g. over several shards, instead of reading them from `db`.
 
     Returns:
         schemas.GlobalInfo: An object containing total games, wins, losses, and win rate percentage.
     """
-    total_games = db.query(models.Game).count()
-    total_wins = db.query(models.Game).filter(models.Game.winner == 'Human').count()
-    total_losses = db.query(models.Game).filter(models.Game.winner == 'Machine').count()
+    if outcomes is None and (window is not None or player is not None or analytics.get_analytics() is not None):
+        outcomes = rollups.get_outcome_counts(db, window, player)
+    if outcomes is not None:
+        total_games, total_wins, total_losses, _ = count_outcomes(outcomes, player)
+    else:
+        archived = archive.archive_totals()
+        games, wins, losses, abandonments = db.execute(GAME_COUNTS, {"winner": 'Human', "loser": 'Machine'}).one()
+        total_games = games + archived.games
+        total_wins = wins + archived.wins('Human')
+        total_losses = losses + archived.wins('Machine')
 
     winrate_percentage = (total_wins / total_games * 100) if total_games > 0 else 0
 
@@ -86,18 +312,59 @@ def get_global_info(db: Session) -> schemas.GlobalInfo:
     )
 
 
-def get_strong_hand(db: Session) -> schemas.StrongHandInfo:
+def count_outcomes(outcomes: List[rollups.OutcomeCount], player: Optional[str] = None) -> tuple:
+    """Totals the games counted by player and winner as the statistics routes count them.
+
+    Args:
+        outcomes (List[rollups.OutcomeCount]): The games counted by player and winner.
+        player (str, optional): The player the games were counted for. Without a player, the
+            wins are those of Human, and the losses and abandonments those won by Machine.
+
+    Returns:
+        tuple: The games, wins, losses and abandonments.
+
+    Examples:
+        >>> outcomes = [rollups.OutcomeCount('Human', 'Human', 5, 0), rollups.OutcomeCount('Human', 'Machine', 3, 1),
+        ...             rollups.OutcomeCount('Machine_1', 'Machine_2', 2, 2)]
+        >>> count_outcomes(outcomes)
+        (10, 5, 3, 1)
+        >>> count_outcomes(outcomes[2:], 'Machine_1')
+        (2, 0, 2, 2)
+    """
+    total_games = sum(outcome.total_games for outcome in outcomes)
+    total_wins = sum(outcome.total_games for outcome in outcomes if outcome.winner == (player or 'Human'))
+    if player is not None:
+        total_losses = total_games - total_wins
+    else:
+        total_losses = sum(outcome.total_games for outcome in outcomes if outcome.winner == 'Machine')
+    total_abandonments = sum(
+        outcome.total_abandonments for outcome in outcomes
+        if player is not None or outcome.winner == 'Machine'
+    )
+    return total_games, total_wins, total_losses, total_abandonments
+
+
+def get_strong_hand(db: Session, hand_stats: Optional[HandStats] = None) -> schemas.StrongHandInfo:
     """Retrieves information about the hand that has resulted in the most victories for Human player.
 
     Args:
         db (Session): Database session to interact with the database.
+        hand_stats (HandStats, optional): Statistics kept in memory, brought up to date with the
+            database and used instead of counting the moves of every game. Defaults to None.
 
     Returns:
         schemas.StrongHandInfo: An object containing the strongest hand and its win percentage.
     """
-    player_wins = db.query(models.Game).filter(models.Game.winner == 'Human').all()
-
-    moves_counter = get_moves_by_winner(player_wins, 'Human')
+    if hand_stats is not None:
+        hand_stats.catch_up(db)
+        moves_counter = hand_stats.moves_counter('Human')
+    elif analytics.get_analytics() is not None:
+        moves_counter = analytics.get_analytics().moves_by_winner('Human')
+        moves_counter.update(archive.archive_totals().hands.get('Human', {}))
+    else:
+        player_wins = db.query(models.Game).options(selectinload(models.Game.moves)).filter(models.Game.winner == 'Human').all()
+        moves_counter = get_moves_by_winner(player_wins, 'Human')
+        moves_counter.update(archive.archive_totals().hands.get('Human', {}))
 
     strong_hand, win_percentage = get_hand_info(moves_counter)
 
@@ -107,18 +374,26 @@ def get_strong_hand(db: Session) -> schemas.StrongHandInfo:
     )
 
 
-def get_weak_hand(db: Session) -> schemas.WeakHandInfo:
+def get_weak_hand(db: Session, hand_stats: Optional[HandStats] = None) -> schemas.WeakHandInfo:
     """Retrieves information about the hand that has resulted in the most losses for the human player.
 
     Args:
         db (Session): Database session to interact with the database.
+        hand_stats (HandStats, optional): Statistics kept in memory, see `get_strong_hand`. Defaults to None.
 
     Returns:
         schemas.WeakHandInfo: An object containing the weakest hand and its loss percentage.
     """
-    human_losses = db.query(models.Game).filter(models.Game.winner == 'Machine').all()
-
-    moves_counter = get_moves_by_winner(human_losses, 'Machine')
+    if hand_stats is not None:
+        hand_stats.catch_up(db)
+        moves_counter = hand_stats.moves_counter('Machine')
+    elif analytics.get_analytics() is not None:
+        moves_counter = analytics.get_analytics().moves_by_winner('Machine')
+        moves_counter.update(archive.archive_totals().hands.get('Machine', {}))
+    else:
+        human_losses = db.query(models.Game).options(selectinload(models.Game.moves)).filter(models.Game.winner == 'Machine').all()
+        moves_counter = get_moves_by_winner(human_losses, 'Machine')
+        moves_counter.update(archive.archive_totals().hands.get('Machine', {}))
 
     weak_hand, loss_percentage = get_hand_info(moves_counter)
 
@@ -128,6 +403,190 @@ def get_weak_hand(db: Session) -> schemas.WeakHandInfo:
     )
 
 
+def get_hands_by_winner(db: Session, winners: List[str], archived: bool = True) -> dict:
+    """Counts, in a single query, the moves of player 1 in the rounds won by each winner in the games it won.
+
+    The result is the one of `get_moves_by_winner` for each winner, plus the archived games.
+
+    Args:
+        db (Session): Database session to interact with the database.
+        winners (List[str]): The winners whose moves are counted.
+        archived (bool): Whether to add the moves of the archived games. Defaults to True.
+
+    Returns:
+        dict: A Counter of the moves, by winner.
+    """
+    hands = {winner: Counter() for winner in winners}
+    duckdb_analytics = analytics.get_analytics()
+    if duckdb_analytics is not None:
+        for winner in winners:
+            hands[winner] = duckdb_analytics.moves_by_winner(winner)
+    else:
+        rows = db.query(models.Game.winner, models.Move.player_1_move, func.count()) \
+            .join(models.Move, and_(models.Move.game_id == models.Game.id, models.Move.winner == models.Game.winner)) \
+            .filter(models.Game.winner.in_(winners)) \
+            .group_by(models.Game.winner, models.Move.player_1_move) \
+            .all()
+        for winner, player_1_move, total in rows:
+            hands[winner][player_1_move] += total
+
+    if archived:
+        archived_hands = archive.archive_totals().hands
+        for winner in winners:
+            hands[winner].update(archived_hands.get(winner, {}))
+    return hands
+
+
+def get_dashboard(db: Session, hand_stats: Optional[HandStats] = None, limit: int = 3,
+                  outcomes: Optional[List[rollups.OutcomeCount]] = None, hands: Optional[dict] = None) -> schemas.Dashboard:
+    """Retrieves every statistic of the dashboard: global information, statistics, ranking and hands.
+
+    The games are counted once, by player and winner, and all the figures are derived from those
+    counts, so they are the ones of the separate routes over all time. The queries run in the
+    transaction of `db` and see the same snapshot of the database.
+
+    Args:
+        db (Session): Database session to interact with the database.
+        hand_stats (HandStats, optional): Statistics kept in memory, see `get_strong_hand`. Defaults to None,
+            which counts the hands with one more query.
+        limit (int): Maximum number of players of the ranking.
+        outcomes (List[rollups.OutcomeCount], optional): The games already counted, see `get_global_info`.
+        hands (dict, optional): The hands of Human and Machine already counted, as returned by
+            `get_hands_by_winner`.
+
+    Returns:
+        schemas.Dashboard: All the statistics.
+    """
+    victories = Counter()
+    total_abandonments = 0
+    if outcomes is None:
+        outcomes = rollups.get_outcome_counts(db)
+    for outcome in outcomes:
+        victories[outcome.winner] += outcome.total_games
+        if outcome.winner == 'Machine':
+            total_abandonments += outcome.total_abandonments
+    total_games = sum(victories.values())
+    total_wins = victories['Human']
+
+    if hands is None and hand_stats is not None:
+        hand_stats.catch_up(db)
+        hands = {winner: hand_stats.moves_counter(winner) for winner in ('Human', 'Machine')}
+    elif hands is None:
+        hands = get_hands_by_winner(db, ['Human', 'Machine'])
+    strong_hand, win_percentage = get_hand_info(hands['Human'])
+    weak_hand, loss_percentage = get_hand_info(hands['Machine'])
+
+    ranking = sorted(victories.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+    return schemas.Dashboard(
+        global_info=schemas.GlobalInfo(
+            total_games=total_games,
+            total_wins=total_wins,
+            total_losses=victories['Machine'],
+            winrate_percentage=(total_wins / total_games * 100) if total_games > 0 else 0
+        ),
+        statistics=schemas.Statistics(
+            total_games=total_games,
+            total_wins=total_wins,
+            total_abandonments=total_abandonments
+        ),
+        ranking=[schemas.PlayerInfo(name=player, points=wins) for player, wins in ranking],
+        strong_hand=schemas.StrongHandInfo(strong_hand=strong_hand, win_percentage=win_percentage),
+        weak_hand=schemas.WeakHandInfo(weak_hand=weak_hand, loss_percentage=loss_percentage)
+    )
+
+
+def get_transitions(db: Session, player: Optional[str] = None,
+                    counts: Optional[sequences.SequenceCounts] = None) -> schemas.Transitions:
+    """Retrieves how often player 1 follows each of its moves with each move in the next round of a game.
+
+    Args:
+        db (Session): Database session to interact with the database.
+        player (str, optional): Only count the games started by this player.
+        counts (sequences.SequenceCounts, optional): The rounds already counted, e.g. merged over
+            the shards. Defaults to those of `sequences.get_sequences`.
+
+    Returns:
+        schemas.Transitions: Number of times each move (second key) followed each move (first key),
+        and the percentage of rounds where player 1 repeated its previous move.
+    """
+    if counts is None:
+        counts = sequences.get_sequences(db)
+    transitions = counts.transitions(player)
+    total_transitions = sum(transitions.values())
+    repeats = sum(total for (previous_move, move), total in transitions.items() if previous_move == move)
+
+    matrix = {}
+    for (previous_move, move), total in sorted(transitions.items()):
+        matrix.setdefault(previous_move, {})[move] = total
+
+    return schemas.Transitions(
+        total_transitions=total_transitions,
+        repeat_percentage=(repeats / total_transitions * 100) if total_transitions > 0 else 0,
+        transitions=matrix
+    )
+
+
+def get_round_statistics(db: Session, player: Optional[str] = None,
+                         counts: Optional[sequences.SequenceCounts] = None) -> schemas.RoundStatistics:
+    """Retrieves the percentage of rounds won by player 1 and tied, overall and by position in the game.
+
+    Args:
+        db (Session): Database session to interact with the database.
+        player (str, optional): Only count the games started by this player.
+        counts (sequences.SequenceCounts, optional): The rounds already counted, see `get_transitions`.
+
+    Returns:
+        schemas.RoundStatistics: The statistics of all the rounds, then of the first, second and third rounds.
+    """
+    if counts is None:
+        counts = sequences.get_sequences(db)
+    by_round = counts.by_round(player)
+    total_rounds = sum(rounds for rounds, wins, ties in by_round.values())
+    total_wins = sum(wins for rounds, wins, ties in by_round.values())
+    total_ties = sum(ties for rounds, wins, ties in by_round.values())
+
+    return schemas.RoundStatistics(
+        total_rounds=total_rounds,
+        win_percentage=(total_wins / total_rounds * 100) if total_rounds > 0 else 0,
+        tie_percentage=(total_ties / total_rounds * 100) if total_rounds > 0 else 0,
+        rounds=[
+            schemas.RoundInfo(round_number=round_number, total_rounds=rounds,
+                              win_percentage=wins / rounds * 100, tie_percentage=ties / rounds * 100)
+            for round_number, (rounds, wins, ties) in by_round.items()
+        ]
+    )
+
+
+def get_prediction(db: Session, predictor: Predictor, player: str = 'Human',
+                   recent_moves: Optional[List[str]] = None) -> schemas.Prediction:
+    """Predicts the next move of a player with its model and chooses the counter move of the machine.
+
+    Args:
+        db (Session): Database session, to build the model or read the games recorded since it was last used.
+        predictor (Predictor): Models of the players kept in memory.
+        player (str): The player, player 1 of its games. Defaults to Human.
+        recent_moves (List[str], optional): The last moves of the player, oldest first. Defaults to
+            the last moves of its recorded games.
+
+    Returns:
+        schemas.Prediction: The predicted move, the counter move, the probability of the predicted
+        move after the context of recent moves used, and the number of moves of the player.
+    """
+    model = predictor.model(db, player)
+    predicted_move, counter_move, probability, context = model.predict(
+        tuple(recent_moves) if recent_moves else None)
+
+    return schemas.Prediction(
+        player=player,
+        predicted_move=predicted_move,
+        counter_move=counter_move,
+        probability_percentage=probability * 100,
+        context=list(context),
+        total_moves=sum(model.counts.get((), ()))
+    )
+
+
 def get_moves_by_winner(player_wins, player: str) -> Counter:
     """Counts the moves made by the player in the won games.
 
@@ -189,23 +648,33 @@ def get_hand_info(moves_counter: Counter) -> tuple:
     return hand, percentage
 
 
-def get_ranking(db: Session, limit: int = 3) -> list[schemas.PlayerInfo]:
+def get_ranking(db: Session, limit: int = 3, window: Optional[timedelta] = None,
+                player: Optional[str] = None, outcomes: Optional[List[rollups.OutcomeCount]] = None) -> list[schemas.PlayerInfo]:
     """Retrieves the ranking of the 3 best players based on the number of victories.
 
     Args:
         db (Session): Database session to interact with the database.
         limit (int): Maximum number of players to retrieve from the ranking.
+        window (timedelta, optional): Only count the games of this last period. Defaults to all time.
+        player (str, optional): Only count the games of this player. Defaults to all players.
+        outcomes (List[rollups.OutcomeCount], optional): The games already counted, see `get_global_info`.
 
     Returns:
         list: A list of PlayerInfo schemas containing player names and their victory counts.
     """
     victories = Counter()
-    
-    games = db.query(models.Game).all()
-    
-    for game in games:
-        winner = game.winner
-        victories[winner] += 1
+
+    if outcomes is None and (window is not None or player is not None or analytics.get_analytics() is not None):
+        outcomes = rollups.get_outcome_counts(db, window, player)
+    if outcomes is not None:
+        for outcome in outcomes:
+            victories[outcome.winner] += outcome.total_games
+    else:
+        for winner, total_games in db.execute(WINS_BY_WINNER):
+            victories[winner] += total_games
+
+        for (game_player, winner), total_games in archive.archive_totals().outcomes.items():
+            victories[winner] += total_games
 
     ranking = sorted(victories.items(), key=lambda item: item[1], reverse=True)[:limit]
 
@@ -216,18 +685,30 @@ def get_ranking(db: Session, limit: int = 3) -> list[schemas.PlayerInfo]:
     return players
 
 
-def get_statistics(db: Session) -> dict:
+def get_statistics(db: Session, window: Optional[timedelta] = None, player: Optional[str] = None,
+                   outcomes: Optional[List[rollups.OutcomeCount]] = None) -> dict:
     """Retrieves statistics about the games played, won, and those abandoned.
 
     Args:
         db (Session): Database session to interact with the database.
+        window (timedelta, optional): Only count the games of this last period. Defaults to all time.
+        player (str, optional): Only count the games of this player. Defaults to all players,
+            with the wins and abandonments of the human player.
+        outcomes (List[rollups.OutcomeCount], optional): The games already counted, see `get_global_info`.
 
     Returns:
         dict: A dictionary containing total games, total wins, and total abandonments.
     """
-    total_games = db.query(models.Game).count()
-    total_wins = db.query(models.Game).filter(models.Game.winner == 'Human').count()
-    total_abandonments = db.query(models.Game).filter(models.Game.winner == 'Machine', models.Game.total_rounds < 3).count()
+    if outcomes is None and (window is not None or player is not None or analytics.get_analytics() is not None):
+        outcomes = rollups.get_outcome_counts(db, window, player)
+    if outcomes is not None:
+        total_games, total_wins, _, total_abandonments = count_outcomes(outcomes, player)
+    else:
+        archived = archive.archive_totals()
+        games, wins, losses, abandonments = db.execute(GAME_COUNTS, {"winner": 'Human', "loser": 'Machine'}).one()
+        total_games = games + archived.games
+        total_wins = wins + archived.wins('Human')
+        total_abandonments = abandonments + archived.abandonments_won_by('Machine')
 
     return {
         "total_games": total_games,
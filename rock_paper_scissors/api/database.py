@@ -1,6 +1,15 @@
 from dotenv import load_dotenv
+import asyncio
+from datetime import datetime
 import os
-from sqlalchemy import create_engine
+import sqlite3
+import time
+from types import SimpleNamespace
+from typing import Optional
+from urllib.parse import quote
+from sqlalchemy import MetaData, and_, case, create_engine, event, inspect, or_, select, text, update
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.schema import CreateTable
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.orm import sessionmaker
 
@@ -10,14 +19,414 @@ load_dotenv()
 
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Milliseconds a connection waits for the SQLite write lock held by another process.
+SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000"))
+
+# Where the statistics (GET) routes read from: "readonly" opens the database file read-only,
+# "snapshot" reads a copy refreshed every READ_SNAPSHOT_INTERVAL seconds and "primary"
+# shares the engine of the writes.
+READ_ENGINE = os.getenv("READ_ENGINE", "readonly")
+READ_SNAPSHOT_INTERVAL = float(os.getenv("READ_SNAPSHOT_INTERVAL", "30"))
+
+# auto_vacuum mode of the new SQLite databases. With "incremental" the free pages left by deleted
+# games are returned to the file system a few at a time by `maintenance`; an existing database
+# keeps its mode until `python -m rock_paper_scissors.api.maintenance --vacuum`.
+SQLITE_AUTO_VACUUM = os.getenv("SQLITE_AUTO_VACUUM", "incremental")
+
+
+def create_db_engine(database_url: str, read_only: bool = False, **kwargs) -> Engine:
+    """Creates an SQLAlchemy engine, tuned for concurrent access when the database is SQLite.
+
+    For SQLite the connections are opened in WAL mode (readers never block the writer) with
+    `synchronous=NORMAL`, and pysqlite's implicit transaction handling is replaced by explicit
+    `BEGIN` statements. Engines or connections with the execution option
+    `sqlite_begin="IMMEDIATE"` take the write lock when the transaction starts, so a writer
+    waits in the busy handler instead of failing when it upgrades a read lock.
+
+    Args:
+        database_url (str): SQLAlchemy URL of the database.
+        read_only (bool): If True, the SQLite connections refuse writes (`PRAGMA query_only`)
+            and do not change the journal mode. Defaults to False.
+        **kwargs: Extra arguments for `sqlalchemy.create_engine`.
+
+    Returns:
+        Engine: The new engine. No connection is opened until it is used.
+    """
+    if not database_url.startswith("sqlite"):
+        return create_engine(database_url, **kwargs)
+
+    connect_args = {"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT / 1000}
+    connect_args.update(kwargs.pop("connect_args", {}))
+    db_engine = create_engine(database_url, connect_args=connect_args, **kwargs)
+
+    @event.listens_for(db_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        # Lets SQLAlchemy emit BEGIN itself, see `_on_begin`.
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        else:
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+    @event.listens_for(db_engine, "begin")
+    def _on_begin(connection):
+        mode = connection.get_execution_options().get("sqlite_begin", "DEFERRED")
+        connection.exec_driver_sql(f"BEGIN {mode}")
+
+    return db_engine
+
+
+def sqlite_file_path(database_url: str) -> Optional[str]:
+    """Returns the path of the file of an SQLite database URL.
+
+    Args:
+        database_url (str): SQLAlchemy URL of the database.
+
+    Returns:
+        Optional[str]: The path of the file, or None if the database is not an SQLite file.
+
+    Examples:
+        >>> sqlite_file_path("sqlite:///./rock_paper_scissors.db")
+        './rock_paper_scissors.db'
+        >>> sqlite_file_path("sqlite:///:memory:") is None
+        True
+    """
+    url = make_url(database_url)
+    if url.get_backend_name() != "sqlite" or url.database in (None, "", ":memory:") or "uri" in url.query:
+        return None
+    return url.database
+
+
+def read_only_url(path: str) -> str:
+    """Builds the SQLAlchemy URL that opens an SQLite file in read-only mode.
+
+    Args:
+        path (str): Path of the SQLite file.
+
+    Returns:
+        str: URL of the file opened with `mode=ro`.
+
+    Examples:
+        >>> read_only_url("/data/rock_paper_scissors.db")
+        'sqlite:///file:/data/rock_paper_scissors.db?mode=ro&uri=true'
+    """
+    return f"sqlite:///file:{quote(os.path.abspath(path))}?mode=ro&uri=true"
+
+
+def snapshot_path(path: str) -> str:
+    """Returns the path of the read snapshot of an SQLite file."""
+    return f"{path}.snapshot"
+
+
+def create_read_engine(database_url: str, mode: str = READ_ENGINE) -> Engine:
+    """Creates the engine used by the routes that only read.
+
+    Args:
+        database_url (str): SQLAlchemy URL of the main database.
+        mode (str): "readonly", "snapshot" or "primary", see `READ_ENGINE`.
+
+    Returns:
+        Engine: A read-only engine, or the main engine when the mode is "primary" or the
+        database is not an SQLite file.
+    """
+    path = sqlite_file_path(database_url)
+    if mode == "primary" or path is None:
+        return engine
+    if mode == "snapshot":
+        path = snapshot_path(path)
+    return create_db_engine(read_only_url(path), read_only=True)
+
+
+def refresh_read_snapshot(max_age: float = 0):
+    """Copies the main SQLite database to its read snapshot with the SQLite backup API.
+
+    The copy is written next to the snapshot and then moved over it, so readers always
+    find a complete file. The pooled connections of the read engine are discarded so the
+    next requests open the new copy.
+
+    Args:
+        max_age (float): Seconds during which an existing snapshot is still valid. With several
+            workers, the first one refreshes the copy and the others only reopen it. Defaults to 0.
+    """
+    path = sqlite_file_path(SQLALCHEMY_DATABASE_URL)
+    target_path = snapshot_path(path)
+    temporary_path = f"{target_path}.{os.getpid()}.tmp"
+
+    if os.path.exists(target_path) and time.time() - os.path.getmtime(target_path) < max_age:
+        read_engine.dispose()
+        return
+
+    source = sqlite3.connect(path)
+    target = sqlite3.connect(temporary_path)
+    try:
+        source.backup(target)
+        # The snapshot is only read: without WAL it can be opened read-only on its own.
+        target.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        target.close()
+        source.close()
+
+    os.replace(temporary_path, target_path)
+    read_engine.dispose()
+
+
+async def refresh_read_snapshot_periodically():
+    """Refreshes the read snapshot every `READ_SNAPSHOT_INTERVAL` seconds until cancelled."""
+    while True:
+        await asyncio.sleep(READ_SNAPSHOT_INTERVAL)
+        await asyncio.to_thread(refresh_read_snapshot, READ_SNAPSHOT_INTERVAL / 2)
+
+
 # Creates the conexion to DB.
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, 
-    connect_args={"check_same_thread": False}
-)
+engine = create_db_engine(SQLALCHEMY_DATABASE_URL)
+
+# Engine for the statistics: reads do not take connections or locks from the writes.
+read_engine = create_read_engine(SQLALCHEMY_DATABASE_URL)
+
+# Forked workers (e.g. gunicorn --preload) must not share the parent's pooled connections:
+# each process starts with an empty pool and opens its own connections.
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=lambda: engine.dispose(close=False))
+    os.register_at_fork(after_in_child=lambda: read_engine.dispose(close=False))
 
 # Creates the session of database
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Session for the routes that only read.
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+# Session for the write path: takes the write lock up front and does not expire the
+# objects on commit, so building the response does not reopen a transaction.
+WriteSessionLocal = sessionmaker(
+    autocommit=False,
+    autoflush=False,
+    expire_on_commit=False,
+    bind=engine.execution_options(sqlite_begin="IMMEDIATE")
+)
+
+# Serializes the writers of this process: requests queue on the event loop instead of
+# spinning in SQLite's busy handler. Writers of other processes wait in the busy timeout.
+# It is the lock of the first shard; the other shards have one each, see `shards.write_locks`.
+write_lock = asyncio.Lock()
+
 # Base class for SQLAlchemy models.
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
+
+
+def init_db(db_engine: Engine = None):
+    """Creates the tables, columns and indexes that do not exist yet.
+
+    The check and the creation run in a single `BEGIN IMMEDIATE` transaction, so several
+    workers starting at the same time do not race: the others wait for the first one and
+    then find the tables already created. The tables created before their ids were
+    AUTOINCREMENT are rebuilt, see `add_autoincrement`.
+
+    Args:
+        db_engine (Engine, optional): Engine of the database. Defaults to the application engine.
+    """
+    # The models must be imported so that they are registered in the metadata.
+    from rock_paper_scissors.api import models
+
+    db_engine = db_engine or engine
+    if db_engine.dialect.name == "sqlite" and SQLITE_AUTO_VACUUM:
+        set_auto_vacuum(db_engine, only_if_empty=True)
+
+    with db_engine.connect().execution_options(sqlite_begin="IMMEDIATE") as connection:
+        with connection.begin():
+            models.Base.metadata.create_all(bind=connection)
+            # create_all skips the tables that already exist, even if they lack a newer column or index.
+            add_missing_columns(connection, models.Base.metadata)
+            if db_engine.dialect.name == "sqlite":
+                rebuilt = add_autoincrement(connection, models.Base.metadata)
+                if "games" in rebuilt and db_engine is engine:
+                    # The archive holds games of this database only: their ids must not be given again.
+                    from rock_paper_scissors.api import archive
+                    segments = archive.archive_totals().segments
+                    if segments:
+                        raise_sequence(connection, "games", max(segment.last_id for segment in segments))
+            for table in models.Base.metadata.sorted_tables:
+                for index in table.indexes:
+                    index.create(bind=connection, checkfirst=True)
+            backfill_games(connection)
+
+
+def set_auto_vacuum(db_engine: Engine, mode: str = SQLITE_AUTO_VACUUM, only_if_empty: bool = False) -> bool:
+    """Sets the auto_vacuum mode of an SQLite database, which only takes effect after a VACUUM.
+
+    In WAL mode the mode cannot be set before the file exists, so the database is vacuumed right
+    after. That rewrites the whole file and takes the write lock while it runs.
+
+    Args:
+        db_engine (Engine): Engine of the database.
+        mode (str): "none", "full" or "incremental". Defaults to `SQLITE_AUTO_VACUUM`.
+        only_if_empty (bool): If True, databases that already have tables are not changed.
+
+    Returns:
+        bool: True if the database was vacuumed with the new mode.
+    """
+    modes = {"none": 0, "full": 1, "incremental": 2}
+    raw_connection = db_engine.raw_connection()
+    try:
+        cursor = raw_connection.cursor()
+        if only_if_empty and cursor.execute("SELECT count(*) FROM sqlite_master").fetchone()[0]:
+            return False
+        if cursor.execute("PRAGMA auto_vacuum").fetchone()[0] == modes[mode]:
+            return False
+        cursor.execute(f"PRAGMA auto_vacuum={mode}")
+        cursor.execute("VACUUM")
+        return True
+    finally:
+        raw_connection.close()
+
+
+def add_missing_columns(connection, metadata):
+    """Adds to the existing tables the columns of the models that they do not have yet.
+
+    The new columns are nullable and have no server default, so the existing rows keep NULL
+    until `backfill_games` fills them.
+
+    Args:
+        connection (Connection): Connection with an open transaction.
+        metadata (MetaData): Metadata of the models.
+    """
+    inspector = inspect(connection)
+    for table in metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=connection.dialect)
+                connection.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}')
+
+
+def add_autoincrement(connection, metadata) -> list:
+    """Rebuilds the SQLite tables whose model has AUTOINCREMENT ids but which were created without.
+
+    Without AUTOINCREMENT, SQLite gives a new row the highest id plus one, so the ids of the
+    newest games are given again once they are deleted, e.g. archived. A table cannot be altered
+    into AUTOINCREMENT: it is created again under a temporary name, without its indexes, the rows
+    are copied, and it replaces the old table. The indexes are then created by `init_db`.
+
+    The foreign keys of the moves are not enforced by the connections of the application, so
+    dropping the old games table does not touch the moves.
+
+    Args:
+        connection (Connection): Connection with an open write transaction.
+        metadata (MetaData): Metadata of the models.
+
+    Returns:
+        list: Names of the tables rebuilt.
+    """
+    # A copy of every table, for the foreign keys of the rebuilt tables to find the tables they point to.
+    scratch = MetaData()
+    for table in metadata.sorted_tables:
+        table.to_metadata(scratch)
+
+    rebuilt = []
+    for table in metadata.sorted_tables:
+        if not table.dialect_options["sqlite"]["autoincrement"]:
+            continue
+        sql = connection.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                                 {"name": table.name}).scalar()
+        if sql is None or "AUTOINCREMENT" in sql.upper():
+            continue
+
+        new_name = f"_{table.name}_new"
+        connection.execute(CreateTable(table.to_metadata(scratch, name=new_name)))
+        columns = ", ".join(column.name for column in table.columns)
+        connection.exec_driver_sql(f"INSERT INTO {new_name} ({columns}) SELECT {columns} FROM {table.name}")
+        connection.exec_driver_sql(f"DROP TABLE {table.name}")
+        connection.exec_driver_sql(f"ALTER TABLE {new_name} RENAME TO {table.name}")
+        rebuilt.append(table.name)
+    return rebuilt
+
+
+def raise_sequence(connection, table_name: str, last_id: int):
+    """Makes sure that the next AUTOINCREMENT id of an SQLite table is after `last_id`.
+
+    Args:
+        connection (Connection): Connection with an open write transaction.
+        table_name (str): Name of a table with AUTOINCREMENT ids.
+        last_id (int): Id that must not be given again.
+    """
+    updated = connection.execute(text("UPDATE sqlite_sequence SET seq = max(seq, :last_id) WHERE name = :name"),
+                                 {"name": table_name, "last_id": last_id}).rowcount
+    if not updated:
+        connection.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :last_id)"),
+                           {"name": table_name, "last_id": last_id})
+
+
+def backfill_games(connection, now: Optional[datetime] = None, batch_size: int = 10000) -> int:
+    """Fills the player and the creation time of the games recorded before those columns existed.
+
+    The player is deduced from the winner with `crud.get_player`, and the creation time is the
+    time of the migration, so the games are counted by `?player=`, the rollups and the sequences,
+    and the archive does not take them for the oldest games. The games are then added to the
+    rollups, which did not count them. Nothing is read when every game has both columns.
+
+    Args:
+        connection (Connection): Connection with an open write transaction.
+        now (datetime, optional): UTC time given to the games without one. Defaults to the current time.
+        batch_size (int): Games filled per statement.
+
+    Returns:
+        int: Number of games filled.
+    """
+    from rock_paper_scissors.api import crud, models, rollups
+
+    games = models.Game.__table__
+    missing = or_(games.c.player.is_(None), games.c.created_at.is_(None))
+    now = now or models.utcnow()
+    filled = 0
+    while True:
+        rows = connection.execute(
+            select(games.c.id, games.c.total_rounds, games.c.winner, games.c.player, games.c.created_at)
+            .where(missing).order_by(games.c.id).limit(batch_size)
+        ).all()
+        if not rows:
+            return filled
+
+        # The games with a creation time are already in the rollups.
+        rollups.record_games(connection, [
+            SimpleNamespace(total_rounds=row.total_rounds, winner=row.winner,
+                            player=row.player or crud.get_player(row.winner), created_at=now)
+            for row in rows if row.created_at is None
+        ])
+        in_batch = and_(games.c.id >= rows[0].id, games.c.id <= rows[-1].id)
+        connection.execute(update(games).where(in_batch, games.c.created_at.is_(None)).values(created_at=now))
+        connection.execute(update(games).where(in_batch, games.c.player.is_(None)).values(
+            player=case(dict(zip(crud.PLAYER_2, crud.PLAYER_1)), value=games.c.winner, else_=games.c.winner)))
+        filled += len(rows)
+
+
+# Dependency
+def get_db():
+    """Dependency that provides a database session.
+
+    This function uses `SessionLocal()` to create a new database session.
+    It ensures that the session is properly closed after use.
+
+    Yields:
+        SessionLocal: A new database session.
+    """
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_read_db():
+    """Dependency that provides a read-only database session for the statistics routes.
+
+    Yields:
+        ReadSessionLocal: A new database session bound to `read_engine`.
+    """
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
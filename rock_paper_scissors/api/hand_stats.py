@@ -0,0 +1,269 @@
+import asyncio
+from array import array
+from collections import Counter
+import json
+import os
+import threading
+from typing import List, Optional
+from sqlalchemy import and_, func, select
+from sqlalchemy.orm import Session
+
+from rock_paper_scissors.api import archive, models
+from rock_paper_scissors.api.database import SQLALCHEMY_DATABASE_URL, SessionLocal, sqlite_file_path
+from rock_paper_scissors.game_logic import MOVES
+
+# File where the hand statistics are saved, so a restarted worker only reads the newer games.
+# Defaults to a file next to the SQLite database; empty disables the snapshots.
+HAND_STATS_SNAPSHOT = os.getenv("HAND_STATS_SNAPSHOT")
+if HAND_STATS_SNAPSHOT is None:
+    database_path = sqlite_file_path(SQLALCHEMY_DATABASE_URL)
+    HAND_STATS_SNAPSHOT = f"{database_path}.hands.json" if database_path else ""
+HAND_STATS_SNAPSHOT_INTERVAL = float(os.getenv("HAND_STATS_SNAPSHOT_INTERVAL", "60"))
+
+MOVE_INDEXES = {move: index for index, move in enumerate(MOVES)}
+
+# Highest id of the games, looked up on every catch up. Built once, as the statements of `crud`.
+MAX_GAME_ID = select(func.max(models.Game.__table__.c.id))
+# The same, with the number of quarantined games, to notice the games removed by the integrity scan.
+CATCH_UP_STATE = select(
+    func.max(models.Game.__table__.c.id),
+    select(func.count()).select_from(models.QuarantinedGame.__table__).scalar_subquery()
+)
+
+
+class HandStats:
+    """Moves of the rounds won by each player in the games they won, kept up to date in memory.
+
+    These are the counts that `crud.get_moves_by_winner` builds from the games on every request.
+    For each winner there is an array with one counter per move of `MOVES`; moves outside `MOVES`,
+    which only old games may have, are kept apart in a Counter. The games are applied in id order
+    and `last_game_id` is the last one applied, so the statistics catch up with the games added by
+    other workers by reading only the games after it. Games moved to the archive are added from
+    the new segments, see `sync_archive`. Games removed by the integrity scan, which runs in
+    another process, are noticed by the number of quarantined games: when it changes, the
+    statistics are rebuilt.
+
+    Attributes:
+        counts (dict): Array of counters of the moves of player 1, by winner.
+        other_moves (dict): Counter of the moves outside `MOVES`, by winner.
+        last_game_id (int): Id of the last game applied.
+        archived_segments (set): Names of the segments of the archive already taken into account.
+        quarantined (int): Number of quarantined games when the statistics were checked against the
+            database, or None before the first check.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self, quarantined: Optional[int] = None):
+        """Forgets every game applied, so the next `catch_up` reads them all again."""
+        self.counts = {}
+        self.other_moves = {}
+        self.last_game_id = 0
+        self.archived_segments = set()
+        self.quarantined = quarantined
+
+    def moves_counter(self, winner: str) -> Counter:
+        """Returns the moves of player 1 in the rounds won by `winner` in the games it won.
+
+        Examples:
+            >>> stats = HandStats()
+            >>> stats.apply_games([{"id": 1, "game_winner": "Human", "rounds_played": [
+            ...     {"player_1_move": "rock", "player_2_move": "scissors", "winner": "Human"},
+            ...     {"player_1_move": "rock", "player_2_move": "paper", "winner": "Machine"}]}])
+            >>> stats.moves_counter("Human")
+            Counter({'rock': 1})
+        """
+        with self.lock:
+            counts = self.counts.get(winner)
+            counter = Counter({move: count for move, count in zip(MOVES, counts or ()) if count})
+            counter.update(self.other_moves.get(winner, {}))
+        return counter
+
+    def _add(self, winner: str, player_1_move: str, count: int = 1):
+        index = MOVE_INDEXES.get(player_1_move)
+        if index is None:
+            self.other_moves.setdefault(winner, Counter())[player_1_move] += count
+        else:
+            counts = self.counts.get(winner)
+            if counts is None:
+                counts = self.counts[winner] = array("q", bytes(8 * len(MOVES)))
+            counts[index] += count
+
+    def apply_games(self, games: List[dict]):
+        """Applies games just recorded by this process, as returned by `crud.create_games`.
+
+        Games are only applied right after `last_game_id`: if another worker recorded games
+        in between, they are left to `catch_up`, which reads them all from the database.
+
+        Args:
+            games (List[dict]): The recorded games, with their ids.
+        """
+        with self.lock:
+            for game in sorted(games, key=lambda game: game["id"]):
+                if game["id"] != self.last_game_id + 1:
+                    return
+                winner = game["game_winner"]
+                for round_info in game["rounds_played"]:
+                    if round_info["winner"] == winner:
+                        self._add(winner, round_info["player_1_move"])
+                self.last_game_id = game["id"]
+
+    def catch_up(self, db: Session, chunk_size: int = 50000):
+        """Applies the stored games after `last_game_id`, in chunks of ids.
+
+        When no game is missing this is a single query, of the highest id in the primary key index
+        and of the number of quarantined games. If games were quarantined since the last check,
+        the statistics are rebuilt from all the games.
+
+        Args:
+            db (Session): Database session to read the games from.
+            chunk_size (int): Range of game ids read per query. Defaults to 50000.
+        """
+        max_id, quarantined = db.execute(CATCH_UP_STATE).one()
+        max_id = max_id or 0
+        with self.lock:
+            if self.quarantined is None:
+                self.quarantined = quarantined
+            elif self.quarantined != quarantined:
+                self.reset(quarantined)
+
+        self.sync_archive(archive.archive_totals())
+
+        start = self.last_game_id
+        while start < max_id:
+            end = min(start + chunk_size, max_id)
+            rows = db.query(models.Game.winner, models.Move.player_1_move) \
+                .join(models.Move, and_(models.Move.game_id == models.Game.id, models.Move.winner == models.Game.winner)) \
+                .filter(models.Game.id > start, models.Game.id <= end) \
+                .all()
+
+            with self.lock:
+                # Another thread may have applied these games meanwhile.
+                if self.last_game_id == start:
+                    for winner, player_1_move in rows:
+                        self._add(winner, player_1_move)
+                    self.last_game_id = end
+            start = self.last_game_id
+
+    def sync_archive(self, totals: archive.ArchiveTotals):
+        """Adds the games of the new segments of the archive that were not applied yet.
+
+        The games of a segment with ids up to `last_game_id` were applied while they were in the
+        database: the archiver only takes games older than `archive.MIN_ARCHIVE_AGE`, and every
+        worker catches up more often than that. The other games are added from the aggregates of
+        the segment or, if it has games on both sides of `last_game_id`, from its games.
+
+        Args:
+            totals (archive.ArchiveTotals): The segments of the archive.
+        """
+        # Segments are never removed, so the same number means no new segment.
+        if len(totals.segments) == len(self.archived_segments):
+            return
+
+        with self.lock:
+            for segment in totals.segments:
+                if segment.name in self.archived_segments:
+                    continue
+                if segment.first_id > self.last_game_id:
+                    for winner, moves in segment.hands.items():
+                        for player_1_move, count in moves.items():
+                            self._add(winner, player_1_move, count)
+                elif segment.last_id > self.last_game_id:
+                    for game in archive.iter_archived_games(segments=[segment]):
+                        if game["id"] > self.last_game_id:
+                            winner = game["game_winner"]
+                            for round_info in game["rounds_played"]:
+                                if round_info["winner"] == winner:
+                                    self._add(winner, round_info["player_1_move"])
+                self.archived_segments.add(segment.name)
+
+    def save(self, path: str):
+        """Writes the statistics and the last applied game id to a JSON file.
+
+        The file is written next to `path` and then moved over it, so a reader never finds half a file.
+        """
+        with self.lock:
+            snapshot = {
+                "moves": list(MOVES),
+                "last_game_id": self.last_game_id,
+                "quarantined": self.quarantined,
+                "archived_segments": sorted(self.archived_segments),
+                "counts": {winner: counts.tolist() for winner, counts in self.counts.items()},
+                "other_moves": {winner: dict(counter) for winner, counter in self.other_moves.items()}
+            }
+
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, "w") as snapshot_file:
+            json.dump(snapshot, snapshot_file)
+        os.replace(temporary_path, path)
+
+    def load(self, path: str, db: Session) -> bool:
+        """Replaces the statistics with a snapshot written by `save`, if it matches the database.
+
+        A snapshot is discarded if it was made with other moves, if its last game id is beyond
+        the games of the database and of the archive, e.g. because the database was recreated,
+        or if games were quarantined since it was saved.
+
+        Args:
+            path (str): The snapshot file.
+            db (Session): Database session, to check the snapshot against the games.
+
+        Returns:
+            bool: True if the snapshot was loaded.
+        """
+        try:
+            with open(path) as snapshot_file:
+                snapshot = json.load(snapshot_file)
+        except (OSError, ValueError):
+            return False
+
+        max_id, quarantined = db.execute(CATCH_UP_STATE).one()
+        max_id = max([max_id or 0] + [segment.last_id for segment in archive.archive_totals().segments])
+        if snapshot.get("moves") != list(MOVES) or snapshot["last_game_id"] > max_id \
+                or snapshot.get("quarantined") != quarantined:
+            return False
+
+        with self.lock:
+            self.counts = {winner: array("q", counts) for winner, counts in snapshot["counts"].items()}
+            self.other_moves = {winner: Counter(counter) for winner, counter in snapshot["other_moves"].items()}
+            self.last_game_id = snapshot["last_game_id"]
+            self.archived_segments = set(snapshot.get("archived_segments", []))
+            self.quarantined = quarantined
+        return True
+
+
+def warm_start(db: Session, path: Optional[str] = None):
+    """Loads the snapshot of the hand statistics of the process and reads the newer games.
+
+    Args:
+        db (Session): Database session to read the games from.
+        path (str, optional): The snapshot file. Defaults to `HAND_STATS_SNAPSHOT`.
+    """
+    path = HAND_STATS_SNAPSHOT if path is None else path
+    if path:
+        hand_stats.load(path, db)
+    hand_stats.catch_up(db)
+
+
+async def refresh_periodically(path: Optional[str] = None):
+    """Every `HAND_STATS_SNAPSHOT_INTERVAL` seconds, until cancelled, reads the games recorded by
+    other workers and saves the hand statistics if they changed.
+
+    Args:
+        path (str, optional): The snapshot file. Defaults to `HAND_STATS_SNAPSHOT`; empty only catches up.
+    """
+    path = HAND_STATS_SNAPSHOT if path is None else path
+    saved_game_id = hand_stats.last_game_id
+    while True:
+        await asyncio.sleep(HAND_STATS_SNAPSHOT_INTERVAL)
+        with SessionLocal() as db:
+            await asyncio.to_thread(hand_stats.catch_up, db)
+        if path and hand_stats.last_game_id != saved_game_id:
+            saved_game_id = hand_stats.last_game_id
+            await asyncio.to_thread(hand_stats.save, path)
+
+
+# Hand statistics of the process.
+hand_stats = HandStats()
@@ -0,0 +1,84 @@
+import hashlib
+import math
+import os
+import threading
+from typing import Iterable
+
+# Keys remembered by the recent-keys filter of a process before its oldest half is forgotten.
+IDEMPOTENCY_FILTER_KEYS = int(os.getenv("IDEMPOTENCY_FILTER_KEYS", "100000"))
+# Share of new keys that the filter wrongly reports as seen, which costs a database lookup.
+IDEMPOTENCY_FILTER_ERROR = float(os.getenv("IDEMPOTENCY_FILTER_ERROR", "0.01"))
+
+
+class BloomFilter:
+    """Set of strings that may answer "maybe present" for an absent one, but never the reverse.
+
+    A key sets `hashes` bits of a bit array, derived from a single blake2b digest.
+
+    Examples:
+        >>> keys = BloomFilter(capacity=1000)
+        >>> keys.add("a1b2")
+        >>> "a1b2" in keys, "c3d4" in keys
+        (True, False)
+    """
+
+    def __init__(self, capacity: int, error_rate: float = IDEMPOTENCY_FILTER_ERROR):
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str) -> Iterable[int]:
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, key: str):
+        """Adds a key to the set."""
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class RecentKeys:
+    """Idempotency keys recorded recently by this process, kept in two generations of bloom filters.
+
+    A key absent from both filters has not been recorded by this process lately, so the write
+    path can skip the database lookup. When the current generation is full it becomes the old
+    one and the previous old one is dropped, so memory stays bounded. The filter is only a
+    shortcut: keys recorded by other workers, or forgotten, are still caught by the unique
+    index of `games.idempotency_key`.
+
+    Examples:
+        >>> keys = RecentKeys(capacity=2)
+        >>> keys.update(["a", "b", "c", "d", "e"])
+        >>> keys.might_contain("e"), keys.might_contain("a")
+        (True, False)
+    """
+
+    def __init__(self, capacity: int = IDEMPOTENCY_FILTER_KEYS):
+        self.capacity = capacity
+        self.current = BloomFilter(capacity)
+        self.previous = None
+        self.lock = threading.Lock()
+
+    def might_contain(self, key: str) -> bool:
+        """Returns False if the key was surely not recorded recently by this process."""
+        return key in self.current or (self.previous is not None and key in self.previous)
+
+    def update(self, keys: Iterable[str]):
+        """Remembers recorded keys. Called by the write path, by the writers of several shards at once."""
+        with self.lock:
+            for key in keys:
+                if self.current.count >= self.capacity:
+                    self.previous = self.current
+                    self.current = BloomFilter(self.capacity)
+                self.current.add(key)
+
+
+# Recent keys of the process.
+recent_keys = RecentKeys()
@@ -1,14 +1,69 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+import os
 
-from rock_paper_scissors.api.database import engine
-from rock_paper_scissors.api.routers import game
-from rock_paper_scissors.api import models
+from rock_paper_scissors.api import database, hand_stats, maintenance, shards
+from rock_paper_scissors.api.admission import AdmissionMiddleware
+from rock_paper_scissors.api.compression import CompressionMiddleware
+from rock_paper_scissors.api.database import init_db
+from rock_paper_scissors.api.query_log import QueryLogMiddleware
+from rock_paper_scissors.api.responses import default_response_class
+from rock_paper_scissors.api.routers import admin, game, scoreboard, sessions
+from rock_paper_scissors.utils import setup_logging
 
 #This files initializes the FastAPI app.
 
-models.Base.metadata.create_all(bind=engine)
+# The schema is created at startup, not at import. `python -m rock_paper_scissors.api`
+# creates it once before starting the workers and disables it for them.
+DB_INIT_ON_STARTUP = os.getenv("DB_INIT_ON_STARTUP", "1") == "1"
+# Writes the logs of each worker with `utils.setup_logging`, to the file "api". It is set by
+# `python -m rock_paper_scissors.api`; with uvicorn alone, set API_LOGGING=1.
+API_LOGGING = os.getenv("API_LOGGING", "0") == "1"
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Prepares the resources of a worker before it starts serving requests."""
+    if API_LOGGING:
+        setup_logging("api")
+    if DB_INIT_ON_STARTUP:
+        init_db()
+        shards.init_shards()
+
+    snapshot_task = None
+    if database.READ_ENGINE == "snapshot" and database.read_engine is not database.engine:
+        database.refresh_read_snapshot(max_age=database.READ_SNAPSHOT_INTERVAL)
+        snapshot_task = asyncio.create_task(database.refresh_read_snapshot_periodically())
+
+    # The hand statistics start from their snapshot and only read the newer games.
+    with database.SessionLocal() as db:
+        await asyncio.to_thread(hand_stats.warm_start, db)
+    hand_stats_task = asyncio.create_task(hand_stats.refresh_periodically())
+
+    maintenance_task = None
+    if maintenance.MAINTENANCE_INTERVAL > 0 and database.sqlite_file_path(database.SQLALCHEMY_DATABASE_URL):
+        maintenance_task = asyncio.create_task(maintenance.maintain_periodically())
+
+    yield
+
+    if snapshot_task:
+        snapshot_task.cancel()
+    hand_stats_task.cancel()
+    if maintenance_task:
+        maintenance_task.cancel()
+    if hand_stats.HAND_STATS_SNAPSHOT:
+        hand_stats.hand_stats.save(hand_stats.HAND_STATS_SNAPSHOT)
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=default_response_class())
+app.add_middleware(QueryLogMiddleware)
+app.add_middleware(CompressionMiddleware)
+# Added last, so it is the outermost: rejected requests do no other work.
+app.add_middleware(AdmissionMiddleware)
 
 #Routers
 app.include_router(game.router)
+app.include_router(scoreboard.router)
+app.include_router(sessions.router)
+app.include_router(admin.router)
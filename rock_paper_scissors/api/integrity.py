@@ -0,0 +1,178 @@
+import argparse
+from collections import Counter
+import json
+import sys
+
+from sqlalchemy.orm import Session, sessionmaker
+
+from rock_paper_scissors.api import models, rollups, shards
+from rock_paper_scissors.api.database import SessionLocal, WriteSessionLocal, init_db
+from rock_paper_scissors.api.validation import check_game
+
+# Checks the games stored in the database and reports, or quarantines, the invalid ones. Usage:
+#   python -m rock_paper_scissors.api.integrity --chunk-size 5000 [--quarantine]
+
+
+class IntegrityReport:
+    """Result of an integrity scan.
+
+    Attributes:
+        scanned (int): Number of games checked.
+        invalid (dict): Problems of each invalid game, by game id.
+        quarantined (int): Number of invalid games moved to the quarantine table.
+    """
+
+    def __init__(self):
+        self.scanned = 0
+        self.invalid = {}
+        self.quarantined = 0
+
+    def reasons(self) -> Counter:
+        """Counts the invalid games by problem."""
+        return Counter(reason for errors in self.invalid.values() for reason in errors)
+
+    def update(self, other: "IntegrityReport"):
+        """Adds the games checked in another database, e.g. another shard."""
+        self.scanned += other.scanned
+        self.invalid.update(other.invalid)
+        self.quarantined += other.quarantined
+
+
+def check_stored_game(game, moves: list) -> list:
+    """Returns the problems of a stored game, as `validation.check_game`, plus a wrong `total_rounds`.
+
+    Args:
+        game (Row): The id, player, winner and total rounds of the game.
+        moves (list): Move of player 1, move of player 2 and winner of each round, in order.
+
+    Returns:
+        list: The problems found, empty if the game is valid.
+    """
+    errors = check_game(game.player, game.winner, moves).errors
+    if game.total_rounds != len(moves):
+        errors.append("Wrong total rounds")
+    return errors
+
+
+def scan_games(chunk_size: int = 5000, quarantine: bool = False, session_factory: sessionmaker = None) -> IntegrityReport:
+    """Checks all the stored games, in chunks of consecutive ids.
+
+    Each chunk is read, and its invalid games quarantined, in its own short transaction, so the
+    scan can run while the API is serving: writers only wait for one chunk at a time.
+    Quarantined games are copied to `games_quarantine`, removed from the games, moves and
+    rollup tables, and so no longer counted in the statistics.
+
+    Args:
+        chunk_size (int): Number of games read per transaction. Defaults to 5000.
+        quarantine (bool): If True, the invalid games are quarantined; otherwise they are only reported.
+        session_factory (sessionmaker, optional): Sessions of the database to check. Defaults to
+            the write sessions when quarantining and to the plain sessions otherwise.
+
+    Returns:
+        IntegrityReport: The games checked and the problems found.
+    """
+    session_factory = session_factory or (WriteSessionLocal if quarantine else SessionLocal)
+    report = IntegrityReport()
+    last_id = 0
+
+    while True:
+        with session_factory() as db:
+            games = db.query(models.Game.id, models.Game.player, models.Game.winner,
+                             models.Game.total_rounds, models.Game.created_at) \
+                .filter(models.Game.id > last_id) \
+                .order_by(models.Game.id) \
+                .limit(chunk_size) \
+                .all()
+            if not games:
+                return report
+            last_id = games[-1].id
+
+            moves = {game.id: [] for game in games}
+            rows = db.query(models.Move.game_id, models.Move.player_1_move, models.Move.player_2_move, models.Move.winner) \
+                .filter(models.Move.game_id >= games[0].id, models.Move.game_id <= last_id) \
+                .order_by(models.Move.game_id, models.Move.id) \
+                .all()
+            for game_id, player_1_move, player_2_move, winner in rows:
+                if game_id in moves:
+                    moves[game_id].append((player_1_move, player_2_move, winner))
+
+            invalid = []
+            for game in games:
+                errors = check_stored_game(game, moves[game.id])
+                if errors:
+                    report.invalid[game.id] = errors
+                    invalid.append(game)
+            report.scanned += len(games)
+
+            if quarantine and invalid:
+                quarantine_games(db, invalid, moves, report.invalid)
+                db.commit()
+                report.quarantined += len(invalid)
+
+
+def quarantine_games(db: Session, games: list, moves: dict, reasons: dict):
+    """Moves invalid games to the quarantine table, in the transaction of the session.
+
+    Args:
+        db (Session): Database session, in a write transaction.
+        games (list): The invalid games, with id, player, winner, total rounds and creation time.
+        moves (dict): Moves of each game, by game id.
+        reasons (dict): Problems of each game, by game id.
+    """
+    db.add_all([
+        models.QuarantinedGame(
+            id=game.id,
+            total_rounds=game.total_rounds,
+            winner=game.winner,
+            player=game.player,
+            created_at=game.created_at,
+            moves=json.dumps(moves[game.id]),
+            reasons="; ".join(reasons[game.id])
+        )
+        for game in games
+    ])
+
+    # Games recorded before the rollups existed have no player and are not in them.
+    counted = [game for game in games if game.created_at is not None and game.player is not None]
+    rollups.record_games(db, counted, sign=-1)
+
+    game_ids = [game.id for game in games]
+    db.query(models.Move).filter(models.Move.game_id.in_(game_ids)).delete(synchronize_session=False)
+    db.query(models.Game).filter(models.Game.id.in_(game_ids)).delete(synchronize_session=False)
+
+
+def main():
+    """Scans the database of the application, every shard, and prints the invalid games.
+
+    Exits with status 1 if invalid games were found and not quarantined.
+    """
+    parser = argparse.ArgumentParser(description="Integrity scan of the stored games.")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Games read per transaction")
+    parser.add_argument("--quarantine", action="store_true", help="Move the invalid games to games_quarantine")
+    parser.add_argument("--show", type=int, default=20, help="Invalid games printed")
+    args = parser.parse_args()
+
+    init_db()
+    shards.init_shards()
+    report = IntegrityReport()
+    for shard in shards.shards:
+        if shard.index == 0:
+            session_factory = None
+        elif args.quarantine:
+            session_factory = shard.SessionLocal
+        else:
+            session_factory = sessionmaker(autocommit=False, autoflush=False, bind=shard.engine)
+        report.update(scan_games(chunk_size=args.chunk_size, quarantine=args.quarantine, session_factory=session_factory))
+
+    print(f"Scanned {report.scanned} games: {len(report.invalid)} invalid, {report.quarantined} quarantined.")
+    for reason, count in report.reasons().most_common():
+        print(f"  {reason}: {count}")
+    for game_id, errors in list(report.invalid.items())[:args.show]:
+        print(f"  game {game_id}: {'; '.join(errors)}")
+
+    if len(report.invalid) > report.quarantined:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+import argparse
+from collections import Counter
+from datetime import datetime, timezone
+import json
+import os
+import sys
+import time
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session, sessionmaker
+
+from rock_paper_scissors.api import models, rollups, schemas, shards
+from rock_paper_scissors.api.crud import GameRow, get_player
+from rock_paper_scissors.api.database import WriteSessionLocal, init_db
+from rock_paper_scissors.api.validation import INGEST_VALIDATION, check_games, fix_winners
+
+# Loads a JSON lines file of games, one game per line in the shape of `schemas.GameCreate`
+# (as sent to POST /game or written by `archive export`), straight into the database. Usage:
+#   python -m rock_paper_scissors.api.loader games.jsonl --batch-size 5000 [--defer-indexes]
+#
+# The file is read one batch of lines at a time, so the memory does not grow with its size.
+# Each batch is validated as `POST /game/bulk` validates a payload, but an invalid line only
+# rejects itself, and its games are inserted with one executemany per table in one transaction.
+
+# Indexes that are only used to read the games. With `defer_indexes` they are dropped while
+# the games are loaded and built once at the end. The unique index on the idempotency key is
+# kept: it is used to skip the games already recorded.
+DEFERRABLE_INDEXES = [
+    index for table in (models.Game.__table__, models.Move.__table__) for index in table.indexes if not index.unique
+]
+
+
+class LoadReport:
+    """Result of the load of a file.
+
+    Attributes:
+        first_line (int): Number of the first line read; greater than 1 when a load is resumed.
+        lines (int): Number of lines read.
+        games (int): Number of games recorded.
+        moves (int): Number of moves recorded.
+        replayed (int): Number of games skipped because their idempotency key was already recorded.
+        rejected (dict): Problems of each rejected line, by line number.
+        seconds (float): Duration of the load.
+    """
+
+    def __init__(self, first_line: int = 1):
+        self.first_line = first_line
+        self.lines = 0
+        self.games = 0
+        self.moves = 0
+        self.replayed = 0
+        self.rejected = {}
+        self.seconds = 0.0
+
+    @property
+    def games_per_second(self) -> float:
+        """Games recorded per second."""
+        return self.games / self.seconds if self.seconds else 0.0
+
+    def reasons(self) -> Counter:
+        """Counts the rejected lines by problem."""
+        return Counter(reason for errors in self.rejected.values() for reason in errors)
+
+
+def parse_line(line: bytes) -> Tuple[Optional[schemas.GameCreate], Optional[datetime], List[str]]:
+    """Parses a line of a games file.
+
+    The creation time of the game is taken from its `created_at` field, if it has one.
+
+    Args:
+        line (bytes): The line, a JSON object.
+
+    Returns:
+        tuple: The game, its creation time in UTC and an empty list, or None, None and the problems of the line.
+
+    Examples:
+        >>> game, created_at, errors = parse_line(b'{"rounds_played": [], "game_winner": "Human", '
+        ...                                       b'"created_at": "2024-05-01T13:45:00+02:00"}')
+        >>> game.game_winner, created_at, errors
+        ('Human', datetime.datetime(2024, 5, 1, 11, 45), [])
+        >>> parse_line(b'{"game_winner": "Human"}')[2]
+        ['Invalid game']
+    """
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None, None, ["Invalid JSON"]
+    try:
+        game = schemas.GameCreate(**record)
+        created_at = record.get("created_at")
+        if created_at is not None:
+            created_at = datetime.fromisoformat(created_at)
+            if created_at.tzinfo is not None:
+                created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+    except (TypeError, ValueError):
+        return None, None, ["Invalid game"]
+    return game, created_at, []
+
+
+def record_batch(db: Session, games: List[Tuple[schemas.GameCreate, Optional[datetime]]]) -> Tuple[int, int, int]:
+    """Inserts valid games, and adds them to the rollups, in the transaction of the session.
+
+    The ids of the games are assigned after the highest id given, archived or not, which the write
+    lock of the transaction keeps stable, so the games and their moves are inserted with one
+    executemany each.
+
+    Args:
+        db (Session): Database session, in a write transaction.
+        games (list): The games and their creation times, None for the current time.
+
+    Returns:
+        Tuple[int, int, int]: Games and moves recorded, and games skipped because their
+        idempotency key was already recorded (or used by an earlier game of the batch).
+    """
+    keys = {game.idempotency_key for game, _ in games if game.idempotency_key is not None}
+    recorded = set()
+    if keys:
+        recorded = {key for (key,) in db.query(models.Game.idempotency_key).filter(models.Game.idempotency_key.in_(keys))}
+
+    now = models.utcnow()
+    next_id = (shards.highest_game_id(db) or 0) + 1
+    rows = []
+    move_rows = []
+    for game, created_at in games:
+        key = game.idempotency_key
+        if key is not None:
+            if key in recorded:
+                continue
+            recorded.add(key)
+
+        rows.append(GameRow(next_id, len(game.rounds_played), game.game_winner,
+                               game.player or get_player(game.game_winner), created_at or now, key))
+        move_rows.extend(
+            {"game_id": next_id, "player_1_move": round_info.player_1_move,
+             "player_2_move": round_info.player_2_move, "winner": round_info.winner}
+            for round_info in game.rounds_played
+        )
+        next_id += 1
+
+    if rows:
+        db.execute(insert(models.Game.__table__), [row._asdict() for row in rows])
+        if move_rows:
+            db.execute(insert(models.Move.__table__), move_rows)
+        rollups.record_games(db, rows)
+    return len(rows), len(move_rows), len(games) - len(rows)
+
+
+def set_indexes(session_factory: sessionmaker, present: bool):
+    """Builds, or drops, the `DEFERRABLE_INDEXES` that are missing, or present."""
+    with session_factory() as db:
+        for index in DEFERRABLE_INDEXES:
+            if present:
+                index.create(bind=db.connection(), checkfirst=True)
+            else:
+                index.drop(bind=db.connection(), checkfirst=True)
+        db.commit()
+
+
+def load_file(path: str, batch_size: int = 5000, mode: str = INGEST_VALIDATION, restart: bool = False,
+              defer_indexes: bool = False, rejects=None, session_factory: sessionmaker = WriteSessionLocal,
+              progress: Optional[Callable[[LoadReport], None]] = None) -> LoadReport:
+    """Loads the games of a JSON lines file into the database, in batches of lines.
+
+    Each batch is committed with a checkpoint of the file (`models.LoadCheckpoint`), so loading a
+    file again resumes after its last batch: an interrupted load can be repeated, and a finished
+    one loads nothing. Lines that cannot be parsed, or whose game is not valid with the
+    validation `mode`, are rejected; the other games of their batch are still recorded.
+
+    Args:
+        path (str): Path of the file.
+        batch_size (int): Lines read per transaction. Defaults to 5000.
+        mode (str): "recompute", "reject" or "off", see `validation.INGEST_VALIDATION`.
+        restart (bool): If True, the file is loaded from the start, ignoring its checkpoint.
+        defer_indexes (bool): If True, the `DEFERRABLE_INDEXES` are dropped during the load and
+            built at the end. Meant for loads that are large compared with the database, while
+            the API is stopped: its queries are slow without the indexes.
+        rejects (file, optional): Text file where each rejected line is written with its problems.
+        session_factory (sessionmaker): Sessions of the database. Defaults to the write sessions.
+        progress (Callable, optional): Called with the report after each batch.
+
+    Returns:
+        LoadReport: The lines read, the games recorded and the lines rejected.
+
+    Raises:
+        ValueError: If the file is shorter than its checkpoint, so it is not the file that was loaded.
+    """
+    start = time.perf_counter()
+    source = os.path.abspath(path)
+    with session_factory() as db:
+        checkpoint = db.get(models.LoadCheckpoint, source)
+        offset, line_number, loaded = (0, 0, 0) if checkpoint is None or restart else \
+            (checkpoint.offset, checkpoint.lines, checkpoint.games)
+    if offset > os.path.getsize(path):
+        raise ValueError(f"{path} is shorter than its checkpoint: load it with restart")
+
+    report = LoadReport(first_line=line_number + 1)
+    if defer_indexes:
+        set_indexes(session_factory, present=False)
+    try:
+        with open(path, "rb") as games_file:
+            games_file.seek(offset)
+            while True:
+                lines = []
+                batch_start = offset
+                for line in games_file:
+                    offset += len(line)
+                    line_number += 1
+                    if line.strip():
+                        lines.append((line_number, line))
+                    if len(lines) == batch_size:
+                        break
+                if offset == batch_start:
+                    break
+
+                parsed = []
+                rejected = {}
+                for number, line in lines:
+                    game, created_at, errors = parse_line(line)
+                    if errors:
+                        rejected[number] = errors
+                    else:
+                        parsed.append((number, game, created_at))
+
+                problems, fixes = check_games([game for _, game, _ in parsed], mode)
+                for index, errors in problems:
+                    rejected[parsed[index][0]] = errors
+                fix_winners(fixes)
+                valid = [(game, created_at) for number, game, created_at in parsed if number not in rejected]
+
+                with session_factory() as db:
+                    games, moves, replayed = record_batch(db, valid)
+                    loaded += games
+                    db.merge(models.LoadCheckpoint(source=source, offset=offset, lines=line_number, games=loaded,
+                                                   updated_at=models.utcnow()))
+                    db.commit()
+
+                report.lines = line_number - report.first_line + 1
+                report.games += games
+                report.moves += moves
+                report.replayed += replayed
+                report.rejected.update(rejected)
+                if rejects is not None:
+                    for number, line in lines:
+                        if number in rejected:
+                            rejects.write(json.dumps({"line": number, "errors": rejected[number],
+                                                      "record": line.decode(errors="replace").rstrip("\n")}) + "\n")
+                report.seconds = time.perf_counter() - start
+                if progress is not None:
+                    progress(report)
+    finally:
+        if defer_indexes:
+            set_indexes(session_factory, present=True)
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def main():
+    """Loads a file of games into the database of the application and prints the rate of the load.
+
+    Exits with status 1 if some lines were rejected.
+    """
+    parser = argparse.ArgumentParser(description="Bulk load of a JSON lines file of games.")
+    parser.add_argument("path", help="File with one game per line, in the shape of the body of POST /game")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Lines read per transaction")
+    parser.add_argument("--validation", choices=["recompute", "reject", "off"], default=INGEST_VALIDATION,
+                        help="What to do with the games whose winners do not match their moves")
+    parser.add_argument("--defer-indexes", action="store_true",
+                        help="Drop the indexes of the games during the load and build them at the end")
+    parser.add_argument("--restart", action="store_true", help="Load the file from the start, ignoring its checkpoint")
+    parser.add_argument("--rejects", help="Append the rejected lines, with their problems, to this file")
+    parser.add_argument("--show", type=int, default=20, help="Rejected lines printed")
+    args = parser.parse_args()
+
+    if len(shards.shards) > 1:
+        # The games would all go to the first shard, with ids that are not those of the shard.
+        parser.error("the bulk loader does not support DATABASE_SHARDS, load the games through POST /game/bulk")
+
+    last_print = [0.0]
+
+    def print_progress(report: LoadReport):
+        if report.seconds - last_print[0] >= 1:
+            last_print[0] = report.seconds
+            print(f"  {report.lines} lines, {report.games} games, {report.games_per_second:.0f} games/s", file=sys.stderr)
+
+    init_db()
+    rejects = open(args.rejects, "a") if args.rejects else None
+    try:
+        report = load_file(args.path, batch_size=args.batch_size, mode=args.validation, restart=args.restart,
+                           defer_indexes=args.defer_indexes, rejects=rejects, progress=print_progress)
+    finally:
+        if rejects is not None:
+            rejects.close()
+
+    if report.first_line > 1:
+        print(f"Resumed at line {report.first_line}.")
+    print(f"Loaded {report.games} games ({report.moves} moves) from {report.lines} lines in {report.seconds:.1f} s: "
+          f"{report.games_per_second:.0f} games/s. {report.replayed} already recorded, {len(report.rejected)} rejected.")
+    for reason, count in report.reasons().most_common():
+        print(f"  {reason}: {count}")
+    for line_number, errors in list(report.rejected.items())[:args.show]:
+        print(f"  line {line_number}: {'; '.join(errors)}")
+
+    if report.rejected:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+import argparse
+import asyncio
+import logging
+import os
+import time
+from typing import Callable, Optional
+
+from sqlalchemy.engine import Engine
+
+from rock_paper_scissors.api import database, shards
+from rock_paper_scissors.api.admission import load
+
+# Maintenance of the SQLite file, run in the background by every worker:
+# - `PRAGMA optimize` refreshes the statistics of the query planner (ANALYZE) of the tables
+#   that changed, reading at most MAINTENANCE_ANALYSIS_LIMIT rows of each index;
+# - `PRAGMA incremental_vacuum` returns the free pages left by deleted games (archive,
+#   quarantine) to the file system, MAINTENANCE_VACUUM_PAGES pages per transaction;
+# - `PRAGMA wal_checkpoint` copies the WAL into the database, and truncates it when it grew
+#   larger than MAINTENANCE_WAL_TRUNCATE_BYTES.
+# The steps that write wait until the worker has served no request for MAINTENANCE_IDLE_SECONDS,
+# and take the write lock of their shard in the worker, see `shards.Shard.write_lock`, so its
+# requests queue on the event loop instead of in SQLite's busy handler while the writes of the
+# other shards go on. Only the passive checkpoint, which never blocks, runs while busy.
+# Usage, to run it once (with --vacuum, also to enable incremental vacuum on an existing file):
+#   python -m rock_paper_scissors.api.maintenance [--vacuum]
+
+logger = logging.getLogger(__name__)
+
+# Seconds between two runs. 0 disables the maintenance.
+MAINTENANCE_INTERVAL = float(os.getenv("MAINTENANCE_INTERVAL", "3600"))
+# Seconds without requests after which the worker is considered idle.
+MAINTENANCE_IDLE_SECONDS = float(os.getenv("MAINTENANCE_IDLE_SECONDS", "1"))
+# Seconds a run waits for the worker to be idle before it skips the steps that write.
+MAINTENANCE_MAX_WAIT = float(os.getenv("MAINTENANCE_MAX_WAIT", "60"))
+MAINTENANCE_ANALYSIS_LIMIT = int(os.getenv("MAINTENANCE_ANALYSIS_LIMIT", "1000"))
+MAINTENANCE_VACUUM_PAGES = int(os.getenv("MAINTENANCE_VACUUM_PAGES", "2000"))
+MAINTENANCE_WAL_TRUNCATE_BYTES = int(os.getenv("MAINTENANCE_WAL_TRUNCATE_BYTES", str(64 * 1024 * 1024)))
+
+# Milliseconds the truncating checkpoint waits for the readers before giving up until the next run.
+CHECKPOINT_BUSY_TIMEOUT = 100
+
+
+class MaintenanceReport:
+    """What a maintenance run did.
+
+    Attributes:
+        timings (dict): Milliseconds taken by each step that ran, by step.
+        vacuumed_pages (int): Free pages returned to the file system.
+        free_pages (int): Free pages left in the file.
+        checkpoint (tuple): Result of the last checkpoint: busy (1 if it could not finish), frames
+            in the WAL and frames copied into the database.
+        skipped (list): Steps not run because the worker was busy.
+    """
+
+    def __init__(self):
+        self.timings = {}
+        self.vacuumed_pages = 0
+        self.free_pages = 0
+        self.checkpoint = None
+        self.skipped = []
+
+    def __str__(self) -> str:
+        """Summary of the run, for the logs.
+
+        Examples:
+            >>> report = MaintenanceReport()
+            >>> report.timings = {"optimize": 1.25, "checkpoint": 0.5}
+            >>> report.checkpoint = (0, 10, 10)
+            >>> report.skipped = ["truncate"]
+            >>> str(report)
+            'optimize 1.2 ms, checkpoint 0.5 ms; 0 pages vacuumed, 0 free; checkpoint (0, 10, 10); skipped truncate'
+        """
+        timings = ", ".join(f"{step} {milliseconds:.1f} ms" for step, milliseconds in self.timings.items())
+        summary = f"{timings}; {self.vacuumed_pages} pages vacuumed, {self.free_pages} free; checkpoint {self.checkpoint}"
+        if self.skipped:
+            summary += f"; skipped {', '.join(self.skipped)}"
+        return summary
+
+
+def wal_size(db_engine: Engine) -> int:
+    """Returns the size in bytes of the WAL file of an SQLite database, 0 if it has none."""
+    path = database.sqlite_file_path(str(db_engine.url))
+    try:
+        return os.path.getsize(f"{path}-wal") if path else 0
+    except FileNotFoundError:
+        return 0
+
+
+def optimize(cursor):
+    cursor.execute(f"PRAGMA analysis_limit={MAINTENANCE_ANALYSIS_LIMIT}")
+    cursor.execute("PRAGMA optimize")
+
+
+def vacuum_pages(cursor, pages: int) -> int:
+    """Returns up to `pages` free pages to the file system in one transaction, and the free pages left."""
+    if cursor.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        return cursor.execute("PRAGMA freelist_count").fetchone()[0]
+    # executescript steps the pragma until it is done: execute would free a single page.
+    cursor.connection.executescript(f"PRAGMA incremental_vacuum({pages})")
+    return cursor.execute("PRAGMA freelist_count").fetchone()[0]
+
+
+def checkpoint(cursor, mode: str) -> tuple:
+    if mode == "TRUNCATE":
+        cursor.execute(f"PRAGMA busy_timeout={CHECKPOINT_BUSY_TIMEOUT}")
+    try:
+        return tuple(cursor.execute(f"PRAGMA wal_checkpoint({mode})").fetchone())
+    finally:
+        if mode == "TRUNCATE":
+            cursor.execute(f"PRAGMA busy_timeout={database.SQLITE_BUSY_TIMEOUT}")
+
+
+async def wait_until_idle(is_idle: Callable[[], bool], deadline: float) -> bool:
+    """Waits until `is_idle` returns True, polling it, or until the monotonic `deadline`."""
+    while not is_idle():
+        if time.monotonic() >= deadline:
+            return False
+        await asyncio.sleep(min(0.1, MAINTENANCE_IDLE_SECONDS))
+    return True
+
+
+async def maintain(db_engine: Engine, is_idle: Optional[Callable[[], bool]] = None,
+                   write_lock: Optional[asyncio.Lock] = None, max_wait: float = MAINTENANCE_MAX_WAIT) -> MaintenanceReport:
+    """Runs the maintenance of an SQLite database once, see the module comments.
+
+    Each step runs in a thread, on one connection of the engine, so the event loop keeps serving.
+
+    Args:
+        db_engine (Engine): Engine of the database.
+        is_idle (Callable, optional): Returns True when the steps that write may run. Defaults to
+            the worker having served no request for `MAINTENANCE_IDLE_SECONDS`.
+        write_lock (asyncio.Lock, optional): Lock of the writers of the process. Defaults to
+            `database.write_lock`.
+        max_wait (float): Seconds to wait for `is_idle` before skipping the steps that write.
+
+    Returns:
+        MaintenanceReport: The steps run and their timings.
+    """
+    is_idle = is_idle or (lambda: load.idle_for() >= MAINTENANCE_IDLE_SECONDS)
+    write_lock = write_lock or database.write_lock
+    deadline = time.monotonic() + max_wait
+    report = MaintenanceReport()
+
+    raw_connection = db_engine.raw_connection()
+    try:
+        cursor = raw_connection.cursor()
+
+        async def step(name: str, function, *args, write: bool = True):
+            if write and not await wait_until_idle(is_idle, deadline):
+                report.skipped.append(name)
+                return None
+            start = time.perf_counter()
+            if write:
+                async with write_lock:
+                    result = await asyncio.to_thread(function, cursor, *args)
+            else:
+                result = await asyncio.to_thread(function, cursor, *args)
+            report.timings[name] = report.timings.get(name, 0.0) + (time.perf_counter() - start) * 1000
+            return result
+
+        await step("optimize", optimize)
+
+        free_pages = cursor.execute("PRAGMA freelist_count").fetchone()[0]
+        while free_pages:
+            left = await step("incremental_vacuum", vacuum_pages, MAINTENANCE_VACUUM_PAGES)
+            if left is None or left >= free_pages:
+                break
+            report.vacuumed_pages += free_pages - left
+            free_pages = left
+        report.free_pages = free_pages
+
+        report.checkpoint = await step("checkpoint", checkpoint, "PASSIVE", write=False)
+        if wal_size(db_engine) > MAINTENANCE_WAL_TRUNCATE_BYTES:
+            report.checkpoint = await step("truncate", checkpoint, "TRUNCATE") or report.checkpoint
+    finally:
+        raw_connection.close()
+    return report
+
+
+def claim_run(path: str, interval: float) -> bool:
+    """Claims a maintenance run for this worker, unless another one ran it in the last half interval.
+
+    The time of the last run is the modification time of the file `path`, which is touched.
+    """
+    try:
+        if time.time() - os.path.getmtime(path) < interval / 2:
+            return False
+    except FileNotFoundError:
+        pass
+    with open(path, "a"):
+        os.utime(path)
+    return True
+
+
+async def maintain_periodically(interval: float = MAINTENANCE_INTERVAL):
+    """Every `interval` seconds, until cancelled, maintains the database of every shard of the
+    application and logs the reports. With several workers only one of them runs it each time."""
+    while True:
+        await asyncio.sleep(interval)
+        for shard in shards.shards:
+            path = database.sqlite_file_path(str(shard.engine.url))
+            if path is None or not claim_run(f"{path}.maintenance", interval):
+                continue
+            try:
+                report = await maintain(shard.engine, write_lock=shard.write_lock)
+            except Exception:
+                logger.exception("Database maintenance of %s failed", path)
+                continue
+            logger.info("Database maintenance of %s: %s", path, report)
+
+
+def main():
+    """Maintains the database of every shard once, without waiting for the API to be idle."""
+    from rock_paper_scissors.utils import setup_logging
+
+    parser = argparse.ArgumentParser(description="Maintenance of the SQLite database.")
+    parser.add_argument("--vacuum", action="store_true",
+                        help="Rewrite the file with VACUUM, enabling SQLITE_AUTO_VACUUM. Stop the API first")
+    args = parser.parse_args()
+
+    setup_logging("maintenance")
+    database.init_db()
+    shards.init_shards()
+    for shard in shards.shards:
+        path = database.sqlite_file_path(str(shard.engine.url))
+        if args.vacuum:
+            start = time.perf_counter()
+            database.set_auto_vacuum(shard.engine)
+            print(f"Vacuumed {path} in {time.perf_counter() - start:.1f} s.")
+        report = asyncio.run(maintain(shard.engine, is_idle=lambda: True, write_lock=asyncio.Lock()))
+        logger.info("Database maintenance of %s: %s", path, report)
+        print(f"Database maintenance of {path}: {report}")
+
+
+if __name__ == "__main__":
+    main()
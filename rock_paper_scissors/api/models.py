@@ -1,25 +1,40 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from datetime import datetime, timezone
+from sqlalchemy import Column, DateTime, Integer, String, Text, ForeignKey
 from sqlalchemy.orm import relationship
 
 from rock_paper_scissors.api.database import Base
 
 
+def utcnow() -> datetime:
+    """Returns the current UTC time without timezone, as it is stored in SQLite."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
 class Game(Base):
     """Represents a game in the Rock Paper Scissors application.
 
     Attributes:
-        id (int): Unique identifier for the game.
+        id (int): Unique identifier for the game, never reused (AUTOINCREMENT).
         total_rounds (int): Total number of rounds in the game. Defaults to 3.
         winner (str): The name of the player who won the game.
+        player (str): The name of player 1, who started the game (Human or Machine_1).
+        created_at (datetime): UTC time when the game was recorded.
+        idempotency_key (str): Key chosen by the client for the upload of the game, unique. A second
+            upload with the same key returns this game instead of recording it again.
 
     Relationships:
         moves (list[Move]): A list of moves associated with this game.
     """
     __tablename__ = 'games'
+    # The ids of the archived games are never given again.
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = Column(Integer, primary_key=True, index=True)
     total_rounds = Column(Integer, default=3)
     winner = Column(String)
+    player = Column(String, index=True)
+    created_at = Column(DateTime, default=utcnow, index=True)
+    idempotency_key = Column(String, unique=True, index=True)
 
     moves = relationship("Move", back_populates="game")
 
@@ -38,11 +53,88 @@ class Move(Base):
         game (Game): The game associated with this move.
     """
     __tablename__ = 'moves'
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = Column(Integer, primary_key=True, index=True)
-    game_id = Column(Integer, ForeignKey('games.id'))
+    game_id = Column(Integer, ForeignKey('games.id'), index=True)
     player_1_move = Column(String, nullable=False)
     player_2_move = Column(String, nullable=False)
     winner = Column(String)
 
-    game = relationship("Game", back_populates="moves")
\ No newline at end of file
+    game = relationship("Game", back_populates="moves")
+
+
+class RollupMixin:
+    """Columns shared by the rollup tables, which pre-aggregate the games by period.
+
+    There is one row per period, player and winner, updated every time a game is recorded.
+
+    Attributes:
+        bucket_start (datetime): UTC start of the period.
+        player (str): The name of player 1 of the games.
+        winner (str): The name of the winner of the games.
+        total_games (int): Number of games of the period.
+        total_abandonments (int): Number of those games abandoned before the third round.
+    """
+    bucket_start = Column(DateTime, primary_key=True)
+    player = Column(String, primary_key=True)
+    winner = Column(String, primary_key=True)
+    total_games = Column(Integer, nullable=False, default=0)
+    total_abandonments = Column(Integer, nullable=False, default=0)
+
+
+class HourlyRollup(RollupMixin, Base):
+    """Games aggregated by hour, see RollupMixin."""
+    __tablename__ = 'game_rollups_hourly'
+
+
+class DailyRollup(RollupMixin, Base):
+    """Games aggregated by day, see RollupMixin."""
+    __tablename__ = 'game_rollups_daily'
+
+
+class QuarantinedGame(Base):
+    """A game removed from the statistics by the integrity scan because its data is not valid.
+
+    Attributes:
+        id (int): The id the game had in the games table.
+        total_rounds (int): Total number of rounds stored for the game.
+        winner (str): The winner stored for the game.
+        player (str): The player 1 stored for the game.
+        created_at (datetime): UTC time when the game was recorded.
+        moves (str): JSON list with the move of player 1, the move of player 2 and the winner of each round.
+        reasons (str): Problems found in the game, separated by "; ".
+        quarantined_at (datetime): UTC time when the game was quarantined.
+    """
+    __tablename__ = 'games_quarantine'
+
+    id = Column(Integer, primary_key=True)
+    total_rounds = Column(Integer)
+    winner = Column(String)
+    player = Column(String)
+    created_at = Column(DateTime)
+    moves = Column(Text)
+    reasons = Column(String)
+    quarantined_at = Column(DateTime, default=utcnow)
+
+
+class LoadCheckpoint(Base):
+    """Progress of the load of a file of games by `loader.load_file`.
+
+    It is written in the transaction of each batch of games, so a load that is interrupted
+    resumes right after the last batch recorded.
+
+    Attributes:
+        source (str): Absolute path of the file.
+        offset (int): Bytes of the file already read.
+        lines (int): Lines of the file already read.
+        games (int): Games of the file recorded so far.
+        updated_at (datetime): UTC time of the last batch.
+    """
+    __tablename__ = 'load_checkpoints'
+
+    source = Column(String, primary_key=True)
+    offset = Column(Integer, nullable=False, default=0)
+    lines = Column(Integer, nullable=False, default=0)
+    games = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=utcnow)
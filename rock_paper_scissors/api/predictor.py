@@ -0,0 +1,227 @@
+from collections import OrderedDict
+import os
+import threading
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from rock_paper_scissors.api import models
+from rock_paper_scissors.game_logic import MOVES, ROUND_OUTCOMES
+
+# Predicts the next move of a player from the moves it played in its recorded games, with a
+# Markov model per player: how often each move followed each context of up to `MAX_ORDER`
+# previous moves. The models are built from the database on first use, kept in a bounded LRU
+# cache and updated with every new game, so a prediction only looks up a few dictionaries.
+
+# Players whose models are kept in memory; the least recently used are dropped first.
+PREDICTOR_MAX_PLAYERS = int(os.getenv("PREDICTOR_MAX_PLAYERS", "1000"))
+# Times a context must have been seen before it is trusted over a shorter one.
+PREDICTOR_MIN_SAMPLES = int(os.getenv("PREDICTOR_MIN_SAMPLES", "5"))
+
+# Longest context of previous moves.
+MAX_ORDER = 2
+
+MOVE_INDEXES = {move: index for index, move in enumerate(MOVES)}
+
+# Highest id of the games, looked up on every catch up. Built once, as the statements of `crud`.
+MAX_GAME_ID = select(func.max(models.Game.__table__.c.id))
+
+# Move that beats each move.
+BEATEN_BY = {move: next(other for other in MOVES if ROUND_OUTCOMES[(other, move)]) for move in MOVES}
+
+
+def best_counter(counts: List[int]) -> str:
+    """Returns the move of the machine (player 2) least likely to lose against moves counted in
+    the order of `MOVES`.
+
+    The machine loses a round only when player 1 plays the move that beats its own, as ties are
+    won by player 2. Between moves equally likely to lose, the one that beats the most likely
+    move of player 1 is chosen.
+
+    Examples:
+        >>> best_counter([8, 1, 1])
+        'paper'
+        >>> best_counter([0, 5, 5])
+        'scissors'
+    """
+    likely = MOVES[max(range(len(MOVES)), key=counts.__getitem__)]
+    return min(MOVES, key=lambda move: (counts[MOVE_INDEXES[BEATEN_BY[move]]], move != BEATEN_BY[likely]))
+
+
+class PlayerModel:
+    """Moves of player 1 in the games of a player, counted after each context of previous moves.
+
+    The moves are taken in the order they were played: by game id, then by round. A context is
+    a tuple of the last 0 to `MAX_ORDER` moves; its counts follow the order of `MOVES`.
+
+    Attributes:
+        player (str): The player.
+        counts (dict): Counts of the next move, by context.
+        last_moves (tuple): The last `MAX_ORDER` moves applied.
+        last_game_id (int): Id of the last game applied, of this player or not.
+    """
+    __slots__ = ("player", "counts", "last_moves", "last_game_id")
+
+    def __init__(self, player: str):
+        self.player = player
+        self.counts = {}
+        self.last_moves = ()
+        self.last_game_id = 0
+
+    def add_move(self, move: str):
+        """Counts a move after each context of the previous moves.
+
+        Examples:
+            >>> model = PlayerModel("Human")
+            >>> for move in ["rock", "paper", "rock", "paper"]:
+            ...     model.add_move(move)
+            >>> model.counts[("rock",)]
+            [0, 2, 0]
+        """
+        index = MOVE_INDEXES.get(move)
+        if index is None:
+            # A move outside `MOVES`, only possible in old games, breaks the sequence.
+            self.last_moves = ()
+            return
+        for order in range(min(len(self.last_moves), MAX_ORDER) + 1):
+            context = self.last_moves[len(self.last_moves) - order:]
+            counts = self.counts.get(context)
+            if counts is None:
+                counts = self.counts[context] = [0] * len(MOVES)
+            counts[index] += 1
+        self.last_moves = (self.last_moves + (move,))[-MAX_ORDER:]
+
+    def predict(self, recent_moves: Tuple[str, ...] = None, min_samples: int = PREDICTOR_MIN_SAMPLES) -> tuple:
+        """Predicts the next move after some recent moves, the last `MAX_ORDER` moves applied by default.
+
+        The longest context of the recent moves seen at least `min_samples` times is used, or
+        the count of all the moves if none was.
+
+        Returns:
+            tuple: The predicted move (None without moves), the counter move of the machine, the
+            probability of the predicted move and the context used.
+
+        Examples:
+            >>> model = PlayerModel("Human")
+            >>> for move in ["rock", "paper"] * 5:
+            ...     model.add_move(move)
+            >>> model.predict(("paper", "rock"), min_samples=3)
+            ('paper', 'scissors', 1.0, ('paper', 'rock'))
+        """
+        recent_moves = self.last_moves if recent_moves is None else tuple(recent_moves[-MAX_ORDER:])
+        for order in range(len(recent_moves), -1, -1):
+            context = recent_moves[len(recent_moves) - order:]
+            counts = self.counts.get(context)
+            if counts is None:
+                continue
+            total = sum(counts)
+            if total >= min_samples or order == 0:
+                index = max(range(len(MOVES)), key=counts.__getitem__)
+                return MOVES[index], best_counter(counts), counts[index] / total, context
+        return None, BEATEN_BY[MOVES[0]], 0.0, ()
+
+
+class Predictor:
+    """Models of the players, in an LRU cache of at most `max_players` models.
+
+    Like `hand_stats.HandStats`, each model applies the games in id order: the games recorded by
+    this process are applied as they are created, and `catch_up` reads the games recorded by
+    other workers after the last one applied. The games moved to the archive are not read.
+
+    Args:
+        max_players (int): Models kept in memory.
+    """
+
+    def __init__(self, max_players: int = PREDICTOR_MAX_PLAYERS):
+        self.max_players = max_players
+        self.models = OrderedDict()
+        self.lock = threading.Lock()
+
+    def cached_model(self, player: str) -> Optional[PlayerModel]:
+        """Returns the model of a player if it is in memory, without reading the database."""
+        with self.lock:
+            model = self.models.get(player)
+            if model is not None:
+                self.models.move_to_end(player)
+            return model
+
+    def model(self, db: Session, player: str) -> PlayerModel:
+        """Returns the model of a player, built from the database if it is not in memory, with the
+        games recorded since it was last used.
+
+        Args:
+            db (Session): Database session to read the games from.
+            player (str): The player.
+
+        Returns:
+            PlayerModel: The model, up to date with the games of the database.
+        """
+        model = self.cached_model(player)
+        if model is None:
+            model = PlayerModel(player)
+            self.catch_up(db, model)
+            with self.lock:
+                # Another thread may have built it meanwhile.
+                model = self.models.setdefault(player, model)
+                self.models.move_to_end(player)
+                while len(self.models) > self.max_players:
+                    self.models.popitem(last=False)
+        else:
+            self.catch_up(db, model)
+        return model
+
+    def catch_up(self, db: Session, model: PlayerModel, chunk_size: int = 50000):
+        """Applies the stored games of the player after `last_game_id`, in chunks of ids.
+
+        When no game is missing this is a single lookup of the highest id in the primary key index.
+
+        Args:
+            db (Session): Database session to read the games from.
+            model (PlayerModel): The model to update.
+            chunk_size (int): Range of game ids read per query. Defaults to 50000.
+        """
+        max_id = db.execute(MAX_GAME_ID).scalar() or 0
+        start = model.last_game_id
+        while start < max_id:
+            end = min(start + chunk_size, max_id)
+            rows = db.query(models.Move.player_1_move) \
+                .join(models.Game, models.Game.id == models.Move.game_id) \
+                .filter(models.Game.player == model.player, models.Game.id > start, models.Game.id <= end) \
+                .order_by(models.Move.game_id, models.Move.id) \
+                .all()
+
+            with self.lock:
+                if model.last_game_id == start:
+                    for (move,) in rows:
+                        model.add_move(move)
+                    model.last_game_id = end
+            start = model.last_game_id
+
+    def apply_games(self, games: List[dict]):
+        """Applies games just recorded by this process, as returned by `crud.create_games`, to the
+        models in memory.
+
+        A model only applies the game right after its `last_game_id`: if another worker recorded
+        games in between, they are left to `catch_up`. Games already applied, such as replayed
+        games, are skipped.
+
+        Args:
+            games (List[dict]): The recorded games, with their ids.
+        """
+        games = sorted(games, key=lambda game: game["id"])
+        with self.lock:
+            for model in self.models.values():
+                for game in games:
+                    if game["id"] <= model.last_game_id:
+                        continue
+                    if game["id"] != model.last_game_id + 1:
+                        break
+                    if game.get("player") == model.player:
+                        for round_info in game["rounds_played"]:
+                            model.add_move(round_info["player_1_move"])
+                    model.last_game_id = game["id"]
+
+
+# Models of the players of the process.
+predictor = Predictor()
@@ -0,0 +1,153 @@
+from collections import Counter
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Optional
+
+# Profilers of the running process, started on demand by the admin routes. Nothing is
+# installed while no profile is running: no hook, no thread and no tracemalloc tracing.
+
+# Leaf frames of threads that are waiting, not working: they are left out of the CPU profiles.
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("socket.py", "accept"),
+}
+
+# Only one profile runs at a time, so they do not measure each other.
+profile_lock = threading.Lock()
+
+_labels = {}
+
+
+class ProfilerBusyError(RuntimeError):
+    """Raised when a profile is requested while another one is running."""
+
+
+def short_path(path: str) -> str:
+    """Returns a path relative to the longest entry of `sys.path` that contains it.
+
+    Examples:
+        >>> import os, sys
+        >>> short_path(os.path.join(sys.path[0], "rock_paper_scissors", "api", "crud.py")).split(os.sep)
+        ['rock_paper_scissors', 'api', 'crud.py']
+    """
+    best = ""
+    for entry in sys.path:
+        if entry and path.startswith(entry + os.sep) and len(entry) > len(best):
+            best = entry
+    return path[len(best) + 1:] if best else path
+
+
+def frame_label(code) -> str:
+    """Names a function in a collapsed stack: its name, file and first line."""
+    label = _labels.get(code)
+    if label is None:
+        label = _labels[code] = f"{code.co_name} ({short_path(code.co_filename)}:{code.co_firstlineno})"
+    return label
+
+
+def collapse(counts: Counter) -> str:
+    """Formats stacks as collapsed stacks: one line per stack, frames from the root separated by
+    ';', then the count. This is the input of flamegraph.pl, speedscope and similar tools.
+
+    Examples:
+        >>> print(collapse(Counter({("main", "work"): 3, ("main",): 1})))
+        main;work 3
+        main 1
+    """
+    return "\n".join(f"{';'.join(stack)} {count}" for stack, count in counts.most_common())
+
+
+def _acquire():
+    if not profile_lock.acquire(blocking=False):
+        raise ProfilerBusyError("A profile is already running")
+
+
+def sample_cpu(seconds: float, interval: float = 0.005, idle: bool = False) -> Counter:
+    """Samples the stacks of all the threads of the process for a while.
+
+    The calling thread sleeps `interval` seconds between samples and reads the current frame
+    of every other thread, so the threads being profiled are not slowed down except by the GIL
+    taken for each sample.
+
+    Args:
+        seconds (float): Duration of the profile.
+        interval (float): Seconds between samples. Defaults to 5 ms.
+        idle (bool): If True, threads waiting for work are sampled too.
+
+    Returns:
+        Counter: Number of samples of each stack, a tuple of frame labels from the thread name to the leaf.
+
+    Raises:
+        ProfilerBusyError: If another profile is running.
+    """
+    _acquire()
+    try:
+        me = threading.get_ident()
+        counts = Counter()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == me:
+                    continue
+                code = frame.f_code
+                if not idle and (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, f"thread-{thread_id}"))
+                counts[tuple(reversed(stack))] += 1
+            time.sleep(interval)
+        return counts
+    finally:
+        profile_lock.release()
+
+
+def trace_memory(seconds: float, frames: int = 10, limit: Optional[int] = 50) -> Counter:
+    """Traces the memory allocated by the process for a while with tracemalloc.
+
+    Tracing only runs during the profile (unless it was already started, e.g. with
+    `PYTHONTRACEMALLOC`), so only the blocks allocated meanwhile and still alive at the end
+    are reported.
+
+    Args:
+        seconds (float): Duration of the profile.
+        frames (int): Frames stored per allocation. Defaults to 10.
+        limit (int, optional): Number of stacks reported, the largest first. Defaults to 50.
+
+    Returns:
+        Counter: Bytes allocated by each stack, a tuple of frame labels from the root to the leaf.
+
+    Raises:
+        ProfilerBusyError: If another profile is running.
+    """
+    _acquire()
+    try:
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start(frames)
+        try:
+            baseline = tracemalloc.take_snapshot()
+            time.sleep(seconds)
+            snapshot = tracemalloc.take_snapshot()
+        finally:
+            if started:
+                tracemalloc.stop()
+
+        snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+        counts = Counter()
+        for difference in snapshot.compare_to(baseline, "traceback"):
+            if difference.size_diff > 0:
+                stack = tuple(f"{short_path(frame.filename)}:{frame.lineno}" for frame in difference.traceback)
+                counts[stack] += difference.size_diff
+        return Counter(dict(counts.most_common(limit)))
+    finally:
+        profile_lock.release()
@@ -0,0 +1,181 @@
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+import logging
+import os
+import time
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Counts and times the SQL statements of every request, logs the slow ones with their query
+# plan and warns when a request repeats the same statement many times (an N+1 pattern).
+
+# Statements that take at least this many milliseconds are logged with their query plan. 0 disables it.
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+# File of the slow query log. Defaults to the logging of the application.
+SLOW_QUERY_LOG = os.getenv("SLOW_QUERY_LOG", "")
+# A request that runs the same SELECT this many times gets a warning. 0 disables it.
+QUERY_REPEAT_WARNING = int(os.getenv("QUERY_REPEAT_WARNING", "10"))
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger("rock_paper_scissors.slow_queries")
+if SLOW_QUERY_LOG:
+    slow_query_logger.addHandler(logging.FileHandler(SLOW_QUERY_LOG))
+
+
+class QueryStats:
+    """Statements run while a tracker is active.
+
+    Attributes:
+        count (int): Number of statements.
+        duration (float): Seconds spent running them.
+        statements (Counter): Number of times each SQL text was run.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def add(self, statement: str, duration: float):
+        self.count += 1
+        self.duration += duration
+        self.statements[statement] += 1
+
+    def repeated(self, times: int) -> list:
+        """Returns the statements run at least `times` times, with their count, most repeated first.
+
+        Examples:
+            >>> stats = QueryStats()
+            >>> for game_id in range(3):
+            ...     stats.add("SELECT * FROM moves WHERE game_id = ?", 0.001)
+            >>> stats.add("SELECT * FROM games", 0.002)
+            >>> stats.repeated(2)
+            [('SELECT * FROM moves WHERE game_id = ?', 3)]
+        """
+        return [(statement, count) for statement, count in self.statements.most_common() if count >= times]
+
+    def summary(self) -> str:
+        """Describes the statements, one line per distinct SQL text."""
+        lines = [f"{self.count} statements in {self.duration * 1000:.1f} ms"]
+        lines += [f"  {count} x {' '.join(statement.split())}" for statement, count in self.statements.most_common()]
+        return "\n".join(lines)
+
+
+# Statements of the current request. The routes that run in the threadpool share it, because
+# the context of the request is copied to the worker thread.
+current_stats: ContextVar[Optional[QueryStats]] = ContextVar("current_stats", default=None)
+
+# Trackers of `count_queries`, which count the statements of every thread.
+_global_stats = []
+
+
+@contextmanager
+def track_queries(label: str = "request"):
+    """Tracks the statements run in the current context, e.g. while a request is served.
+
+    On exit, a warning is logged for each read statement run at least `QUERY_REPEAT_WARNING`
+    times. Writes are left out: the ORM inserts the rows of a unit of work one by one.
+
+    Args:
+        label (str): Name of the tracked work in the warnings, e.g. "GET /game/mano_fuerte".
+
+    Yields:
+        QueryStats: The statements run so far.
+    """
+    stats = QueryStats()
+    token = current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        current_stats.reset(token)
+        if QUERY_REPEAT_WARNING:
+            for statement, count in stats.repeated(QUERY_REPEAT_WARNING):
+                if not is_read(statement):
+                    continue
+                logger.warning("%s ran the same statement %d times (N+1 queries?): %s",
+                               label, count, " ".join(statement.split())[:300])
+
+
+@contextmanager
+def count_queries():
+    """Counts the statements run by any thread of the process while the block runs.
+
+    Unlike `track_queries` it also sees the statements of requests served in other threads,
+    e.g. by a `TestClient`, so tests can bound the statements of a route.
+
+    Yields:
+        QueryStats: The statements run so far.
+    """
+    stats = QueryStats()
+    _global_stats.append(stats)
+    try:
+        yield stats
+    finally:
+        _global_stats.remove(stats)
+
+
+class QueryLogMiddleware:
+    """ASGI middleware that tracks the statements of each HTTP request with `track_queries`."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with track_queries(f"{scope['method']} {scope['path']}"):
+            await self.app(scope, receive, send)
+
+
+def is_read(statement: str) -> bool:
+    """Returns True for a SELECT statement, or one that starts with a WITH clause.
+
+    Examples:
+        >>> is_read("  SELECT max(games.id) FROM games"), is_read("INSERT INTO games VALUES (?)")
+        (True, False)
+    """
+    return statement.lstrip()[:6].upper().startswith(("SELECT", "WITH "))
+
+
+def query_plan(cursor, statement: str, parameters) -> str:
+    """Returns the SQLite query plan of a statement, one step per line."""
+    try:
+        rows = cursor.connection.execute(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    except Exception as error:
+        return f"no plan: {error}"
+    return "\n".join(f"  {row[-1]}" for row in rows)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "handle_error")
+def handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute.
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_start"):
+        connection.info["query_start"].pop()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info["query_start"].pop()
+
+    stats = current_stats.get()
+    if stats is not None:
+        stats.add(statement, duration)
+    for global_stats in _global_stats:
+        global_stats.add(statement, duration)
+
+    if SLOW_QUERY_MS and duration * 1000 >= SLOW_QUERY_MS:
+        plan = ""
+        if conn.dialect.name == "sqlite" and not executemany and is_read(statement):
+            plan = "\n" + query_plan(cursor, statement, parameters)
+        slow_query_logger.warning("%.1f ms: %s %s%s", duration * 1000, " ".join(statement.split()),
+                                  str(parameters)[:200], plan)
@@ -0,0 +1,45 @@
+import os
+from typing import Any, Optional
+
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
+
+try:
+    import orjson
+except ImportError:  # orjson is optional: without it the fast path stays disabled.
+    orjson = None
+
+
+# Opt-in fast path for the JSON responses: orjson instead of the standard `json`, and the
+# routes that already build plain dictionaries skip the validation of their response_model.
+FAST_JSON = os.getenv("FAST_JSON", "0") == "1" and orjson is not None
+
+
+def default_response_class() -> type:
+    """Returns the response class used by default by the application.
+
+    Returns:
+        type: `ORJSONResponse` when the fast path is enabled, `JSONResponse` otherwise.
+    """
+    return ORJSONResponse if FAST_JSON else JSONResponse
+
+
+def fast_response(content: Any, headers: Optional[dict] = None) -> Any:
+    """Wraps the content of a route that is already made of plain dicts, lists and scalars.
+
+    When the fast path is enabled the content is returned as an `ORJSONResponse`, which
+    FastAPI sends as is: the response_model of the route is still documented in OpenAPI but
+    it is not validated and serialized again. Otherwise the content is returned unchanged, or
+    as a `JSONResponse` if there are headers.
+
+    Args:
+        content (Any): JSON-compatible content of the response.
+        headers (dict, optional): Headers of the response.
+
+    Returns:
+        Any: The response to return from the route.
+    """
+    if FAST_JSON:
+        return ORJSONResponse(content, headers=headers)
+    if headers:
+        return JSONResponse(content, headers=headers)
+    return content
@@ -0,0 +1,224 @@
+from collections import Counter
+from datetime import datetime, timedelta
+import re
+from typing import List, NamedTuple, Optional
+from sqlalchemy import Integer, func
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from rock_paper_scissors.api import analytics, archive, models
+
+# Time windows accepted by the statistics routes: a number followed by m (minutes), h (hours) or d (days).
+WINDOW_PATTERN = r"^[1-9][0-9]*[mhd]$"
+
+WINDOW_UNITS = {"m": "minutes", "h": "hours", "d": "days"}
+
+HOUR = timedelta(hours=1)
+DAY = timedelta(days=1)
+
+
+class OutcomeCount(NamedTuple):
+    """Number of games, and of abandoned games, of a player that were won by a winner."""
+    player: str
+    winner: str
+    total_games: int
+    total_abandonments: int
+
+
+def parse_window(window: str) -> timedelta:
+    """Converts a time window of the statistics routes to a timedelta.
+
+    Args:
+        window (str): Window matching WINDOW_PATTERN, e.g. "90m", "1h" or "7d".
+
+    Returns:
+        timedelta: The duration of the window.
+
+    Raises:
+        ValueError: If the window does not match WINDOW_PATTERN.
+
+    Examples:
+        >>> parse_window("1h")
+        datetime.timedelta(seconds=3600)
+        >>> parse_window("7d")
+        datetime.timedelta(days=7)
+    """
+    if not re.match(WINDOW_PATTERN, window):
+        raise ValueError(f"Invalid time window: {window}")
+    return timedelta(**{WINDOW_UNITS[window[-1]]: int(window[:-1])})
+
+
+def floor_hour(moment: datetime) -> datetime:
+    """Returns the start of the hour of a moment.
+
+    Examples:
+        >>> floor_hour(datetime(2024, 5, 1, 13, 45, 12))
+        datetime.datetime(2024, 5, 1, 13, 0)
+    """
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def floor_day(moment: datetime) -> datetime:
+    """Returns the start of the day of a moment.
+
+    Examples:
+        >>> floor_day(datetime(2024, 5, 1, 13, 45, 12))
+        datetime.datetime(2024, 5, 1, 0, 0)
+    """
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def ceil(moment: datetime, floor, period: timedelta) -> datetime:
+    """Returns the first start of a period at or after a moment.
+
+    Examples:
+        >>> ceil(datetime(2024, 5, 1, 13, 45), floor_hour, HOUR)
+        datetime.datetime(2024, 5, 1, 14, 0)
+        >>> ceil(datetime(2024, 5, 1, 13, 0), floor_hour, HOUR)
+        datetime.datetime(2024, 5, 1, 13, 0)
+    """
+    start = floor(moment)
+    return start if start == moment else start + period
+
+
+def record_games(db: Session, db_games: List[models.Game], sign: int = 1):
+    """Adds new games to the hourly and daily rollups, in the transaction of the session.
+
+    The games are first aggregated in memory, so a batch of games updates each rollup row
+    with a single upsert.
+
+    Args:
+        db (Session): Database session where the games are being added.
+        db_games (List[models.Game]): The new games, with `player` and `created_at` set, or rows
+            with the same attributes.
+        sign (int): 1 to add the games, -1 to subtract games being removed. Defaults to 1.
+    """
+    if not db_games:
+        return
+
+    for model, floor in ((models.HourlyRollup, floor_hour), (models.DailyRollup, floor_day)):
+        totals = Counter()
+        abandonments = Counter()
+        for db_game in db_games:
+            key = (floor(db_game.created_at), db_game.player, db_game.winner)
+            totals[key] += sign
+            abandonments[key] += sign * (db_game.total_rounds < 3)
+
+        rows = [
+            {
+                "bucket_start": bucket_start,
+                "player": player,
+                "winner": winner,
+                "total_games": total_games,
+                "total_abandonments": abandonments[(bucket_start, player, winner)]
+            }
+            for (bucket_start, player, winner), total_games in totals.items()
+        ]
+
+        statement = insert(model)
+        statement = statement.on_conflict_do_update(
+            index_elements=[model.bucket_start, model.player, model.winner],
+            set_={
+                "total_games": model.total_games + statement.excluded.total_games,
+                "total_abandonments": model.total_abandonments + statement.excluded.total_abandonments
+            }
+        )
+        db.execute(statement, rows)
+
+
+def get_outcome_counts(db: Session, window: Optional[timedelta] = None, player: Optional[str] = None,
+                       now: Optional[datetime] = None, archived: bool = True) -> List[OutcomeCount]:
+    """Counts the games by player and winner, over all time or over the last `window`.
+
+    A window is split in whole days read from the daily rollup, whole hours (and the current
+    hour) read from the hourly rollup, and the minutes before the first whole hour, which are
+    counted from the games themselves through the index on `created_at`. So the result is exact
+    and only a handful of rows are read. The rollups keep counting the archived games; the
+    counts over all time and of the first minutes add the games of the archive.
+
+    Args:
+        db (Session): Database session to interact with the database.
+        window (timedelta, optional): Duration of the window ending now. Defaults to all time.
+        player (str, optional): Only count the games of this player. Defaults to all players.
+        now (datetime, optional): UTC end of the window. Defaults to the current time.
+        archived (bool): Whether to add the archived games. Defaults to True.
+
+    Returns:
+        List[OutcomeCount]: One entry per player and winner.
+    """
+    counts = Counter()
+    abandonments = Counter()
+
+    def add(rows):
+        for row_player, winner, total_games, total_abandonments in rows:
+            counts[(row_player, winner)] += total_games
+            abandonments[(row_player, winner)] += total_abandonments or 0
+
+    if window is None:
+        add(query_games(db, player))
+        if archived:
+            add(archive.count_archived_games(player))
+    else:
+        now = now or models.utcnow()
+        since = now - window
+        first_hour = ceil(since, floor_hour, HOUR)
+        first_day = ceil(first_hour, floor_day, DAY)
+        last_day = floor_day(now)
+
+        add(query_games(db, player, since, first_hour))
+        if archived:
+            add(archive.count_archived_games(player, since, first_hour))
+        if first_day < last_day:
+            add(query_rollup(db, models.HourlyRollup, player, first_hour, first_day))
+            add(query_rollup(db, models.DailyRollup, player, first_day, last_day))
+            add(query_rollup(db, models.HourlyRollup, player, last_day))
+        else:
+            add(query_rollup(db, models.HourlyRollup, player, first_hour))
+
+    return [
+        OutcomeCount(row_player, winner, total_games, abandonments[(row_player, winner)])
+        for (row_player, winner), total_games in counts.items()
+    ]
+
+
+def query_games(db: Session, player: Optional[str] = None, start: Optional[datetime] = None,
+                end: Optional[datetime] = None) -> list:
+    """Counts the stored games by player and winner, optionally between two moments.
+
+    With `analytics.ANALYTICS_ENGINE` set to "duckdb", all the games are counted by DuckDB; the
+    games of a period are still counted by SQLite, which only reads them through the index on
+    `created_at`.
+    """
+    duckdb_analytics = analytics.get_analytics()
+    if duckdb_analytics is not None and start is None:
+        return duckdb_analytics.outcome_counts(player)
+
+    query = db.query(
+        models.Game.player,
+        models.Game.winner,
+        func.count(),
+        # Typed as an integer: the sum of a comparison would be read back as a boolean.
+        func.sum(models.Game.total_rounds < 3, type_=Integer)
+    )
+    if start is not None:
+        if start >= end:
+            return []
+        query = query.filter(models.Game.created_at >= start, models.Game.created_at < end)
+    if player is not None:
+        query = query.filter(models.Game.player == player)
+    return query.group_by(models.Game.player, models.Game.winner).all()
+
+
+def query_rollup(db: Session, model, player: Optional[str], start: datetime, end: Optional[datetime] = None) -> list:
+    """Sums the rows of a rollup by player and winner, for the periods starting in [start, end)."""
+    query = db.query(
+        model.player,
+        model.winner,
+        func.sum(model.total_games),
+        func.sum(model.total_abandonments)
+    ).filter(model.bucket_start >= start)
+    if end is not None:
+        query = query.filter(model.bucket_start < end)
+    if player is not None:
+        query = query.filter(model.player == player)
+    return query.group_by(model.player, model.winner).all()
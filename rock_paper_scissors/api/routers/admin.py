@@ -0,0 +1,86 @@
+import asyncio
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+import os
+import secrets
+from typing import Optional
+
+from rock_paper_scissors.api import profiling
+
+# Token of the admin routes, sent in the `X-Admin-Token` header. Empty (the default) disables them.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+# Longest profile that can be requested, in seconds.
+PROFILE_MAX_SECONDS = 60
+
+
+def require_admin_token(x_admin_token: Optional[str] = Header(None)):
+    """Dependency that refuses the request unless it carries the admin token.
+
+    Without `ADMIN_TOKEN` the admin routes answer 404, as if they did not exist.
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if x_admin_token is None or not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid admin token")
+
+
+router = APIRouter(prefix="/admin",
+                   tags=["admin"],
+                   dependencies=[Depends(require_admin_token)])
+
+"""
+API Router for the administration of a running worker.
+
+The profiles are taken in the worker that answers the request, while it keeps serving the
+others, and are returned as collapsed stacks: one stack per line, frames separated by ';' and
+followed by a count, ready for flamegraph.pl or speedscope.
+
+Endpoints:
+    GET /admin/profile/cpu    - Sample the stacks of the worker for some seconds
+    GET /admin/profile/memory - Trace the memory allocated by the worker for some seconds
+"""
+
+SECONDS_QUERY = Query(10, gt=0, le=PROFILE_MAX_SECONDS, description="Duration of the profile, in seconds.")
+
+
+async def run_profile(profile, *args) -> PlainTextResponse:
+    """Runs a profiler of `profiling` in a thread, so the event loop keeps serving while it runs."""
+    try:
+        counts = await asyncio.to_thread(profile, *args)
+    except profiling.ProfilerBusyError as error:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(error))
+    return PlainTextResponse(profiling.collapse(counts))
+
+
+@router.get("/profile/cpu", response_class=PlainTextResponse)
+async def profile_cpu(seconds: float = SECONDS_QUERY,
+                      interval_ms: float = Query(5, ge=1, le=1000, description="Milliseconds between samples."),
+                      idle: bool = Query(False, description="Also sample the threads waiting for work.")):
+    """Sample the CPU stacks of every thread of the worker.
+
+    Args:
+        seconds (float): Duration of the profile (up to 60).
+        interval_ms (float): Milliseconds between samples.
+        idle (bool): If True, the threads waiting for work are sampled too.
+
+    Returns:
+        PlainTextResponse: Collapsed stacks with their number of samples, rooted at the thread name.
+    """
+    return await run_profile(profiling.sample_cpu, seconds, interval_ms / 1000, idle)
+
+
+@router.get("/profile/memory", response_class=PlainTextResponse)
+async def profile_memory(seconds: float = SECONDS_QUERY,
+                         frames: int = Query(10, ge=1, le=100, description="Frames stored per allocation."),
+                         limit: int = Query(50, ge=1, le=1000, description="Number of stacks returned.")):
+    """Trace the memory allocated by the worker with tracemalloc.
+
+    Args:
+        seconds (float): Duration of the profile (up to 60).
+        frames (int): Frames stored per allocation.
+        limit (int): Number of stacks returned, the largest first.
+
+    Returns:
+        PlainTextResponse: Collapsed stacks with the bytes they allocated and still hold.
+    """
+    return await run_profile(profiling.trace_memory, seconds, frames, limit)
@@ -1,9 +1,22 @@
-from fastapi import  APIRouter, status, Depends
+from fastapi import  APIRouter, Header, HTTPException, status, Depends, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+import json
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Literal, Optional
 
-from rock_paper_scissors.api import crud, schemas
-from rock_paper_scissors.api.api_client import get_db
+from rock_paper_scissors.api import archive, changes, crud, rollups, schemas, shards, validation
+from rock_paper_scissors.api.hand_stats import hand_stats
+from rock_paper_scissors.api.predictor import predictor
+from rock_paper_scissors.api.scoreboard import broadcaster
+from rock_paper_scissors.api.database import SessionLocal, WriteSessionLocal, get_read_db
+from rock_paper_scissors.api.responses import fast_response
+
+
+# Optional filters of the statistics routes. Without them, the statistics cover all the games.
+WINDOW_QUERY = Query(None, pattern=rollups.WINDOW_PATTERN,
+                     description="Only count the games of the last period, e.g. 90m, 1h or 7d.")
+PLAYER_QUERY = Query(None, description="Only count the games started by this player, e.g. Human or Machine_1.")
 
 
 router = APIRouter(prefix="/game",
@@ -18,42 +31,220 @@ and accessing various statistics related to the Rock Paper Scissors game.
 
 Endpoints:
     POST /game/               - Create a new game
+    POST /game/bulk           - Create several games at once
+    GET /game/historial       - Get a page of the games played
+    GET /game/archivo         - Export the archived games as JSON lines
+    GET /game/changes         - Get the games recorded after a cursor, waiting for them
     GET /game/get_global_info - Get global game information
     GET /game/mano_fuerte     - Get strong hand information
     GET /game/mano_debil      - Get weak hand information
     GET /game/ranking         - Get ranking of players
     GET /game/estadisticas    - Get game statistics
+    GET /game/dashboard       - Get all the statistics at once
+    GET /game/transiciones    - Get how often each move follows each move
+    GET /game/rondas          - Get the win and tie rates of each round
+    GET /game/predict         - Predict the next move of a player and the counter move
 """
 
+def invalid_games(error: validation.InvalidGameError, bulk: bool) -> HTTPException:
+    """Builds the 422 response of invalid games, with the same shape as FastAPI's validation errors."""
+    return HTTPException(
+        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        detail=[
+            {"loc": ["body", index] if bulk else ["body"], "msg": message, "type": "value_error"}
+            for index, errors in error.problems
+            for message in errors
+        ]
+    )
+
+
+async def validated_game(game: schemas.GameCreate) -> schemas.GameCreate:
+    """Dependency that checks a game with `validation.validate_games`.
+
+    It runs before the route, so the game is checked before the write lock is taken.
+    """
+    try:
+        validation.validate_games([game])
+    except validation.InvalidGameError as error:
+        raise invalid_games(error, bulk=False)
+    return game
+
+
+def validated_games(games: List[schemas.GameCreate]) -> List[schemas.GameCreate]:
+    """Dependency that checks the games of a bulk upload with `validation.validate_games`.
+
+    Unlike `validated_game` it runs in the threadpool, so a large payload does not block the event loop.
+    """
+    try:
+        validation.validate_games(games)
+    except validation.InvalidGameError as error:
+        raise invalid_games(error, bulk=True)
+    return games
+
+
+async def record_games(games: List[schemas.GameCreate]) -> List[dict]:
+    """Records games through `shards.create_games` and applies the new ones to the statistics
+    kept in memory, the change feed and the scoreboard.
+
+    The write locks of the shards of the games are held meanwhile, and only those, so the
+    requests writing in other shards go on. The locks are awaited on the event loop, so waiting
+    requests do not occupy the threadpool that runs the writes. The scoreboard, which reads
+    the totals, is published to after the locks are released.
+
+    Args:
+        games (List[schemas.GameCreate]): The games to create, already validated.
+
+    Returns:
+        List[dict]: The created games, in the same order; the replayed ones have `replayed` set.
+    """
+    positions = shards.route_games(games)
+
+    def create() -> List[dict]:
+        with WriteSessionLocal() as db:
+            if len(games) == 1:
+                created_games = [shards.create_game(db=db, game=games[0], positions=positions)]
+            else:
+                created_games = shards.create_games(db=db, games=games, positions=positions)
+        new_games = [created_game for created_game in created_games if not created_game.get("replayed")]
+        if new_games:
+            hand_stats.apply_games(new_games)
+            predictor.apply_games(new_games)
+            changes.change_notifier.notify()
+        return created_games
+
+    def publish(new_games: List[dict]):
+        with SessionLocal() as db:
+            broadcaster.publish_games(db, new_games)
+
+    async with shards.write_locks(positions):
+        created_games = await run_in_threadpool(create)
+    new_games = [created_game for created_game in created_games if not created_game.get("replayed")]
+    if new_games and broadcaster.subscribers:
+        await run_in_threadpool(publish, new_games)
+    return created_games
+
+
 @router.post("/", response_model=schemas.Game)
-def create_game(game: schemas.GameCreate, db: Session = Depends(get_db)):
+async def create_game(game: schemas.GameCreate = Depends(validated_game),
+                      idempotency_key: Optional[str] = Header(None)):
     """Create a new game.
 
+    Wrong winners are recomputed from the moves, or the game is refused, see `validation.INGEST_VALIDATION`.
+    If the idempotency key of the game (from the body or the `Idempotency-Key` header) was already
+    recorded, the recorded game is returned with the header `Idempotent-Replayed: true`.
+
     Args:
         game (schemas.GameCreate): The game creation request data.
-        db (Session): The database session dependency.
+        idempotency_key (str, optional): Key of the upload, used when the body has none.
 
     Returns:
         schemas.Game: The created game object.
     """
-    return crud.create_game(db=db, game=game)
+    if game.idempotency_key is None:
+        game.idempotency_key = idempotency_key
+
+    created_game = (await record_games([game]))[0]
+    headers = {}
+    if created_game.pop("replayed", False):
+        headers["Idempotent-Replayed"] = "true"
+    return fast_response(created_game, headers)
+
+
+@router.post("/bulk", response_model=List[schemas.Game])
+async def create_games(games: List[schemas.GameCreate] = Depends(validated_games)):
+    """Create several games in a single transaction.
+
+    If any game cannot be recorded, none is and the error lists the position of each invalid game.
+    Games whose idempotency key was already recorded are not created again: their position holds
+    the recorded game. With shards, the games of each shard are recorded in a transaction of their own.
+
+    Args:
+        games (List[schemas.GameCreate]): The games to create.
+
+    Returns:
+        List[schemas.Game]: The created games, in the same order.
+    """
+    created_games = await record_games(games)
+    for created_game in created_games:
+        created_game.pop("replayed", None)
+    return fast_response(created_games)
+
+
+@router.get("/historial", response_model=List[schemas.Game])
+def get_history(after_id: int = Query(0, ge=0),
+                limit: int = Query(100, ge=1, le=1000),
+                db: Session = Depends(get_read_db)):
+    """Retrieve a page of the games played, oldest first.
+
+    Args:
+        after_id (int): Id of the last game of the previous page, 0 for the first page.
+        limit (int): Maximum number of games of the page (1-1000).
+        db (Session): The database session dependency.
+
+    Returns:
+        List[schemas.Game]: The games of the page.
+    """
+    return fast_response(shards.get_history(db=db, after_id=after_id, limit=limit))
+
+
+@router.get("/archivo")
+def export_archive():
+    """Export the games moved to the archive, oldest first, as JSON lines.
+
+    The games are read one segment at a time while they are sent. `/game/historial` only
+    pages through the games still in the database.
+
+    Returns:
+        StreamingResponse: An `application/x-ndjson` response with one game per line.
+    """
+    def lines():
+        for game in archive.iter_archived_games():
+            yield json.dumps(game) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.get("/changes", response_model=schemas.Changes)
+async def get_changes(since: str = Query("0", description="Cursor returned by the previous request, 0 to start from the first game."),
+                      limit: int = Query(100, ge=1, le=1000),
+                      wait: float = Query(changes.CHANGES_WAIT, ge=0, le=changes.CHANGES_MAX_WAIT)):
+    """Retrieve the games recorded after a cursor, oldest first, to tail the database.
+
+    If there are none, the request waits up to `wait` seconds for the next one, see `changes`.
+
+    Args:
+        since (str): Cursor of the last batch received, 0 for the first one.
+        limit (int): Maximum number of games of the batch (1-1000).
+        wait (float): Seconds to wait when there are no new games, 0 to answer at once.
+
+    Returns:
+        schemas.Changes: The games and the cursor of the next request.
+    """
+    try:
+        positions = changes.parse_cursor(since, len(shards.shards))
+    except ValueError as error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(error))
+    return fast_response(await changes.wait_for_changes(positions, limit, wait))
 
 
 @router.get("/get_global_info", response_model=schemas.GlobalInfo)
-def get_global_info(db: Session = Depends(get_db)):
+def get_global_info(window: Optional[str] = WINDOW_QUERY, player: Optional[str] = PLAYER_QUERY,
+                    db: Session = Depends(get_read_db)):
     """ Retrieve global game information.
 
     Args:
+        window (str, optional): Only count the games of the last period, read from the rollups.
+        player (str, optional): Only count the games of this player.
         db (Session): The database session dependency.
 
     Returns:
         schemas.GlobalInfo: An object containing global game information.
     """
-    return crud.get_global_info(db=db)
+    return shards.get_global_info(db=db, window=window and rollups.parse_window(window), player=player)
 
 
 @router.get("/mano_fuerte", response_model=schemas.StrongHandInfo)
-def get_strong_hand(db: Session = Depends(get_db)):
+def get_strong_hand(db: Session = Depends(get_read_db)):
     """Get information about the strong hand in the game.
 
     Args:
@@ -62,11 +253,11 @@ def get_strong_hand(db: Session = Depends(get_db)):
     Returns:
         schemas.StrongHandInfo: Information about the strong hand.
     """
-    return crud.get_strong_hand(db=db)
+    return shards.get_strong_hand(db=db, hand_stats=hand_stats)
 
 
 @router.get("/mano_debil", response_model=schemas.WeakHandInfo)
-def get_weak_hand_info(db: Session = Depends(get_db)):
+def get_weak_hand_info(db: Session = Depends(get_read_db)):
     """Get information about the weak hand in the game.
 
     Args:
@@ -75,30 +266,106 @@ def get_weak_hand_info(db: Session = Depends(get_db)):
     Returns:
         schemas.WeakHandInfo: Information about the weak hand.
     """
-    return crud.get_weak_hand(db)
+    return shards.get_weak_hand(db, hand_stats=hand_stats)
 
 
 @router.get("/ranking", response_model= List[schemas.PlayerInfo])
-def get_ranking(db: Session = Depends(get_db)):
+def get_ranking(window: Optional[str] = WINDOW_QUERY, player: Optional[str] = PLAYER_QUERY,
+                db: Session = Depends(get_read_db)):
     """Retrieve the ranking of players.
 
     Args:
+        window (str, optional): Only count the games of the last period, read from the rollups.
+        player (str, optional): Only count the games of this player.
         db (Session): The database session dependency.
 
     Returns:
         List[schemas.PlayerInfo]: A list of players and their ranking information.
     """
-    return crud.get_ranking(db=db)
+    return shards.get_ranking(db=db, window=window and rollups.parse_window(window), player=player)
 
 
 @router.get("/estadisticas", response_model=schemas.Statistics)
-def get_statistics(db: Session = Depends(get_db)):
+def get_statistics(window: Optional[str] = WINDOW_QUERY, player: Optional[str] = PLAYER_QUERY,
+                   db: Session = Depends(get_read_db)):
     """Retrieve game statistics.
 
     Args:
+        window (str, optional): Only count the games of the last period, read from the rollups.
+        player (str, optional): Only count the games of this player.
         db (Session): The database session dependency.
 
     Returns:
         schemas.Statistics: An object containing game statistics.
     """
-    return crud.get_statistics(db=db)
\ No newline at end of file
+    return shards.get_statistics(db=db, window=window and rollups.parse_window(window), player=player)
+
+
+@router.get("/dashboard", response_model=schemas.Dashboard)
+def get_dashboard(db: Session = Depends(get_read_db)):
+    """Retrieve all the statistics of the other routes, over all time, in a single request.
+
+    Args:
+        db (Session): The database session dependency.
+
+    Returns:
+        schemas.Dashboard: Global information, statistics, ranking, strong hand and weak hand.
+    """
+    return shards.get_dashboard(db=db, hand_stats=hand_stats)
+
+
+@router.get("/transiciones", response_model=schemas.Transitions)
+def get_transitions(player: Optional[str] = PLAYER_QUERY, db: Session = Depends(get_read_db)):
+    """Retrieve how often player 1 follows each of its moves with each move in the next round.
+
+    The counts are cached until a game is recorded or archived.
+
+    Args:
+        player (str, optional): Only count the games of this player.
+        db (Session): The database session dependency.
+
+    Returns:
+        schemas.Transitions: The transitions between moves and the repeat percentage.
+    """
+    return shards.get_transitions(db=db, player=player)
+
+
+@router.get("/rondas", response_model=schemas.RoundStatistics)
+def get_round_statistics(player: Optional[str] = PLAYER_QUERY, db: Session = Depends(get_read_db)):
+    """Retrieve the percentage of rounds won by player 1 and tied, overall and by round number.
+
+    The counts are cached until a game is recorded or archived.
+
+    Args:
+        player (str, optional): Only count the games of this player.
+        db (Session): The database session dependency.
+
+    Returns:
+        schemas.RoundStatistics: The statistics of all the rounds and of each round number.
+    """
+    return shards.get_round_statistics(db=db, player=player)
+
+
+@router.get("/predict", response_model=schemas.Prediction)
+def predict_move(player: str = Query("Human", description="Player 1 of the games, e.g. Human or Machine_1."),
+                 moves: List[Literal["rock", "paper", "scissors"]] = Query(
+                     [], description="Last moves of the player, oldest first. Defaults to those of its recorded games."),
+                 db: Session = Depends(get_read_db)):
+    """Predict the next move of a player from the moves of its recorded games, and the move of
+    the machine least likely to lose against it.
+
+    Args:
+        player (str): The player.
+        moves (List[str]): The last moves of the player, e.g. `?moves=rock&moves=paper`.
+        db (Session): The database session dependency.
+
+    Returns:
+        schemas.Prediction: The predicted move and the counter move of the machine.
+
+    Raises:
+        HTTPException: 501 with shards, whose games the predictor cannot apply in order.
+    """
+    if len(shards.shards) > 1:
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED,
+                            detail="The predictor is not available with DATABASE_SHARDS")
+    return crud.get_prediction(db=db, predictor=predictor, player=player, recent_moves=moves)
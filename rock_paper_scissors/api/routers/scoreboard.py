@@ -0,0 +1,90 @@
+import asyncio
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+
+from rock_paper_scissors.api import scoreboard
+from rock_paper_scissors.api.database import ReadSessionLocal
+
+
+router = APIRouter(prefix="/game/scoreboard", tags=["scoreboard"])
+
+"""
+API Router for the live scoreboard.
+
+Dashboards connect once and receive an event every time a game is recorded, instead of
+polling the statistics. The first event holds the current totals; then every game sends
+its winner, moves and the new totals.
+
+Endpoints:
+    WEBSOCKET /game/scoreboard/ws - Events as WebSocket text messages
+    GET /game/scoreboard/stream   - Events as Server-Sent Events
+"""
+
+# Seconds without games after which a comment is sent on the SSE stream, so proxies keep it open.
+KEEPALIVE_INTERVAL = 15
+
+
+async def current_totals() -> str:
+    """Encodes the totals event sent to a dashboard when it connects, read from the rollups."""
+    def load():
+        with ReadSessionLocal() as db:
+            return scoreboard.load_totals(db)
+
+    totals = await run_in_threadpool(load)
+    return scoreboard.encode(scoreboard.broadcaster.totals_event(totals))
+
+
+@router.websocket("/ws")
+async def scoreboard_websocket(websocket: WebSocket):
+    """Send the scoreboard events to a WebSocket client.
+
+    A client that does not read its messages fast enough is disconnected with the
+    code 1013 (try again later).
+
+    Args:
+        websocket (WebSocket): The connection with the dashboard.
+    """
+    await websocket.accept()
+    subscriber = scoreboard.broadcaster.subscribe()
+    try:
+        await websocket.send_text(await current_totals())
+        while True:
+            message = await subscriber.next()
+            if message is None:
+                await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+                return
+            await websocket.send_text(message)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        scoreboard.broadcaster.unsubscribe(subscriber)
+
+
+@router.get("/stream")
+async def scoreboard_stream():
+    """Send the scoreboard events as Server-Sent Events.
+
+    A client that does not read its events fast enough sees the stream closed.
+
+    Returns:
+        StreamingResponse: A `text/event-stream` response that lasts until the client disconnects.
+    """
+    subscriber = scoreboard.broadcaster.subscribe()
+
+    async def events():
+        try:
+            yield f"data: {await current_totals()}\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscriber.next(), KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if message is None:
+                    return
+                yield f"data: {message}\n\n"
+        finally:
+            scoreboard.broadcaster.unsubscribe(subscriber)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
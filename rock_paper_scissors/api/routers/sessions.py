@@ -0,0 +1,104 @@
+from fastapi import APIRouter, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from typing import Optional
+
+from rock_paper_scissors.api import schemas, sessions, validation
+from rock_paper_scissors.api.database import ReadSessionLocal
+from rock_paper_scissors.api.responses import fast_response
+from rock_paper_scissors.api.routers.game import invalid_games, record_games
+from rock_paper_scissors.api.predictor import predictor
+from rock_paper_scissors.api.sessions import play_move, session_store
+
+
+router = APIRouter(prefix="/game/sesion",
+                   tags=["session"],
+                   responses={status.HTTP_404_NOT_FOUND: {"message": "No encontrado"}})
+
+"""
+API Router for games played round by round on the server.
+
+The client opens a session, then sends its moves one by one and receives the move of the
+machine and the result of each round. When the game finishes (three rounds, or the player
+gives up) it is recorded as if it had been sent to POST /game/.
+
+The routes are asynchronous and the sessions are kept in memory, so a round does not use
+the threadpool nor the database; only the finished game is written.
+
+Endpoints:
+    POST /game/sesion/                     - Start a game session
+    POST /game/sesion/{session_id}/jugada  - Play a round of a session
+"""
+
+
+@router.post("/", response_model=schemas.SessionInfo, status_code=status.HTTP_201_CREATED)
+async def start_session(session: Optional[schemas.SessionCreate] = None):
+    """Start a game session against the machine.
+
+    Args:
+        session (schemas.SessionCreate, optional): Name of the player. Defaults to Human.
+
+    Returns:
+        schemas.SessionInfo: The id of the session and the seconds it stays open without moves.
+    """
+    player = session.player if session else "Human"
+    game_session = session_store.create(player_1=player, player_2=validation.OPPONENTS[player])
+    if game_session is None:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Too many open sessions")
+
+    if sessions.MACHINE_STRATEGY == "predictor":
+        # The rounds only use the model in memory: it is built or updated now, in a thread.
+        await run_in_threadpool(load_model, player)
+
+    return {"session_id": game_session.session_id, "player": player, "expires_in": session_store.ttl}
+
+
+@router.post("/{session_id}/jugada", response_model=schemas.RoundResult)
+async def play_round(session_id: str, move: schemas.SessionMove):
+    """Play a round of a session.
+
+    Args:
+        session_id (str): The id returned when the session was started.
+        move (schemas.SessionMove): The move of the player, and whether to give up after this round.
+
+    Returns:
+        schemas.RoundResult: The moves and winner of the round. When the game is finished,
+        the recorded game too.
+    """
+    game_session = session_store.get(session_id)
+    if game_session is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Session not found or expired")
+
+    result = play_move(game_session, move.move, move.abandon)
+    if result["finished"]:
+        session_store.close(session_id)
+        result["game"] = await save_game(schemas.GameCreate(**game_session.to_game()))
+
+    return fast_response(result)
+
+
+def load_model(player: str):
+    """Builds the model of a player, or reads the games recorded since it was last used."""
+    with ReadSessionLocal() as db:
+        predictor.model(db, player)
+
+
+async def save_game(game: schemas.GameCreate) -> dict:
+    """Records a finished game through `routers.game.record_games`, holding the write lock of its shard.
+
+    The game is checked with `validation.validate_games` first, like the games sent to POST /game/.
+
+    Args:
+        game (schemas.GameCreate): The finished game.
+
+    Returns:
+        dict: The created game.
+
+    Raises:
+        HTTPException: 422 if the game is not valid.
+    """
+    try:
+        validation.validate_games([game])
+    except validation.InvalidGameError as error:
+        raise invalid_games(error, bulk=False)
+
+    return (await record_games([game]))[0]
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Literal, Optional
 
 
 # Schema definition for a movement
@@ -12,20 +12,32 @@ class Move(BaseModel):
         from_attributes = True
 
 
-# Schema definition to create a game
-class GameCreate(BaseModel):
+# Schema definition of the fields shared by a new game and a recorded one
+class GameBase(BaseModel):
     rounds_played: List[Move]
     game_winner: str
+    player: Optional[str] = None
+
+
+# Schema definition to create a game. The idempotency key is write-only: it is not returned.
+class GameCreate(GameBase):
+    idempotency_key: Optional[str] = None
 
 
 # Schema definition to get information of a game
-class Game(GameCreate):
+class Game(GameBase):
     id: int
 
     class Config:
         from_attributes = True
 
 
+# Schema definition of a batch of the change feed and the cursor of the next one
+class Changes(BaseModel):
+    games: List[Game]
+    cursor: str
+
+
 # Schema definition for global information
 class GlobalInfo(BaseModel):
     total_games: int
@@ -70,4 +82,76 @@ class Statistics(BaseModel):
     total_abandonments: int
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+# Schema definition of all the statistics shown by a dashboard
+class Dashboard(BaseModel):
+    global_info: GlobalInfo
+    statistics: Statistics
+    ranking: List[PlayerInfo]
+    strong_hand: StrongHandInfo
+    weak_hand: WeakHandInfo
+
+
+# Schema definition of the moves chosen by player 1 after each of its moves in a game
+class Transitions(BaseModel):
+    total_transitions: int
+    repeat_percentage: float
+    transitions: Dict[str, Dict[str, int]]
+
+
+# Schema definition of the rounds played in the same position of the games
+class RoundInfo(BaseModel):
+    round_number: int
+    total_rounds: int
+    win_percentage: float
+    tie_percentage: float
+
+
+# Schema definition of the statistics of the rounds, won by player 1 or tied
+class RoundStatistics(BaseModel):
+    total_rounds: int
+    win_percentage: float
+    tie_percentage: float
+    rounds: List[RoundInfo]
+
+
+# Schema definition of the next move predicted for a player and the counter move of the machine
+class Prediction(BaseModel):
+    player: str
+    predicted_move: Optional[str]
+    counter_move: str
+    probability_percentage: float
+    context: List[str]
+    total_moves: int
+
+
+# Schema definition to start a game session against the machine
+class SessionCreate(BaseModel):
+    # The players who can start a game, the keys of `validation.OPPONENTS`.
+    player: Literal["Human", "Machine_1"] = "Human"
+
+
+# Schema definition of an open game session
+class SessionInfo(BaseModel):
+    session_id: str
+    player: str
+    expires_in: float
+
+
+# Schema definition of a move in a game session
+class SessionMove(BaseModel):
+    move: Literal["rock", "paper", "scissors"]
+    abandon: bool = False
+
+
+# Schema definition of the result of a round of a game session
+class RoundResult(BaseModel):
+    session_id: str
+    round_number: int
+    player_1_move: str
+    player_2_move: str
+    winner: str
+    finished: bool
+    game: Optional[Game] = None
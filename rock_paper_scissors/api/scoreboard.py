@@ -0,0 +1,200 @@
+import asyncio
+from collections import Counter, deque
+import json
+import os
+import threading
+from typing import List, Optional
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from rock_paper_scissors.api import models, shards
+
+# Number of events a subscriber may have pending. A subscriber that falls further behind is dropped.
+SCOREBOARD_BUFFER = int(os.getenv("SCOREBOARD_BUFFER", "64"))
+
+# Games won by each winner, summed over the days of the daily rollup.
+WINS = select(models.DailyRollup.winner, func.sum(models.DailyRollup.total_games)).group_by(models.DailyRollup.winner)
+
+
+class Subscriber:
+    """A connected dashboard: a bounded buffer of encoded events and an event to wake it up.
+
+    Attributes:
+        messages (deque): Encoded events waiting to be sent.
+        size (int): Maximum number of pending events.
+        ready (asyncio.Event): Set when there are messages or the subscriber was dropped.
+        dropped (bool): True if the subscriber was disconnected for being too slow.
+    """
+    __slots__ = ("messages", "size", "ready", "dropped")
+
+    def __init__(self, size: int):
+        self.messages = deque()
+        self.size = size
+        self.ready = asyncio.Event()
+        self.dropped = False
+
+    def push(self, message: str) -> bool:
+        """Adds a message to the buffer.
+
+        Returns:
+            bool: False if the buffer is full.
+        """
+        if len(self.messages) >= self.size:
+            return False
+        self.messages.append(message)
+        self.ready.set()
+        return True
+
+    def drop(self):
+        """Discards the pending messages and wakes the subscriber up so it disconnects."""
+        self.dropped = True
+        self.messages.clear()
+        self.ready.set()
+
+    async def next(self) -> Optional[str]:
+        """Waits for the next message.
+
+        Returns:
+            Optional[str]: The encoded event, or None if the subscriber was dropped.
+        """
+        while not self.messages:
+            if self.dropped:
+                return None
+            self.ready.clear()
+            await self.ready.wait()
+        return self.messages.popleft()
+
+
+class Broadcaster:
+    """Fans out the games recorded by this process to the connected dashboards.
+
+    Every event is encoded once and the same string is queued for every subscriber, so the cost
+    of a game grows with the number of dashboards but nothing runs between games. The scoreboard
+    only sends the games created by its own process: with several workers, each dashboard
+    receives the games of the worker it is connected to. The totals are read again from the
+    daily rollups with every publication, so they include the games of the other workers and
+    of the maintenance commands (quarantine, archive).
+
+    Attributes:
+        totals (Counter): Number of games won by each player after the last publication, or None
+            until this process publishes a game to a subscriber.
+    """
+
+    def __init__(self, buffer_size: int = SCOREBOARD_BUFFER):
+        self.buffer_size = buffer_size
+        self.totals = None
+        self._subscribers = set()
+        self._loop = None
+        self._lock = threading.Lock()
+
+    @property
+    def subscribers(self) -> int:
+        """Number of connected subscribers."""
+        return len(self._subscribers)
+
+    def subscribe(self) -> Subscriber:
+        """Registers a new subscriber. Must be called from the event loop."""
+        self._loop = asyncio.get_running_loop()
+        subscriber = Subscriber(self.buffer_size)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        """Removes a subscriber. Must be called from the event loop."""
+        self._subscribers.discard(subscriber)
+
+    def publish_games(self, db: Session, games: List[dict]):
+        """Reloads the totals and sends one event per game to the subscribers.
+
+        It is called by the routes that create games, after the commit and the write locks are
+        released. Without subscribers nothing is read. The writers of several shards publish at
+        the same time, so the totals are updated under a lock of their own.
+
+        Args:
+            db (Session): Database session, used to read the totals.
+            games (List[dict]): The created games, as returned by `crud.create_game`.
+        """
+        if not self._subscribers or self._loop is None:
+            return
+
+        # The games are already committed, so they are included in the loaded totals: each event
+        # holds the totals up to its game.
+        with self._lock:
+            totals = load_totals(db)
+            self.totals = totals - Counter(game["game_winner"] for game in games)
+
+            messages = []
+            for game in games:
+                self.totals[game["game_winner"]] += 1
+                messages.append(encode(self.game_event(game)))
+            self.totals = totals
+
+            self._loop.call_soon_threadsafe(self._fan_out, messages)
+
+    def game_event(self, game: dict) -> dict:
+        """Builds the compact event of a new game, with the totals after it."""
+        return {
+            "type": "game",
+            "id": game["id"],
+            "player": game.get("player"),
+            "winner": game["game_winner"],
+            "moves": [
+                [round_info["player_1_move"], round_info["player_2_move"], round_info["winner"]]
+                for round_info in game["rounds_played"]
+            ],
+            "totals": self.totals_event()["totals"]
+        }
+
+    def totals_event(self, totals: Optional[Counter] = None) -> dict:
+        """Builds the event with the current totals, sent to a dashboard when it connects."""
+        totals = self.totals if totals is None else totals
+        return {
+            "type": "totals",
+            "totals": {"total_games": sum(totals.values()), "wins": dict(totals)}
+        }
+
+    def _fan_out(self, messages: List[str]):
+        for subscriber in list(self._subscribers):
+            for message in messages:
+                if not subscriber.push(message):
+                    subscriber.drop()
+                    self._subscribers.discard(subscriber)
+                    break
+
+
+def load_totals(db: Session) -> Counter:
+    """Counts the games won by each player, on every shard, from the daily rollups.
+
+    The rollups keep counting the archived games and lose the quarantined ones, and hold a row
+    per day, player and winner, so the games themselves are not read.
+
+    Args:
+        db (Session): Database session to interact with the database.
+
+    Returns:
+        Counter: Number of games won by each player.
+    """
+    if len(shards.shards) == 1:
+        partials = [db.execute(WINS).all()]
+    else:
+        partials = shards.fan_out(db, lambda shard_db, shard: shard_db.execute(WINS).all())
+    totals = Counter()
+    for rows in partials:
+        for winner, total_games in rows:
+            if total_games:
+                totals[winner] += total_games
+    return totals
+
+
+def encode(event: dict) -> str:
+    """Encodes an event as compact JSON.
+
+    Examples:
+        >>> encode({"type": "game", "winner": "Human"})
+        '{"type":"game","winner":"Human"}'
+    """
+    return json.dumps(event, separators=(",", ":"))
+
+
+# Broadcaster of the process.
+broadcaster = Broadcaster()
@@ -0,0 +1,167 @@
+from collections import Counter
+from typing import Optional
+
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import Session
+
+from rock_paper_scissors.api import archive, models
+
+# Counts the rounds of the games by their position in the game and by the previous move of
+# player 1, so the transitions between moves, the repeat rate, the tie rate and the win rate
+# of each round are derived without loading the moves in Python.
+
+
+class SequenceCounts:
+    """Rounds counted by (player, round number, previous move of player 1, move of player 1).
+
+    The previous move is None in the first round of a game. `player` is player 1 of the game.
+
+    Attributes:
+        rounds (Counter): Number of rounds of each key.
+        wins (Counter): Number of those rounds won by player 1.
+        ties (Counter): Number of those rounds where both players chose the same move.
+    """
+
+    def __init__(self):
+        self.rounds = Counter()
+        self.wins = Counter()
+        self.ties = Counter()
+
+    def add(self, key: tuple, rounds: int, wins: int, ties: int):
+        self.rounds[key] += rounds
+        self.wins[key] += wins
+        self.ties[key] += ties
+
+    def update(self, other: "SequenceCounts"):
+        self.rounds.update(other.rounds)
+        self.wins.update(other.wins)
+        self.ties.update(other.ties)
+
+    def keys(self, player: Optional[str] = None) -> list:
+        """Returns the keys of the rounds of a player, or of every player."""
+        return [key for key in self.rounds if player is None or key[0] == player]
+
+    def transitions(self, player: Optional[str] = None) -> Counter:
+        """Counts how often player 1 follows a move with another, by (previous move, move).
+
+        Examples:
+            >>> counts = SequenceCounts()
+            >>> counts.add(('Human', 1, None, 'rock'), 5, 2, 1)
+            >>> counts.add(('Human', 2, 'rock', 'paper'), 3, 1, 0)
+            >>> counts.add(('Human', 3, 'rock', 'paper'), 1, 0, 1)
+            >>> counts.transitions()
+            Counter({('rock', 'paper'): 4})
+        """
+        transitions = Counter()
+        for key in self.keys(player):
+            if key[2] is not None:
+                transitions[(key[2], key[3])] += self.rounds[key]
+        return transitions
+
+    def by_round(self, player: Optional[str] = None) -> dict:
+        """Counts the rounds, wins of player 1 and ties by round number.
+
+        Returns:
+            dict: Tuples (rounds, wins, ties) by round number.
+        """
+        totals = {}
+        for key in self.keys(player):
+            rounds, wins, ties = totals.get(key[1], (0, 0, 0))
+            totals[key[1]] = (rounds + self.rounds[key], wins + self.wins[key], ties + self.ties[key])
+        return dict(sorted(totals.items()))
+
+
+def count_sequences(db: Session) -> SequenceCounts:
+    """Counts the rounds of the games stored in the database, in a single query.
+
+    The rounds of each game are ordered by id with window functions. The index on `moves.game_id`
+    holds the id of each move too, so SQLite reads the moves of each game in order from the index
+    and does not sort them.
+
+    Args:
+        db (Session): Database session to interact with the database.
+
+    Returns:
+        SequenceCounts: The rounds of the stored games.
+    """
+    in_game = {"partition_by": models.Move.game_id, "order_by": models.Move.id}
+    numbered = select(
+        models.Game.player,
+        func.row_number().over(**in_game).label("round_number"),
+        func.lag(models.Move.player_1_move).over(**in_game).label("previous_move"),
+        models.Move.player_1_move,
+        case((models.Move.winner == models.Game.player, 1), else_=0).label("won"),
+        case((models.Move.player_1_move == models.Move.player_2_move, 1), else_=0).label("tie"),
+    ).join(models.Game, models.Game.id == models.Move.game_id).subquery()
+
+    rows = db.execute(
+        select(numbered.c.player, numbered.c.round_number, numbered.c.previous_move, numbered.c.player_1_move,
+               func.count(), func.sum(numbered.c.won), func.sum(numbered.c.tie))
+        .group_by(numbered.c.player, numbered.c.round_number, numbered.c.previous_move, numbered.c.player_1_move)
+    ).all()
+
+    counts = SequenceCounts()
+    for player, round_number, previous_move, move, rounds, wins, ties in rows:
+        counts.add((player, round_number, previous_move, move), rounds, wins, ties)
+    return counts
+
+
+def count_games(games) -> SequenceCounts:
+    """Counts the rounds of games with the shape of `archive.read_segment`, as `count_sequences` does.
+
+    Examples:
+        >>> games = [{"player": "Human", "rounds_played": [
+        ...     {"player_1_move": "rock", "player_2_move": "rock", "winner": "Machine"},
+        ...     {"player_1_move": "paper", "player_2_move": "rock", "winner": "Human"}]}]
+        >>> counts = count_games(games)
+        >>> counts.by_round()
+        {1: (1, 0, 1), 2: (1, 1, 0)}
+    """
+    counts = SequenceCounts()
+    for game in games:
+        previous_move = None
+        for round_number, move in enumerate(game["rounds_played"], start=1):
+            counts.add((game["player"], round_number, previous_move, move["player_1_move"]), 1,
+                       int(move["winner"] == game["player"]), int(move["player_1_move"] == move["player_2_move"]))
+            previous_move = move["player_1_move"]
+    return counts
+
+
+_cache = {}
+
+
+def get_sequences(db: Session, archived: bool = True) -> SequenceCounts:
+    """Returns the rounds of every game, stored or archived, counted by `count_sequences`.
+
+    The counts are cached until a game is recorded or archived: the key is the database, its
+    highest move id and the list of segments of the archive, read with one indexed lookup and a
+    directory listing, so every worker sees the games recorded by the others. The archived games
+    are counted once per list of segments. Games removed by the integrity scan are seen after
+    the next game is recorded.
+
+    Args:
+        db (Session): Database session to interact with the database.
+        archived (bool): Whether to count the archived games too. With shards, only one shard
+            counts them. Defaults to True.
+
+    Returns:
+        SequenceCounts: The rounds of all the games. It must not be modified.
+    """
+    totals = archive.archive_totals() if archived else None
+    segment_names = tuple(segment.name for segment in totals.segments) if archived else None
+    url = str(db.get_bind().url)
+    key = (db.query(func.max(models.Move.id)).scalar(), segment_names)
+
+    cached = _cache.get(("sequences", url))
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    counts = count_sequences(db)
+    if archived:
+        archived_counts = _cache.get("archived")
+        if archived_counts is None or archived_counts[0] != segment_names:
+            archived_counts = (segment_names, count_games(archive.iter_archived_games(segments=totals.segments)))
+        counts.update(archived_counts[1])
+        _cache["archived"] = archived_counts
+    _cache[("sequences", url)] = (key, counts)
+    return counts
@@ -0,0 +1,193 @@
+from collections import OrderedDict
+import os
+import secrets
+import time
+from typing import Optional
+
+from rock_paper_scissors.api.predictor import predictor
+from rock_paper_scissors.game_logic import ROUND_OUTCOMES, TOTAL_ROUNDS, get_machine_move
+
+# Seconds a session stays open without moves.
+SESSION_TTL = float(os.getenv("SESSION_TTL", "300"))
+# Maximum number of open sessions of a process.
+SESSION_MAX = int(os.getenv("SESSION_MAX", "100000"))
+# How the machine chooses its moves: "random" (default), as in the console game, or "predictor",
+# the counter move of the next move predicted for the player by `predictor.predictor`.
+MACHINE_STRATEGY = os.getenv("MACHINE_STRATEGY", "random")
+
+
+class GameSession:
+    """A game played round by round against the machine.
+
+    Attributes:
+        session_id (str): Identifier sent to the client.
+        player_1 (str): Name of the human player.
+        player_2 (str): Name of the machine.
+        rounds (list): Rounds played, as tuples (player_1_move, player_2_move, winner).
+        player_1_wins (int): Rounds won by player 1.
+        expires_at (float): Monotonic time after which the session is discarded.
+    """
+    __slots__ = ("session_id", "player_1", "player_2", "rounds", "player_1_wins", "expires_at")
+
+    def __init__(self, session_id: str, player_1: str, player_2: str, expires_at: float):
+        self.session_id = session_id
+        self.player_1 = player_1
+        self.player_2 = player_2
+        self.rounds = []
+        self.player_1_wins = 0
+        self.expires_at = expires_at
+
+    def play_round(self, player_1_move: str, player_2_move: str) -> str:
+        """Records a round and returns its winner, as `game_logic.determine_round_winner`.
+
+        Examples:
+            >>> session = GameSession("id", "Human", "Machine", 0)
+            >>> session.play_round("rock", "scissors")
+            'Human'
+            >>> session.play_round("rock", "rock")
+            'Machine'
+            >>> session.rounds
+            [('rock', 'scissors', 'Human'), ('rock', 'rock', 'Machine')]
+        """
+        if ROUND_OUTCOMES[(player_1_move, player_2_move)]:
+            winner = self.player_1
+            self.player_1_wins += 1
+        else:
+            winner = self.player_2
+        self.rounds.append((player_1_move, player_2_move, winner))
+        return winner
+
+    @property
+    def game_winner(self) -> str:
+        """Winner of the game, as `game_logic.get_game_information`: player 1 must win most
+        of the three rounds; an abandoned game is won by player 2."""
+        player_2_wins = len(self.rounds) - self.player_1_wins
+        if self.player_1_wins > player_2_wins and len(self.rounds) == TOTAL_ROUNDS:
+            return self.player_1
+        return self.player_2
+
+    def to_game(self) -> dict:
+        """Returns the game in the shape of `schemas.GameCreate`."""
+        return {
+            "rounds_played": [
+                {"player_1_move": player_1_move, "player_2_move": player_2_move, "winner": winner}
+                for player_1_move, player_2_move, winner in self.rounds
+            ],
+            "game_winner": self.game_winner,
+            "player": self.player_1
+        }
+
+
+class SessionStore:
+    """Open sessions of the process, discarded after `ttl` seconds without moves.
+
+    Every access moves the session to the end of an ordered dictionary and extends its
+    expiration by the same `ttl`, so the sessions are sorted by expiration and the expired
+    ones are always at the beginning: evicting them costs nothing when none has expired.
+    Sessions live in the memory of a process; with several workers, the moves of a session
+    must reach the worker that created it (e.g. with sticky sessions in the load balancer).
+    """
+
+    def __init__(self, ttl: float = SESSION_TTL, max_sessions: int = SESSION_MAX, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.clock = clock
+        self._sessions = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def create(self, player_1: str = "Human", player_2: str = "Machine") -> Optional[GameSession]:
+        """Opens a new session.
+
+        Returns:
+            Optional[GameSession]: The new session, or None if the store is full.
+        """
+        now = self.clock()
+        self.evict_expired(now)
+        if len(self._sessions) >= self.max_sessions:
+            return None
+
+        session = GameSession(secrets.token_urlsafe(12), player_1, player_2, now + self.ttl)
+        self._sessions[session.session_id] = session
+        return session
+
+    def get(self, session_id: str) -> Optional[GameSession]:
+        """Returns an open session and extends its expiration.
+
+        Returns:
+            Optional[GameSession]: The session, or None if it does not exist or has expired.
+        """
+        now = self.clock()
+        self.evict_expired(now)
+        session = self._sessions.get(session_id)
+        if session is not None:
+            session.expires_at = now + self.ttl
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def close(self, session_id: str):
+        """Removes a session from the store."""
+        self._sessions.pop(session_id, None)
+
+    def evict_expired(self, now: float):
+        """Removes the sessions whose expiration has passed."""
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if session.expires_at > now:
+                return
+            self._sessions.popitem(last=False)
+
+
+def machine_move(session: GameSession) -> str:
+    """Chooses the move of the machine for the next round of a session, before seeing the move of the player.
+
+    With the "predictor" strategy, the machine plays the counter move of the move predicted after
+    the last moves of the player: those of its recorded games, then those of the session. The
+    model of the player is only used if it is in memory, so a round never reads the database;
+    otherwise, and with the "random" strategy, the move is random.
+
+    Args:
+        session (GameSession): The session being played.
+
+    Returns:
+        str: The move of the machine.
+    """
+    if MACHINE_STRATEGY == "predictor":
+        model = predictor.cached_model(session.player_1)
+        if model is not None:
+            recent_moves = model.last_moves + tuple(player_1_move for player_1_move, _, _ in session.rounds)
+            predicted_move, counter_move, _, _ = model.predict(recent_moves)
+            if predicted_move is not None:
+                return counter_move
+    return get_machine_move()
+
+
+def play_move(session: GameSession, player_1_move: str, abandon: bool = False) -> dict:
+    """Plays a round of a session against a machine move, as `game_logic.play_rounds`.
+
+    Args:
+        session (GameSession): The session being played.
+        player_1_move (str): Move of the human player.
+        abandon (bool): If True, the player gives up the game after this round. As in
+            `game_logic.is_round_abandoned`, it is ignored in the last round. Defaults to False.
+
+    Returns:
+        dict: The round number, both moves, the winner of the round and whether the game is finished.
+    """
+    player_2_move = machine_move(session)
+    winner = session.play_round(player_1_move, player_2_move)
+    round_number = len(session.rounds)
+
+    return {
+        "session_id": session.session_id,
+        "round_number": round_number,
+        "player_1_move": player_1_move,
+        "player_2_move": player_2_move,
+        "winner": winner,
+        "finished": round_number == TOTAL_ROUNDS or abandon
+    }
+
+
+# Sessions of the process.
+session_store = SessionStore()
@@ -0,0 +1,430 @@
+import asyncio
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AsyncExitStack, asynccontextmanager
+from datetime import timedelta
+import itertools
+import logging
+import os
+import threading
+from typing import Callable, Dict, Iterable, List, Optional
+import zlib
+
+from sqlalchemy import column, select, table
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from rock_paper_scissors.api import analytics, crud, database, models, rollups, schemas, sequences, sessions
+from rock_paper_scissors.api.hand_stats import MAX_GAME_ID, HandStats
+
+# Spreads the games over several SQLite databases, the shards, so the writers of different
+# shards do not wait for the same write lock. The first shard is DATABASE_URL; the others are
+# listed in DATABASE_SHARDS. Each shard has its own write lock in the process, taken by the routes
+# once they know the shards of their games, so the writers of different shards of a worker do
+# not wait for each other either. Each game, with its moves and its rollups, is recorded in one shard:
+# - a game with an idempotency key in the shard chosen by a hash of the key, so an upload that
+#   is repeated finds the recorded game;
+# - the games of an upload without a key in the next shard, round-robin, so an upload is one
+#   transaction and the uploads of the workers write in different shards at the same time.
+# The shard `i` of `n` gives its games the ids that are `i` modulo `n`, so the ids are unique
+# over all the shards and the games of every shard can be read after an id. The routes that
+# read the games ask every shard at once, in threads, and merge their counts.
+#
+# The transitions and the rounds are counted on every shard too, and the archiver and the
+# integrity scan go through every shard; the archive of all the shards is a single directory,
+# counted once. The hand statistics kept in memory only follow the first shard, so with shards
+# the hands are counted on every shard instead. The predictor applies the games of a player in
+# id order, which the shards do not commit in: with shards, /game/predict answers 501 and the
+# machine plays random moves. The bulk loader refuses to run with shards.
+
+logger = logging.getLogger(__name__)
+
+# Comma-separated URLs of the databases of the other shards, e.g.
+# "sqlite:///./rock_paper_scissors.1.db,sqlite:///./rock_paper_scissors.2.db". Empty, the
+# default, keeps every game in DATABASE_URL. The shards must not change once they hold games.
+DATABASE_SHARDS = os.getenv("DATABASE_SHARDS", "")
+
+# Highest id of the games and last id given by the shard, which the sequence of AUTOINCREMENT
+# keeps once the newest games are archived.
+sqlite_sequence = table("sqlite_sequence", column("name"), column("seq"))
+HIGHEST_GAME_IDS = select(
+    MAX_GAME_ID.scalar_subquery(),
+    select(sqlite_sequence.c.seq).where(sqlite_sequence.c.name == "games").scalar_subquery()
+)
+
+
+def next_game_id(after: int, index: int, count: int) -> int:
+    """Returns the first id greater than `after` of the shard `index` of `count`.
+
+    Examples:
+        >>> next_game_id(0, 0, 3)
+        3
+        >>> next_game_id(7, 2, 3)
+        8
+        >>> next_game_id(8, 2, 3)
+        11
+    """
+    return after + 1 + (index - after - 1) % count
+
+
+def shard_of_key(key: str, count: int) -> int:
+    """Returns the shard of the games with an idempotency key, the same in every process.
+
+    Examples:
+        >>> shard_of_key("9f86d081884c7d659a2feaa0c55ad015", 4)
+        2
+    """
+    return zlib.crc32(key.encode()) % count
+
+
+class Shard:
+    """One of the databases the games are spread over.
+
+    Attributes:
+        index (int): Position of the shard; its games have the ids that are `index` modulo `count`.
+        count (int): Number of shards.
+        engine (Engine): Engine of the database.
+        read_engine (Engine): Engine of the routes that only read, see `database.READ_ENGINE`.
+        SessionLocal (sessionmaker): Sessions that write, taking the write lock up front.
+        ReadSessionLocal (sessionmaker): Sessions that only read.
+        first_engine (Engine): Engine of the first shard, which may hold games of any id
+            recorded before the shards were added.
+        lock (threading.Lock): Serializes the threads writing in the shard.
+        write_lock (asyncio.Lock): Serializes the requests writing in the shard, on the event
+            loop, see `database.write_lock`, which is the one of the first shard.
+    """
+
+    def __init__(self, index: int, count: int, engine: Engine, read_engine: Engine,
+                 first_engine: Optional[Engine] = None, write_lock: Optional[asyncio.Lock] = None):
+        self.index = index
+        self.count = count
+        self.engine = engine
+        self.read_engine = read_engine
+        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False,
+                                         bind=engine.execution_options(sqlite_begin="IMMEDIATE"))
+        self.ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+        self.first_engine = first_engine or engine
+        self.lock = threading.Lock()
+        self.write_lock = write_lock or asyncio.Lock()
+
+    def assign_ids(self, db: Session, count: int) -> Iterable[int]:
+        """Returns the ids of `count` new games, for `crud.create_games`.
+
+        They follow the highest id the shard has given, which the write transaction of `db` keeps
+        stable, even if those games were archived. The first games of an empty shard follow every
+        game of the first shard.
+
+        Args:
+            db (Session): Session of the shard, in its write transaction.
+            count (int): Number of games.
+
+        Returns:
+            Iterable[int]: The ids, in increasing order.
+        """
+        highest = highest_game_id(db)
+        if highest is None and self.first_engine is not self.engine:
+            with self.first_engine.connect() as connection:
+                highest = highest_game_id(connection)
+        first_id = next_game_id(highest or 0, self.index, self.count)
+        return range(first_id, first_id + count * self.count, self.count)
+
+
+def highest_game_id(db) -> Optional[int]:
+    """Returns the highest id given to a game of a database, archived or not, or None if there is none.
+
+    Args:
+        db (Session or Connection): Session or connection of the database.
+    """
+    ids = [game_id for game_id in db.execute(HIGHEST_GAME_IDS).one() if game_id is not None]
+    return max(ids) if ids else None
+
+
+def create_shards(urls: List[str]) -> List[Shard]:
+    """Creates the shards: the database of the application, then one per URL.
+
+    Args:
+        urls (List[str]): SQLAlchemy URLs of the databases of the other shards.
+
+    Returns:
+        List[Shard]: The shards, the first one using the engines of `database`.
+    """
+    count = len(urls) + 1
+    shards = [Shard(0, count, database.engine, database.read_engine, write_lock=database.write_lock)]
+    for index, url in enumerate(urls, start=1):
+        engine = database.create_db_engine(url)
+        # The read snapshot is only made of the first shard; the others are read in place.
+        path = database.sqlite_file_path(url)
+        if database.READ_ENGINE == "primary" or path is None:
+            read_engine = engine
+        else:
+            read_engine = database.create_db_engine(database.read_only_url(path), read_only=True)
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=lambda engine=engine: engine.dispose(close=False))
+            os.register_at_fork(after_in_child=lambda engine=read_engine: engine.dispose(close=False))
+        shards.append(Shard(index, count, engine, read_engine, first_engine=database.engine))
+    return shards
+
+
+def init_shards():
+    """Creates the schema in the databases of the other shards, as `database.init_db` does in the first."""
+    for shard in shards[1:]:
+        database.init_db(shard.engine)
+
+
+# Runs the work of every shard of a request at the same time.
+executor = ThreadPoolExecutor(thread_name_prefix="shards")
+
+# Shard of the games without an idempotency key of the next upload. It starts at a different
+# shard in every worker process.
+round_robin = itertools.count(os.getpid())
+
+
+def reset_after_fork():
+    """Gives a forked worker its own executor, the threads of the parent are not copied, and its own round-robin."""
+    global executor, round_robin
+    executor = ThreadPoolExecutor(thread_name_prefix="shards")
+    round_robin = itertools.count(os.getpid())
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=reset_after_fork)
+
+
+def fan_out(db: Optional[Session], function: Callable[[Session, Shard], object]) -> list:
+    """Runs `function(session, shard)` for every shard at the same time.
+
+    The first shard is read with `db`, if given; the others with a new read session each.
+
+    Returns:
+        list: The result of each shard, in the order of the shards.
+    """
+    def run(shard: Shard):
+        if shard.index == 0 and db is not None:
+            return function(db, shard)
+        with shard.ReadSessionLocal() as shard_db:
+            return function(shard_db, shard)
+
+    return list(executor.map(run, shards))
+
+
+def route_games(games: List[schemas.GameCreate]) -> Dict[int, List[int]]:
+    """Chooses the shard of each game: the one of its idempotency key, or the next shard,
+    round-robin, for all the games without a key.
+
+    Args:
+        games (List[schemas.GameCreate]): Schema objects of the games being created.
+
+    Returns:
+        dict: Positions of the games of each shard, by index of the shard.
+    """
+    if len(shards) == 1:
+        return {0: list(range(len(games)))}
+
+    next_shard = next(round_robin) % len(shards)
+    positions = {}
+    for position, game in enumerate(games):
+        if game.idempotency_key is not None:
+            index = shard_of_key(game.idempotency_key, len(shards))
+        else:
+            index = next_shard
+        positions.setdefault(index, []).append(position)
+    return positions
+
+
+@asynccontextmanager
+async def write_locks(indexes: Iterable[int]):
+    """Holds the write locks of some shards, see `Shard.write_lock`.
+
+    They are taken in the order of the shards, so two requests never wait for each other.
+
+    Args:
+        indexes (Iterable[int]): Indexes of the shards, e.g. those of `route_games`.
+    """
+    async with AsyncExitStack() as stack:
+        for index in sorted(indexes):
+            await stack.enter_async_context(shards[index].write_lock)
+        yield
+
+
+def create_game(db: Session, game: schemas.GameCreate, positions: Optional[Dict[int, List[int]]] = None) -> dict:
+    """Creates a game with `crud.create_game`, in the shard of the game, see `create_games`.
+
+    Args:
+        db (Session): Database session of the first shard.
+        game (schemas.GameCreate): Schema object of the game being created.
+        positions (dict, optional): The shard of the game, see `create_games`.
+
+    Returns:
+        dict: Formatted response with the details of the game.
+    """
+    if len(shards) == 1:
+        return crud.create_game(db, game)
+    return create_games(db, [game], positions)[0]
+
+
+def create_games(db: Session, games: List[schemas.GameCreate],
+                 positions: Optional[Dict[int, List[int]]] = None) -> List[dict]:
+    """Creates games with `crud.create_games`, in the shard of each game.
+
+    Without shards, the games are created with `db`. With shards, each shard that gets games
+    records them in its own transaction, at the same time as the others.
+
+    Args:
+        db (Session): Database session of the first shard.
+        games (List[schemas.GameCreate]): Schema objects of the games being created.
+        positions (dict, optional): The shards of the games, from `route_games`, whose write
+            locks the caller holds. Defaults to a new routing.
+
+    Returns:
+        List[dict]: Formatted responses with the details of each game, in the same order.
+    """
+    if len(shards) == 1:
+        return crud.create_games(db, games)
+
+    positions = positions or route_games(games)
+
+    def create(index: int) -> List[dict]:
+        shard = shards[index]
+        with shard.lock, shard.SessionLocal() as shard_db:
+            return crud.create_games(shard_db, [games[position] for position in positions[index]], shard.assign_ids)
+
+    responses = [None] * len(games)
+    for index, created_games in zip(positions, executor.map(create, positions)):
+        for position, created_game in zip(positions[index], created_games):
+            responses[position] = created_game
+    return responses
+
+
+def get_history(db: Session, after_id: int = 0, limit: int = 100) -> List[dict]:
+    """Retrieves a page of the games of every shard, in the order of their ids, see `crud.get_history`."""
+    if len(shards) == 1:
+        return crud.get_history(db, after_id, limit)
+    pages = fan_out(db, lambda shard_db, shard: crud.get_history(shard_db, after_id, limit))
+    return sorted((game for page in pages for game in page), key=lambda game: game["id"])[:limit]
+
+
+def get_outcome_counts(db: Session, window: Optional[timedelta] = None,
+                       player: Optional[str] = None) -> List[rollups.OutcomeCount]:
+    """Counts the games of every shard by player and winner, see `rollups.get_outcome_counts`.
+
+    Every shard archives into the same directory, so the archive is counted once, with the
+    first shard.
+    """
+    if len(shards) == 1:
+        return rollups.get_outcome_counts(db, window, player)
+
+    now = models.utcnow()
+    totals = Counter()
+    abandonments = Counter()
+    partials = fan_out(db, lambda shard_db, shard: rollups.get_outcome_counts(
+        shard_db, window, player, now=now, archived=shard.index == 0))
+    for outcomes in partials:
+        for outcome in outcomes:
+            totals[(outcome.player, outcome.winner)] += outcome.total_games
+            abandonments[(outcome.player, outcome.winner)] += outcome.total_abandonments
+    return [
+        rollups.OutcomeCount(outcome_player, winner, total_games, abandonments[(outcome_player, winner)])
+        for (outcome_player, winner), total_games in totals.items()
+    ]
+
+
+def get_hands_by_winner(db: Session, winners: List[str]) -> dict:
+    """Counts the hands of the winners on every shard, see `crud.get_hands_by_winner`.
+
+    The archive shared by the shards is counted once, with the first shard.
+    """
+    hands = {winner: Counter() for winner in winners}
+    partials = fan_out(db, lambda shard_db, shard: crud.get_hands_by_winner(shard_db, winners, archived=shard.index == 0))
+    for partial in partials:
+        for winner, moves_counter in partial.items():
+            hands[winner].update(moves_counter)
+    return hands
+
+
+def get_sequences(db: Session) -> sequences.SequenceCounts:
+    """Counts the rounds of the games of every shard, see `sequences.get_sequences`.
+
+    Each shard keeps its own cached counts; the archive shared by the shards is counted once,
+    with the first shard.
+    """
+    merged = sequences.SequenceCounts()
+    for counts in fan_out(db, lambda shard_db, shard: sequences.get_sequences(shard_db, archived=shard.index == 0)):
+        merged.update(counts)
+    return merged
+
+
+def get_transitions(db: Session, player: Optional[str] = None) -> schemas.Transitions:
+    """Retrieves the transitions between the moves of player 1 over every shard, see `crud.get_transitions`."""
+    if len(shards) == 1:
+        return crud.get_transitions(db, player)
+    return crud.get_transitions(db, player, counts=get_sequences(db))
+
+
+def get_round_statistics(db: Session, player: Optional[str] = None) -> schemas.RoundStatistics:
+    """Retrieves the statistics of the rounds over every shard, see `crud.get_round_statistics`."""
+    if len(shards) == 1:
+        return crud.get_round_statistics(db, player)
+    return crud.get_round_statistics(db, player, counts=get_sequences(db))
+
+
+def get_global_info(db: Session, window: Optional[timedelta] = None, player: Optional[str] = None) -> schemas.GlobalInfo:
+    """Retrieves global information about the games of every shard, see `crud.get_global_info`."""
+    if len(shards) == 1:
+        return crud.get_global_info(db, window, player)
+    return crud.get_global_info(db, window, player, outcomes=get_outcome_counts(db, window, player))
+
+
+def get_statistics(db: Session, window: Optional[timedelta] = None, player: Optional[str] = None) -> dict:
+    """Retrieves statistics about the games of every shard, see `crud.get_statistics`."""
+    if len(shards) == 1:
+        return crud.get_statistics(db, window, player)
+    return crud.get_statistics(db, window, player, outcomes=get_outcome_counts(db, window, player))
+
+
+def get_ranking(db: Session, limit: int = 3, window: Optional[timedelta] = None,
+                player: Optional[str] = None) -> List[schemas.PlayerInfo]:
+    """Retrieves the ranking of the players over every shard, see `crud.get_ranking`."""
+    if len(shards) == 1:
+        return crud.get_ranking(db, limit, window, player)
+    return crud.get_ranking(db, limit, window, player, outcomes=get_outcome_counts(db, window, player))
+
+
+def get_strong_hand(db: Session, hand_stats: Optional[HandStats] = None) -> schemas.StrongHandInfo:
+    """Retrieves the strong hand of Human over every shard, see `crud.get_strong_hand`.
+
+    With shards the hands are counted on every shard, `hand_stats` only follows the first one.
+    """
+    if len(shards) == 1:
+        return crud.get_strong_hand(db, hand_stats)
+    strong_hand, win_percentage = crud.get_hand_info(get_hands_by_winner(db, ['Human'])['Human'])
+    return schemas.StrongHandInfo(strong_hand=strong_hand, win_percentage=win_percentage)
+
+
+def get_weak_hand(db: Session, hand_stats: Optional[HandStats] = None) -> schemas.WeakHandInfo:
+    """Retrieves the weak hand of Human over every shard, see `crud.get_weak_hand` and `get_strong_hand`."""
+    if len(shards) == 1:
+        return crud.get_weak_hand(db, hand_stats)
+    weak_hand, loss_percentage = crud.get_hand_info(get_hands_by_winner(db, ['Machine'])['Machine'])
+    return schemas.WeakHandInfo(weak_hand=weak_hand, loss_percentage=loss_percentage)
+
+
+def get_dashboard(db: Session, hand_stats: Optional[HandStats] = None, limit: int = 3) -> schemas.Dashboard:
+    """Retrieves every statistic of the dashboard over every shard, see `crud.get_dashboard`."""
+    if len(shards) == 1:
+        return crud.get_dashboard(db, hand_stats, limit)
+    return crud.get_dashboard(db, limit=limit, outcomes=get_outcome_counts(db),
+                              hands=get_hands_by_winner(db, ['Human', 'Machine']))
+
+
+# Shards of the application.
+shards = create_shards([url.strip() for url in DATABASE_SHARDS.split(",") if url.strip()])
+
+if len(shards) > 1 and analytics.ANALYTICS_ENGINE == "duckdb":
+    # DuckDB attaches DATABASE_URL alone: it would count the games of the first shard on every shard.
+    logger.warning("ANALYTICS_ENGINE=duckdb is not used with DATABASE_SHARDS, the games are counted by SQLite")
+    analytics.ANALYTICS_ENGINE = "sqlite"
+
+if len(shards) > 1 and sessions.MACHINE_STRATEGY == "predictor":
+    # The predictor reads the games of the first shard alone, see the top of this module.
+    logger.warning("MACHINE_STRATEGY=predictor is not used with DATABASE_SHARDS, the machine plays random moves")
+    sessions.MACHINE_STRATEGY = "random"
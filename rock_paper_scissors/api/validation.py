@@ -0,0 +1,178 @@
+import os
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+from rock_paper_scissors.api import schemas
+from rock_paper_scissors.api.crud import PLAYER_1, PLAYER_2, get_player
+from rock_paper_scissors.game_logic import MOVES, ROUND_OUTCOMES, TOTAL_ROUNDS
+
+# What the game routes do with a game whose winners do not match its moves: "recompute" stores
+# the winners computed from the moves, "reject" refuses the game and "off" trusts the client.
+INGEST_VALIDATION = os.getenv("INGEST_VALIDATION", "recompute")
+
+MOVE_CODES = {move: code for code, move in enumerate(MOVES)}
+
+# ROUND_WINS[3 * code_1 + code_2] is True if player 1 wins the round, from ROUND_OUTCOMES.
+ROUND_WINS = tuple(
+    ROUND_OUTCOMES[(player_1_move, player_2_move)] for player_1_move in MOVES for player_2_move in MOVES
+)
+
+# Player 2 of the games started by each player 1.
+OPPONENTS = dict(zip(PLAYER_1, PLAYER_2))
+
+# Errors that are fixed by storing the winners computed from the moves.
+WINNER_ERRORS = {"Wrong round winner", "Wrong game winner"}
+
+
+class GameCheck(NamedTuple):
+    """Winners of a game computed from its moves, and the problems found in the game.
+
+    Attributes:
+        round_winners (List[str]): Winner of each round, empty if the moves are not valid.
+        game_winner (Optional[str]): Winner of the game, None if it cannot be computed.
+        errors (List[str]): Problems of the game, empty if the game is valid.
+    """
+    round_winners: List[str]
+    game_winner: Optional[str]
+    errors: List[str]
+
+    @property
+    def recomputable(self) -> bool:
+        """True if the only problems of the game are wrong winners."""
+        return set(self.errors) <= WINNER_ERRORS
+
+
+class InvalidGameError(ValueError):
+    """Raised when games sent to the API are not valid.
+
+    Attributes:
+        problems (List[Tuple[int, List[str]]]): Position of each invalid game in the payload and its errors.
+    """
+
+    def __init__(self, problems: List[Tuple[int, List[str]]]):
+        super().__init__(f"{len(problems)} invalid games")
+        self.problems = problems
+
+
+def check_game(player: Optional[str], game_winner: str, rounds: Iterable[Tuple[str, str, str]]) -> GameCheck:
+    """Recomputes the winners of a game from its moves, as `game_logic` decides them.
+
+    Player 1 is `player` or, when it is not known, deduced from the winner as `crud.get_player`
+    does; player 2 is its usual opponent. A round is decided by a lookup in ROUND_WINS, so the
+    whole check only reads a few tuples and dictionaries per round.
+
+    Args:
+        player (Optional[str]): Player 1 of the game, if known.
+        game_winner (str): Winner of the game, as sent or stored.
+        rounds (Iterable[Tuple[str, str, str]]): Move of player 1, move of player 2 and winner of each round.
+
+    Returns:
+        GameCheck: The computed winners and the problems found.
+
+    Examples:
+        >>> check_game("Human", "Human", [("rock", "scissors", "Human")] * 3)
+        GameCheck(round_winners=['Human', 'Human', 'Human'], game_winner='Human', errors=[])
+        >>> check_game(None, "Human", [("rock", "paper", "Human")]).errors
+        ['Wrong round winner', 'Wrong game winner']
+        >>> check_game("Human", "Human", [("rock", "lizard", "Human")]).errors
+        ['Invalid move']
+    """
+    player_1 = player or get_player(game_winner)
+    player_2 = OPPONENTS.get(player_1)
+    if player_2 is None:
+        return GameCheck([], None, ["Unknown players"])
+
+    errors = []
+    round_winners = []
+    player_1_wins = 0
+    sent_winners_match = True
+    for player_1_move, player_2_move, winner in rounds:
+        code_1 = MOVE_CODES.get(player_1_move)
+        code_2 = MOVE_CODES.get(player_2_move)
+        if code_1 is None or code_2 is None:
+            return GameCheck([], None, ["Invalid move"])
+
+        if ROUND_WINS[3 * code_1 + code_2]:
+            player_1_wins += 1
+            round_winners.append(player_1)
+        else:
+            round_winners.append(player_2)
+        sent_winners_match = sent_winners_match and winner == round_winners[-1]
+
+    total_rounds = len(round_winners)
+    if not 1 <= total_rounds <= TOTAL_ROUNDS:
+        return GameCheck([], None, ["Wrong number of rounds"])
+
+    if not sent_winners_match:
+        errors.append("Wrong round winner")
+
+    if total_rounds == TOTAL_ROUNDS and player_1_wins * 2 > total_rounds:
+        computed_game_winner = player_1
+    else:
+        computed_game_winner = player_2
+    if game_winner != computed_game_winner:
+        errors.append("Wrong game winner")
+
+    return GameCheck(round_winners, computed_game_winner, errors)
+
+
+def check_games(games: List[schemas.GameCreate], mode: str = INGEST_VALIDATION) -> Tuple[list, list]:
+    """Checks a batch of games without changing them.
+
+    Args:
+        games (List[schemas.GameCreate]): The games.
+        mode (str): "recompute", "reject" or "off", see `INGEST_VALIDATION`.
+
+    Returns:
+        Tuple[list, list]: The position of each game that cannot be recorded and its errors, and
+        the games that can be recorded once their winners are fixed, with their `GameCheck`.
+    """
+    problems = []
+    fixes = []
+    if mode == "off":
+        return problems, fixes
+
+    for index, game in enumerate(games):
+        rounds = game.rounds_played
+        check = check_game(
+            game.player,
+            game.game_winner,
+            [(round_info.player_1_move, round_info.player_2_move, round_info.winner) for round_info in rounds]
+        )
+        if not check.errors:
+            continue
+
+        if mode == "recompute" and check.recomputable:
+            fixes.append((game, check))
+        else:
+            problems.append((index, check.errors))
+    return problems, fixes
+
+
+def fix_winners(fixes: List[Tuple[schemas.GameCreate, GameCheck]]):
+    """Replaces in place the wrong winners of games by the winners computed from their moves."""
+    for game, check in fixes:
+        for round_info, winner in zip(game.rounds_played, check.round_winners):
+            round_info.winner = winner
+        game.game_winner = check.game_winner
+
+
+def validate_games(games: List[schemas.GameCreate], mode: str = INGEST_VALIDATION):
+    """Checks the games sent to the API before they are recorded.
+
+    With the mode "recompute", the wrong winners of the games are replaced in place by the
+    winners computed from the moves, so only games that cannot be played (unknown moves or
+    players, no rounds or more than three) are refused. With "reject" any problem refuses
+    the whole payload, and with "off" the games are not checked.
+
+    Args:
+        games (List[schemas.GameCreate]): The games of the payload.
+        mode (str): "recompute", "reject" or "off", see `INGEST_VALIDATION`.
+
+    Raises:
+        InvalidGameError: If some games are not valid. No game of the payload is changed, and
+            none must be recorded.
+    """
+    problems, fixes = check_games(games, mode)
+    if problems:
+        raise InvalidGameError(problems)
+    fix_winners(fixes)
@@ -4,6 +4,9 @@ from rock_paper_scissors.api.api_client import create_game
 
 MOVES = ["rock", "paper", "scissors"]
 
+# Rounds of a game that is not abandoned.
+TOTAL_ROUNDS = 3
+
 
 def determine_round_winner(player_1_move: str, player_2_move: str, player_1: str, player_2: str) -> str:
     """Determine the winner of a game.
@@ -31,6 +34,14 @@ def determine_round_winner(player_1_move: str, player_2_move: str, player_1: str
         return player_1
     else:
         return player_2
+
+
+# Precomputed result of every pair of moves: True if player 1 wins the round.
+ROUND_OUTCOMES = {
+    (player_1_move, player_2_move): determine_round_winner(player_1_move, player_2_move, True, False)
+    for player_1_move in MOVES
+    for player_2_move in MOVES
+}
     
 
 def get_round_result(round_number: str, player_1_move: str, player_2_move: str, player_1: str, player_2: str) -> dict:
@@ -1,6 +1,6 @@
 import logging
 
-from rock_paper_scissors.api.api_client import get_global_info, get_strong_hand, get_weak_hand, get_ranking, get_statistics
+from rock_paper_scissors.api.api_client import get_dashboard, get_global_info, get_strong_hand, get_weak_hand, get_ranking, get_statistics
 from rock_paper_scissors.game_logic import play_game
 
 
@@ -14,6 +14,7 @@ def print_menu():
     print("5. Ranking")
     print("6. Statistics")
     print("7. Exit")
+    print("8. Dashboard")
         
 
 def handle_choice(choice: str) -> bool:
@@ -29,7 +30,7 @@ def handle_choice(choice: str) -> bool:
     >>> handle_choice("7")
     Thank you for playing! See you next time.
     False
-    >>> handle_choice(7)
+    >>> handle_choice(8)
     Invalid option, please try again.
     True
     """
@@ -48,7 +49,9 @@ def handle_choice(choice: str) -> bool:
     elif choice == "7":
         print("Thank you for playing! See you next time.")
         return False
+    elif choice == "8":
+        get_dashboard()
     else:
-        logging.warning(f"Invalid option selected by the user: {choice}")
+        logging.warning("Invalid option selected by the user: %s", choice)
         print("Invalid option, please try again.")
     return True
\ No newline at end of file
@@ -1,30 +1,160 @@
+import atexit
+import itertools
+import json
 import logging
+import logging.handlers
 from datetime import datetime
 import os
+import queue
+from typing import Optional
+
+# Directory of the log files.
+LOG_DIR = os.getenv("LOG_DIR", "logs")
+# Lowest level of the records written.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# Format of the records: "text", one line with the time, logger, level and origin of the record,
+# or "json", one JSON object per line.
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+# How the log file is rotated: "size", when it reaches LOG_MAX_BYTES, or "time", every midnight.
+# LOG_BACKUP_COUNT rotated files are kept.
+LOG_ROTATION = os.getenv("LOG_ROTATION", "size")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+# Whether each process writes its own log files, named with its pid. A file rotated by several
+# processes loses records: each one renames it on its own. Set by `python -m rock_paper_scissors.api`
+# when it starts several workers.
+LOG_PER_PROCESS = os.getenv("LOG_PER_PROCESS", "0") == "1"
+# Only one of every LOG_SAMPLE_EVERY records below WARNING of GAMES_LOGGER is written.
+LOG_SAMPLE_EVERY = int(os.getenv("LOG_SAMPLE_EVERY", "1"))
+
+# Logger of the messages written for every game, which may be sampled.
+GAMES_LOGGER = "rock_paper_scissors.games"
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d - %(funcName)s] - %(message)s"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats each record as a JSON object on one line.
+
+    Examples:
+        >>> record = logging.LogRecord("rock_paper_scissors.games", logging.INFO, "api_client.py", 108,
+        ...                            "New game created: %s", ("Human",), None, "create_game")
+        >>> entry = json.loads(JsonFormatter(datefmt=DATE_FORMAT).format(record))
+        >>> entry["level"], entry["message"], entry["line"]
+        ('INFO', 'New game created: Human', 108)
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record, self.datefmt),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "file": record.filename,
+            "line": record.lineno,
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+class SamplingFilter(logging.Filter):
+    """Lets through one of every `every` records below WARNING, and every warning and error.
+
+    Examples:
+        >>> sampling = SamplingFilter(3)
+        >>> [sampling.filter(logging.LogRecord("games", logging.INFO, "", 0, "", (), None)) for _ in range(4)]
+        [True, False, False, True]
+    """
+
+    def __init__(self, every: int):
+        super().__init__()
+        self.every = every
+        self.counter = itertools.count()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or next(self.counter) % self.every == 0
 
-def setup_logging():
-    """Configures the logging settings for the application.
 
-    This function sets up the logging system to record logs in a specified format,
-    including timestamps, log levels, and other contextual information (such as 
-    the filename, line number, and function name). The logs are saved in a file 
-    located in the 'logs' directory, with the filename including the current date 
-    in the format YYYYMMDD.
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Puts the records in a queue as they are, for a `QueueListener` thread to format and write.
 
-    The log level is set to INFO, meaning that all messages at this level and 
-    above (WARNING, ERROR, CRITICAL) will be recorded.
+    The standard `QueueHandler` formats the message in the thread that logs it, so it can be sent
+    to another process; in the same process the listener can do it. The arguments of a record
+    must not be changed after it is logged.
     """
-    log_format = "%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d - %(funcName)s] - %(message)s"
-    date_format = "%Y-%m-%d %H:%M:%S"
-    current_date = datetime.now().strftime("%Y%m%d")
-    log_file = os.path.join("logs", f"{current_date}_game.log")
 
-    logging.basicConfig(
-        level=logging.INFO,
-        format=log_format,
-        datefmt=date_format,
-        handlers=[logging.FileHandler(log_file)]
-    )
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
 
 
+def create_file_handler(name: str) -> logging.Handler:
+    """Creates the rotating handler of the log file `name`, with the format of `LOG_FORMAT`.
+
+    With `LOG_PER_PROCESS` the pid of the process is added to the name, e.g. "api.4242".
+
+    Args:
+        name (str): Name of the log, e.g. "game" or "api".
+
+    Returns:
+        logging.Handler: A handler that rotates by size, in a file named after the current date,
+        or by time, in a file that gets the date of each day when it is rotated.
+    """
+    if LOG_PER_PROCESS:
+        name = f"{name}.{os.getpid()}"
+    if LOG_ROTATION == "time":
+        handler = logging.handlers.TimedRotatingFileHandler(
+            os.path.join(LOG_DIR, f"{name}.log"), when="midnight", backupCount=LOG_BACKUP_COUNT)
+    else:
+        current_date = datetime.now().strftime("%Y%m%d")
+        handler = logging.handlers.RotatingFileHandler(
+            os.path.join(LOG_DIR, f"{current_date}_{name}.log"), maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT)
+
+    if LOG_FORMAT == "json":
+        handler.setFormatter(JsonFormatter(datefmt=DATE_FORMAT))
+    else:
+        handler.setFormatter(logging.Formatter(TEXT_FORMAT, datefmt=DATE_FORMAT))
+    return handler
+
+
+def setup_logging(name: str = "game") -> Optional[logging.handlers.QueueListener]:
+    """Configures the logging settings for the application.
+
+    This function sets up the logging system to record logs in the directory
+    `LOG_DIR`, in a file rotated by size or by time (see `create_file_handler`),
+    as text including timestamps, log levels, and other contextual information
+    (such as the filename, line number, and function name), or as JSON.
+
+    Logging a record only puts it in a queue: a background thread formats it and
+    writes it to the file, so the game does not wait for the disk. The messages
+    are formatted with %-style arguments, which are not formatted at all when
+    the level is disabled or the record is sampled out (`LOG_SAMPLE_EVERY`).
+
+    The log level is `LOG_LEVEL`, INFO by default, meaning that all messages at
+    this level and above (WARNING, ERROR, CRITICAL) will be recorded. Logging
+    is only set up once per process.
+
+    Args:
+        name (str): Name of the log file. Defaults to "game".
+
+    Returns:
+        Optional[QueueListener]: The thread that writes the records, stopped at exit, or None
+        if the logging was already set up.
+    """
+    root = logging.getLogger()
+    if any(isinstance(handler, DeferredQueueHandler) for handler in root.handlers):
+        return None
+
+    os.makedirs(LOG_DIR, exist_ok=True)
+    records = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(records, create_file_handler(name))
+    listener.start()
+    # Writes the records still in the queue before the process exits.
+    atexit.register(listener.stop)
 
+    root.addHandler(DeferredQueueHandler(records))
+    root.setLevel(LOG_LEVEL)
+    if LOG_SAMPLE_EVERY > 1:
+        logging.getLogger(GAMES_LOGGER).addFilter(SamplingFilter(LOG_SAMPLE_EVERY))
+    return listener
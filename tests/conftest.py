@@ -0,0 +1,59 @@
+import os
+import shutil
+import tempfile
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# The tests run the API on a database of their own, in a temporary directory, so they never
+# write into the database of the developer (DATABASE_URL of .env) nor leave files next to it:
+# the hand statistics snapshot, the archive and the maintenance marker follow the database.
+# The variables are set before the application is imported, because its engines are created
+# at import time; `load_dotenv` does not override them.
+TEST_DIRECTORY = tempfile.mkdtemp(prefix="rock_paper_scissors_tests_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TEST_DIRECTORY, 'rock_paper_scissors.db')}"
+os.environ["DATABASE_SHARDS"] = ""
+os.environ["LOG_DIR"] = os.path.join(TEST_DIRECTORY, "logs")
+
+
+def pytest_unconfigure(config):
+    """Removes the database of the tests and the files next to it."""
+    shutil.rmtree(TEST_DIRECTORY, ignore_errors=True)
+
+
+@pytest.fixture(scope='function')
+def session_factory():
+    """Create a session factory over an in-memory SQLite database.
+
+    All the sessions of a test share the same database, so a test can use
+    several, as the functions that open their own sessions do.
+
+    Yields:
+        sessionmaker: Factory of sessions bound to the in-memory database.
+    """
+    from rock_paper_scissors.api.models import Base
+
+    engine = create_engine('sqlite:///:memory:')
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    yield TestingSessionLocal
+
+    Base.metadata.drop_all(bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture(scope='function')
+def db_session(session_factory):
+    """Create a new SQLAlchemy session over an in-memory SQLite database.
+
+    Yields:
+        Session: A SQLAlchemy session object to interact with the 
+        in-memory database.
+    """
+    session = session_factory()
+
+    yield session
+
+    session.close()
@@ -0,0 +1,137 @@
+import asyncio
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+
+from rock_paper_scissors.api import admission
+from rock_paper_scissors.api.admission import AdmissionMiddleware, ConcurrencyLimiter, RateLimiter, RejectedError
+from rock_paper_scissors.api.database import init_db
+from rock_paper_scissors.api.init_app import app
+
+
+def http_scope(method: str, path: str, client: str = "10.0.0.1") -> dict:
+    """Build the ASGI scope of an HTTP request."""
+    return {"type": "http", "method": method, "path": path, "client": (client, 50000)}
+
+
+def test_queue_is_bounded_and_served_in_order():
+    """Test that the waiting requests get the freed places in order and the extra ones are rejected.
+
+    With one place and a queue of two, the fourth request is rejected at once with a 503
+    and a Retry-After.
+    """
+    async def scenario():
+        limiter = ConcurrencyLimiter(limit=1, queue_size=2, timeout=5)
+        await limiter.acquire()
+        order = []
+
+        async def wait(name):
+            await limiter.acquire()
+            order.append(name)
+
+        waiting = [asyncio.create_task(wait(name)) for name in ("first", "second")]
+        await asyncio.sleep(0)
+        with pytest.raises(RejectedError) as rejected:
+            await limiter.acquire()
+
+        limiter.release()
+        await asyncio.sleep(0)
+        limiter.release()
+        await asyncio.gather(*waiting)
+        return limiter, order, rejected.value
+
+    limiter, order, rejected = asyncio.run(scenario())
+
+    assert order == ["first", "second"]
+    assert limiter.active == 1
+    assert (rejected.status_code, rejected.retry_after) == (503, 1)
+
+
+def test_wait_times_out():
+    """Test that a request that waits longer than the timeout is rejected and leaves the queue."""
+    async def scenario():
+        limiter = ConcurrencyLimiter(limit=1, queue_size=5, timeout=0.01)
+        await limiter.acquire()
+        with pytest.raises(RejectedError) as rejected:
+            await limiter.acquire()
+        limiter.release()
+        return limiter, rejected.value
+
+    limiter, rejected = asyncio.run(scenario())
+
+    assert rejected.status_code == 503
+    assert limiter.active == 0
+    assert not limiter.waiters
+
+
+def test_rate_limit_per_client():
+    """Test that each client gets its own bucket and a rate limited request is told when to retry."""
+    limiter = RateLimiter(rate=0.5, burst=2)
+
+    limiter.check("10.0.0.1", now=0)
+    limiter.check("10.0.0.1", now=0)
+    limiter.check("10.0.0.2", now=0)
+    with pytest.raises(RejectedError) as rejected:
+        limiter.check("10.0.0.1", now=0.5)
+
+    assert (rejected.value.status_code, rejected.value.retry_after) == (429, 2)
+    limiter.check("10.0.0.1", now=2.5)
+
+
+def test_write_storm_does_not_block_reads():
+    """Test that writes beyond their limit are rejected while the reads are still served.
+
+    Two writes hold the only write place and the only queued place; a third one is
+    rejected with a 503, and a read is served meanwhile.
+    """
+    async def scenario():
+        release_writes = asyncio.Event()
+
+        async def inner_app(scope, receive, send):
+            if scope["method"] == "POST":
+                await release_writes.wait()
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"{}"})
+
+        with patch.multiple(admission, WRITE_CONCURRENCY=1, WRITE_QUEUE=1, WRITE_RATE_LIMIT=0, READ_RATE_LIMIT=0):
+            middleware = AdmissionMiddleware(inner_app)
+
+        async def request(method, path):
+            messages = []
+
+            async def send(message):
+                messages.append(message)
+
+            await middleware(http_scope(method, path), None, send)
+            start = messages[0]
+            return start["status"], dict(start["headers"])
+
+        writes = [asyncio.create_task(request("POST", "/game/")) for _ in range(2)]
+        await asyncio.sleep(0)
+        rejected = await request("POST", "/game/")
+        read = await request("GET", "/game/ranking")
+        release_writes.set()
+        return rejected, read, await asyncio.gather(*writes)
+
+    rejected, read, writes = asyncio.run(scenario())
+
+    assert rejected[0] == 503
+    assert rejected[1][b"retry-after"] == b"1"
+    assert read[0] == 200
+    assert [status for status, headers in writes] == [200, 200]
+
+
+def test_rate_limited_route():
+    """Test that the API answers 429 with a Retry-After to a client over its write rate."""
+    init_db()
+    with patch.multiple(admission, WRITE_RATE_LIMIT=0.001, WRITE_RATE_BURST=1):
+        client = TestClient(AdmissionMiddleware(app))
+    game = {"rounds_played": [{"player_1_move": "rock", "player_2_move": "scissors", "winner": "Human"}],
+            "game_winner": "Machine"}
+
+    assert client.post("/game/", json=game).status_code == 200
+    response = client.post("/game/", json=game)
+
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) > 0
+    assert client.get("/game/ranking").status_code == 200
@@ -0,0 +1,91 @@
+import pytest
+import random
+from datetime import timedelta
+from unittest.mock import patch
+from sqlalchemy.orm import sessionmaker
+
+from rock_paper_scissors.api import analytics, schemas
+from rock_paper_scissors.api.crud import (create_games, get_global_info, get_moves_by_winner, get_ranking,
+                                          get_statistics, get_strong_hand, get_weak_hand)
+from rock_paper_scissors.api.database import create_db_engine, init_db
+from rock_paper_scissors.api.models import Game
+from rock_paper_scissors.api.rollups import query_games
+from rock_paper_scissors.game_logic import MOVES, determine_round_winner
+
+
+@pytest.fixture(scope='function')
+def database(tmp_path):
+    """Create an SQLite file with random games.
+
+    Yields:
+        tuple: The path of the database and a session over it.
+    """
+    path = str(tmp_path / "games.db")
+    engine = create_db_engine(f"sqlite:///{path}")
+    init_db(engine)
+    session = sessionmaker(autoflush=False, bind=engine)()
+
+    rng = random.Random(3)
+    games = []
+    for _ in range(200):
+        player, opponent = rng.choice([('Human', 'Machine'), ('Machine_1', 'Machine_2')])
+        rounds_played = []
+        for _ in range(rng.choice([1, 3, 3])):
+            player_1_move, player_2_move = rng.choice(MOVES), rng.choice(MOVES)
+            winner = determine_round_winner(player_1_move, player_2_move, player, opponent)
+            rounds_played.append(schemas.Move(player_1_move=player_1_move, player_2_move=player_2_move, winner=winner))
+        player_wins = sum(round_info.winner == player for round_info in rounds_played)
+        game_winner = player if len(rounds_played) == 3 and player_wins >= 2 else opponent
+        games.append(schemas.GameCreate(rounds_played=rounds_played, game_winner=game_winner, player=player))
+    create_games(session, games)
+
+    yield path, session
+
+    session.close()
+    engine.dispose()
+
+
+def test_sqlite_is_used_without_duckdb():
+    """Test that the statistics stay on SQLite unless DuckDB is chosen and installed."""
+    assert analytics.get_analytics() is None
+    with patch('rock_paper_scissors.api.analytics.ANALYTICS_ENGINE', 'duckdb'), \
+            patch('rock_paper_scissors.api.analytics.duckdb', None):
+        assert analytics.get_analytics() is None
+
+
+def test_duckdb_counts_match_sqlite(database):
+    """Test that DuckDB counts the games and the hands as the SQLite queries do.
+
+    Args:
+        database (tuple): Path and session of the database provided by the database fixture.
+    """
+    pytest.importorskip("duckdb")
+    path, session = database
+    duckdb_analytics = analytics.DuckDBAnalytics(path)
+
+    assert sorted(duckdb_analytics.outcome_counts()) == sorted(tuple(row) for row in query_games(session))
+    assert sorted(duckdb_analytics.outcome_counts(player='Human')) == sorted(tuple(row) for row in query_games(session, 'Human'))
+
+    for winner in ('Human', 'Machine'):
+        games = session.query(Game).filter(Game.winner == winner).all()
+        assert duckdb_analytics.moves_by_winner(winner) == get_moves_by_winner(games, winner)
+
+
+def test_statistics_through_duckdb(database):
+    """Test that the statistics routes give the same results with the DuckDB engine.
+
+    Args:
+        database (tuple): Path and session of the database provided by the database fixture.
+    """
+    pytest.importorskip("duckdb")
+    path, session = database
+
+    def statistics():
+        return (get_global_info(session), get_statistics(session), get_ranking(session, limit=10),
+                get_statistics(session, window=timedelta(hours=1), player='Human'),
+                get_strong_hand(session), get_weak_hand(session))
+
+    expected = statistics()
+    with patch('rock_paper_scissors.api.analytics.ANALYTICS_ENGINE', 'duckdb'), \
+            patch('rock_paper_scissors.api.analytics._analytics', analytics.DuckDBAnalytics(path)):
+        assert statistics() == expected
@@ -1,6 +1,9 @@
 import pytest
+import requests
+import subprocess
+import sys
 from unittest.mock import patch
-from rock_paper_scissors.api.api_client import create_game, get_global_info, get_strong_hand, get_weak_hand, get_ranking, get_statistics
+from rock_paper_scissors.api.api_client import accept_encoding, create_game, get_dashboard, get_global_info, get_strong_hand, get_weak_hand, get_ranking, get_statistics
 
 @pytest.fixture(scope='function')
 def mock_requests_post():
@@ -47,8 +50,60 @@ def test_create_game(mock_requests_post):
     # Execution of the function
     create_game(rounds_info, game_info)
 
-    # Make sure that the API call was made.
+    # Make sure that the API call was made, accepting a compressed response.
     mock_requests_post.assert_called_once()
+    assert "gzip" in mock_requests_post.call_args.kwargs["headers"]["Accept-Encoding"]
+
+
+
+@patch('rock_paper_scissors.api.api_client.time.sleep')
+def test_create_game_retries_with_the_same_key(mock_sleep, mock_requests_post):
+    """Test that a game upload that times out is retried with the same idempotency key.
+
+    The API may have recorded the first attempt, so both requests must carry the
+    same `Idempotency-Key` header for the game to be recorded only once.
+    """
+    response = mock_requests_post.return_value
+    response.status_code = 200
+    mock_requests_post.side_effect = [requests.exceptions.Timeout("timed out"), response]
+
+    create_game({"rounds_played": []}, {"game_winner": "Machine"})
+
+    assert mock_requests_post.call_count == 2
+    first_call, second_call = mock_requests_post.call_args_list
+    assert first_call.kwargs["headers"]["Idempotency-Key"] == second_call.kwargs["headers"]["Idempotency-Key"]
+
+@patch('rock_paper_scissors.api.api_client.time.sleep')
+def test_create_game_honors_retry_after(mock_sleep, mock_requests_post):
+    """Test that a game upload refused because the API is busy is sent again after the Retry-After wait."""
+    busy = requests.Response()
+    busy.status_code = 503
+    busy.headers["Retry-After"] = "3"
+    created = mock_requests_post.return_value
+    created.status_code = 200
+    mock_requests_post.side_effect = [busy, created]
+
+    create_game({"rounds_played": []}, {"game_winner": "Machine"})
+
+    assert mock_requests_post.call_count == 2
+    mock_sleep.assert_called_once_with(3.0)
+
+
+@patch('rock_paper_scissors.api.api_client.time.sleep')
+def test_get_honors_retry_after(mock_sleep, mock_requests_get):
+    """Test that a rate limited GET request is sent again after the Retry-After wait."""
+    limited = requests.Response()
+    limited.status_code = 429
+    limited.headers["Retry-After"] = "1"
+    ok = requests.Response()
+    ok.status_code = 200
+    ok._content = b'{"total_games": 10}'
+    mock_requests_get.side_effect = [limited, ok]
+
+    get_global_info()
+
+    assert mock_requests_get.call_count == 2
+    mock_sleep.assert_called_once_with(1.0)
 
 
 def test_get_global_info(mock_requests_get):
@@ -66,7 +121,7 @@ def test_get_global_info(mock_requests_get):
     get_global_info()
 
     # Make sure that the API call was made.
-    mock_requests_get.assert_called_once_with("http://localhost:8000/game/get_global_info")
+    mock_requests_get.assert_called_once_with("http://localhost:8000/game/get_global_info", headers=accept_encoding())
 
 
 def test_get_strong_hand(mock_requests_get):
@@ -84,7 +139,7 @@ def test_get_strong_hand(mock_requests_get):
     get_strong_hand()
 
     # Make sure that the API call was made.
-    mock_requests_get.assert_called_once_with("http://localhost:8000/game/mano_fuerte")
+    mock_requests_get.assert_called_once_with("http://localhost:8000/game/mano_fuerte", headers=accept_encoding())
 
 
 def test_get_weak_hand(mock_requests_get):
@@ -103,7 +158,7 @@ def test_get_weak_hand(mock_requests_get):
     get_weak_hand()
 
     # Make sure that the API call was made.
-    mock_requests_get.assert_called_once_with("http://localhost:8000/game/mano_debil")
+    mock_requests_get.assert_called_once_with("http://localhost:8000/game/mano_debil", headers=accept_encoding())
 
 
 def test_get_ranking(mock_requests_get):
@@ -121,7 +176,7 @@ def test_get_ranking(mock_requests_get):
     get_ranking()
 
     # Make sure that the API call was made.
-    mock_requests_get.assert_called_once_with("http://localhost:8000/game/ranking")
+    mock_requests_get.assert_called_once_with("http://localhost:8000/game/ranking", headers=accept_encoding())
 
 
 def test_get_statistics(mock_requests_get):
@@ -140,4 +195,34 @@ def test_get_statistics(mock_requests_get):
     get_statistics()
 
     # Make sure that the API call was made.
-    mock_requests_get.assert_called_once_with("http://localhost:8000/game/estadisticas")
+    mock_requests_get.assert_called_once_with("http://localhost:8000/game/estadisticas", headers=accept_encoding())
+
+
+def test_get_dashboard(mock_requests_get):
+    """Test the 'get_dashboard' function.
+
+    This test ensures that all the statistics are fetched with a single GET
+    request to the dashboard endpoint.
+    """
+    mock_requests_get.return_value.status_code = 200
+    mock_requests_get.return_value.text = '{"global_info": {"total_games": 10}, "ranking": []}'
+
+    get_dashboard()
+
+    mock_requests_get.assert_called_once_with("http://localhost:8000/game/dashboard", headers=accept_encoding())
+
+
+def test_client_does_not_import_server_stack():
+    """Test that the console client starts without the server dependencies.
+
+    Importing `main` must not load SQLAlchemy, FastAPI or the database module, and
+    `requests` is only imported once the first HTTP call is made.
+    """
+    code = (
+        "import sys, main; "
+        "print(','.join(m for m in ('sqlalchemy', 'fastapi', 'requests', "
+        "'rock_paper_scissors.api.database') if m in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+
+    assert result.stdout.strip() == ""
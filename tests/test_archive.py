@@ -0,0 +1,223 @@
+import pytest
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from rock_paper_scissors.api import archive, schemas
+from rock_paper_scissors.api.crud import create_game, get_global_info, get_ranking, get_statistics, get_strong_hand, get_weak_hand
+from rock_paper_scissors.api.hand_stats import HandStats
+from rock_paper_scissors.api.models import Game, Move
+from rock_paper_scissors.api.rollups import get_outcome_counts, parse_window, record_games
+from rock_paper_scissors.game_logic import MOVES, determine_round_winner
+
+NOW = datetime(2024, 5, 10, 15, 37, 20)
+
+
+@pytest.fixture(scope='function')
+def archive_dir(tmp_path):
+    """Makes a temporary directory the archive of the application.
+
+    Yields:
+        str: The directory of the archive.
+    """
+    directory = str(tmp_path / "archive")
+    with patch("rock_paper_scissors.api.archive.ARCHIVE_DIR", directory):
+        yield directory
+
+
+def add_games(db, count: int = 300) -> list:
+    """Adds random games, created over the last ten days, and their rollups.
+
+    Returns:
+        list: The games, with their moves.
+    """
+    rng = random.Random(0)
+    games = []
+    for _ in range(count):
+        player, opponent = rng.choice([('Human', 'Machine'), ('Machine_1', 'Machine_2')])
+        moves = []
+        for _ in range(rng.choice([1, 2, 3, 3])):
+            player_1_move, player_2_move = rng.choice(MOVES), rng.choice(MOVES)
+            winner = determine_round_winner(player_1_move, player_2_move, player, opponent)
+            moves.append(Move(player_1_move=player_1_move, player_2_move=player_2_move, winner=winner))
+        player_wins = sum(move.winner == player for move in moves)
+        games.append(Game(
+            total_rounds=len(moves),
+            player=player,
+            winner=player if len(moves) == 3 and player_wins >= 2 else opponent,
+            created_at=NOW - timedelta(seconds=rng.randint(0, 10 * 24 * 3600)),
+            moves=moves
+        ))
+    db.add_all(games)
+    record_games(db, games)
+    db.commit()
+    return games
+
+
+def statistics(db, hand_stats=None) -> tuple:
+    """Reads every all-time statistic of `crud`."""
+    return (
+        get_global_info(db),
+        get_statistics(db),
+        get_ranking(db, limit=10),
+        get_strong_hand(db, hand_stats=hand_stats),
+        get_weak_hand(db, hand_stats=hand_stats)
+    )
+
+
+def test_archived_games_leave_the_database(session_factory, archive_dir):
+    """Test that the old games are moved to segments and removed from the database.
+
+    Args:
+        session_factory (sessionmaker): Factory of sessions provided by the session_factory fixture.
+        archive_dir (str): Directory of the archive provided by the archive_dir fixture.
+    """
+    with session_factory() as db:
+        games = add_games(db)
+        old_ids = sorted(game.id for game in games if game.created_at < NOW - timedelta(days=3))
+
+    archived = archive.archive_games(timedelta(days=3), segment_size=40, session_factory=session_factory, now=NOW)
+
+    assert archived == len(old_ids)
+    totals = archive.archive_totals()
+    assert totals.games == len(old_ids)
+    assert len(totals.segments) == -(-len(old_ids) // 40)
+    with session_factory() as db:
+        assert db.query(Game).filter(Game.id.in_(old_ids)).count() == 0
+        assert db.query(Move).filter(Move.game_id.in_(old_ids)).count() == 0
+        assert db.query(Game).count() == len(games) - len(old_ids)
+
+
+def test_ids_of_archived_games_are_not_reused(session_factory, archive_dir):
+    """Test that a game recorded after every game was archived gets a new id.
+
+    Args:
+        session_factory (sessionmaker): Factory of sessions provided by the session_factory fixture.
+        archive_dir (str): Directory of the archive provided by the archive_dir fixture.
+    """
+    with session_factory() as db:
+        games = add_games(db, count=50)
+        last_id = max(game.id for game in games)
+
+    archive.archive_games(timedelta(days=1), session_factory=session_factory, now=NOW + timedelta(days=20))
+
+    with session_factory() as db:
+        assert db.query(Game).count() == 0
+        created = create_game(db, schemas.GameCreate(
+            rounds_played=[schemas.Move(player_1_move='rock', player_2_move='paper', winner='Machine')],
+            game_winner='Machine'
+        ))
+    assert created['id'] > last_id
+    assert created['id'] not in {game['id'] for game in archive.iter_archived_games()}
+
+
+def test_statistics_include_the_archive(session_factory, archive_dir):
+    """Test that the statistics are the same before and after archiving.
+
+    Args:
+        session_factory (sessionmaker): Factory of sessions provided by the session_factory fixture.
+        archive_dir (str): Directory of the archive provided by the archive_dir fixture.
+    """
+    with session_factory() as db:
+        add_games(db)
+        stats = HandStats()
+        stats.catch_up(db)
+        before = statistics(db)
+        windows = {window: get_outcome_counts(db, parse_window(window), now=NOW) for window in ["1h", "3d", "5d", "11d"]}
+
+    archive.archive_games(timedelta(days=4), segment_size=50, session_factory=session_factory, now=NOW)
+
+    with session_factory() as db:
+        assert statistics(db) == before
+        assert statistics(db, hand_stats=stats) == before
+        cold_stats = HandStats()
+        cold_stats.catch_up(db)
+        assert statistics(db, hand_stats=cold_stats) == before
+        for window, outcomes in windows.items():
+            assert sorted(get_outcome_counts(db, parse_window(window), now=NOW)) == sorted(outcomes)
+
+
+def test_export_round_trip(session_factory, archive_dir):
+    """Test that the exported games are the archived ones, with their moves in order.
+
+    Args:
+        session_factory (sessionmaker): Factory of sessions provided by the session_factory fixture.
+        archive_dir (str): Directory of the archive provided by the archive_dir fixture.
+    """
+    with session_factory() as db:
+        games = add_games(db, count=120)
+        expected = [
+            (game.id, game.winner, game.player, game.total_rounds, game.created_at.isoformat(),
+             [(move.player_1_move, move.player_2_move, move.winner) for move in game.moves])
+            for game in sorted(games, key=lambda game: game.id)
+        ]
+
+    archive.archive_games(timedelta(hours=1), segment_size=50, session_factory=session_factory, now=NOW + timedelta(hours=2))
+
+    exported = [
+        (game["id"], game["game_winner"], game["player"], game["total_rounds"], game["created_at"],
+         [(move["player_1_move"], move["player_2_move"], move["winner"]) for move in game["rounds_played"]])
+        for game in archive.iter_archived_games()
+    ]
+    assert exported == expected
+
+
+def test_recover_pending_segments(session_factory, archive_dir):
+    """Test that a segment left pending is published only if its games were deleted.
+
+    Args:
+        session_factory (sessionmaker): Factory of sessions provided by the session_factory fixture.
+        archive_dir (str): Directory of the archive provided by the archive_dir fixture.
+    """
+    with session_factory() as db:
+        add_games(db, count=20)
+        rows = [
+            {"id": game.id, "total_rounds": game.total_rounds, "winner": game.winner, "player": game.player,
+             "created_at": game.created_at, "idempotency_key": None,
+             "moves": [(move.player_1_move, move.player_2_move, move.winner) for move in game.moves]}
+            for game in db.query(Game).order_by(Game.id).all()
+        ]
+
+    archive.os.makedirs(archive_dir)
+    kept = archive.write_segment(archive_dir, rows[:10])
+    deleted = archive.write_segment(archive_dir, rows[10:])
+    with session_factory() as db:
+        db.query(Game).filter(Game.id > 10).delete()
+        db.commit()
+
+        archive.recover_pending(db, archive_dir)
+
+    assert [segment.name for segment in archive.archive_totals().segments] == [deleted]
+    assert not any(name.startswith(kept) for name in archive.os.listdir(archive_dir))
+
+
+def test_recent_games_are_not_archived(session_factory, archive_dir):
+    """Test that games younger than `MIN_ARCHIVE_AGE` cannot be archived.
+
+    Args:
+        session_factory (sessionmaker): Factory of sessions provided by the session_factory fixture.
+        archive_dir (str): Directory of the archive provided by the archive_dir fixture.
+    """
+    with pytest.raises(ValueError):
+        archive.archive_games(timedelta(minutes=30), session_factory=session_factory)
+
+
+def test_count_archived_games_by_period(session_factory, archive_dir):
+    """Test that the archived games of a period are counted from the segments that cover it.
+
+    Args:
+        session_factory (sessionmaker): Factory of sessions provided by the session_factory fixture.
+        archive_dir (str): Directory of the archive provided by the archive_dir fixture.
+    """
+    with session_factory() as db:
+        games = add_games(db)
+        start, end = NOW - timedelta(days=8, minutes=17), NOW - timedelta(days=6, hours=5)
+        expected = Counter((game.player, game.winner) for game in games if start <= game.created_at < end)
+
+    archive.archive_games(timedelta(days=5), segment_size=30, session_factory=session_factory, now=NOW)
+
+    rows = archive.count_archived_games(start=start, end=end)
+    assert {(player, winner): total for player, winner, total, abandonments in rows} == expected
+    assert {(player, winner): total for player, winner, total, abandonments in archive.count_archived_games(player='Human', start=start, end=end)} == \
+        {key: total for key, total in expected.items() if key[0] == 'Human'}
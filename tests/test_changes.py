@@ -0,0 +1,88 @@
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+from rock_paper_scissors.api import changes, schemas, shards
+from rock_paper_scissors.api.database import create_db_engine, init_db
+from rock_paper_scissors.api.init_app import app
+from rock_paper_scissors.api.shards import Shard
+
+init_db()
+client = TestClient(app)
+
+GAME = {
+    "rounds_played": [
+        {"player_1_move": "rock", "player_2_move": "scissors", "winner": "Human"},
+        {"player_1_move": "paper", "player_2_move": "rock", "winner": "Human"}
+    ],
+    "game_winner": "Human"
+}
+
+
+def test_changes_returns_new_games():
+    """Test that the feed returns the games after the cursor in batches, then none."""
+    cursor = str(client.post("/game/", json=GAME).json()["id"])
+    created = client.post("/game/bulk", json=[GAME] * 3).json()
+
+    first = client.get("/game/changes", params={"since": cursor, "limit": 2, "wait": 0}).json()
+    second = client.get("/game/changes", params={"since": first["cursor"], "limit": 2, "wait": 0}).json()
+    last = client.get("/game/changes", params={"since": second["cursor"], "wait": 0}).json()
+
+    assert [game["id"] for game in first["games"] + second["games"]] == [game["id"] for game in created]
+    assert second["cursor"] == str(created[-1]["id"])
+    assert last == {"games": [], "cursor": second["cursor"]}
+
+
+def test_changes_waits_for_next_game(monkeypatch):
+    """Test that a request without new games is answered as soon as a game is recorded, without rechecking."""
+    monkeypatch.setattr(changes, "CHANGES_RECHECK_INTERVAL", 30)
+    cursor = str(client.post("/game/", json=GAME).json()["id"])
+    result = {}
+
+    def poll():
+        start = time.perf_counter()
+        result["response"] = client.get("/game/changes", params={"since": cursor, "wait": 20})
+        result["seconds"] = time.perf_counter() - start
+
+    poller = threading.Thread(target=poll)
+    poller.start()
+    time.sleep(0.5)
+    created = client.post("/game/", json=GAME).json()
+    poller.join()
+
+    assert result["response"].status_code == 200
+    assert [game["id"] for game in result["response"].json()["games"]] == [created["id"]]
+    assert result["seconds"] < 10
+
+
+def test_changes_rejects_invalid_cursor():
+    """Test that a cursor that is not an id of each shard is refused."""
+    assert client.get("/game/changes", params={"since": "abc", "wait": 0}).status_code == 400
+    assert client.get("/game/changes", params={"since": "1.2", "wait": 0}).status_code == 400
+
+
+def test_read_changes_over_shards(tmp_path, monkeypatch):
+    """Test that the cursor pages through the games of every shard, each game once."""
+    engines = [create_db_engine(f"sqlite:///{tmp_path / f'game.{index}.db'}") for index in range(3)]
+    for engine in engines:
+        init_db(engine)
+    monkeypatch.setattr(shards, "shards", [Shard(index, 3, engine, engine, first_engine=engines[0])
+                                           for index, engine in enumerate(engines)])
+    db = shards.shards[0].SessionLocal()
+    created = [shards.create_game(db, schemas.GameCreate(**GAME)) for _ in range(7)]
+
+    received = []
+    positions = changes.parse_cursor("0", 3)
+    while True:
+        games, positions = changes.read_changes(db, positions, limit=2)
+        if not games:
+            break
+        received.extend(games)
+
+    assert [game["id"] for game in received] == sorted(game["id"] for game in created)
+    assert changes.format_cursor(positions) == ".".join(
+        str(max(game["id"] for game in created if game["id"] % 3 == index)) for index in range(3))
+    db.close()
+    for engine in engines:
+        engine.dispose()
@@ -0,0 +1,95 @@
+import gzip
+import json
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from rock_paper_scissors.api import compression
+from rock_paper_scissors.api.compression import CompressionMiddleware
+from rock_paper_scissors.api.database import init_db
+from rock_paper_scissors.api.init_app import app
+
+ENCODINGS = [
+    "gzip",
+    pytest.param("br", marks=pytest.mark.skipif(compression.brotli is None, reason="brotli is not installed")),
+    pytest.param("zstd", marks=pytest.mark.skipif(compression.zstandard is None, reason="zstandard is not installed")),
+]
+
+
+def decompress(encoding: str, body: bytes) -> bytes:
+    """Decompresses a body in one of the encodings of `compression`."""
+    if encoding == "br":
+        return compression.brotli.decompress(body)
+    if encoding == "zstd":
+        return compression.zstandard.ZstdDecompressor().decompressobj().decompress(body)
+    return gzip.decompress(body)
+
+
+def streaming_app() -> FastAPI:
+    """Builds an application with a streamed JSON lines route, a streamed event route and a small route."""
+    streaming = FastAPI()
+
+    @streaming.get("/lines")
+    def lines():
+        return StreamingResponse((json.dumps({"id": index, "winner": "Machine_2"}) + "\n" for index in range(500)),
+                                 media_type="application/x-ndjson")
+
+    @streaming.get("/events")
+    def events():
+        return StreamingResponse(iter(["data: 1\n\n"] * 200), media_type="text/event-stream")
+
+    @streaming.get("/small")
+    def small():
+        return {"winner": "Human"}
+
+    return streaming
+
+
+def test_large_history_is_compressed():
+    """Test that a page of the history is compressed with gzip and holds the same games."""
+    init_db()
+    client = TestClient(app)
+    game = {"rounds_played": [{"player_1_move": "rock", "player_2_move": "scissors", "winner": "Human"}] * 3,
+            "game_winner": "Human"}
+    assert client.post("/game/bulk", json=[game] * 30).status_code == 200
+
+    compressed = client.get("/game/historial", params={"limit": 30}, headers={"Accept-Encoding": "gzip"})
+    plain = client.get("/game/historial", params={"limit": 30}, headers={"Accept-Encoding": "identity"})
+
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert "accept-encoding" in compressed.headers["vary"].lower()
+    assert int(compressed.headers["content-length"]) < len(plain.content) / 3
+    assert "content-encoding" not in plain.headers
+    assert compressed.json() == plain.json()
+
+
+@pytest.mark.parametrize("encoding", ENCODINGS)
+def test_streamed_response_is_compressed(encoding):
+    """Test that a streamed response is compressed as it is sent, with each encoding.
+
+    Args:
+        encoding (str): The encoding accepted by the client.
+    """
+    client = TestClient(CompressionMiddleware(streaming_app(), encodings=["zstd", "br", "gzip"]))
+
+    with client.stream("GET", "/lines", headers={"Accept-Encoding": encoding}) as response:
+        body = b"".join(response.iter_raw())
+
+    assert response.headers["content-encoding"] == encoding
+    assert "content-length" not in response.headers
+    lines = decompress(encoding, body).decode().splitlines()
+    assert [json.loads(line)["id"] for line in lines] == list(range(500))
+
+
+def test_small_and_event_responses_are_not_compressed():
+    """Test that the responses below the minimum size and the event streams are sent as they are."""
+    client = TestClient(CompressionMiddleware(streaming_app(), encodings=["gzip"], minimum_size=100))
+
+    small = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    events = client.get("/events", headers={"Accept-Encoding": "gzip"})
+
+    assert "content-encoding" not in small.headers
+    assert small.json() == {"winner": "Human"}
+    assert "content-encoding" not in events.headers
+    assert events.text.count("data: 1") == 200
@@ -1,37 +1,15 @@
 import pytest
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from rock_paper_scissors.api.models import Base, Game, Move
-from rock_paper_scissors.api.crud import create_game, get_global_info, get_strong_hand, get_weak_hand, get_hand_info, get_ranking, get_statistics
-from rock_paper_scissors.api import schemas
+from unittest.mock import patch
+from rock_paper_scissors.api.idempotency import RecentKeys
+from rock_paper_scissors.api.models import Game, HourlyRollup, Move
+from rock_paper_scissors.api.crud import create_game, create_games, get_dashboard, get_round_statistics, get_transitions, get_history, get_global_info, get_strong_hand, get_weak_hand, get_hand_info, get_ranking, get_statistics
+from rock_paper_scissors.api.hand_stats import HandStats
+from rock_paper_scissors.api.query_log import count_queries
+from rock_paper_scissors.api.sequences import _cache as sequences_cache
+from rock_paper_scissors.api import crud, schemas
 from collections import Counter
 
 
-@pytest.fixture(scope='function')
-def db_session():
-    """Create a new SQLAlchemy database session for testing.
-
-    This fixture sets up an in-memory SQLite database for the duration 
-    of a test function. It creates the necessary tables, yields a 
-    session for interacting with the database, and ensures proper 
-    cleanup by closing the session and dropping the tables after the 
-    test completes.
-
-    Yields:
-        Session: A SQLAlchemy session object to interact with the 
-        in-memory database.
-    """
-    engine = create_engine('sqlite:///:memory:')
-    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    Base.metadata.create_all(bind=engine)
-    session = TestingSessionLocal()
-    
-    yield session
-    
-    session.close()
-    Base.metadata.drop_all(bind=engine)
-
-
 def test_create_game(db_session):
     """Test the creation of a game.
 
@@ -65,6 +43,163 @@ def test_create_game(db_session):
     assert response['rounds_played'][1]['player_2_move'] == 'rock'
 
 
+def test_create_games(db_session):
+    """Test the creation of several games in a single call.
+
+    The games must be stored with their moves and returned in the same
+    order they were sent, each one with its new id.
+
+    Args:
+        db_session (Session): A SQLAlchemy session object provided by 
+        the db_session fixture.
+    """
+    games = [
+        schemas.GameCreate(
+            rounds_played=[schemas.Move(player_1_move='rock', player_2_move='paper', winner='Machine')],
+            game_winner='Machine'
+        ),
+        schemas.GameCreate(
+            rounds_played=[
+                schemas.Move(player_1_move='rock', player_2_move='scissors', winner='Human'),
+                schemas.Move(player_1_move='paper', player_2_move='rock', winner='Human'),
+                schemas.Move(player_1_move='paper', player_2_move='paper', winner='Machine')
+            ],
+            game_winner='Human'
+        ),
+    ]
+
+    response = create_games(db_session, games)
+
+    assert db_session.query(Game).count() == 2
+    assert db_session.query(Move).count() == 4
+    assert [game['game_winner'] for game in response] == ['Machine', 'Human']
+    assert response[0]['id'] < response[1]['id']
+    assert len(response[1]['rounds_played']) == 3
+
+
+def test_create_games_with_idempotency_keys(db_session):
+    """Test that a game uploaded twice with the same key is recorded once.
+
+    The second upload, and a repeated key in the same list, return the recorded
+    game marked as replayed. The rollups only count the game once.
+
+    Args:
+        db_session (Session): A SQLAlchemy session object provided by 
+        the db_session fixture.
+    """
+    game = schemas.GameCreate(
+        rounds_played=[schemas.Move(player_1_move='rock', player_2_move='paper', winner='Machine')],
+        game_winner='Machine',
+        idempotency_key='upload-1'
+    )
+
+    first = create_game(db_session, game)
+    replays = create_games(db_session, [game, game.model_copy(update={'idempotency_key': 'upload-2'})] * 2)
+
+    assert 'replayed' not in first
+    assert replays[0] == {**first, 'replayed': True}
+    assert 'replayed' not in replays[1]
+    assert replays[3] == {**replays[1], 'replayed': True}
+    assert db_session.query(Game).count() == 2
+    assert db_session.query(Move).count() == 2
+    assert sum(rollup.total_games for rollup in db_session.query(HourlyRollup)) == 2
+
+
+def test_create_game_with_key_recorded_elsewhere(db_session):
+    """Test the replay of a key that the filter of recent keys does not know.
+
+    It happens when another worker recorded the key: the unique index refuses
+    the new game and the recorded one is returned.
+
+    Args:
+        db_session (Session): A SQLAlchemy session object provided by 
+        the db_session fixture.
+    """
+    game = schemas.GameCreate(
+        rounds_played=[schemas.Move(player_1_move='rock', player_2_move='paper', winner='Machine')],
+        game_winner='Machine',
+        idempotency_key='upload-1'
+    )
+    first = create_game(db_session, game)
+
+    with patch('rock_paper_scissors.api.crud.recent_keys', RecentKeys()):
+        replay = create_game(db_session, game)
+
+    assert replay == {**first, 'replayed': True}
+    assert db_session.query(Game).count() == 1
+
+
+def test_replay_racing_another_worker(session_factory):
+    """Test a bulk upload whose key is recorded by another worker while it is being written.
+
+    The other worker commits the key after this process decided the key was
+    new, so the unique index refuses the whole transaction: it is retried, the
+    recorded game is replayed and the other games, including a repeated key of
+    the same upload, are recorded once, with their rollups.
+
+    Args:
+        session_factory (sessionmaker): Sessions of the in-memory database.
+    """
+    def game(key):
+        return schemas.GameCreate(
+            rounds_played=[schemas.Move(player_1_move='rock', player_2_move='paper', winner='Machine')],
+            game_winner='Machine',
+            idempotency_key=key
+        )
+
+    worker, other_worker = session_factory(), session_factory()
+    insert_games = crud.insert_games
+    recorded_elsewhere = {}
+
+    def racing_insert(db, games, recorded, assign_ids=None):
+        if db is worker and not recorded_elsewhere:
+            recorded_elsewhere.update(create_game(other_worker, game('shared')))
+        return insert_games(db, games, recorded, assign_ids)
+
+    with patch('rock_paper_scissors.api.crud.recent_keys', RecentKeys()), \
+            patch('rock_paper_scissors.api.crud.insert_games', side_effect=racing_insert):
+        responses = create_games(worker, [game('new'), game('shared'), game('new')])
+
+    assert responses[1] == {**recorded_elsewhere, 'replayed': True}
+    assert responses[2] == {**responses[0], 'replayed': True}
+    assert worker.query(Game).count() == 2
+    assert sum(rollup.total_games for rollup in worker.query(HourlyRollup)) == 2
+    worker.close()
+    other_worker.close()
+
+
+def test_get_history(db_session):
+    """Test the pagination of the history of games.
+
+    Each page starts after the id of the last game of the previous one,
+    and the rounds of every game keep the order in which they were played.
+
+    Args:
+        db_session (Session): A SQLAlchemy session object provided by 
+        the db_session fixture.
+    """
+    games = [
+        schemas.GameCreate(
+            rounds_played=[
+                schemas.Move(player_1_move='rock', player_2_move='scissors', winner='Human'),
+                schemas.Move(player_1_move='paper', player_2_move='scissors', winner='Machine')
+            ],
+            game_winner='Machine'
+        )
+        for _ in range(5)
+    ]
+    created = create_games(db_session, games)
+
+    first_page = get_history(db_session, limit=3)
+    second_page = get_history(db_session, after_id=first_page[-1]['id'], limit=3)
+
+    assert first_page == created[:3]
+    assert second_page == created[3:]
+    assert get_history(db_session, after_id=created[-1]['id']) == []
+    assert first_page[0]['rounds_played'][0]['player_1_move'] == 'rock'
+    assert first_page[0]['rounds_played'][1]['player_1_move'] == 'paper'
+
+
 def test_get_global_info(db_session):
     """Test the retrieval of global game statistics.
 
@@ -218,4 +353,82 @@ def test_get_statistics(db_session):
     
     assert stats['total_games'] == 4
     assert stats['total_wins'] == 2
-    assert stats['total_abandonments'] == 1
\ No newline at end of file
+    assert stats['total_abandonments'] == 1
+
+def test_get_dashboard(db_session):
+    """Test that the dashboard has the figures of the separate statistics, from a few queries.
+
+    The hands are counted from the games in one query, or taken from the
+    statistics kept in memory.
+
+    Args:
+        db_session (Session): A SQLAlchemy session object provided by 
+        the db_session fixture.
+    """
+    def game(winner, moves, rounds=3):
+        loser = 'Machine' if winner == 'Human' else 'Human'
+        return schemas.GameCreate(
+            rounds_played=[
+                schemas.Move(player_1_move=move, player_2_move='rock', winner=winner if index % 2 == 0 else loser)
+                for index, move in enumerate(moves[:rounds])
+            ],
+            game_winner=winner
+        )
+
+    create_games(db_session, [
+        game('Human', ['paper', 'rock', 'paper']),
+        game('Human', ['scissors', 'rock', 'rock']),
+        game('Machine', ['rock', 'paper', 'scissors'], rounds=2),
+        game('Machine_1', ['rock', 'rock', 'rock']),
+    ])
+
+    with count_queries() as queries:
+        dashboard = get_dashboard(db_session, limit=3)
+
+    assert queries.count <= 2
+    assert dashboard.global_info == get_global_info(db_session)
+    assert dashboard.statistics.model_dump() == get_statistics(db_session)
+    assert sorted((player.name, player.points) for player in dashboard.ranking) == \
+        sorted((player.name, player.points) for player in get_ranking(db_session, limit=3))
+    assert dashboard.strong_hand == get_strong_hand(db_session)
+    assert dashboard.weak_hand == get_weak_hand(db_session)
+
+    assert get_dashboard(db_session, hand_stats=HandStats()) == dashboard
+
+
+def test_get_transitions_and_round_statistics(db_session):
+    """Test the transitions between moves and the statistics of the rounds of a few games.
+
+    Args:
+        db_session (Session): A SQLAlchemy session object provided by 
+        the db_session fixture.
+    """
+    sequences_cache.clear()
+    create_games(db_session, [
+        schemas.GameCreate(rounds_played=[
+            schemas.Move(player_1_move='rock', player_2_move='scissors', winner='Human'),
+            schemas.Move(player_1_move='rock', player_2_move='rock', winner='Machine'),
+            schemas.Move(player_1_move='paper', player_2_move='rock', winner='Human'),
+        ], game_winner='Human'),
+        schemas.GameCreate(rounds_played=[
+            schemas.Move(player_1_move='scissors', player_2_move='rock', winner='Machine'),
+            schemas.Move(player_1_move='rock', player_2_move='paper', winner='Machine'),
+        ], game_winner='Machine'),
+        schemas.GameCreate(rounds_played=[
+            schemas.Move(player_1_move='paper', player_2_move='paper', winner='Machine_2'),
+        ], game_winner='Machine_2'),
+    ])
+
+    transitions = get_transitions(db_session, player='Human')
+    assert transitions.transitions == {'rock': {'rock': 1, 'paper': 1}, 'scissors': {'rock': 1}}
+    assert transitions.total_transitions == 3
+    assert transitions.repeat_percentage == pytest.approx(100 / 3)
+
+    statistics = get_round_statistics(db_session)
+    assert statistics.total_rounds == 6
+    assert statistics.win_percentage == pytest.approx(2 / 6 * 100)
+    assert statistics.tie_percentage == pytest.approx(2 / 6 * 100)
+    assert [(info.round_number, info.total_rounds, info.win_percentage) for info in statistics.rounds] == \
+        [(1, 3, pytest.approx(100 / 3)), (2, 2, 0), (3, 1, 100)]
+    assert get_round_statistics(db_session, player='Machine_1').rounds[0].tie_percentage == 100
+    sequences_cache.clear()
@@ -0,0 +1,181 @@
+from datetime import timedelta
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import Session
+
+from rock_paper_scissors.api import database
+from rock_paper_scissors.api.database import create_db_engine, init_db, read_only_url, snapshot_path
+from rock_paper_scissors.api.rollups import get_outcome_counts
+
+
+@pytest.fixture(scope='function')
+def database_file(tmp_path):
+    """Create an SQLite database file with the schema of the application.
+
+    Yields:
+        tuple: The path of the file and the engine used to write into it.
+    """
+    path = str(tmp_path / "game.db")
+    engine = create_db_engine(f"sqlite:///{path}")
+    init_db(engine)
+
+    yield path, engine
+
+    engine.dispose()
+
+
+def test_init_db_is_idempotent(database_file):
+    """Test that creating the schema again over an existing database does nothing.
+
+    Several workers may run `init_db` at the same time; the ones arriving later must
+    find the tables and leave them untouched.
+    """
+    path, engine = database_file
+
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO games (total_rounds, winner) VALUES (3, 'Human')"))
+
+    init_db(engine)
+
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT count(*) FROM games")).scalar() == 1
+        assert connection.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+
+
+def test_init_db_adds_missing_columns(tmp_path):
+    """Test that `init_db` upgrades a database created by an older version.
+
+    The columns added later to the models are created, the existing games get the player
+    deduced from their winner and the time of the migration, and are added to the rollups.
+    """
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE games (id INTEGER PRIMARY KEY, total_rounds INTEGER, winner VARCHAR)"))
+        connection.execute(text("INSERT INTO games (total_rounds, winner) VALUES (3, 'Human'), (2, 'Machine'), (3, 'Machine_2')"))
+
+    init_db(engine)
+
+    with engine.connect() as connection:
+        columns = {row[1] for row in connection.execute(text("PRAGMA table_info(games)"))}
+        assert {"player", "created_at"} <= columns
+        assert connection.execute(text("SELECT player FROM games ORDER BY id")).scalars().all() == ['Human', 'Human', 'Machine_1']
+        assert connection.execute(text("SELECT count(*) FROM games WHERE created_at IS NULL")).scalar() == 0
+        with Session(bind=connection) as db:
+            outcomes = get_outcome_counts(db, window=timedelta(hours=1), player='Human')
+        assert sorted((outcome.winner, outcome.total_games, outcome.total_abandonments) for outcome in outcomes) == \
+            [('Human', 1, 0), ('Machine', 1, 1)]
+
+    init_db(engine)
+
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT sum(total_games) FROM game_rollups_daily")).scalar() == 3
+
+    engine.dispose()
+
+
+def test_init_db_rebuilds_tables_without_autoincrement(tmp_path):
+    """Test the migration of the tables created before their ids were AUTOINCREMENT.
+
+    The games and moves are kept with their ids and indexes, and once the
+    newest game is deleted, as the archive does, its id is not given again.
+    """
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE games (id INTEGER PRIMARY KEY, total_rounds INTEGER, winner VARCHAR, "
+                                "player VARCHAR, created_at DATETIME, idempotency_key VARCHAR)"))
+        connection.execute(text("CREATE UNIQUE INDEX ix_games_idempotency_key ON games (idempotency_key)"))
+        connection.execute(text("CREATE TABLE moves (id INTEGER PRIMARY KEY, game_id INTEGER REFERENCES games (id), "
+                                "player_1_move VARCHAR NOT NULL, player_2_move VARCHAR NOT NULL, winner VARCHAR)"))
+        connection.execute(text("INSERT INTO games VALUES (1, 1, 'Machine', 'Human', '2024-05-01 10:00:00', 'key'), "
+                                "(2, 1, 'Machine', 'Human', '2024-05-01 10:00:00', NULL)"))
+        connection.execute(text("INSERT INTO moves VALUES (1, 1, 'rock', 'paper', 'Machine'), (2, 2, 'rock', 'paper', 'Machine')"))
+
+    init_db(engine)
+    init_db(engine)
+
+    with engine.begin() as connection:
+        for table in ("games", "moves"):
+            sql = connection.execute(text("SELECT sql FROM sqlite_master WHERE name = :name"), {"name": table}).scalar()
+            assert "AUTOINCREMENT" in sql
+        assert connection.execute(text("SELECT id, idempotency_key FROM games ORDER BY id")).all() == [(1, 'key'), (2, None)]
+        assert connection.execute(text("SELECT game_id FROM moves ORDER BY id")).scalars().all() == [1, 2]
+        indexes = {row[1] for row in connection.execute(text("PRAGMA index_list(games)"))}
+        assert {"ix_games_idempotency_key", "ix_games_created_at", "ix_games_player"} <= indexes
+        assert not connection.execute(text("SELECT name FROM sqlite_master WHERE name LIKE '%_new'")).all()
+        with pytest.raises(IntegrityError):
+            connection.execute(text("INSERT INTO games (total_rounds, winner, idempotency_key) VALUES (1, 'Human', 'key')"))
+
+    with engine.begin() as connection:
+        connection.execute(text("DELETE FROM moves WHERE game_id = 2"))
+        connection.execute(text("DELETE FROM games WHERE id = 2"))
+        connection.execute(text("INSERT INTO games (total_rounds, winner) VALUES (1, 'Human')"))
+        assert connection.execute(text("SELECT max(id) FROM games")).scalar() == 3
+    engine.dispose()
+
+
+def test_read_only_engine(database_file):
+    """Test that the read-only engine sees the committed games and refuses to write."""
+    path, engine = database_file
+    read_engine = create_db_engine(read_only_url(path), read_only=True)
+
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO games (total_rounds, winner) VALUES (3, 'Human')"))
+
+    with read_engine.connect() as connection:
+        assert connection.execute(text("SELECT count(*) FROM games")).scalar() == 1
+
+        with pytest.raises(OperationalError):
+            connection.execute(text("INSERT INTO games (total_rounds, winner) VALUES (3, 'Machine')"))
+
+    read_engine.dispose()
+
+
+def test_refresh_read_snapshot(database_file, monkeypatch):
+    """Test that the snapshot is a copy of the database at the time of the refresh."""
+    path, engine = database_file
+    read_engine = create_db_engine(read_only_url(snapshot_path(path)), read_only=True)
+    monkeypatch.setattr(database, "SQLALCHEMY_DATABASE_URL", f"sqlite:///{path}")
+    monkeypatch.setattr(database, "read_engine", read_engine)
+
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO games (total_rounds, winner) VALUES (3, 'Human')"))
+    database.refresh_read_snapshot()
+
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO games (total_rounds, winner) VALUES (3, 'Machine')"))
+
+    with read_engine.connect() as connection:
+        assert connection.execute(text("SELECT count(*) FROM games")).scalar() == 1
+
+    database.refresh_read_snapshot()
+
+    with read_engine.connect() as connection:
+        assert connection.execute(text("SELECT count(*) FROM games")).scalar() == 2
+
+    read_engine.dispose()
+
+
+def test_set_auto_vacuum(database_file, tmp_path):
+    """Test that new databases get incremental vacuum, and that existing ones are only converted on demand."""
+    path, engine = database_file
+    with engine.connect() as connection:
+        assert connection.execute(text("PRAGMA auto_vacuum")).scalar() == 2
+
+    old_engine = create_db_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with old_engine.begin() as connection:
+        connection.execute(text("CREATE TABLE games (id INTEGER PRIMARY KEY)"))
+    init_db(old_engine)
+    assert not database.set_auto_vacuum(old_engine, only_if_empty=True)
+
+    assert database.set_auto_vacuum(old_engine)
+    with old_engine.connect() as connection:
+        assert connection.execute(text("PRAGMA auto_vacuum")).scalar() == 2
+    old_engine.dispose()
+
+
+def test_tests_use_their_own_database():
+    """Test that the application under test writes into the temporary database of `conftest`, not into the one of .env."""
+    from tests.conftest import TEST_DIRECTORY
+
+    assert database.sqlite_file_path(database.SQLALCHEMY_DATABASE_URL).startswith(TEST_DIRECTORY)
@@ -0,0 +1,136 @@
+import random
+
+from rock_paper_scissors.api import schemas
+from rock_paper_scissors.api.crud import create_games, get_moves_by_winner, get_strong_hand, get_weak_hand
+from rock_paper_scissors.api.hand_stats import HandStats
+from rock_paper_scissors.api.integrity import scan_games
+from rock_paper_scissors.api.models import Game, Move
+from rock_paper_scissors.game_logic import MOVES, determine_round_winner
+
+
+def random_games(rng: random.Random, count: int) -> list:
+    """Builds random games between Human and Machine, some of them abandoned."""
+    games = []
+    for _ in range(count):
+        rounds_played = []
+        for _ in range(rng.randint(1, 3)):
+            player_1_move, player_2_move = rng.choice(MOVES), rng.choice(MOVES)
+            winner = determine_round_winner(player_1_move, player_2_move, 'Human', 'Machine')
+            rounds_played.append(schemas.Move(player_1_move=player_1_move, player_2_move=player_2_move, winner=winner))
+        human_wins = sum(round_info.winner == 'Human' for round_info in rounds_played)
+        game_winner = 'Human' if len(rounds_played) == 3 and human_wins >= 2 else 'Machine'
+        games.append(schemas.GameCreate(rounds_played=rounds_played, game_winner=game_winner))
+    return games
+
+
+def test_hand_stats_match_the_games(db_session):
+    """Test that the statistics in memory are the ones counted from the games.
+
+    Half of the games are applied as they are recorded and the rest are read
+    by `catch_up`, in several chunks.
+
+    Args:
+        db_session (Session): A SQLAlchemy session object provided by 
+        the db_session fixture.
+    """
+    rng = random.Random(1)
+    stats = HandStats()
+    stats.apply_games(create_games(db_session, random_games(rng, 50)))
+    create_games(db_session, random_games(rng, 50))
+
+    stats.catch_up(db_session, chunk_size=7)
+
+    assert stats.last_game_id == 100
+    for winner in ('Human', 'Machine'):
+        games = db_session.query(Game).filter(Game.winner == winner).all()
+        assert stats.moves_counter(winner) == get_moves_by_winner(games, winner)
+
+    assert get_strong_hand(db_session, hand_stats=stats).win_percentage == get_strong_hand(db_session).win_percentage
+    assert get_weak_hand(db_session, hand_stats=stats).loss_percentage == get_weak_hand(db_session).loss_percentage
+
+
+def test_apply_games_waits_for_missing_games(db_session):
+    """Test that games recorded after a gap are left to `catch_up`.
+
+    The gap stands for games recorded by another worker, which this process
+    has not seen yet.
+
+    Args:
+        db_session (Session): A SQLAlchemy session object provided by 
+        the db_session fixture.
+    """
+    rng = random.Random(2)
+    stats = HandStats()
+    create_games(db_session, random_games(rng, 3))
+    stats.apply_games(create_games(db_session, random_games(rng, 2)))
+
+    assert stats.last_game_id == 0
+
+    stats.catch_up(db_session)
+    assert stats.last_game_id == 5
+
+
+def test_snapshot_warm_start(db_session, tmp_path):
+    """Test that a restarted process loads the snapshot and only reads the newer games.
+
+    A snapshot beyond the last game of the database, e.g. of another database,
+    is discarded.
+
+    Args:
+        db_session (Session): A SQLAlchemy session object provided by 
+        the db_session fixture.
+        tmp_path (Path): Temporary directory for the snapshot file.
+    """
+    rng = random.Random(3)
+    path = str(tmp_path / "hands.json")
+    stats = HandStats()
+    stats.apply_games(create_games(db_session, random_games(rng, 20)))
+    # As `warm_start`, so the snapshot holds the number of quarantined games it was checked against.
+    stats.catch_up(db_session)
+    stats.save(path)
+    stats.apply_games(create_games(db_session, random_games(rng, 20)))
+
+    restarted = HandStats()
+    assert restarted.load(path, db_session)
+    assert restarted.last_game_id == 20
+    restarted.catch_up(db_session)
+
+    assert restarted.last_game_id == 40
+    assert restarted.moves_counter('Human') == stats.moves_counter('Human')
+    assert restarted.moves_counter('Machine') == stats.moves_counter('Machine')
+
+    db_session.query(Game).filter(Game.id > 10).delete()
+    assert not HandStats().load(path, db_session)
+
+
+def test_quarantine_rebuilds_hand_stats(db_session, tmp_path):
+    """Test that the games quarantined by the integrity scan leave the statistics.
+
+    The scan runs in another process in production, so the statistics only
+    learn about it from the database: on the next catch up they are rebuilt,
+    and a snapshot saved before the quarantine is discarded.
+
+    Args:
+        db_session (Session): A SQLAlchemy session object provided by 
+        the db_session fixture.
+        tmp_path (Path): Temporary directory for the snapshot file.
+    """
+    rng = random.Random(4)
+    path = str(tmp_path / "hands.json")
+    stats = HandStats()
+    stats.apply_games(create_games(db_session, random_games(rng, 30)))
+    stats.catch_up(db_session)
+    stats.save(path)
+
+    corrupt = db_session.query(Game).filter(Game.winner == 'Human').first()
+    db_session.query(Move).filter(Move.game_id == corrupt.id).update({Move.player_1_move: 'lizard'})
+    db_session.commit()
+    report = scan_games(quarantine=True, session_factory=lambda: db_session)
+    assert report.quarantined == 1
+
+    stats.catch_up(db_session)
+
+    for winner in ('Human', 'Machine'):
+        games = db_session.query(Game).filter(Game.winner == winner).all()
+        assert stats.moves_counter(winner) == get_moves_by_winner(games, winner)
+    assert not HandStats().load(path, db_session)
@@ -0,0 +1,33 @@
+import uuid
+
+from rock_paper_scissors.api.idempotency import BloomFilter, RecentKeys
+
+
+def test_bloom_filter_error_rate():
+    """Test that a full filter never misses a key and rarely reports an absent one.
+
+    With the default error rate of 1%, less than 2% of new keys may be
+    reported as present.
+    """
+    keys = BloomFilter(capacity=10000)
+    added = [uuid.uuid4().hex for _ in range(10000)]
+    for key in added:
+        keys.add(key)
+
+    assert all(key in keys for key in added)
+    assert sum(uuid.uuid4().hex in keys for _ in range(10000)) < 200
+
+
+def test_recent_keys_are_bounded():
+    """Test that the filter of recent keys forgets the oldest keys.
+
+    The last `capacity` keys are always remembered; two generations later
+    the first keys are mostly forgotten and the memory used stays the same.
+    """
+    recent_keys = RecentKeys(capacity=1000)
+    keys = [uuid.uuid4().hex for _ in range(3000)]
+    recent_keys.update(keys)
+
+    assert all(recent_keys.might_contain(key) for key in keys[-1000:])
+    assert sum(recent_keys.might_contain(key) for key in keys[:1000]) < 50
+    assert recent_keys.previous.count == recent_keys.current.count == 1000
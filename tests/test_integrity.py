@@ -0,0 +1,115 @@
+import json
+
+from rock_paper_scissors.api import schemas
+from rock_paper_scissors.api.crud import create_games
+from rock_paper_scissors.api.integrity import scan_games
+from rock_paper_scissors.api.models import Game, HourlyRollup, Move, QuarantinedGame, utcnow
+from rock_paper_scissors.api.rollups import record_games
+
+
+def add_games(db):
+    """Adds two valid games through `crud.create_games` and two corrupt ones directly to the tables.
+
+    Returns:
+        list: The ids of the corrupt games.
+    """
+    create_games(db, [
+        schemas.GameCreate(
+            rounds_played=[schemas.Move(player_1_move='rock', player_2_move='scissors', winner='Human')] * 3,
+            game_winner='Human'
+        )
+    ] * 2)
+
+    wrong_winner = Game(total_rounds=1, winner='Human', player='Human', created_at=utcnow())
+    wrong_winner.moves.append(Move(player_1_move='rock', player_2_move='paper', winner='Human'))
+    wrong_rounds = Game(total_rounds=3, winner='Machine')
+    wrong_rounds.moves.append(Move(player_1_move='rock', player_2_move='rock', winner='Machine'))
+    db.add_all([wrong_winner, wrong_rounds])
+    db.commit()
+
+    return [wrong_winner.id, wrong_rounds.id]
+
+
+def test_scan_reports_invalid_games(session_factory):
+    """Test that the scan finds the corrupt games in every chunk without changing them.
+
+    Args:
+        session_factory (sessionmaker): Sessions of the in-memory database.
+    """
+    with session_factory() as db:
+        wrong_winner, wrong_rounds = add_games(db)
+
+    report = scan_games(chunk_size=3, session_factory=session_factory)
+
+    assert report.scanned == 4
+    assert report.invalid == {
+        wrong_winner: ['Wrong round winner', 'Wrong game winner'],
+        wrong_rounds: ['Wrong total rounds']
+    }
+    assert report.quarantined == 0
+    with session_factory() as db:
+        assert db.query(Game).count() == 4
+
+
+def test_scan_quarantines_invalid_games(session_factory):
+    """Test that quarantined games leave the games, moves and rollups.
+
+    The corrupt game with a creation time was counted in the hourly rollup,
+    so its count is subtracted. A second scan finds nothing.
+
+    Args:
+        session_factory (sessionmaker): Sessions of the in-memory database.
+    """
+    with session_factory() as db:
+        wrong_winner, wrong_rounds = add_games(db)
+        record_games(db, [db.get(Game, wrong_winner)])
+        db.commit()
+
+    report = scan_games(chunk_size=10, quarantine=True, session_factory=session_factory)
+    assert report.quarantined == 2
+
+    with session_factory() as db:
+        assert db.query(Game).count() == 2
+        assert db.query(Move).count() == 6
+        assert {rollup.winner: rollup.total_games for rollup in db.query(HourlyRollup)} == {'Human': 2}
+
+        quarantined = db.get(QuarantinedGame, wrong_winner)
+        assert json.loads(quarantined.moves) == [['rock', 'paper', 'Human']]
+        assert quarantined.reasons == 'Wrong round winner; Wrong game winner'
+
+    assert scan_games(session_factory=session_factory).invalid == {}
+
+
+def test_quarantine_game_without_player(session_factory):
+    """Test the quarantine of a game that has no player, as the games recorded before that column.
+
+    The game is checked with the player deduced from its winner, and as an
+    abandoned game cannot be won by the player, it is quarantined. A game
+    without player was never counted in the rollups, which are left as they are.
+
+    Args:
+        session_factory (sessionmaker): Sessions of the in-memory database.
+    """
+    with session_factory() as db:
+        create_games(db, [
+            schemas.GameCreate(
+                rounds_played=[schemas.Move(player_1_move='rock', player_2_move='scissors', winner='Human')] * 3,
+                game_winner='Human'
+            )
+        ])
+        orphan = Game(total_rounds=1, winner='Human', player=None, created_at=utcnow())
+        db.add(orphan)
+        db.flush()
+        db.add(Move(game_id=orphan.id, player_1_move='rock', player_2_move='scissors', winner='Human'))
+        db.commit()
+        orphan_id = orphan.id
+
+    report = scan_games(quarantine=True, session_factory=session_factory)
+
+    assert report.invalid[orphan_id] == ['Wrong game winner']
+    with session_factory() as db:
+        quarantined = db.get(QuarantinedGame, orphan_id)
+        assert quarantined.player is None
+        assert json.loads(quarantined.moves) == [['rock', 'scissors', 'Human']]
+        assert db.get(Game, orphan_id) is None
+        assert {rollup.winner: rollup.total_games for rollup in db.query(HourlyRollup)} == {'Human': 1}
@@ -0,0 +1,134 @@
+import json
+import pytest
+from datetime import timedelta
+from sqlalchemy import inspect
+
+from rock_paper_scissors.api import archive, crud, models, schemas
+from rock_paper_scissors.api.loader import DEFERRABLE_INDEXES, load_file
+from rock_paper_scissors.api.models import DailyRollup, Game, Move
+
+
+def game_line(moves: list, game_winner: str, **fields) -> str:
+    """Builds a line of a games file with the rounds of Human against Machine."""
+    rounds = [{"player_1_move": player_1_move, "player_2_move": player_2_move, "winner": winner}
+              for player_1_move, player_2_move, winner in moves]
+    return json.dumps({"rounds_played": rounds, "game_winner": game_winner, **fields}) + "\n"
+
+
+WON = [("rock", "scissors", "Human")] * 3
+
+
+def test_load_file(session_factory, tmp_path):
+    """Test that the valid games of a file are recorded and the invalid lines rejected.
+
+    A game with wrong winners is recorded with the winners of its moves, a
+    game whose key is already used is skipped, and blank lines are ignored.
+
+    Args:
+        session_factory (sessionmaker): The factory of sessions provided by the fixture.
+        tmp_path (Path): Temporary directory provided by pytest.
+    """
+    path = tmp_path / "games.jsonl"
+    path.write_text(
+        game_line(WON, "Human", idempotency_key="a", created_at="2024-05-01T13:45:00")
+        + game_line([("rock", "paper", "Human")], "Human")
+        + "\n"
+        + "not json\n"
+        + game_line([("rock", "lizard", "Human")], "Human")
+        + game_line(WON, "Human", idempotency_key="a")
+        + game_line(WON, "Human", player="Machine_1")
+    )
+    rejects_path = tmp_path / "rejects.jsonl"
+
+    with open(rejects_path, "w") as rejects:
+        report = load_file(str(path), batch_size=4, rejects=rejects, session_factory=session_factory)
+
+    assert (report.lines, report.games, report.moves, report.replayed) == (7, 3, 7, 1)
+    assert report.rejected == {4: ["Invalid JSON"], 5: ["Invalid move"]}
+    assert [json.loads(line)["line"] for line in rejects_path.read_text().splitlines()] == [4, 5]
+
+    with session_factory() as db:
+        history = crud.get_history(db)
+        assert [(game["id"], game["game_winner"], game["player"]) for game in history] == \
+            [(1, "Human", "Human"), (2, "Machine", "Human"), (3, "Machine_1", "Machine_1")]
+        assert history[1]["rounds_played"][0]["winner"] == "Machine"
+        assert db.query(Game.created_at).filter(Game.id == 1).scalar().isoformat() == "2024-05-01T13:45:00"
+        assert sum(rollup.total_games for rollup in db.query(DailyRollup)) == 3
+        assert db.query(Move).count() == 7
+
+
+def test_load_resumes_after_last_batch(session_factory, tmp_path):
+    """Test that an interrupted load resumes after its last batch, and a finished one loads nothing.
+
+    Args:
+        session_factory (sessionmaker): The factory of sessions provided by the fixture.
+        tmp_path (Path): Temporary directory provided by pytest.
+    """
+    path = tmp_path / "games.jsonl"
+    path.write_text(game_line(WON, "Human") * 10)
+
+    def interrupt(report):
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        load_file(str(path), batch_size=3, session_factory=session_factory, progress=interrupt)
+
+    report = load_file(str(path), batch_size=3, session_factory=session_factory)
+    assert (report.first_line, report.lines, report.games) == (4, 7, 7)
+    assert load_file(str(path), session_factory=session_factory).games == 0
+    with session_factory() as db:
+        assert db.query(Game).count() == 10
+
+    path.write_text(game_line(WON, "Human"))
+    with pytest.raises(ValueError):
+        load_file(str(path), session_factory=session_factory)
+    assert load_file(str(path), restart=True, session_factory=session_factory).games == 1
+
+
+def test_load_with_deferred_indexes(session_factory, tmp_path):
+    """Test that the indexes dropped during a load are built again at the end.
+
+    Args:
+        session_factory (sessionmaker): The factory of sessions provided by the fixture.
+        tmp_path (Path): Temporary directory provided by pytest.
+    """
+    path = tmp_path / "games.jsonl"
+    path.write_text(game_line(WON, "Human") * 5)
+    dropped = []
+
+    def check_indexes(report):
+        with session_factory() as db:
+            dropped.append({index["name"] for index in inspect(db.connection()).get_indexes("moves")})
+
+    report = load_file(str(path), batch_size=2, defer_indexes=True, session_factory=session_factory,
+                       progress=check_indexes)
+
+    assert report.games == 5
+    assert "ix_moves_game_id" not in dropped[0]
+    with session_factory() as db:
+        names = {index["name"] for table in ("games", "moves") for index in inspect(db.connection()).get_indexes(table)}
+    assert {index.name for index in DEFERRABLE_INDEXES} <= names
+
+
+def test_load_after_archiving_every_game(session_factory, tmp_path):
+    """Test that the loaded games do not get the ids of archived games.
+
+    Args:
+        session_factory (sessionmaker): The factory of sessions provided by the fixture.
+        tmp_path (Path): Temporary directory provided by pytest.
+    """
+    path = tmp_path / "games.jsonl"
+    path.write_text(game_line(WON, "Human") * 2)
+    with session_factory() as db:
+        for _ in range(3):
+            crud.create_game(db, schemas.GameCreate(**json.loads(game_line(WON, "Human"))))
+    directory = str(tmp_path / "archive")
+    archive.archive_games(timedelta(days=1), directory=directory, session_factory=session_factory,
+                          now=models.utcnow() + timedelta(days=2))
+
+    report = load_file(str(path), session_factory=session_factory)
+
+    assert report.games == 2
+    assert [segment.last_id for segment in archive.archive_totals(directory).segments] == [3]
+    with session_factory() as db:
+        assert [game["id"] for game in crud.get_history(db)] == [4, 5]
@@ -0,0 +1,79 @@
+import asyncio
+import os
+import pytest
+from sqlalchemy import text
+
+from rock_paper_scissors.api import maintenance
+from rock_paper_scissors.api.database import create_db_engine, init_db
+from rock_paper_scissors.api.maintenance import claim_run, maintain, wal_size
+
+
+@pytest.fixture(scope='function')
+def database_file(tmp_path):
+    """Create an SQLite database file with free pages, left by games deleted after the last checkpoint.
+
+    Yields:
+        tuple: The path of the file and the engine used to write into it.
+    """
+    path = str(tmp_path / "game.db")
+    engine = create_db_engine(f"sqlite:///{path}")
+    init_db(engine)
+    with engine.begin() as connection:
+        connection.execute(text(
+            "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 5000) "
+            "INSERT INTO games (total_rounds, winner) SELECT 3, 'Human' FROM n"))
+    with engine.begin() as connection:
+        connection.execute(text("DELETE FROM games"))
+
+    yield path, engine
+
+    engine.dispose()
+
+
+def free_pages(engine) -> int:
+    with engine.connect() as connection:
+        return connection.execute(text("PRAGMA freelist_count")).scalar()
+
+
+def test_maintain(database_file, monkeypatch):
+    """Test that a run on an idle worker vacuums the free pages and truncates a large WAL."""
+    path, engine = database_file
+    monkeypatch.setattr(maintenance, "MAINTENANCE_VACUUM_PAGES", 10)
+    monkeypatch.setattr(maintenance, "MAINTENANCE_WAL_TRUNCATE_BYTES", 0)
+    assert free_pages(engine) > 10
+    assert wal_size(engine) > 0
+
+    report = asyncio.run(maintain(engine, is_idle=lambda: True, write_lock=asyncio.Lock()))
+
+    assert free_pages(engine) == 0
+    assert report.vacuumed_pages > 10
+    assert report.free_pages == 0
+    assert set(report.timings) == {"optimize", "incremental_vacuum", "checkpoint", "truncate"}
+    assert report.checkpoint[0] == 0
+    assert report.skipped == []
+    assert wal_size(engine) == 0
+
+
+def test_maintain_skips_writes_while_busy(database_file, monkeypatch):
+    """Test that a run on a worker that stays busy only makes a passive checkpoint."""
+    path, engine = database_file
+    monkeypatch.setattr(maintenance, "MAINTENANCE_WAL_TRUNCATE_BYTES", 0)
+    pages = free_pages(engine)
+
+    report = asyncio.run(maintain(engine, is_idle=lambda: False, write_lock=asyncio.Lock(), max_wait=0))
+
+    assert report.skipped == ["optimize", "incremental_vacuum", "truncate"]
+    assert set(report.timings) == {"checkpoint"}
+    assert report.vacuumed_pages == 0
+    assert free_pages(engine) == pages
+
+
+def test_claim_run(tmp_path):
+    """Test that a single worker claims each run, and the next one once half the interval passed."""
+    marker = str(tmp_path / "game.db.maintenance")
+
+    assert claim_run(marker, interval=60)
+    assert not claim_run(marker, interval=60)
+
+    os.utime(marker, (0, os.path.getmtime(marker) - 31))
+    assert claim_run(marker, interval=60)
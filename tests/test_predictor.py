@@ -0,0 +1,103 @@
+import random
+
+from rock_paper_scissors.api import schemas
+from rock_paper_scissors.api.crud import create_games, get_prediction
+from rock_paper_scissors.api.predictor import PlayerModel, Predictor
+from rock_paper_scissors.game_logic import MOVES, determine_round_winner
+
+
+def player_games(rng: random.Random, count: int, player: str, moves: list = None) -> list:
+    """Builds games of a player, with random moves or cycling through `moves`."""
+    games = []
+    for index in range(count):
+        rounds_played = []
+        for round_number in range(3):
+            player_1_move = moves[(index * 3 + round_number) % len(moves)] if moves else rng.choice(MOVES)
+            player_2_move = rng.choice(MOVES)
+            winner = determine_round_winner(player_1_move, player_2_move, player, 'Machine')
+            rounds_played.append(schemas.Move(player_1_move=player_1_move, player_2_move=player_2_move, winner=winner))
+        human_wins = sum(round_info.winner == player for round_info in rounds_played)
+        games.append(schemas.GameCreate(rounds_played=rounds_played, game_winner=player if human_wins >= 2 else 'Machine',
+                                        player=player))
+    return games
+
+
+def test_model_built_from_database_matches_incremental_model(db_session):
+    """Test that a model built from the database counts the same moves as one updated game by game.
+
+    Games of two players are interleaved: the second model applies the
+    games as they are recorded, then reads the rest with `catch_up` in
+    several chunks.
+
+    Args:
+        db_session (Session): A SQLAlchemy session object provided by 
+        the db_session fixture.
+    """
+    rng = random.Random(1)
+    incremental = Predictor()
+    incremental.model(db_session, 'Alice')
+    for _ in range(10):
+        incremental.apply_games(create_games(db_session, player_games(rng, 3, 'Alice') + player_games(rng, 2, 'Bob')))
+    create_games(db_session, player_games(rng, 20, 'Alice'))
+    incremental.catch_up(db_session, incremental.cached_model('Alice'), chunk_size=7)
+
+    built = Predictor().model(db_session, 'Alice')
+    model = incremental.cached_model('Alice')
+
+    assert model.last_game_id == built.last_game_id == 70
+    assert model.counts == built.counts
+    assert model.last_moves == built.last_moves
+    assert sum(built.counts[()]) == 50 * 3
+
+
+def test_predict_pattern(db_session):
+    """Test that the moves of a player who repeats a pattern are predicted and countered.
+
+    Args:
+        db_session (Session): A SQLAlchemy session object provided by 
+        the db_session fixture.
+    """
+    create_games(db_session, player_games(random.Random(2), 10, 'Alice', ['rock', 'rock', 'paper']))
+    predictor = Predictor()
+
+    prediction = get_prediction(db_session, predictor, player='Alice', recent_moves=['rock', 'rock'])
+    assert prediction.predicted_move == 'paper'
+    assert prediction.counter_move == 'scissors'
+    assert prediction.probability_percentage == 100.0
+    assert prediction.context == ['rock', 'rock']
+    assert prediction.total_moves == 30
+
+    prediction = get_prediction(db_session, predictor, player='Alice', recent_moves=['paper'])
+    assert prediction.predicted_move == 'rock'
+    assert prediction.counter_move == 'paper'
+
+    prediction = get_prediction(db_session, predictor, player='Nobody')
+    assert prediction.predicted_move is None
+    assert prediction.total_moves == 0
+
+
+def test_predict_falls_back_to_shorter_contexts():
+    """Test that a context seen fewer than `min_samples` times is not trusted."""
+    model = PlayerModel('Alice')
+    for move in ['scissors'] * 6 + ['rock', 'paper']:
+        model.add_move(move)
+
+    assert model.predict(('rock',), min_samples=1)[0] == 'paper'
+    assert model.predict(('rock',), min_samples=2) == ('scissors', 'rock', 0.75, ())
+
+
+def test_models_are_evicted_least_recently_used(db_session):
+    """Test that at most `max_players` models are kept, dropping the least recently used.
+
+    Args:
+        db_session (Session): A SQLAlchemy session object provided by 
+        the db_session fixture.
+    """
+    predictor = Predictor(max_players=2)
+    for player in ['Alice', 'Bob']:
+        predictor.model(db_session, player)
+    predictor.cached_model('Alice')
+    predictor.model(db_session, 'Carol')
+
+    assert list(predictor.models) == ['Alice', 'Carol']
+    assert predictor.cached_model('Bob') is None
@@ -0,0 +1,96 @@
+import pytest
+import threading
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+
+from rock_paper_scissors.api import profiling
+from rock_paper_scissors.api.init_app import app
+
+client = TestClient(app)
+
+
+def busy_loop(stop: threading.Event):
+    """Keeps a thread busy until it is stopped."""
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def allocate(stop: threading.Event, blocks: list):
+    """Keeps allocating blocks that stay alive until the thread is stopped."""
+    while not stop.is_set():
+        blocks.append(bytearray(10000))
+        stop.wait(0.001)
+
+
+def run_with_thread(target, profile):
+    """Runs a profile while a thread runs `target`, and returns the profile."""
+    stop = threading.Event()
+    blocks = []
+    args = (stop,) if target is busy_loop else (stop, blocks)
+    thread = threading.Thread(target=target, args=args, name="worker-under-test")
+    thread.start()
+    try:
+        return profile()
+    finally:
+        stop.set()
+        thread.join()
+
+
+def test_sample_cpu_finds_the_busy_thread():
+    """Test that the CPU profile has the stacks of a busy thread, rooted at its name.
+
+    The thread of the profiler itself is not sampled, and the profile leaves no
+    thread or lock behind.
+    """
+    counts = run_with_thread(busy_loop, lambda: profiling.sample_cpu(0.2, interval=0.002))
+
+    busy = [stack for stack in counts if stack[0] == "worker-under-test"]
+    assert busy
+    assert any(frame.startswith("busy_loop (") for stack in busy for frame in stack)
+    assert not any("sample_cpu" in frame for stack in counts for frame in stack)
+    assert not profiling.profile_lock.locked()
+
+    line = profiling.collapse(counts).splitlines()[0]
+    stack, count = line.rsplit(" ", 1)
+    assert int(count) > 0 and ";" in stack
+
+
+def test_trace_memory_finds_the_allocations():
+    """Test that the memory profile reports the blocks allocated during the profile.
+
+    Tracing is stopped afterwards, so there is no overhead once it ends.
+    """
+    counts = run_with_thread(allocate, lambda: profiling.trace_memory(0.2, frames=5))
+
+    assert any(stack[-1].endswith(f"test_profiling.py:{allocate.__code__.co_firstlineno + 3}") for stack in counts)
+    assert not profiling.tracemalloc.is_tracing()
+
+
+def test_only_one_profile_at_a_time():
+    """Test that a profile requested while another one runs is refused."""
+    with profiling.profile_lock:
+        with pytest.raises(profiling.ProfilerBusyError):
+            profiling.sample_cpu(0.01)
+
+
+def test_admin_routes_require_the_token():
+    """Test that the admin routes are hidden without ADMIN_TOKEN and need the right token otherwise."""
+    assert client.get("/admin/profile/cpu", params={"seconds": 0.05}).status_code == 404
+
+    with patch('rock_paper_scissors.api.routers.admin.ADMIN_TOKEN', 's3cret'):
+        assert client.get("/admin/profile/cpu", params={"seconds": 0.05}).status_code == 403
+        assert client.get("/admin/profile/cpu", params={"seconds": 0.05},
+                          headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+        response = client.get("/admin/profile/cpu", params={"seconds": 0.05, "idle": True},
+                              headers={"X-Admin-Token": "s3cret"})
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert all(line.rsplit(" ", 1)[1].isdigit() for line in response.text.splitlines())
+
+        response = client.get("/admin/profile/memory", params={"seconds": 0.05},
+                              headers={"X-Admin-Token": "s3cret"})
+        assert response.status_code == 200
+
+        assert client.get("/admin/profile/cpu", params={"seconds": 600},
+                          headers={"X-Admin-Token": "s3cret"}).status_code == 422
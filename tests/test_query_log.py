@@ -0,0 +1,93 @@
+import logging
+import pytest
+from sqlalchemy import text
+from unittest.mock import patch
+
+from rock_paper_scissors.api import query_log, schemas
+from rock_paper_scissors.api.crud import create_games, get_strong_hand, get_weak_hand
+from rock_paper_scissors.api.models import Game
+
+
+def add_games(db, count: int):
+    """Adds games won by Human through `crud.create_games`."""
+    create_games(db, [
+        schemas.GameCreate(
+            rounds_played=[schemas.Move(player_1_move='rock', player_2_move='scissors', winner='Human')] * 3,
+            game_winner='Human'
+        )
+    ] * count)
+
+
+def test_hand_queries_do_not_grow_with_the_games(db_session):
+    """Test that the hands counted from the games load the moves of all the games at once.
+
+    Args:
+        db_session (Session): A SQLAlchemy session object provided by 
+        the db_session fixture.
+    """
+    add_games(db_session, 3)
+    with query_log.count_queries() as few:
+        get_strong_hand(db_session)
+    add_games(db_session, 30)
+    db_session.expire_all()
+    with query_log.count_queries() as many:
+        get_strong_hand(db_session)
+        get_weak_hand(db_session)
+
+    assert few.count <= 2
+    assert many.count <= 2 * few.count
+
+
+def test_repeated_statements_are_reported(db_session, caplog):
+    """Test that a tracked block running the same SELECT many times logs a warning.
+
+    Args:
+        db_session (Session): A SQLAlchemy session object provided by 
+        the db_session fixture.
+        caplog (LogCaptureFixture): Captured log records.
+    """
+    add_games(db_session, 12)
+    db_session.expire_all()
+
+    with caplog.at_level(logging.WARNING, logger="rock_paper_scissors.api.query_log"):
+        with query_log.track_queries("GET /test") as stats:
+            games = db_session.query(Game).all()
+            for game in games:
+                len(game.moves)
+
+    assert stats.count == 13
+    assert stats.repeated(12)[0][1] == 12
+    assert "GET /test ran the same statement 12 times" in caplog.text
+    assert query_log.current_stats.get() is None
+
+
+def test_slow_queries_are_logged_with_their_plan(db_session, caplog):
+    """Test that a statement over the threshold goes to the slow query log with its query plan.
+
+    Args:
+        db_session (Session): A SQLAlchemy session object provided by 
+        the db_session fixture.
+        caplog (LogCaptureFixture): Captured log records.
+    """
+    with patch('rock_paper_scissors.api.query_log.SLOW_QUERY_MS', 1e-6), \
+            caplog.at_level(logging.WARNING, logger="rock_paper_scissors.slow_queries"):
+        db_session.execute(text("SELECT id FROM games WHERE winner = :winner"), {"winner": "Human"}).all()
+
+    record = caplog.records[-1]
+    assert "SELECT id FROM games WHERE winner = ?" in record.getMessage()
+    assert "SCAN games" in record.getMessage() or "SEARCH games" in record.getMessage()
+
+
+def test_failed_statements_keep_the_timers_balanced(db_session):
+    """Test that a statement that fails does not leave its start time behind.
+
+    Args:
+        db_session (Session): A SQLAlchemy session object provided by 
+        the db_session fixture.
+    """
+    with pytest.raises(Exception):
+        db_session.execute(text("SELECT * FROM missing_table"))
+    db_session.rollback()
+
+    connection = db_session.connection()
+    assert connection.info.get("query_start", []) == []
@@ -0,0 +1,114 @@
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+
+from rock_paper_scissors.api import schemas
+from rock_paper_scissors.api.crud import create_game, get_global_info, get_ranking, get_statistics
+from rock_paper_scissors.api.models import Game, HourlyRollup
+from rock_paper_scissors.api.rollups import get_outcome_counts, parse_window, record_games
+
+
+def test_windows_match_the_games(db_session):
+    """Test that the windowed counts read from the rollups are exact.
+
+    Random games spread over ten days are added to the rollups. For several
+    windows, the counts must be the same as counting the games one by one.
+
+    Args:
+        db_session (Session): A SQLAlchemy session object provided by 
+        the db_session fixture.
+    """
+    rng = random.Random(0)
+    now = datetime(2024, 5, 10, 15, 37, 20)
+    games = [
+        Game(
+            total_rounds=rng.choice([1, 2, 3, 3]),
+            player=player,
+            winner=rng.choice([player, opponent]),
+            created_at=now - timedelta(seconds=rng.randint(0, 10 * 24 * 3600))
+        )
+        for player, opponent in [('Human', 'Machine'), ('Machine_1', 'Machine_2')] * 200
+    ]
+    db_session.add_all(games)
+    record_games(db_session, games)
+    db_session.commit()
+
+    for window in ["20m", "1h", "150m", "5h", "1d", "30h", "3d", "11d"]:
+        since = now - parse_window(window)
+        expected = Counter((game.player, game.winner) for game in games if game.created_at >= since)
+
+        outcomes = get_outcome_counts(db_session, parse_window(window), now=now)
+
+        assert {(outcome.player, outcome.winner): outcome.total_games for outcome in outcomes} == expected
+        assert sum(outcome.total_abandonments for outcome in outcomes) == \
+            sum(1 for game in games if game.created_at >= since and game.total_rounds < 3)
+
+
+def test_statistics_by_window_and_player(db_session):
+    """Test the statistics of the last hour for a single player.
+
+    Games created through `create_game` are recorded in the rollups, and
+    the player is deduced from the winner when it is not sent.
+
+    Args:
+        db_session (Session): A SQLAlchemy session object provided by 
+        the db_session fixture.
+    """
+    def game(winner, rounds=3):
+        return schemas.GameCreate(
+            rounds_played=[schemas.Move(player_1_move='rock', player_2_move='paper', winner=winner)] * rounds,
+            game_winner=winner
+        )
+
+    create_game(db_session, game('Human'))
+    create_game(db_session, game('Machine', rounds=2))
+    create_game(db_session, game('Machine_1'))
+    create_game(db_session, game('Machine_2'))
+    create_game(db_session, game('Machine_2'))
+
+    assert db_session.query(HourlyRollup).count() == 4
+
+    info = get_global_info(db_session, window=timedelta(hours=1), player='Machine_1')
+    assert (info.total_games, info.total_wins, info.total_losses) == (3, 1, 2)
+
+    stats = get_statistics(db_session, window=timedelta(hours=1), player='Human')
+    assert stats == {"total_games": 2, "total_wins": 1, "total_abandonments": 1}
+
+    ranking = get_ranking(db_session, window=timedelta(hours=1))
+    assert [(player.name, player.points) for player in ranking][0] == ('Machine_2', 2)
+
+    assert get_global_info(db_session, window=timedelta(hours=1)) == get_global_info(db_session)
+
+    create_game(db_session, game('Machine', rounds=1))
+    stats = get_statistics(db_session, player='Human')
+    assert stats == {"total_games": 3, "total_wins": 1, "total_abandonments": 2}
+
+
+def test_window_boundaries(db_session):
+    """Test the games at the edges of a window and of its hours and days.
+
+    A game recorded exactly when the window starts is counted and one a
+    microsecond earlier is not, whether the window starts on a whole hour,
+    on a whole day or in the middle of an hour; so are the games of the
+    current hour and of the last moment of each hour and day.
+
+    Args:
+        db_session (Session): A SQLAlchemy session object provided by 
+        the db_session fixture.
+    """
+    now = datetime(2024, 5, 10, 0, 0, 0)
+    tick = timedelta(microseconds=1)
+    moments = [now, now - tick, now - timedelta(hours=1), now - timedelta(hours=1) - tick,
+               now - timedelta(days=1), now - timedelta(days=1) - tick, now - timedelta(days=2, minutes=30),
+               now - timedelta(days=2, minutes=30) - tick, now - timedelta(days=3)]
+    games = [Game(total_rounds=3, player='Human', winner='Human', created_at=moment) for moment in moments]
+    db_session.add_all(games)
+    record_games(db_session, games)
+    db_session.commit()
+
+    for window in [timedelta(hours=1), timedelta(days=1), timedelta(days=2, minutes=30), timedelta(days=3)]:
+        expected = sum(1 for moment in moments if now - window <= moment <= now)
+
+        outcomes = get_outcome_counts(db_session, window, now=now)
+
+        assert sum(outcome.total_games for outcome in outcomes) == expected, window
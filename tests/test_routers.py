@@ -1,13 +1,31 @@
+import json
+from contextlib import contextmanager
 from fastapi.testclient import TestClient
 from unittest.mock import patch
 
+from rock_paper_scissors.api import query_log, responses
+from rock_paper_scissors.api.database import init_db
 from rock_paper_scissors.api.init_app import app
 
+init_db()
 client = TestClient(app)
 
 
+@contextmanager
+def max_queries(limit: int):
+    """Fails the test if the block runs more than `limit` SQL statements, and lists them.
+
+    Example:
+        with max_queries(3):
+            client.get("/game/historial")
+    """
+    with query_log.count_queries() as stats:
+        yield stats
+    assert stats.count <= limit, f"Expected at most {limit} statements, got {stats.summary()}"
+
+
 @patch('rock_paper_scissors.api.crud.create_game')
-@patch('rock_paper_scissors.api.api_client.get_db')
+@patch('rock_paper_scissors.api.database.get_db')
 def test_create_game(mock_get_db, mock_create_game):
     """Test for verifying the creation of a game through the API.
 
@@ -22,8 +40,9 @@ def test_create_game(mock_get_db, mock_create_game):
     """
     data = {
         "rounds_played": [
-            {"player_1_move": "Rock", "player_2_move": "Scissors", "winner": "Human"},
-            {"player_1_move": "Paper", "player_2_move": "Rock", "winner": "Human"}
+            {"player_1_move": "rock", "player_2_move": "scissors", "winner": "Human"},
+            {"player_1_move": "paper", "player_2_move": "rock", "winner": "Human"},
+            {"player_1_move": "paper", "player_2_move": "paper", "winner": "Machine"}
         ],
         "game_winner": "Human"
     }
@@ -40,7 +59,7 @@ def test_create_game(mock_get_db, mock_create_game):
 
     json_response = response.json()
     assert json_response["game_winner"] == "Human"
-    assert len(json_response["rounds_played"]) == 2
+    assert len(json_response["rounds_played"]) == 3
 
     mock_create_game.assert_called_once()
 
@@ -157,6 +176,239 @@ def test_get_statistics():
     assert data["total_abandonments"] <= data["total_games"]
 
 
+@patch('rock_paper_scissors.api.crud.create_games')
+def test_create_games(mock_create_games):
+    """Test for verifying the creation of several games through the API.
+
+    This test sends a list of games to the `/game/bulk` endpoint, mocking
+    `create_games` to avoid writing into the database, and checks that every
+    game is returned.
+    """
+    game = {
+        "rounds_played": [{"player_1_move": "rock", "player_2_move": "paper", "winner": "Machine"}],
+        "game_winner": "Machine"
+    }
+    mock_create_games.return_value = [dict(game, id=1), dict(game, id=2)]
+
+    response = client.post("/game/bulk", json=[game, game])
+    assert response.status_code == 200
+
+    data = response.json()
+
+    assert [entry["id"] for entry in data] == [1, 2]
+    mock_create_games.assert_called_once()
+
+
+def test_get_history():
+    """Test for retrieving a page of the history of games.
+
+    This test sends a GET request to the `/game/historial` endpoint and verifies
+    that the response is a list of games no longer than the requested limit,
+    and that a limit out of range is rejected.
+    """
+    response = client.get("/game/historial", params={"limit": 5})
+    assert response.status_code == 200
+
+    data = response.json()
+
+    assert isinstance(data, list)
+    assert len(data) <= 5
+
+    for entry in data:
+        assert "id" in entry
+        assert "rounds_played" in entry
+        assert "game_winner" in entry
+
+    assert client.get("/game/historial", params={"limit": 0}).status_code == 422
+
+
+@patch('rock_paper_scissors.api.crud.create_game')
+def test_create_game_fast_json(mock_create_game, monkeypatch):
+    """Test for the fast JSON path of the routes that build their own dictionaries.
+
+    With `FAST_JSON` enabled the response is sent with orjson and without being
+    validated again, but it must be the same JSON, and the response model must
+    still be documented in OpenAPI.
+    """
+    monkeypatch.setattr(responses, "FAST_JSON", True)
+    game = {
+        "id": 7,
+        "rounds_played": [{"player_1_move": "rock", "player_2_move": "paper", "winner": "Machine"}],
+        "game_winner": "Machine"
+    }
+    mock_create_game.return_value = game
+
+    response = client.post("/game", json={"rounds_played": game["rounds_played"], "game_winner": "Machine"})
+    assert response.status_code == 200
+    assert response.json() == game
+
+    schema = client.get("/openapi.json").json()
+    history_schema = schema["paths"]["/game/historial"]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+    assert history_schema["items"]["$ref"] == "#/components/schemas/Game"
+
+
+def test_get_statistics_by_window():
+    """Test for retrieving the statistics of the last period for a player.
+
+    This test sends GET requests with the `window` and `player` parameters to
+    the statistics endpoints, and checks that an invalid window is rejected.
+    """
+    for endpoint in ["/game/get_global_info", "/game/estadisticas", "/game/ranking"]:
+        response = client.get(endpoint, params={"window": "1h", "player": "Human"})
+        assert response.status_code == 200
+
+    data = client.get("/game/estadisticas", params={"window": "7d"}).json()
+    assert data["total_abandonments"] <= data["total_games"]
+
+    assert client.get("/game/estadisticas", params={"window": "1y"}).status_code == 422
+
+
+def test_create_game_is_idempotent():
+    """Test that retrying an upload with the same `Idempotency-Key` header records the game once.
+
+    The retry returns the recorded game, with the header `Idempotent-Replayed`.
+    The key is write-only: neither the responses nor the history show it.
+    """
+    game = {
+        "rounds_played": [{"player_1_move": "rock", "player_2_move": "paper", "winner": "Machine"}],
+        "game_winner": "Machine"
+    }
+    headers = {"Idempotency-Key": "test-create-game-is-idempotent"}
 
+    first = client.post("/game", json=game, headers=headers)
+    total_games = client.get("/game/estadisticas").json()["total_games"]
+    retry = client.post("/game", json=game, headers=headers)
 
+    assert "idempotent-replayed" not in first.headers
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert retry.json() == first.json()
+    assert client.get("/game/estadisticas").json()["total_games"] == total_games
+    assert "idempotency_key" not in first.json()
+    page = client.get("/game/historial", params={"after_id": first.json()["id"] - 1, "limit": 1}).json()
+    assert page[0]["id"] == first.json()["id"]
+    assert "idempotency_key" not in page[0]
+
+
+def test_export_archive(tmp_path):
+    """Test for exporting the archived games as JSON lines.
+
+    Without archive the response is empty; with a segment, each line is one of its games.
+    """
+    from rock_paper_scissors.api import archive
+
+    directory = str(tmp_path)
+    with patch('rock_paper_scissors.api.archive.ARCHIVE_DIR', directory):
+        response = client.get("/game/archivo")
+        assert response.status_code == 200
+        assert response.text == ""
+
+        games = [
+            {"id": game_id, "total_rounds": 1, "winner": "Machine", "player": "Human", "created_at": None,
+             "idempotency_key": None, "moves": [("rock", "paper", "Machine")]}
+            for game_id in (1, 2)
+        ]
+        archive.publish_segment(directory, archive.write_segment(directory, games))
+
+        response = client.get("/game/archivo")
+
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line)["id"] for line in response.text.splitlines()] == [1, 2]
+
+
+def test_routes_query_budget():
+    """Test that the routes run a bounded number of SQL statements, whatever the number of games.
+
+    Games are added first, so a route that loads the games one by one (N+1 queries) would
+    go over its budget. The budgets count the BEGIN of each transaction.
+    """
+    game = {
+        "rounds_played": [{"player_1_move": "rock", "player_2_move": "scissors", "winner": "Human"}] * 3,
+        "game_winner": "Human"
+    }
+    assert client.post("/game/bulk", json=[game] * 20).status_code == 200
+
+    budgets = {
+        "/game/historial": 3,
+        "/game/get_global_info": 4,
+        "/game/mano_fuerte": 3,
+        "/game/mano_debil": 3,
+        "/game/ranking": 2,
+        "/game/estadisticas": 4,
+        "/game/estadisticas?window=1h": 3,
+        "/game/dashboard": 4,
+        "/game/transiciones": 4,
+        "/game/rondas?player=Human": 4,
+    }
+    for path, limit in budgets.items():
+        with max_queries(limit):
+            assert client.get(path).status_code == 200
+
+
+def test_get_dashboard():
+    """Test for retrieving all the statistics in a single request.
+
+    The dashboard must have the same figures as the separate routes.
+    """
+    response = client.get("/game/dashboard")
+    assert response.status_code == 200
+
+    data = response.json()
+
+    assert data["global_info"] == client.get("/game/get_global_info").json()
+    assert data["statistics"] == client.get("/game/estadisticas").json()
+    assert data["strong_hand"] == client.get("/game/mano_fuerte").json()
+    assert data["weak_hand"] == client.get("/game/mano_debil").json()
+    assert sorted(player["points"] for player in data["ranking"]) == \
+        sorted(player["points"] for player in client.get("/game/ranking").json())
+
+
+def test_get_transitions_and_rounds():
+    """Test the routes of the transitions between moves and of the statistics of the rounds.
+
+    A new game must be counted by both routes.
+    """
+    before = client.get("/game/transiciones", params={"player": "Human"}).json()
+    rounds_before = client.get("/game/rondas", params={"player": "Human"}).json()
+
+    response = client.post("/game/", json={
+        "rounds_played": [
+            {"player_1_move": "paper", "player_2_move": "paper", "winner": "Machine"},
+            {"player_1_move": "paper", "player_2_move": "rock", "winner": "Human"},
+        ],
+        "game_winner": "Machine"
+    })
+    assert response.status_code == 200
+
+    after = client.get("/game/transiciones", params={"player": "Human"}).json()
+    assert after["total_transitions"] == before["total_transitions"] + 1
+    assert after["transitions"]["paper"]["paper"] == before["transitions"].get("paper", {}).get("paper", 0) + 1
+
+    rounds_after = client.get("/game/rondas", params={"player": "Human"}).json()
+    assert rounds_after["total_rounds"] == rounds_before["total_rounds"] + 2
+    assert [info["round_number"] for info in rounds_after["rounds"]] == sorted(info["round_number"] for info in rounds_after["rounds"])
+
+
+def test_get_prediction():
+    """Test the route of the prediction of the next move of a player.
+
+    A new game must be counted by the model, and invalid moves are rejected.
+    """
+    before = client.get("/game/predict", params={"player": "Human"}).json()
+
+    response = client.post("/game/", json={
+        "rounds_played": [
+            {"player_1_move": "scissors", "player_2_move": "paper", "winner": "Human"},
+            {"player_1_move": "scissors", "player_2_move": "paper", "winner": "Human"},
+        ],
+        "game_winner": "Machine"
+    })
+    assert response.status_code == 200
+
+    response = client.get("/game/predict", params={"player": "Human", "moves": ["scissors"]})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["player"] == "Human"
+    assert data["total_moves"] == before["total_moves"] + 2
+    assert data["counter_move"] in ("rock", "paper", "scissors")
 
+    assert client.get("/game/predict", params={"moves": ["lizard"]}).status_code == 422
@@ -0,0 +1,159 @@
+import asyncio
+import json
+from collections import Counter
+from datetime import timedelta
+from fastapi.testclient import TestClient
+
+from rock_paper_scissors.api import archive, crud, models, schemas, scoreboard
+from rock_paper_scissors.api.database import init_db
+from rock_paper_scissors.api.init_app import app
+from rock_paper_scissors.api.scoreboard import Broadcaster
+
+
+def make_game(game_id: int, winner: str) -> dict:
+    """Build a created game as returned by `crud.create_game`."""
+    return {
+        "id": game_id,
+        "rounds_played": [{"player_1_move": "rock", "player_2_move": "paper", "winner": winner}],
+        "game_winner": winner,
+        "player": "Human"
+    }
+
+
+def test_fan_out_and_slow_consumers(monkeypatch):
+    """Test that every subscriber receives the events and slow ones are dropped.
+
+    Two subscribers with a buffer of two events are registered. One reads
+    its events and the other does not, so it is dropped on the third game
+    while the first one keeps receiving them.
+    """
+    recorded = Counter()
+    monkeypatch.setattr(scoreboard, "load_totals", lambda db: Counter(recorded))
+
+    async def scenario():
+        broadcaster = Broadcaster(buffer_size=2)
+        reader = broadcaster.subscribe()
+        sleeper = broadcaster.subscribe()
+
+        received = []
+        for game_id in range(1, 4):
+            recorded["Human"] += 1
+            broadcaster.publish_games(None, [make_game(game_id, "Human")])
+            await asyncio.sleep(0)
+            received.append(json.loads(await reader.next()))
+
+        return broadcaster, received, sleeper
+
+    broadcaster, received, sleeper = asyncio.run(scenario())
+
+    assert [event["id"] for event in received] == [1, 2, 3]
+    assert received[-1]["totals"] == {"total_games": 3, "wins": {"Human": 3}}
+    assert received[0]["moves"] == [["rock", "paper", "Human"]]
+    assert sleeper.dropped
+    assert broadcaster.subscribers == 1
+
+
+def test_scoreboard_websocket():
+    """Test for receiving a new game through the scoreboard WebSocket.
+
+    The first message holds the current totals. After a game is created
+    through the API, its event arrives with the totals increased by one.
+    """
+    init_db()
+    game = {
+        "rounds_played": [{"player_1_move": "rock", "player_2_move": "scissors", "winner": "Human"}] * 3,
+        "game_winner": "Human"
+    }
+
+    with TestClient(app) as client:
+        with client.websocket_connect("/game/scoreboard/ws") as websocket:
+            totals = websocket.receive_json()
+            assert totals["type"] == "totals"
+
+            response = client.post("/game/", json=game)
+            event = websocket.receive_json()
+
+    assert event["type"] == "game"
+    assert event["id"] == response.json()["id"]
+    assert event["winner"] == "Human"
+    assert event["totals"]["total_games"] == totals["totals"]["total_games"] + 1
+
+
+def test_totals_follow_other_writers(monkeypatch):
+    """Test that the totals are reloaded with every publication.
+
+    The games recorded by another worker, and those removed by the
+    quarantine, are reflected in the next event, and the events of a
+    batch count the games up to their own.
+    """
+    recorded = Counter(Human=5, Machine=2)
+    monkeypatch.setattr(scoreboard, "load_totals", lambda db: Counter(recorded))
+
+    async def scenario():
+        broadcaster = Broadcaster()
+        reader = broadcaster.subscribe()
+
+        recorded.update(Human=1)
+        broadcaster.publish_games(None, [make_game(1, "Human")])
+        # Another worker records a game and the quarantine removes two.
+        recorded.update(Machine=1, Human=-2)
+        recorded.update(Human=1, Machine=1)
+        broadcaster.publish_games(None, [make_game(2, "Human"), make_game(3, "Machine")])
+        await asyncio.sleep(0)
+        return broadcaster, [json.loads(await reader.next()) for _ in range(3)]
+
+    broadcaster, received = asyncio.run(scenario())
+
+    assert [event["totals"]["wins"] for event in received] == [
+        {"Human": 6, "Machine": 2}, {"Human": 5, "Machine": 3}, {"Human": 5, "Machine": 4}]
+    assert broadcaster.totals == Counter(Human=5, Machine=4)
+
+
+def test_dropped_and_unsubscribed_subscribers(monkeypatch):
+    """Test the end of a subscription.
+
+    A subscriber dropped for being full loses its pending messages and its
+    `next` returns None at once; an unsubscribed one receives no more events,
+    and without subscribers the events are not even encoded.
+    """
+    monkeypatch.setattr(scoreboard, "load_totals", lambda db: Counter(Human=1))
+    encoded = []
+    monkeypatch.setattr(scoreboard, "encode", lambda event: encoded.append(event) or "event")
+
+    async def scenario():
+        broadcaster = Broadcaster(buffer_size=1)
+        broadcaster.publish_games(None, [make_game(1, "Human")])
+        assert encoded == []
+
+        full = broadcaster.subscribe()
+        left = broadcaster.subscribe()
+        broadcaster.unsubscribe(left)
+        broadcaster.publish_games(None, [make_game(2, "Human"), make_game(3, "Human")])
+        await asyncio.sleep(0)
+        return broadcaster, full, left, await full.next()
+
+    broadcaster, full, left, message = asyncio.run(scenario())
+
+    assert message is None
+    assert full.dropped and not full.messages
+    assert not left.messages
+    assert broadcaster.subscribers == 0
+
+
+def test_totals_from_rollups(session_factory, tmp_path, monkeypatch):
+    """Test that the totals are counted from the rollups, archived games included, and that
+    they are not read without subscribers."""
+    with session_factory() as db:
+        for winner in ("Human", "Human", "Machine"):
+            crud.create_game(db, schemas.GameCreate(rounds_played=[], game_winner=winner))
+        archive.archive_games(timedelta(days=1), segment_size=2, directory=str(tmp_path), session_factory=session_factory,
+                              now=models.utcnow() + timedelta(days=2))
+        crud.create_game(db, schemas.GameCreate(rounds_played=[], game_winner="Machine"))
+
+        assert db.query(models.Game).count() == 1
+        assert scoreboard.load_totals(db) == Counter(Human=2, Machine=2)
+
+    loads = []
+    monkeypatch.setattr(scoreboard, "load_totals", lambda db: loads.append(db) or Counter())
+    Broadcaster().publish_games(None, [make_game(1, "Human")])
+    assert loads == []
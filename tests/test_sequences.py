@@ -0,0 +1,113 @@
+import pytest
+import random
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from rock_paper_scissors.api import archive, schemas, sequences
+from rock_paper_scissors.api.crud import create_game, get_round_statistics, get_transitions
+from rock_paper_scissors.api.models import Game, Move
+from rock_paper_scissors.api.query_log import count_queries
+from rock_paper_scissors.game_logic import MOVES, determine_round_winner
+
+
+@pytest.fixture(scope='function')
+def session_factory(session_factory, tmp_path):
+    """Give the in-memory database of `conftest.session_factory` an empty archive.
+
+    Yields:
+        sessionmaker: Factory of sessions bound to the in-memory database.
+    """
+    with patch("rock_paper_scissors.api.archive.ARCHIVE_DIR", str(tmp_path / "archive")):
+        yield session_factory
+
+    sequences._cache.clear()
+
+
+def add_games(db, count: int = 200, now: datetime = None) -> list:
+    """Adds random games, created over the last three days.
+
+    Returns:
+        list: The games, with the shape of `archive.read_segment`.
+    """
+    rng = random.Random(1)
+    now = now or datetime.now()
+    games = []
+    for _ in range(count):
+        player, opponent = rng.choice([('Human', 'Machine'), ('Machine_1', 'Machine_2')])
+        moves = []
+        for _ in range(rng.choice([1, 2, 3, 3])):
+            player_1_move, player_2_move = rng.choice(MOVES), rng.choice(MOVES)
+            winner = determine_round_winner(player_1_move, player_2_move, player, opponent)
+            moves.append(Move(player_1_move=player_1_move, player_2_move=player_2_move, winner=winner))
+        games.append(Game(total_rounds=len(moves), player=player, winner=opponent, moves=moves,
+                          created_at=now - timedelta(seconds=rng.randint(0, 3 * 24 * 3600))))
+    db.add_all(games)
+    db.commit()
+    return [
+        {"player": game.player,
+         "rounds_played": [{"player_1_move": move.player_1_move, "player_2_move": move.player_2_move,
+                            "winner": move.winner} for move in game.moves]}
+        for game in games
+    ]
+
+
+def test_window_functions_match_the_games(session_factory):
+    """Test that the rounds counted with window functions are the ones counted in Python.
+
+    Args:
+        session_factory (sessionmaker): Factory of sessions provided by the session_factory fixture.
+    """
+    with session_factory() as db:
+        games = add_games(db)
+        counts = sequences.count_sequences(db)
+
+    expected = sequences.count_games(games)
+    assert counts.rounds == expected.rounds
+    assert +counts.wins == +expected.wins
+    assert +counts.ties == +expected.ties
+    assert counts.transitions('Human') == expected.transitions('Human')
+    assert sum(rounds for rounds, wins, ties in counts.by_round().values()) == \
+        sum(len(game["rounds_played"]) for game in games)
+
+
+def test_cache_is_invalidated_by_new_games(session_factory):
+    """Test that the counts are read again only after a game is recorded.
+
+    Args:
+        session_factory (sessionmaker): Factory of sessions provided by the session_factory fixture.
+    """
+    with session_factory() as db:
+        add_games(db, count=50)
+        counts = sequences.get_sequences(db)
+
+        with count_queries() as queries:
+            assert sequences.get_sequences(db) is counts
+        assert queries.count == 1
+
+        create_game(db, schemas.GameCreate(
+            rounds_played=[schemas.Move(player_1_move='rock', player_2_move='rock', winner='Machine'),
+                           schemas.Move(player_1_move='rock', player_2_move='paper', winner='Machine')],
+            game_winner='Machine'
+        ))
+        new_counts = sequences.get_sequences(db)
+
+    assert new_counts is not counts
+    assert new_counts.transitions('Human')[('rock', 'rock')] == counts.transitions('Human')[('rock', 'rock')] + 1
+
+
+def test_archived_games_are_counted(session_factory):
+    """Test that the counts are the same before and after archiving the old games.
+
+    Args:
+        session_factory (sessionmaker): Factory of sessions provided by the session_factory fixture.
+    """
+    now = datetime(2024, 5, 10, 15, 37, 20)
+    with session_factory() as db:
+        add_games(db, now=now)
+        before = (get_transitions(db), get_round_statistics(db, player='Human'))
+
+    archived = archive.archive_games(timedelta(days=1), segment_size=40, session_factory=session_factory, now=now)
+    assert archived > 0
+
+    with session_factory() as db:
+        assert (get_transitions(db), get_round_statistics(db, player='Human')) == before
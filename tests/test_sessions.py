@@ -0,0 +1,168 @@
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+
+from rock_paper_scissors.api import crud
+from rock_paper_scissors.api.database import SessionLocal, init_db
+from rock_paper_scissors.api.init_app import app
+from rock_paper_scissors.api.sessions import GameSession, SessionStore
+
+init_db()
+client = TestClient(app)
+
+
+class FakeClock:
+    """Clock that only moves forward when told to."""
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_session_store_expires_idle_sessions():
+    """Test that sessions expire after the TTL without moves.
+
+    A session that receives a move gets a new TTL, while the idle one is
+    discarded. The store also refuses new sessions when it is full.
+    """
+    clock = FakeClock()
+    store = SessionStore(ttl=10, max_sessions=2, clock=clock)
+
+    idle = store.create()
+    active = store.create()
+    assert store.create() is None
+
+    clock.now = 8
+    assert store.get(active.session_id) is active
+
+    clock.now = 12
+    assert store.get(idle.session_id) is None
+    assert store.get(active.session_id) is active
+    assert len(store) == 1
+
+    clock.now = 30
+    assert store.create() is not None
+    assert len(store) == 1
+
+
+def test_game_winner_of_session():
+    """Test that the winner of a session follows `get_game_information`.
+
+    Player 1 needs to win most of the three rounds; a game abandoned before
+    the third round is won by the machine.
+    """
+    session = GameSession("id", "Human", "Machine", 0)
+    session.play_round("rock", "scissors")
+    session.play_round("paper", "rock")
+    assert session.game_winner == "Machine"
+
+    session.play_round("rock", "rock")
+    assert session.game_winner == "Human"
+    assert session.to_game()["rounds_played"][2] == {"player_1_move": "rock", "player_2_move": "rock", "winner": "Machine"}
+
+
+@patch('rock_paper_scissors.api.sessions.get_machine_move', return_value='scissors')
+def test_play_session(mock_machine_move):
+    """Test for playing a whole game round by round through the API.
+
+    The player wins the three rounds with rock against scissors. The last
+    round returns the recorded game, and the session is closed afterwards.
+    """
+    response = client.post("/game/sesion/")
+    assert response.status_code == 201
+    session_id = response.json()["session_id"]
+
+    for round_number in range(1, 4):
+        response = client.post(f"/game/sesion/{session_id}/jugada", json={"move": "rock"})
+        assert response.status_code == 200
+
+        data = response.json()
+        assert data["round_number"] == round_number
+        assert data["player_2_move"] == "scissors"
+        assert data["winner"] == "Human"
+
+    assert data["finished"]
+    assert data["game"]["game_winner"] == "Human"
+    assert len(data["game"]["rounds_played"]) == 3
+    assert isinstance(data["game"]["id"], int)
+
+    response = client.post(f"/game/sesion/{session_id}/jugada", json={"move": "rock"})
+    assert response.status_code == 404
+
+
+@patch('rock_paper_scissors.api.sessions.get_machine_move', return_value='scissors')
+def test_abandon_session(mock_machine_move):
+    """Test for giving up a game session after the first round.
+
+    The game finishes after that round and it is won by the machine, even
+    if the player won the round. Invalid moves are rejected.
+    """
+    session_id = client.post("/game/sesion/", json={"player": "Human"}).json()["session_id"]
+
+    assert client.post(f"/game/sesion/{session_id}/jugada", json={"move": "lizard"}).status_code == 422
+
+    data = client.post(f"/game/sesion/{session_id}/jugada", json={"move": "rock", "abandon": True}).json()
+
+    assert data["finished"]
+    assert data["game"]["game_winner"] == "Machine"
+    assert len(data["game"]["rounds_played"]) == 1
+
+
+def test_predictor_strategy_counters_the_player():
+    """Test that with the "predictor" strategy the machine counters the usual move of the player.
+
+    The player only played rock in its previous games, so the machine plays
+    paper in every round.
+    """
+    game = {"rounds_played": [{"player_1_move": "rock", "player_2_move": "rock", "winner": "Machine_2"}] * 3,
+            "game_winner": "Machine_2", "player": "Machine_1"}
+    assert client.post("/game/bulk", json=[game] * 5).status_code == 200
+
+    with patch('rock_paper_scissors.api.sessions.MACHINE_STRATEGY', 'predictor'):
+        session_id = client.post("/game/sesion/", json={"player": "Machine_1"}).json()["session_id"]
+        moves = [client.post(f"/game/sesion/{session_id}/jugada", json={"move": "rock"}).json()["player_2_move"]
+                 for _ in range(3)]
+
+    assert moves == ["paper"] * 3
+
+
+@patch('rock_paper_scissors.api.sessions.get_machine_move', return_value='paper')
+def test_machine_session_matches_stored_game(mock_machine_move):
+    """Test that a session of Machine_1 names Machine_2 as the winner, as the stored game does."""
+    session_id = client.post("/game/sesion/", json={"player": "Machine_1"}).json()["session_id"]
+    rounds = [client.post(f"/game/sesion/{session_id}/jugada", json={"move": "rock"}).json() for _ in range(3)]
+    game = rounds[-1]["game"]
+
+    with SessionLocal() as db:
+        stored = crud.get_history(db, after_id=game["id"] - 1, limit=1)[0]
+
+    assert [data["winner"] for data in rounds] == ["Machine_2"] * 3
+    assert stored["id"] == game["id"]
+    assert stored["game_winner"] == game["game_winner"] == "Machine_2"
+    assert stored["rounds_played"] == game["rounds_played"]
+    assert [round_info["winner"] for round_info in game["rounds_played"]] == ["Machine_2"] * 3
+
+
+def test_session_rejects_unknown_player():
+    """Test that a session can only be started by a player who has an opponent."""
+    response = client.post("/game/sesion/", json={"player": "Machine_2"})
+
+    assert response.status_code == 422
+
+
+@patch('rock_paper_scissors.api.sessions.get_machine_move', return_value='scissors')
+def test_session_game_is_validated(mock_machine_move):
+    """Test that the finished game of a session is checked like the games sent to POST /game/.
+
+    The session builds a game of four rounds, which cannot be played, so it
+    is refused instead of being recorded.
+    """
+    session_id = client.post("/game/sesion/", json={"player": "Human"}).json()["session_id"]
+    game = {"rounds_played": [{"player_1_move": "rock", "player_2_move": "scissors", "winner": "Human"}] * 4,
+            "game_winner": "Human", "player": "Human"}
+
+    with patch.object(GameSession, "to_game", return_value=game):
+        response = client.post(f"/game/sesion/{session_id}/jugada", json={"move": "rock", "abandon": True})
+
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body"]
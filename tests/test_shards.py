@@ -0,0 +1,234 @@
+import asyncio
+from datetime import timedelta
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from rock_paper_scissors.api import archive, crud, loader, models, schemas, shards
+from rock_paper_scissors.api.database import create_db_engine, init_db
+from rock_paper_scissors.api.init_app import app
+from rock_paper_scissors.api.routers.game import record_games
+from rock_paper_scissors.api.shards import Shard
+
+init_db()
+
+
+def make_game(winner: str, moves: list, player: str = None, idempotency_key: str = None) -> schemas.GameCreate:
+    return schemas.GameCreate(
+        rounds_played=[schemas.Move(player_1_move=player_1_move, player_2_move=player_2_move, winner=round_winner)
+                       for player_1_move, player_2_move, round_winner in moves],
+        game_winner=winner,
+        player=player,
+        idempotency_key=idempotency_key,
+    )
+
+
+GAMES = [
+    make_game('Human', [('rock', 'scissors', 'Human'), ('paper', 'rock', 'Human')]),
+    make_game('Machine', [('rock', 'paper', 'Machine')], player='Machine_1'),
+    make_game('Human', [('scissors', 'paper', 'Human')], idempotency_key='first'),
+    make_game('Machine', [('paper', 'scissors', 'Machine'), ('rock', 'paper', 'Machine')]),
+    make_game('Human', [('paper', 'rock', 'Human')], player='Machine_1', idempotency_key='second'),
+    make_game('Draw', [('rock', 'rock', 'Draw')]),
+    make_game('Human', [('paper', 'rock', 'Human')]),
+]
+
+
+def create_sharded(tmp_path, count: int) -> list:
+    engines = [create_db_engine(f"sqlite:///{tmp_path / f'game.{index}.db'}") for index in range(count)]
+    for engine in engines:
+        init_db(engine)
+    return [Shard(index, count, engine, engine, first_engine=engines[0]) for index, engine in enumerate(engines)]
+
+
+@pytest.fixture(scope='function')
+def sharded(tmp_path, monkeypatch):
+    """Spread the games over three SQLite files, the first one used by the routes as `db`.
+
+    Yields:
+        tuple: The session of the first shard and the shards.
+    """
+    three_shards = create_sharded(tmp_path, 3)
+    monkeypatch.setattr(shards, "shards", three_shards)
+    db = three_shards[0].SessionLocal()
+
+    yield db, three_shards
+
+    db.close()
+    for shard in three_shards:
+        shard.engine.dispose()
+
+
+@pytest.fixture(scope='function')
+def single(tmp_path):
+    """Create a single SQLite file, to compare the merged statistics with.
+
+    Yields:
+        Session: A session of the database.
+    """
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'single.db'}")
+    init_db(engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+
+    yield db
+
+    db.close()
+    engine.dispose()
+
+
+def test_create_games_routes_games(sharded):
+    """Test that every shard gives its games the ids of its residue and that keyed games are replayed."""
+    db, three_shards = sharded
+
+    created = [shards.create_game(db, game) for game in GAMES]
+    replayed = shards.create_game(db, make_game('Machine', [('rock', 'paper', 'Machine')], idempotency_key='first'))
+
+    assert [game['game_winner'] for game in created] == [game.game_winner for game in GAMES]
+    assert len({game['id'] for game in created}) == len(GAMES)
+    assert replayed == dict(created[2], replayed=True)
+    for shard in three_shards:
+        with shard.engine.connect() as connection:
+            ids = connection.execute(text("SELECT id FROM games")).scalars().all()
+        assert ids
+        assert all(game_id % 3 == shard.index for game_id in ids)
+    assert created[2]['id'] % 3 == shards.shard_of_key('first', 3)
+
+
+def test_create_games_keeps_upload_together(sharded):
+    """Test that the games without a key of a bulk upload are recorded in a single shard."""
+    db, three_shards = sharded
+
+    created = shards.create_games(db, [game for game in GAMES if game.idempotency_key is None])
+
+    assert len({game['id'] % 3 for game in created}) == 1
+
+
+def test_empty_shard_follows_first_shard(tmp_path):
+    """Test that the first game of an empty shard gets an id after the games recorded before the shards."""
+    two_shards = create_sharded(tmp_path, 2)
+    with two_shards[0].engine.begin() as connection:
+        connection.execute(text("INSERT INTO games (id, total_rounds, winner) VALUES (41, 1, 'Human')"))
+
+    with two_shards[1].SessionLocal() as db:
+        assert list(two_shards[1].assign_ids(db, 2)) == [43, 45]
+    with two_shards[0].SessionLocal() as db:
+        assert list(two_shards[0].assign_ids(db, 2)) == [42, 44]
+
+
+def test_reads_merge_shards(sharded, single):
+    """Test that the statistics merged over the shards are those of the same games in a single database."""
+    db, three_shards = sharded
+    for game in GAMES:
+        shards.create_game(db, game)
+    crud.create_games(single, GAMES)
+
+    assert shards.get_global_info(db) == crud.get_global_info(single)
+    assert shards.get_global_info(db, player='Machine_1') == crud.get_global_info(single, player='Machine_1')
+    assert shards.get_statistics(db) == crud.get_statistics(single)
+    assert shards.get_ranking(db) == crud.get_ranking(single)
+    assert shards.get_strong_hand(db) == crud.get_strong_hand(single)
+    assert shards.get_weak_hand(db) == crud.get_weak_hand(single)
+    assert shards.get_dashboard(db) == crud.get_dashboard(single)
+    assert shards.get_transitions(db) == crud.get_transitions(single)
+    assert shards.get_transitions(db, player='Machine_1') == crud.get_transitions(single, player='Machine_1')
+    assert shards.get_round_statistics(db) == crud.get_round_statistics(single)
+
+
+def test_writes_take_the_lock_of_their_shard(sharded):
+    """Test that a write only waits for the write lock of its own shard."""
+    db, three_shards = sharded
+    keys = {shards.shard_of_key(key, 3): key for key in map(str, range(100))}
+
+    async def write_while_locked():
+        async with three_shards[1].write_lock:
+            other_shard = await asyncio.wait_for(record_games([make_game('Human', [('rock', 'scissors', 'Human')],
+                                                                         idempotency_key=keys[2])]), timeout=10)
+            same_shard = asyncio.create_task(record_games([make_game('Draw', [('rock', 'rock', 'Draw')],
+                                                                     idempotency_key=keys[1])]))
+            await asyncio.sleep(0.2)
+            waiting = not same_shard.done()
+        return other_shard, waiting, await same_shard
+
+    other_shard, waiting, same_shard = asyncio.run(write_while_locked())
+
+    assert other_shard[0]['id'] % 3 == 2
+    assert waiting
+    assert same_shard[0]['id'] % 3 == 1
+
+
+def test_get_history_merges_pages(sharded):
+    """Test that the history pages through the games of every shard in the order of their ids."""
+    db, three_shards = sharded
+    created = [shards.create_game(db, game) for game in GAMES]
+    ids = sorted(game['id'] for game in created)
+
+    first_page = shards.get_history(db, after_id=0, limit=4)
+    second_page = shards.get_history(db, after_id=first_page[-1]['id'], limit=4)
+
+    assert [game['id'] for game in first_page + second_page] == ids
+
+
+def test_archived_ids_are_not_given_again(tmp_path):
+    """Test that a shard whose newest games were archived gives ids after them."""
+    two_shards = create_sharded(tmp_path, 2)
+    with two_shards[1].SessionLocal() as db:
+        created = two_shards[1].assign_ids(db, 2)
+        crud.create_games(db, GAMES[:2], assign_ids=lambda db, count: created)
+    with two_shards[1].engine.begin() as connection:
+        connection.execute(text("DELETE FROM moves"))
+        connection.execute(text("DELETE FROM games"))
+
+    with two_shards[1].SessionLocal() as db:
+        assert list(two_shards[1].assign_ids(db, 1)) == [created[-1] + 2]
+    for shard in two_shards:
+        shard.engine.dispose()
+
+
+def test_predict_is_refused_with_shards(sharded):
+    """Test that the predictor, which follows the first shard alone, is not used with shards."""
+    response = TestClient(app).get("/game/predict", params={"player": "Human"})
+
+    assert response.status_code == 501
+
+
+def test_archive_every_shard(sharded, tmp_path):
+    """Test that the games of every shard go to the same archive and that a pending segment of
+    another shard is not published while its games are stored."""
+    db, three_shards = sharded
+    for game in GAMES:
+        shards.create_game(db, game)
+    directory = str(tmp_path / "archive")
+    now = models.utcnow() + timedelta(days=2)
+
+    pending = None
+    for shard in three_shards:
+        others = [other.SessionLocal for other in three_shards if other is not shard]
+        if shard.index == 1:
+            with shard.SessionLocal() as shard_db:
+                games = [{**row._asdict(), "moves": []} for row in shard_db.query(
+                    models.Game.id, models.Game.total_rounds, models.Game.winner, models.Game.player,
+                    models.Game.created_at, models.Game.idempotency_key).order_by(models.Game.id)]
+            pending = archive.write_segment(directory, games)
+            continue
+        archive.archive_games(timedelta(days=1), directory=directory, session_factory=shard.SessionLocal,
+                              now=now, other_session_factories=others)
+
+    totals = archive.archive_totals(directory)
+    with three_shards[1].engine.connect() as connection:
+        kept = connection.execute(text("SELECT count(*) FROM games")).scalar()
+    assert kept > 0
+    assert totals.games == len(GAMES) - kept
+    assert pending not in [segment.name for segment in totals.segments]
+
+
+def test_loader_refuses_shards(sharded, tmp_path, monkeypatch):
+    """Test that the bulk loader, which writes the first shard with its own ids, does not run with shards."""
+    monkeypatch.setattr(sys, "argv", ["loader", str(tmp_path / "games.jsonl")])
+
+    with pytest.raises(SystemExit) as error:
+        loader.main()
+
+    assert error.value.code == 2
@@ -0,0 +1,191 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import pytest
+import threading
+
+from rock_paper_scissors import utils
+
+
+@pytest.fixture
+def log_setup(tmp_path, monkeypatch):
+    """Sets up the logging of the application in a temporary directory and removes it afterwards.
+
+    The tests stop the listener themselves, to read the file once every record is written.
+
+    Yields:
+        Callable: Function that sets up the logging and returns the listener.
+    """
+    monkeypatch.setattr(utils, "LOG_DIR", str(tmp_path))
+    root = logging.getLogger()
+    games_logger = logging.getLogger(utils.GAMES_LOGGER)
+    level = root.level
+    listeners = []
+
+    def setup(name: str = "test"):
+        listeners.append(utils.setup_logging(name))
+        return listeners[-1]
+
+    yield setup
+
+    for listener in listeners:
+        if listener is not None:
+            atexit.unregister(listener.stop)
+    for handler in list(root.handlers):
+        if isinstance(handler, utils.DeferredQueueHandler):
+            root.removeHandler(handler)
+    for log_filter in list(games_logger.filters):
+        games_logger.removeFilter(log_filter)
+    root.setLevel(level)
+
+
+def test_json_logs_with_sampling(log_setup, tmp_path, monkeypatch):
+    """Test that the records are written as JSON by the listener, sampling the game records.
+
+    Args:
+        log_setup (Callable): Sets up the logging, provided by the fixture.
+        tmp_path (Path): Temporary directory provided by pytest.
+        monkeypatch (MonkeyPatch): Fixture to change the settings of `utils`.
+    """
+    monkeypatch.setattr(utils, "LOG_FORMAT", "json")
+    monkeypatch.setattr(utils, "LOG_SAMPLE_EVERY", 2)
+    listener = log_setup()
+    assert log_setup() is None
+
+    games_logger = logging.getLogger(utils.GAMES_LOGGER)
+    for game_number in range(4):
+        games_logger.info("New game created: %d", game_number)
+    games_logger.warning("The API is busy")
+    logging.getLogger("rock_paper_scissors.other").info("Not sampled")
+    listener.stop()
+
+    [log_file] = tmp_path.iterdir()
+    entries = [json.loads(line) for line in log_file.read_text().splitlines()]
+    assert [entry["message"] for entry in entries] == \
+        ["New game created: 0", "New game created: 2", "The API is busy", "Not sampled"]
+    assert entries[2]["level"] == "WARNING"
+    assert entries[0]["logger"] == utils.GAMES_LOGGER
+
+
+def test_messages_are_formatted_lazily(log_setup, monkeypatch):
+    """Test that the arguments of a record are only formatted when it is written.
+
+    Records below the level, or sampled out, never format their arguments,
+    and the written ones are formatted in the thread of the listener.
+
+    Args:
+        log_setup (Callable): Sets up the logging, provided by the fixture.
+        monkeypatch (MonkeyPatch): Fixture to change the settings of `utils`.
+    """
+    monkeypatch.setattr(utils, "LOG_SAMPLE_EVERY", 3)
+    monkeypatch.setattr(utils, "LOG_LEVEL", "INFO")
+    listener = log_setup()
+    formatted = {}
+
+    class Response:
+        def __str__(self):
+            formatted.setdefault(id(self), set()).add(threading.current_thread().name)
+            return "response"
+
+    responses = [Response() for _ in range(4)]
+    games_logger = logging.getLogger(utils.GAMES_LOGGER)
+    games_logger.debug("Debug %s", responses[0])
+    for response in responses[1:]:
+        games_logger.info("New game created:\n%s", response)
+    listener.stop()
+
+    assert list(formatted) == [id(responses[1])]
+    # The thread of the listener wrote it (the handlers of pytest also format it in this thread).
+    assert formatted[id(responses[1])] - {threading.current_thread().name}
+
+
+def test_json_logs_keep_exceptions_and_warnings(log_setup, tmp_path, monkeypatch):
+    """Test that sampling never drops a warning and that exceptions are written in the JSON entry.
+
+    Args:
+        log_setup (Callable): Sets up the logging, provided by the fixture.
+        tmp_path (Path): Temporary directory provided by pytest.
+        monkeypatch (MonkeyPatch): Fixture to change the settings of `utils`.
+    """
+    monkeypatch.setattr(utils, "LOG_FORMAT", "json")
+    monkeypatch.setattr(utils, "LOG_SAMPLE_EVERY", 1000)
+    listener = log_setup()
+
+    games_logger = logging.getLogger(utils.GAMES_LOGGER)
+    games_logger.info("Sampled in")
+    games_logger.info("Sampled out")
+    for _ in range(3):
+        games_logger.warning("Slow answer")
+    try:
+        raise ValueError("bad game")
+    except ValueError:
+        games_logger.exception("Game refused")
+    listener.stop()
+
+    [log_file] = tmp_path.iterdir()
+    entries = [json.loads(line) for line in log_file.read_text().splitlines()]
+    assert [entry["message"] for entry in entries] == ["Sampled in"] + ["Slow answer"] * 3 + ["Game refused"]
+    assert "ValueError: bad game" in entries[-1]["exception"]
+    assert "exception" not in entries[0]
+
+
+def test_time_rotation_file_name(tmp_path, monkeypatch):
+    """Test that with the rotation by time the log file has no date until it is rotated.
+
+    Args:
+        tmp_path (Path): Temporary directory provided by pytest.
+        monkeypatch (MonkeyPatch): Fixture to change the settings of `utils`.
+    """
+    monkeypatch.setattr(utils, "LOG_DIR", str(tmp_path))
+    monkeypatch.setattr(utils, "LOG_ROTATION", "time")
+
+    handler = utils.create_file_handler("api")
+    handler.close()
+
+    assert isinstance(handler, logging.handlers.TimedRotatingFileHandler)
+    assert handler.baseFilename == str(tmp_path / "api.log")
+    assert handler.backupCount == utils.LOG_BACKUP_COUNT
+
+
+def test_log_file_per_process(tmp_path, monkeypatch):
+    """Test that with `LOG_PER_PROCESS` the log file of each process is named with its pid.
+
+    Args:
+        tmp_path (Path): Temporary directory provided by pytest.
+        monkeypatch (MonkeyPatch): Fixture to change the settings of `utils`.
+    """
+    monkeypatch.setattr(utils, "LOG_DIR", str(tmp_path))
+    monkeypatch.setattr(utils, "LOG_PER_PROCESS", True)
+
+    for rotation in ("size", "time"):
+        monkeypatch.setattr(utils, "LOG_ROTATION", rotation)
+        handler = utils.create_file_handler("api")
+        handler.close()
+        assert handler.baseFilename.endswith(f"api.{os.getpid()}.log")
+
+
+def test_several_workers_log_per_process(monkeypatch):
+    """Test that the entry point of the API gives each worker its own log files when there are several.
+
+    Args:
+        monkeypatch (MonkeyPatch): Fixture to change the environment and the arguments.
+    """
+    from rock_paper_scissors.api import __main__ as entry_point
+
+    monkeypatch.setattr(entry_point, "init_db", lambda: None)
+    monkeypatch.setattr(entry_point, "init_shards", lambda: None)
+    monkeypatch.setattr(entry_point.uvicorn, "run", lambda *args, **kwargs: None)
+    for variable in ("LOG_PER_PROCESS", "DB_INIT_ON_STARTUP", "API_LOGGING"):
+        # Set first, so the variables that `main` sets are removed after the test.
+        monkeypatch.setenv(variable, "")
+        monkeypatch.delenv(variable)
+
+    monkeypatch.setattr("sys.argv", ["api", "--workers", "1"])
+    entry_point.main()
+    assert "LOG_PER_PROCESS" not in os.environ
+
+    monkeypatch.setattr("sys.argv", ["api", "--workers", "4"])
+    entry_point.main()
+    assert os.environ["LOG_PER_PROCESS"] == "1"
@@ -0,0 +1,98 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from rock_paper_scissors.api import schemas
+from rock_paper_scissors.api.database import init_db
+from rock_paper_scissors.api.init_app import app
+from rock_paper_scissors.api.validation import InvalidGameError, check_game, validate_games
+
+init_db()
+client = TestClient(app)
+
+
+def make_game(moves, round_winners, game_winner, player=None) -> schemas.GameCreate:
+    """Builds the schema of a game from its moves and the winners sent by the client."""
+    return schemas.GameCreate(
+        rounds_played=[
+            schemas.Move(player_1_move=player_1_move, player_2_move=player_2_move, winner=winner)
+            for (player_1_move, player_2_move), winner in zip(moves, round_winners)
+        ],
+        game_winner=game_winner,
+        player=player
+    )
+
+
+def test_check_game_follows_game_logic():
+    """Test that the computed winners are the ones of `game_logic`.
+
+    Ties are won by player 2, player 1 needs most of the three rounds, and a
+    game abandoned before the third round is won by player 2.
+    """
+    moves = [("rock", "scissors", ""), ("paper", "paper", ""), ("scissors", "paper", "")]
+    check = check_game("Machine_1", "", moves)
+    assert check.round_winners == ["Machine_1", "Machine_2", "Machine_1"]
+    assert check.game_winner == "Machine_1"
+
+    check = check_game("Human", "", moves[:2])
+    assert check.game_winner == "Machine"
+
+    assert check_game("Alice", "Alice", moves).errors == ["Unknown players"]
+    assert check_game("Human", "Human", moves * 2).errors == ["Wrong number of rounds"]
+
+
+def test_validate_games_recomputes_winners():
+    """Test that the mode "recompute" fixes the wrong winners in place.
+
+    The client claims the human won, but rock loses against paper in every round.
+    """
+    game = make_game([("rock", "paper")] * 3, ["Human"] * 3, "Human")
+
+    validate_games([game], mode="recompute")
+
+    assert [round_info.winner for round_info in game.rounds_played] == ["Machine"] * 3
+    assert game.game_winner == "Machine"
+
+
+def test_validate_games_rejects():
+    """Test that invalid games are refused with their position in the payload.
+
+    Games with unknown moves are refused in every mode; games with wrong
+    winners only in the mode "reject". With "off" nothing is checked.
+    """
+    valid = make_game([("rock", "scissors")] * 3, ["Human"] * 3, "Human")
+    wrong_winner = make_game([("rock", "paper")], ["Human"], "Machine")
+    unknown_move = make_game([("rock", "lizard")], ["Human"], "Human")
+
+    with pytest.raises(InvalidGameError) as error:
+        validate_games([valid, wrong_winner, unknown_move], mode="recompute")
+    assert error.value.problems == [(2, ["Invalid move"])]
+
+    with pytest.raises(InvalidGameError) as error:
+        validate_games([valid, wrong_winner], mode="reject")
+    assert error.value.problems == [(1, ["Wrong round winner"])]
+
+    validate_games([unknown_move], mode="off")
+
+
+def test_routes_validate_games():
+    """Test that the game routes store the recomputed winners and refuse invalid games.
+
+    A bulk upload with an invalid game is refused as a whole, and the error
+    points to the invalid game.
+    """
+    game = {
+        "rounds_played": [{"player_1_move": "rock", "player_2_move": "paper", "winner": "Human"}] * 3,
+        "game_winner": "Human"
+    }
+    response = client.post("/game", json=game)
+    assert response.status_code == 200
+    assert response.json()["game_winner"] == "Machine"
+    assert {round_info["winner"] for round_info in response.json()["rounds_played"]} == {"Machine"}
+
+    invalid = {"rounds_played": [{"player_1_move": "Rock", "player_2_move": "paper", "winner": "Human"}], "game_winner": "Human"}
+    total_games = client.get("/game/estadisticas").json()["total_games"]
+
+    response = client.post("/game/bulk", json=[game, invalid])
+    assert response.status_code == 422
+    assert response.json()["detail"] == [{"loc": ["body", 1], "msg": "Invalid move", "type": "value_error"}]
+    assert client.get("/game/estadisticas").json()["total_games"] == total_games